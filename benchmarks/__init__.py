@@ -0,0 +1,19 @@
+# Copyright (C) 2012  VT SuperDARN Lab
+# Full license can be found in LICENSE.txt
+"""
+*********************
+**Module**: benchmarks
+*********************
+Benchmarks of DaViT-py on synthetic data, reported as JSON so that runs on different commits can be compared::
+
+  python -m benchmarks.bench --size day --out bench.json
+
+**Modules**:
+    * :mod:`benchmarks.synthData`: synthetic fitacf, rawacf, iqdat, grid and map files
+    * :mod:`benchmarks.bench`: the benchmarks and their runner
+
+"""
+try:
+    import synthData
+except Exception, e:
+    print __file__+' -> benchmarks.synthData: ', e
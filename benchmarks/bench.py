@@ -0,0 +1,400 @@
+# Copyright (C) 2012  VT SuperDARN Lab
+# Full license can be found in LICENSE.txt
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+.. module:: bench
+   :synopsis: time reading, filtering, fov, plotting and MUSIC on synthetic data
+
+***************************
+**Module**: benchmarks.bench
+***************************
+
+Runs the benchmarks on synthetic files made by :mod:`benchmarks.synthData` and reports them as JSON, so runs on different commits can be compared.  The files are written to a scratch directory, and DAVIT_LOCALDIR, DAVIT_DIRFORMAT, DAVIT_TMPDIR and DAVIT_ARCHIVEDIR are pointed into it, so the data is found through the normal local file look up and no real data or cache is touched.  Plots are drawn with the Agg backend.
+
+Each benchmark runs in its own process, so its peak memory is its own, and one which fails, eg for want of a radar database or a compiled model, is reported with its error and the rest carry on.  Each result has:
+
+  * **name**: the benchmark
+  * **seconds**: the best wall time of the repeats
+  * **records**, **bytes**: the amount of data handled
+  * **recordsPerSec**, **mbPerSec**: records and MB (1e6 bytes) per second of the best time
+  * **peakRssMb**: the peak resident memory of the process running it
+  * **error**: the error, if it failed
+
+From the shell::
+
+  python -m benchmarks.bench --size day --out bench.json
+  python -m benchmarks.bench --only readRec,fov
+
+**Functions**:
+  * :func:`benchmarks.bench.runBenchmarks`
+  * :func:`benchmarks.bench.makeData`
+  * :func:`benchmarks.bench.peakRss`
+  * :func:`benchmarks.bench.main`
+"""
+
+#how much synthetic data to make for each size
+sizes = {
+  'small':{'hours':2,'nbeam':16,'ngate':75,'scanTime':60,'occupancy':.3,'nchan':1,'gridHours':2},
+  'day':{'hours':24,'nbeam':16,'ngate':75,'scanTime':60,'occupancy':.3,'nchan':1,'gridHours':24},
+  'stereo':{'hours':24,'nbeam':16,'ngate':100,'scanTime':60,'occupancy':.5,'nchan':2,'gridHours':24},
+}
+#the radar and day of the synthetic data
+benchRadar,benchStid = 'bks',33
+benchDay = (2011,1,1)
+
+def peakRss():
+  """the peak resident memory of this process so far, in MB"""
+  import resource, sys
+  rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+  #bytes on mac, kilobytes elsewhere
+  if sys.platform == 'darwin': return rss/1e6
+  return rss/1e3
+
+def makeData(workDir, config):
+  """write the synthetic files for a run
+
+  **Args**:
+    * **workDir** (str): the scratch directory
+    * **config** (dict): a value of sizes, or the like
+  **Returns**:
+    * **data** (dict): the times and files of the data, passed to each benchmark
+  """
+  import os, datetime as dt
+  from benchmarks import synthData
+  sTime = dt.datetime(*benchDay)
+  eTime = sTime+dt.timedelta(hours=config['hours'])
+  radKw = dict([(k,config[k]) for k in ('nbeam','ngate','scanTime','occupancy','nchan')])
+  base = os.path.join(workDir,'data')
+  data = {'sTime':sTime,'eTime':eTime,'base':base,'config':config}
+  data['fitacf'] = synthData.writeRadarFiles(base,sTime,eTime,radcode=benchRadar,fileType='fitacf',stid=benchStid,**radKw)
+  #the raw files are big, an hour of them is enough
+  rawEnd = min(eTime,sTime+dt.timedelta(hours=1))
+  data['rawacf'] = synthData.writeRadarFiles(base,sTime,rawEnd,radcode=benchRadar,fileType='rawacf',stid=benchStid,**radKw)
+  iqEnd = sTime+dt.timedelta(minutes=10)
+  data['iqdat'] = synthData.writeRadarFiles(base,sTime,iqEnd,radcode=benchRadar,fileType='iqdat',stid=benchStid,**radKw)
+  gEnd = sTime+dt.timedelta(hours=config['gridHours'])
+  data['grdex'] = os.path.join(base,sTime.strftime('%Y%m%d')+'.north.grdex')
+  synthData.writeGridFile(data['grdex'],sTime,gEnd,fileType='grdex')
+  data['mapex'] = os.path.join(base,sTime.strftime('%Y%m%d')+'.north.mapex')
+  synthData.writeGridFile(data['mapex'],sTime,gEnd,fileType='mapex')
+  return data
+
+def _env(workDir):
+  """point the data look up and the cache into the scratch directory"""
+  import os
+  os.environ['DAVIT_LOCALDIR'] = os.path.join(workDir,'data')
+  os.environ['DAVIT_DIRFORMAT'] = '%(dirtree)s/%(year)s/%(ftype)s/%(radar)s/'
+  os.environ['DAVIT_TMPDIR'] = os.path.join(workDir,'tmp')+'/'
+  os.environ['DAVIT_ARCHIVEDIR'] = os.path.join(workDir,'archive')+'/'
+
+def _size(files):
+  import os
+  if isinstance(files,basestring): files = [files]
+  return sum([os.path.getsize(f) for f in files])
+
+def _open(data, fileType='fitacf', **kwargs):
+  from pydarn.sdio import radDataOpen
+  return radDataOpen(data['sTime'],benchRadar,eTime=data['eTime'],fileType=fileType,src='local',noCache=True,**kwargs)
+
+def _quiet(func, *args, **kwargs):
+  """call a function with its printing thrown away"""
+  import sys, os
+  old = sys.stdout
+  sys.stdout = open(os.devnull,'w')
+  try: return func(*args,**kwargs)
+  finally:
+    sys.stdout.close()
+    sys.stdout = old
+
+#the benchmarks.  each takes the data dict and returns (records, bytes) of the work done
+
+def benchOpen(data):
+  """radDataOpen of the fitacf files"""
+  myPtr = _open(data)
+  myPtr.close()
+  return 0,_size(data['fitacf'])
+
+def benchReadRec(data, fileType='fitacf'):
+  """radDataReadRec of every record"""
+  from pydarn.sdio import radDataReadRec
+  myPtr = _open(data,fileType=fileType)
+  n = 0
+  while radDataReadRec(myPtr) is not None: n += 1
+  myPtr.close()
+  return n,_size(data[fileType])
+
+def benchReadRaw(data):
+  """radDataReadRec of every rawacf record"""
+  return benchReadRec(data,'rawacf')
+
+def benchReadIq(data):
+  """radDataReadRec of every iqdat record"""
+  return benchReadRec(data,'iqdat')
+
+def benchReadScan(data):
+  """radDataReadScan of every scan"""
+  from pydarn.sdio import radDataReadScan
+  myPtr = _open(data)
+  n = 0
+  while True:
+    myScan = radDataReadScan(myPtr)
+    if myScan is None: break
+    n += len(myScan)
+  myPtr.close()
+  return n,_size(data['fitacf'])
+
+def benchReadAll(data):
+  """radDataReadAll"""
+  from pydarn.sdio import radDataReadAll
+  myPtr = _open(data)
+  beams = radDataReadAll(myPtr)
+  myPtr.close()
+  return len(beams),_size(data['fitacf'])
+
+def benchReadBlock(data):
+  """radDataPtr.readBlock of every record"""
+  myPtr = _open(data)
+  myBlock = myPtr.readBlock()
+  myPtr.close()
+  return myBlock.nrec,_size(data['fitacf'])
+
+def benchReadGrid(data, fileType='grdex'):
+  """sdDataReadRec of every grid record"""
+  from pydarn.sdio import sdDataOpen, sdDataReadRec
+  myPtr = sdDataOpen(data['sTime'],eTime=data['eTime'],fileType=fileType,fileName=data[fileType],
+                     custType=fileType,noCache=True)
+  n = 0
+  while sdDataReadRec(myPtr) is not None: n += 1
+  myPtr.close()
+  return n,_size(data[fileType])
+
+def benchReadMap(data):
+  """sdDataReadRec of every map record"""
+  return benchReadGrid(data,'mapex')
+
+def benchFilter(data):
+  """fitexfilter.doFilter of the first scans, three at a time"""
+  from pydarn.sdio import radDataReadScan
+  from pydarn.sdio.fitexfilter import doFilter
+  myPtr = _open(data)
+  scans = [radDataReadScan(myPtr) for i in range(12)]
+  myPtr.close()
+  scans = [s for s in scans if s is not None]
+  n = 0
+  for i in range(1,len(scans)-1):
+    doFilter(scans[i-1:i+2])
+    n += len(scans[i])
+  return n,0
+
+def benchFov(data, coords='geo', repeats=5):
+  """building the fov of the radar"""
+  from pydarn.radar import site
+  from pydarn.radar.radFov import fov
+  cfg = data['config']
+  mySite = site(code=benchRadar,dt=data['sTime'])
+  for i in range(repeats):
+    fov(site=mySite,rsep=45,frang=180,ngates=cfg['ngate']+1,nbeams=cfg['nbeam'],coords=coords)
+  return repeats*(cfg['nbeam']+1)*(cfg['ngate']+2),0
+
+def benchFovMag(data):
+  """building the fov of the radar in magnetic coordinates"""
+  return benchFov(data,coords='mag')
+
+def _agg():
+  """draw without a display.  matplotlib is only imported by the plotting benchmarks, so the reading ones run without it"""
+  import matplotlib
+  matplotlib.use('Agg')
+
+def benchRti(data):
+  """plotRti of a day of one beam, drawn to a png"""
+  _agg()
+  from pydarn.plotting.rti import plotRti
+  cfg = data['config']
+  plotRti(data['sTime'],benchRadar,eTime=data['eTime'],bmnum=7,fileType='fitacf',show=False,png=True,dpi=100)
+  return cfg['hours']*3600/cfg['scanTime'],_size(data['fitacf'])
+
+def benchFan(data):
+  """plotFan of one scan, drawn to a png"""
+  _agg()
+  from pydarn.plotting.fan import plotFan
+  cfg = data['config']
+  plotFan(data['sTime'],[benchRadar],interval=cfg['scanTime'],fileType='fitacf',show=False,png=True,dpi=100)
+  return cfg['nbeam'],0
+
+def benchMusic(data):
+  """the MUSIC chain: musicArray, limits, interpolation and a simulated wave, then calculateFFT, calculateDlm and calculateKarr.  only the last three are timed"""
+  import time
+  from pydarn.proc import music
+  myPtr = _open(data)
+  dataObj = music.musicArray(myPtr,fovModel='GS')
+  myPtr.close()
+  music.defineLimits(dataObj,gateLimits=[30,40])
+  dataObj.active.applyLimits()
+  music.beamInterpolation(dataObj)
+  music.timeInterpolation(dataObj,timeRes=data['config']['scanTime'])
+  music.determineRelativePosition(dataObj)
+  music.simulator(dataObj)
+  music.nan_to_num(dataObj)
+  music.windowData(dataObj,window='hann')
+  t = time.time()
+  music.calculateFFT(dataObj)
+  music.calculateDlm(dataObj)
+  music.calculateKarr(dataObj,kxMax=0.05,kyMax=0.05,dkx=0.002,dky=0.002)
+  nTimes,nBeams,nGates = dataObj.active.data.shape
+  return nTimes*nBeams*nGates,0,time.time()-t
+
+#name -> benchmark, in the order they are run
+benchmarks = [('open',benchOpen),('readRec',benchReadRec),('readScan',benchReadScan),
+              ('readAll',benchReadAll),('readBlock',benchReadBlock),('readRaw',benchReadRaw),
+              ('readIq',benchReadIq),('readGrid',benchReadGrid),('readMap',benchReadMap),
+              ('filter',benchFilter),('fov',benchFov),('fovMag',benchFovMag),('rti',benchRti),
+              ('fan',benchFan),('music',benchMusic)]
+
+def _runOne(name, func, data, repeats):
+  """run a benchmark a few times, keeping the best time"""
+  import time, traceback
+  result = {'name':name}
+  try:
+    best = None
+    for i in range(repeats):
+      t = time.time()
+      out = _quiet(func,data)
+      dt = time.time()-t
+      #a benchmark may time only part of what it does
+      if len(out) == 3: dt = out[2]
+      if best is None or dt < best: best = dt
+    records,nbytes = out[0],out[1]
+    result.update({'seconds':best,'records':records,'bytes':nbytes,
+                   'recordsPerSec':records/best if best > 0 else None,
+                   'mbPerSec':nbytes/1e6/best if best > 0 else None})
+  except Exception, e:
+    result['error'] = '%s: %s' % (type(e).__name__,e)
+    result['traceback'] = traceback.format_exc()
+  result['peakRssMb'] = peakRss()
+  return result
+
+def _child(name, func, data, repeats, queue):
+  queue.put(_runOne(name,func,data,repeats))
+
+def _isolated(name, func, data, repeats):
+  """run a benchmark in a process of its own"""
+  import multiprocessing
+  queue = multiprocessing.Queue()
+  proc = multiprocessing.Process(target=_child,args=(name,func,data,repeats,queue))
+  proc.start()
+  try: result = queue.get()
+  except Exception, e: result = {'name':name,'error':'%s: %s' % (type(e).__name__,e)}
+  proc.join()
+  if proc.exitcode != 0 and 'error' not in result: result['error'] = 'exit code %d' % proc.exitcode
+  return result
+
+def _meta(size, config):
+  """what the run was made on"""
+  import os, sys, platform, socket, subprocess, datetime as dt
+  import numpy
+  try:
+    import matplotlib
+    mplVersion = matplotlib.__version__
+  except ImportError: mplVersion = None
+  meta = {'size':size,'config':config,'python':sys.version.split()[0],'numpy':numpy.__version__,
+          'matplotlib':mplVersion,'platform':platform.platform(),'host':socket.gethostname(),
+          'time':dt.datetime.utcnow().isoformat(),'commit':None}
+  try:
+    here = os.path.dirname(os.path.abspath(__file__))
+    meta['commit'] = subprocess.Popen(['git','rev-parse','HEAD'],cwd=here,stdout=subprocess.PIPE,
+                                      stderr=subprocess.PIPE).communicate()[0].strip() or None
+  except Exception: pass
+  return meta
+
+def runBenchmarks(only=None, size='small', repeats=1, outFile=None, workDir=None, isolate=True, vb=True):
+  """make the synthetic data and run the benchmarks on it
+
+  **Args**:
+    * **[only]** (list): the names of the benchmarks to run, None runs them all. default = None
+    * **[size]** (str): how much data to make, a key of sizes. default = 'small'
+    * **[repeats]** (int): the times to run each benchmark, the best is kept. default = 1
+    * **[outFile]** (str): a file to write the JSON results to. default = None
+    * **[workDir]** (str): the scratch directory, kept afterwards.  if None a temporary one is made and removed. default = None
+    * **[isolate]** (bool): run each benchmark in a process of its own. default = True
+    * **[vb]** (bool): print each result as it comes. default = True
+  **Returns**:
+    * **report** (dict): {'meta':..., 'results':[...]}
+  **Example**:
+    ::
+
+      report = benchmarks.bench.runBenchmarks(only=['readRec','fov'],size='day')
+  """
+  import os, json, shutil, tempfile
+  assert(size in sizes),'error, size must be one of '+','.join(sorted(sizes.keys()))
+  names = [n for n,f in benchmarks]
+  if only is not None:
+    for n in only: assert(n in names),'error, unknown benchmark '+n
+  config = sizes[size]
+  tmp = workDir is None
+  if tmp: workDir = tempfile.mkdtemp(prefix='davitbench')
+  oldEnv = dict(os.environ)
+  oldDir = os.getcwd()
+  results = []
+  try:
+    _env(workDir)
+    for d in ('tmp','archive','plots'):
+      if not os.path.exists(os.path.join(workDir,d)): os.makedirs(os.path.join(workDir,d))
+    data = _quiet(makeData,workDir,config)
+    #plots are saved in the current directory
+    os.chdir(os.path.join(workDir,'plots'))
+    for name,func in benchmarks:
+      if only is not None and name not in only: continue
+      if isolate: result = _isolated(name,func,data,repeats)
+      else: result = _runOne(name,func,data,repeats)
+      results.append(result)
+      if vb:
+        if 'error' in result: print '%-10s failed: %s' % (name,result['error'])
+        else: print '%-10s %8.3f s %10.1f rec/s %8.2f MB/s %8.1f MB' % \
+          (name,result['seconds'],result['recordsPerSec'] or 0,result['mbPerSec'] or 0,result['peakRssMb'])
+  finally:
+    os.chdir(oldDir)
+    os.environ.clear()
+    os.environ.update(oldEnv)
+    if tmp: shutil.rmtree(workDir,ignore_errors=True)
+  report = {'meta':_meta(size,config),'results':results}
+  if outFile is not None:
+    f = open(outFile,'w')
+    json.dump(report,f,indent=1,sort_keys=True)
+    f.close()
+  return report
+
+def main(argv=None):
+  """run the benchmarks from the command line, see python -m benchmarks.bench --help"""
+  import argparse, json, sys
+  parser = argparse.ArgumentParser(description='time davitpy on synthetic data, reporting JSON')
+  parser.add_argument('--size',default='small',choices=sorted(sizes.keys()),help='how much data to make')
+  parser.add_argument('--only',default=None,help='comma separated benchmarks to run, of: '+','.join([n for n,f in benchmarks]))
+  parser.add_argument('--repeats',type=int,default=1,help='runs of each benchmark, the best is kept')
+  parser.add_argument('--out',default=None,help='write the JSON here instead of to stdout')
+  parser.add_argument('--workdir',default=None,help='keep the synthetic data in this directory')
+  parser.add_argument('--no-isolate',action='store_true',help='run every benchmark in this process')
+  args = parser.parse_args(argv)
+  only = None
+  if args.only: only = args.only.split(',')
+  report = runBenchmarks(only=only,size=args.size,repeats=args.repeats,outFile=args.out,
+                         workDir=args.workdir,isolate=not args.no_isolate,vb=args.out is not None)
+  if args.out is None:
+    json.dump(report,sys.stdout,indent=1,sort_keys=True)
+    print
+  return report
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,338 @@
+# Copyright (C) 2012  VT SuperDARN Lab
+# Full license can be found in LICENSE.txt
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+.. module:: synthData
+   :synopsis: synthetic fitacf, rawacf, iqdat, grid and map dmap files
+
+*******************************
+**Module**: benchmarks.synthData
+*******************************
+
+Generators of realistic looking radar records, for timing the readers and the processing built on them without any real data.  Records are dicts of the form read by :func:`pydarn.dmapio.readDmapRec`, written with :class:`pydarn.sdio.dmapWriter.dmapWriter`.  The number of beams, gates and channels, the time between scans and the fraction of gates with echoes can all be set, and a seed makes the files the same from run to run.
+
+**Functions**:
+  * :func:`benchmarks.synthData.fitRecords`
+  * :func:`benchmarks.synthData.rawRecords`
+  * :func:`benchmarks.synthData.iqRecords`
+  * :func:`benchmarks.synthData.gridRecords`
+  * :func:`benchmarks.synthData.mapRecords`
+  * :func:`benchmarks.synthData.writeRecords`
+  * :func:`benchmarks.synthData.writeRadarFiles`
+  * :func:`benchmarks.synthData.writeGridFile`
+"""
+
+#dmap type codes, as in pydarn.sdio.dmapWriter
+DATACHAR,DATASHORT,DATAINT,DATAFLOAT,DATADOUBLE,DATASTRING = 1,2,3,4,8,9
+
+#the types of the iq, grid and map fields which are not in pydarn.sdio.dmapWriter.dmapTypes
+synthTypes = {'btnum':DATAINT,'tbadtr':DATAINT,'badtr':DATAINT,'data':DATASHORT,
+              'major.revision':DATASHORT,'minor.revision':DATASHORT,'program.id':DATASHORT,
+              'nvec':DATASHORT,'freq':DATAFLOAT,'IMF.flag':DATASHORT,'IMF.delay':DATASHORT,
+              'IMF.Bx':DATADOUBLE,'IMF.By':DATADOUBLE,'IMF.Bz':DATADOUBLE,'model.angle':DATASTRING,
+              'model.level':DATASTRING,'model.tilt':DATASTRING,'model.name':DATASTRING,
+              'hemisphere':DATASHORT,'fit.order':DATASHORT,'latmin':DATAFLOAT,'chi.sqr':DATADOUBLE,
+              'chi.sqr.dat':DATADOUBLE,'rms.err':DATADOUBLE,'lon.shft':DATAFLOAT,'lat.shft':DATAFLOAT,
+              'mlt.start':DATADOUBLE,'mlt.end':DATADOUBLE,'mlt.av':DATADOUBLE,'pot.drop':DATADOUBLE,
+              'pot.drop.err':DATADOUBLE,'pot.max':DATADOUBLE,'pot.max.err':DATADOUBLE,
+              'pot.min':DATADOUBLE,'pot.min.err':DATADOUBLE}
+
+#the pulse and lag tables of the standard 8 pulse sequence
+ptab8 = [0,14,22,24,27,31,42,43]
+ltab8 = [[0,0],[42,43],[22,24],[24,27],[27,31],[22,27],[24,31],[14,22],[22,31],[14,24],[31,42],
+         [31,43],[14,27],[0,14],[27,42],[27,43],[14,31],[24,42],[24,43],[22,42],[22,43],[0,22],
+         [0,24],[43,43]]
+
+def _channels(nchan):
+  """the dmap channel numbers and cp of a radar running nchan channels.  one channel is 0, stereo channels are 1, 2..."""
+  if nchan <= 1: return [0],150
+  return range(1,nchan+1),153
+
+def _prm(t, bmnum, ch, cp, stid, scan, nbeam, ngate, tfreq, nave, rs):
+  """the radar parameters of a sounding"""
+  import numpy as np
+  noise = float(rs.lognormal(1.,.5))
+  return {'radar.revision.major':1,'radar.revision.minor':18,'origin.code':0,
+          'origin.time':'synthetic','origin.command':'benchmarks.synthData','cp':cp,'stid':stid,
+          'time':t,'txpow':9000,'nave':nave,'atten':0,'lagfr':1200,'smsep':300,'ercod':0,
+          'stat.agc':0,'stat.lopwr':0,'noise.search':noise*2,'noise.mean':noise*2.5,'channel':ch,
+          'bmnum':bmnum,'bmazm':float(-24.+3.24*(bmnum-nbeam/2.)),'scan':scan,'offset':0,'rxrise':100,
+          'intt.sc':3,'intt.us':0,'txpl':300,'mpinc':1500,'mppul':8,'mplgs':23,'mplgexs':0,'ifmode':-1,
+          'nrang':ngate,'frang':180,'rsep':45,'xcf':1,'tfreq':tfreq,'mxpwr':1070000000,'lvmax':20000,
+          'combf':'synthetic data','ptab':np.array(ptab8,dtype=np.int16),
+          'ltab':np.array(ltab8,dtype=np.int16)}
+
+def _soundings(sTime, eTime, nbeam, scanTime, nchan):
+  """(epoch time, beam, channel number, scan flag) of every sounding between two times, beams stepping across each scan.  the channels of a stereo radar sound together."""
+  from utils.timeUtils import datetimeToEpoch
+  chans,cp = _channels(nchan)
+  t,t1 = datetimeToEpoch(sTime),datetimeToEpoch(eTime)
+  dwell = float(scanTime)/nbeam
+  while t < t1:
+    for b in range(nbeam):
+      for ch in chans:
+        yield t+b*dwell,b,ch,int(b == 0)
+    t += scanTime
+
+def fitRecords(sTime, eTime, nbeam=16, ngate=75, scanTime=60, occupancy=.3, nchan=1, stid=33, seed=0):
+  """a generator of fitacf records.  Echoes come in patches which drift along the range axis from scan to scan, with velocities which vary smoothly across the field of view, and about a third of them are ground scatter.
+
+  **Args**:
+    * **sTime** (`datetime <http://tinyurl.com/bl352yx>`_): the time of the first record
+    * **eTime** (`datetime <http://tinyurl.com/bl352yx>`_): no records at or after this
+    * **[nbeam]** (int): the number of beams in a scan. default = 16
+    * **[ngate]** (int): the number of range gates. default = 75
+    * **[scanTime]** (float): seconds from one scan to the next. default = 60
+    * **[occupancy]** (float): the fraction of gates with an echo. default = 0.3
+    * **[nchan]** (int): the number of channels, 1 or more. default = 1
+    * **[stid]** (int): the station id. default = 33 (bks)
+    * **[seed]** (int): the random seed. default = 0
+  **Returns**:
+    * a generator of record dicts
+  **Example**:
+    ::
+
+      recs = list(benchmarks.synthData.fitRecords(dt.datetime(2011,1,1),dt.datetime(2011,1,1,2)))
+  """
+  import numpy as np
+  rs = np.random.RandomState(seed)
+  chans,cp = _channels(nchan)
+  gates = np.arange(ngate)
+  for t,b,ch,scan in _soundings(sTime,eTime,nbeam,scanTime,nchan):
+    rec = _prm(t,b,ch,cp,stid,scan,nbeam,ngate,10500+1000*chans.index(ch),20,rs)
+    #a patch of echoes which moves out in range over the day
+    centre = ngate*(.5+.3*np.sin(t/3600.+b/float(nbeam)))
+    prob = occupancy*2*np.exp(-((gates-centre)/(ngate*occupancy+1.))**2)
+    slist = gates[rs.random_sample(ngate) < np.minimum(prob,1.)].astype(np.int16)
+    n = len(slist)
+    pwr = np.abs(rs.normal(15.,8.,n)).astype(np.float32)
+    vel = (300*np.sin(t/1800.+b/5.+slist/20.)+rs.normal(0,50,n)).astype(np.float32)
+    gflg = (rs.random_sample(n) < .3).astype(np.int8)
+    vel[gflg == 1] *= .1
+    wid = np.abs(rs.normal(150.,80.,n)).astype(np.float32)
+    err = lambda x,f: (np.abs(x)*f+1.).astype(np.float32)
+    pwr0 = np.abs(rs.normal(5.,3.,ngate)).astype(np.float32)
+    pwr0[slist] += pwr
+    rec.update({'fitacf.revision.major':5,'fitacf.revision.minor':0,'noise.sky':rec['noise.search']/2.,
+                'noise.lag0':0.,'noise.vel':0.,'pwr0':pwr0,'slist':slist,
+                'nlag':rs.randint(5,20,n).astype(np.int16),'qflg':np.ones(n,dtype=np.int8),'gflg':gflg,
+                'p_l':pwr,'p_l_e':err(pwr,.05),'p_s':pwr*.9,'p_s_e':err(pwr,.06),'v':vel,'v_e':err(vel,.1),
+                'w_l':wid,'w_l_e':err(wid,.1),'w_s':wid*.8,'w_s_e':err(wid,.12),
+                'sd_l':err(pwr,.01),'sd_s':err(pwr,.01),'sd_phi':err(pwr,.01),
+                'x_qflg':np.ones(n,dtype=np.int8),'x_gflg':gflg,'x_p_l':pwr,'x_p_l_e':err(pwr,.05),
+                'x_p_s':pwr,'x_p_s_e':err(pwr,.05),'x_v':vel,'x_v_e':err(vel,.1),'x_w_l':wid,
+                'x_w_l_e':err(wid,.1),'x_w_s':wid,'x_w_s_e':err(wid,.1),'phi0':rs.uniform(-np.pi,np.pi,n).astype(np.float32),
+                'phi0_e':np.ones(n,dtype=np.float32),'elv':rs.uniform(5,40,n).astype(np.float32),
+                'elv_low':rs.uniform(0,5,n).astype(np.float32),'elv_high':rs.uniform(40,45,n).astype(np.float32),
+                'x_sd_l':err(pwr,.01),'x_sd_s':err(pwr,.01),'x_sd_phi':err(pwr,.01)})
+    yield rec
+
+def rawRecords(sTime, eTime, nbeam=16, ngate=75, scanTime=60, occupancy=.3, nchan=1, stid=33, seed=0):
+  """a generator of rawacf records, with decaying acfs and xcfs at every gate.  The args are as for :func:`fitRecords`, occupancy sets the fraction of gates with strong acfs."""
+  import numpy as np
+  rs = np.random.RandomState(seed)
+  chans,cp = _channels(nchan)
+  for t,b,ch,scan in _soundings(sTime,eTime,nbeam,scanTime,nchan):
+    rec = _prm(t,b,ch,cp,stid,scan,nbeam,ngate,10500+1000*chans.index(ch),20,rs)
+    mplgs = rec['mplgs']
+    pwr0 = rs.exponential(10.,ngate)
+    pwr0[rs.random_sample(ngate) < occupancy] *= 50
+    lags = np.arange(mplgs)
+    decay = np.exp(-lags[None,:]/rs.uniform(3,15,(ngate,1)))*pwr0[:,None]
+    phase = np.exp(1j*lags[None,:]*rs.uniform(-.5,.5,(ngate,1)))
+    acf = (decay*phase).astype(np.complex64)
+    rec.update({'rawacf.revision.major':1,'rawacf.revision.minor':1,'thr':3.,
+                'pwr0':pwr0.astype(np.float32),'slist':np.arange(ngate,dtype=np.int16),
+                'acfd':acf.view(np.float32).ravel(),'xcfd':(acf*.5).astype(np.complex64).view(np.float32).ravel()})
+    yield rec
+
+def iqRecords(sTime, eTime, nbeam=16, scanTime=60, nchan=1, stid=33, seqnum=20, smpnum=300, seed=0):
+  """a generator of iqdat records, main and interferometer samples of every pulse sequence.  The args are as for :func:`fitRecords`, plus
+
+  **Args**:
+    * **[seqnum]** (int): the number of pulse sequences in a sounding. default = 20
+    * **[smpnum]** (int): the number of samples in a pulse sequence. default = 300
+  """
+  import numpy as np
+  rs = np.random.RandomState(seed)
+  chans,cp = _channels(nchan)
+  for t,b,ch,scan in _soundings(sTime,eTime,nbeam,scanTime,nchan):
+    rec = _prm(t,b,ch,cp,stid,scan,nbeam,75,10500+1000*chans.index(ch),seqnum,rs)
+    data = rs.normal(0,200,seqnum*2*smpnum*2).clip(-32768,32767).astype(np.int16)
+    rec.update({'iqdata.revision.major':1,'iqdata.revision.minor':0,'seqnum':seqnum,'chnnum':2,
+                'smpnum':smpnum,'skpnum':4,'btnum':0,'tsc':np.arange(seqnum,dtype=np.int32),
+                'tus':np.arange(seqnum,dtype=np.int32)*100000,'tatten':np.zeros(seqnum,dtype=np.int16),
+                'tnoise':np.ones(seqnum,dtype=np.float32),'toff':np.arange(seqnum,dtype=np.int32)*smpnum*2*2,
+                'tsze':np.ones(seqnum,dtype=np.int32)*smpnum*2*2,'tbadtr':np.zeros(0,dtype=np.int32),
+                'badtr':np.zeros(0,dtype=np.int32),'data':data})
+    yield rec
+
+def _gridRec(t, dt, rs, nrad, nvec, mlatMin):
+  """the fields shared by grid and map records"""
+  import datetime
+  import numpy as np
+  e = t+datetime.timedelta(seconds=dt)
+  nv = rs.poisson(nvec,nrad).astype(np.int16)
+  n = int(nv.sum())
+  stids = np.arange(1,nrad+1,dtype=np.int16)
+  ones = lambda x: np.ones(nrad,dtype=np.float32)*x
+  rec = {'start.year':t.year,'start.month':t.month,'start.day':t.day,'start.hour':t.hour,
+         'start.minute':t.minute,'start.second':float(t.second),
+         'end.year':e.year,'end.month':e.month,'end.day':e.day,'end.hour':e.hour,
+         'end.minute':e.minute,'end.second':float(e.second),
+         'stid':stids,'channel':np.zeros(nrad,dtype=np.int16),'nvec':nv,'freq':ones(11000.),
+         'major.revision':np.ones(nrad,dtype=np.int16),'minor.revision':np.zeros(nrad,dtype=np.int16),
+         'program.id':np.ones(nrad,dtype=np.int16)*150,'noise.mean':ones(3.),'noise.sd':ones(1.),
+         'gsct':np.zeros(nrad,dtype=np.int16),'v.min':ones(35.),'v.max':ones(2000.),'p.min':ones(3.),
+         'p.max':ones(50.),'w.min':ones(10.),'w.max':ones(1000.),'ve.min':ones(0.),'ve.max':ones(200.),
+         'vector.mlat':rs.uniform(mlatMin,88,n).astype(np.float32),
+         'vector.mlon':rs.uniform(0,360,n).astype(np.float32),
+         'vector.kvect':rs.uniform(-180,180,n).astype(np.float32),
+         'vector.stid':np.repeat(stids,nv),'vector.channel':np.zeros(n,dtype=np.int16),
+         'vector.index':np.arange(n,dtype=np.int32),
+         'vector.vel.median':rs.normal(0,300,n).astype(np.float32),
+         'vector.vel.sd':np.abs(rs.normal(50,20,n)).astype(np.float32),
+         'vector.pwr.median':np.abs(rs.normal(15,5,n)).astype(np.float32),
+         'vector.pwr.sd':np.ones(n,dtype=np.float32),
+         'vector.wdt.median':np.abs(rs.normal(150,50,n)).astype(np.float32),
+         'vector.wdt.sd':np.ones(n,dtype=np.float32)}
+  return rec
+
+def _times(sTime, eTime, dt):
+  import datetime
+  t = sTime
+  while t < eTime:
+    yield t
+    t += datetime.timedelta(seconds=dt)
+
+def gridRecords(sTime, eTime, dt=120, nrad=12, nvec=150, mlatMin=50., seed=0):
+  """a generator of grdex records
+
+  **Args**:
+    * **sTime** (`datetime <http://tinyurl.com/bl352yx>`_): the start of the first record
+    * **eTime** (`datetime <http://tinyurl.com/bl352yx>`_): no records start at or after this
+    * **[dt]** (int): the length of a record in seconds. default = 120
+    * **[nrad]** (int): the number of radars in each record. default = 12
+    * **[nvec]** (int): the mean number of vectors from each radar. default = 150
+    * **[mlatMin]** (float): the lowest magnetic latitude of a vector. default = 50
+    * **[seed]** (int): the random seed. default = 0
+  **Returns**:
+    * a generator of record dicts
+  """
+  import numpy as np
+  rs = np.random.RandomState(seed)
+  for t in _times(sTime,eTime,dt):
+    yield _gridRec(t,dt,rs,nrad,nvec,mlatMin)
+
+def mapRecords(sTime, eTime, dt=120, nrad=12, nvec=150, order=8, mlatMin=50., seed=0):
+  """a generator of mapex records, grid records with a fit of the given order, model vectors and a boundary.  The args are as for :func:`gridRecords`, plus order, the order of the fit. default = 8"""
+  import numpy as np
+  rs = np.random.RandomState(seed)
+  ncoef = (order+1)**2
+  for t in _times(sTime,eTime,dt):
+    rec = _gridRec(t,dt,rs,nrad,nvec,mlatMin)
+    m = rs.randint(20,80)
+    rec.update({'IMF.flag':1,'IMF.delay':10,'IMF.Bx':float(rs.normal(0,3)),'IMF.By':float(rs.normal(0,3)),
+                'IMF.Bz':float(rs.normal(0,3)),'model.angle':'Bz-/By+','model.level':'4<BT<6',
+                'model.tilt':'DP0','model.name':'RG96','hemisphere':1,'fit.order':order,'latmin':mlatMin,
+                'chi.sqr':1.,'chi.sqr.dat':1.,'rms.err':1.,'lon.shft':0.,'lat.shft':0.,'mlt.start':0.,
+                'mlt.end':0.,'mlt.av':0.,'pot.drop':float(rs.uniform(2e4,1e5)),'pot.drop.err':1e3,
+                'pot.max':3e4,'pot.max.err':1e3,'pot.min':-3e4,'pot.min.err':1e3,
+                'N':rs.normal(0,1,ncoef),'N+1':rs.normal(0,1,ncoef),'N+2':np.repeat(np.arange(order+1),order+1).astype(np.float64),
+                'N+3':np.tile(np.arange(order+1),order+1).astype(np.float64),
+                'model.mlat':rs.uniform(mlatMin,88,m).astype(np.float32),
+                'model.mlon':rs.uniform(0,360,m).astype(np.float32),
+                'model.kvect':rs.uniform(-180,180,m).astype(np.float32),
+                'model.vel.median':np.abs(rs.normal(300,100,m)).astype(np.float32),
+                'boundary.mlat':np.ones(36,dtype=np.float32)*mlatMin+5,
+                'boundary.mlon':np.arange(0,360,10,dtype=np.float32)})
+    yield rec
+
+def writeRecords(fileName, recs):
+  """write records to a dmap file, compressed if it ends in .gz or .bz2
+
+  **Args**:
+    * **fileName** (str): the file to write
+    * **recs** (iterable): the record dicts, eg from :func:`fitRecords`
+  **Returns**:
+    * **nrec** (int): the number of records written
+  """
+  from pydarn.sdio.dmapWriter import dmapWriter
+  myWriter = dmapWriter(fileName,types=synthTypes)
+  try:
+    batch = []
+    for rec in recs:
+      batch.append(rec)
+      if len(batch) == 256:
+        myWriter.writeRecs(batch)
+        batch = []
+    myWriter.writeRecs(batch)
+  finally:
+    myWriter.close()
+  return myWriter.nrec
+
+def writeRadarFiles(baseDir, sTime, eTime, radcode='bks', fileType='fitacf', stid=33, hours=2, **kwargs):
+  """write synthetic radar files laid out as the local data tree, <baseDir>/<yyyy>/<ftype>/<rad>/<yyyymmdd>.<hh>00.00.<rad>.<ftype>, one every few hours.  Point DAVIT_LOCALDIR at baseDir and DAVIT_DIRFORMAT at '%(dirtree)s/%(year)s/%(ftype)s/%(radar)s/' to read them with :func:`pydarn.sdio.radDataRead.radDataOpen`.
+
+  **Args**:
+    * **baseDir** (str): the top of the tree
+    * **sTime** (`datetime <http://tinyurl.com/bl352yx>`_): the start of the data, on the hour
+    * **eTime** (`datetime <http://tinyurl.com/bl352yx>`_): the end of the data
+    * **[radcode]** (str): the 3-letter radar code of the file names. default = 'bks'
+    * **[fileType]** (str): 'fitacf', 'fitex', 'lmfit', 'rawacf' or 'iqdat'. default = 'fitacf'
+    * **[stid]** (int): the station id of the records, it should match radcode. default = 33
+    * **[hours]** (int): the hours in each file. default = 2
+    * **[kwargs]**: passed on to :func:`fitRecords`, :func:`rawRecords` or :func:`iqRecords`
+  **Returns**:
+    * **files** (list): the files written
+  """
+  import os, datetime
+  if fileType in ('fitacf','fitex','lmfit'): gen = fitRecords
+  elif fileType == 'rawacf': gen = rawRecords
+  elif fileType == 'iqdat':
+    gen = iqRecords
+    kwargs.pop('ngate',None)
+    kwargs.pop('occupancy',None)
+  else: raise ValueError('unknown fileType '+fileType)
+  files = []
+  t = sTime
+  seed = kwargs.pop('seed',0)
+  while t < eTime:
+    t2 = min(t+datetime.timedelta(hours=hours),eTime)
+    myDir = os.path.join(baseDir,t.strftime('%Y'),fileType,radcode)
+    if not os.path.exists(myDir): os.makedirs(myDir)
+    fileName = os.path.join(myDir,t.strftime('%Y%m%d.%H%M.%S')+'.'+radcode+'.'+fileType)
+    writeRecords(fileName,gen(t,t2,stid=stid,seed=seed+len(files),**kwargs))
+    files.append(fileName)
+    t = t2
+  return files
+
+def writeGridFile(fileName, sTime, eTime, fileType='grdex', **kwargs):
+  """write a synthetic grdex or mapex file
+
+  **Args**:
+    * **fileName** (str): the file to write
+    * **sTime** (`datetime <http://tinyurl.com/bl352yx>`_): the start of the data
+    * **eTime** (`datetime <http://tinyurl.com/bl352yx>`_): the end of the data
+    * **[fileType]** (str): 'grdex' or 'mapex'. default = 'grdex'
+    * **[kwargs]**: passed on to :func:`gridRecords` or :func:`mapRecords`
+  **Returns**:
+    * **nrec** (int): the number of records written
+  """
+  if fileType in ('grd','grdex'): gen = gridRecords
+  elif fileType in ('map','mapex'): gen = mapRecords
+  else: raise ValueError('unknown fileType '+fileType)
+  return writeRecords(fileName,gen(sTime,eTime,**kwargs))
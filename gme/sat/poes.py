@@ -13,6 +13,7 @@
   * :func:`readPoes`
   * :func:`readPoesFtp`
   * :func:`mapPoesMongo`
+  * :func:`poesToMag`
   * :func:`overlayPoesTed`
 """
 
@@ -411,8 +412,33 @@ def mapPoesMongo(sYear,eYear=None):
     myTime += dt.timedelta(days=10)
     
     
+def poesToMag(lats, lons, times, coords='mag', approx=False):
+  """This function converts a track of poes foot-of-field-line points to magnetic coordinates, all in one call to aacgm
+  
+  **Args**: 
+    * **lats** (list): geographic latitudes of the points
+    * **lons** (list): geographic longitudes of the points
+    * **times** (list): the `datetime <http://tinyurl.com/bl352yx>`_ of each point, used for mlt
+    * **[coords]** (str): 'mag' for magnetic longitudes or 'mlt' for magnetic local times in degrees. default = 'mag'
+    * **[approx]** (bool): convert with the approximate aacgm lookup grid, see :mod:`models.aacgm.aacgmGrid`. default = False
+  **Returns**:
+    * **lats** (list): magnetic latitudes of the points
+    * **lons** (list): magnetic longitudes or magnetic local times [degrees] of the points
+
+  **Example**:
+    ::
+    
+      mlats,mlons = gme.sat.poes.poesToMag(lats,lons,times,coords='mlt')
+  """
+  import models, utils
+  if len(lats) == 0: return lats,lons
+  mlats,mlons,_ = models.aacgm.aacgmConvArray(lats,lons,0.,0,approx=approx)
+  if coords == 'mlt':
+    mlons = [models.aacgm.mltFromEpoch(utils.timeUtils.datetimeToEpoch(t),l)*360./24. for t,l in zip(times,mlons)]
+  return list(mlats),list(mlons)
+
 def overlayPoesTed( baseMapObj, axisHandle, startTime, endTime = None, coords = 'geo', \
-                    hemi = 1, folat = [45., 90.], satNum = None, param='ted', scMin=-3.,scMax=0.5) :
+                    hemi = 1, folat = [45., 90.], satNum = None, param='ted', scMin=-3.,scMax=0.5, approx=False) :
   """This function overlays POES TED data onto a map object.
   
   **Args**: 
@@ -425,6 +451,7 @@ def overlayPoesTed( baseMapObj, axisHandle, startTime, endTime = None, coords =
     * [**hemi**] (list or None): Hemisphere of the map object on which you want data to be overlayed on. Value is 1 for northern hemisphere and -1 for the southern hemisphere.Default 1
      [**folat**] (list or None): if this is not None, it must be a 2-element list of numbers, [a,b].  In this case, only data with latitude values in the range [a,b] will be returned.  default = None
     * [**param**] (str): the name of the poes parameter to be plotted.  default='ted'
+    * [**approx**] (bool): with coords 'mag' or 'mlt', convert with the approximate aacgm lookup grid.  default=False
   **Returns**:
     POES TED data is overlayed on the map object. If no data is found, None is returned.
   **Example**:
@@ -526,21 +553,16 @@ def overlayPoesTed( baseMapObj, axisHandle, startTime, endTime = None, coords =
       # Store our data in arrays
       try:
         tedPoesAll[sN].append(math.log10(getattr(l,param)))
-        if coords == 'mag' or coords == 'mlt':
-          lat,lon,_ = models.aacgm.aacgmConv(l.folat,l.folon, 0., 0)
-          latPoesAll[sN].append(lat)
-          if coords == 'mag':
-            lonPoesAll[sN].append(lon)
-          else:
-            lonPoesAll[sN].append(models.aacgm.mltFromEpoch(utils.timeUtils.datetimeToEpoch(l.time),lon)*360./24.)
-        else:
-          latPoesAll[sN].append(l.folat)
-          lonPoesAll[sN].append(l.folon)
-
+        latPoesAll[sN].append(l.folat)
+        lonPoesAll[sN].append(l.folon)
         timePoesAll[sN].append(l.time)
       except Exception,e:
         print e
         print 'could not get parameter for time',l.time
+
+    # convert the whole track at once
+    if coords == 'mag' or coords == 'mlt':
+      latPoesAll[sN],lonPoesAll[sN] = poesToMag(latPoesAll[sN],lonPoesAll[sN],timePoesAll[sN],coords,approx=approx)
   
   if(not goodFlg): return None
   
@@ -571,7 +593,7 @@ def overlayPoesTed( baseMapObj, axisHandle, startTime, endTime = None, coords =
   return bpltpoes
     
     
-def overlayPoesBnd( baseMapObj, axisHandle, startTime, coords = 'geo', hemi = 1, equBnd = True, polBnd = False ) :
+def overlayPoesBnd( baseMapObj, axisHandle, startTime, coords = 'geo', hemi = 1, equBnd = True, polBnd = False, approx = False ) :
   """This function reads POES TED data with in +/- 45min of the given time, fits the auroral oval boundaries and overlays them on a map object. The poleward boundary is not accurate all the times due to lesser number of satellite passes identifying it.
 
   **Args**: 
@@ -582,6 +604,7 @@ def overlayPoesBnd( baseMapObj, axisHandle, startTime, coords = 'geo', hemi = 1,
   * [**hemi**] (list or None): Hemisphere of the map object on which you want data to be overlayed on. Value is 1 for northern hemisphere and -1 for the southern hemisphere.Default 1
   * [**equBnd**] (list or None): If this is True the equatorward auroral oval boundary fit from the TED data is overlayed on the map object. Default True
         * [**polBnd**] (list or None): If this is True the poleward auroral oval boundary fit from the TED data is overlayed on the map object. Default False
+  * [**approx**] (bool): with coords 'mag' or 'mlt', convert with the approximate aacgm lookup grid. Default False
     
   **Returns**:
     POES TED data is overlayed on the map object. If no data is found, None is returned.
@@ -654,21 +677,17 @@ def overlayPoesBnd( baseMapObj, axisHandle, startTime, coords = 'geo', hemi = 1,
        continue
 
       if x > equBndCutoffVal:
-        if coords == 'mag' or coords == 'mlt':
-          lat,lon,_ = models.aacgm.aacgmConv(currPoesList[l].folat,currPoesList[l].folon, 0., 0)
-          latPoesAll[sN].append(lat)
-          if coords == 'mag':
-            lonPoesAll[sN].append(lon)
-          else:
-            lonPoesAll[sN].append(models.aacgm.mltFromEpoch(utils.timeUtils.datetimeToEpoch(currPoesList[l].time),lon)*360./24.)
-        else:
-          latPoesAll[sN].append(currPoesList[l].folat)
-          lonPoesAll[sN].append(currPoesList[l].folon)
+        latPoesAll[sN].append(currPoesList[l].folat)
+        lonPoesAll[sN].append(currPoesList[l].folon)
 
         # latPoesAll[sN].append( currPoesList[l].folat )
         # lonPoesAll[sN].append( currPoesList[l].folon )
         tedPoesAll[sN].append( math.log10(currPoesList[l].ted) )
         timePoesAll[sN].append( currPoesList[l].time )
+
+    # convert the whole track at once
+    if coords == 'mag' or coords == 'mlt':
+      latPoesAll[sN],lonPoesAll[sN] = poesToMag(latPoesAll[sN],lonPoesAll[sN],timePoesAll[sN],coords,approx=approx)
       
   latPoesAll = numpy.array( latPoesAll ) 
   lonPoesAll = numpy.array( lonPoesAll )
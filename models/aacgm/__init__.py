@@ -4,8 +4,73 @@
 *********************
 **Module**: models.aacgm
 *********************
+**Functions**:
+  * :func:`models.aacgm.aacgmConvArray`
+**Modules**:
+  * :mod:`models.aacgm.aacgmGrid`: approximate conversions from a lookup grid
 """
 try:
     from aacgmlib import *
 except Exception, e:
     print __file__+' -> aacgmlib: ', e
+
+
+def aacgmConvArray(lat, lon, height, flg, out=None, nThreads=1, approx=False, order=1):
+    """Converts numpy arrays of points to or from aacgm coordinates.  The points are converted 
+    in C straight from and into the arrays, with the GIL released, so converting coastlines, 
+    fields of view or grid vectors costs only the conversion itself.
+
+    **Args**:
+        * **lat**: latitudes [degree], an array of any shape (or a list or number)
+        * **lon**: longitudes [degree], broadcastable against lat
+        * **height**: altitude [km], a number for all the points or an array broadcastable against lat
+        * **flg**: 0 for geographic to aacgm, 1 for aacgm to geographic
+        * **[out]**: 3 preallocated C-contiguous float64 arrays of the broadcast shape for lat, lon and r
+        * **[nThreads]**: the most threads to split the points across.  Only used when height is a 
+          single number and there are at least a few thousand points per thread.  default = 1
+        * **[approx]**: interpolate a precomputed lookup grid instead of doing the exact conversion, 
+          see :mod:`models.aacgm.aacgmGrid`.  Only used when height is a single number.  default = False
+        * **[order]**: with approx, 1 for bilinear or 3 for bicubic interpolation.  default = 1
+    **Returns**:
+        * **lat**: converted latitudes [degree], an array of the broadcast shape
+        * **lon**: converted longitudes [degree]
+        * **r**: radius [Re]
+
+    **Example**:
+        ::
+
+            mlat, mlon, r = models.aacgm.aacgmConvArray(myFov.latFull, myFov.lonFull, 300., 0)
+    """
+    import numpy as np
+
+    scalarHeight = np.ndim(height) == 0
+    if approx and scalarHeight:
+        import aacgmGrid
+        return aacgmGrid.aacgmConvApprox(lat, lon, height, flg, order=order, out=out)
+    if scalarHeight:
+        height = float(height)
+        lat, lon = np.broadcast_arrays(np.asarray(lat, dtype=float), np.asarray(lon, dtype=float))
+    else:
+        lat, lon, height = np.broadcast_arrays(np.asarray(lat, dtype=float), np.asarray(lon, dtype=float), 
+                                               np.asarray(height, dtype=float))
+        height = np.array(height, order='C', copy=False)
+    lat, lon = np.array(lat, order='C', copy=False), np.array(lon, order='C', copy=False)
+
+    if out is None:
+        out = (np.empty(lat.shape), np.empty(lat.shape), np.empty(lat.shape))
+    else:
+        assert len(out) == 3, 'aacgmConvArray: out must hold 3 arrays'
+        for o in out:
+            assert o.shape == lat.shape, 'aacgmConvArray: out arrays must have shape %s' % (lat.shape,)
+
+    try:
+        aacgmConvBuf
+    except NameError:
+        # an aacgmlib built before aacgmConvBuf was added
+        heights = [height]*lat.size if scalarHeight else height.ravel().tolist()
+        outLat, outLon, outR = aacgmConvArr(lat.ravel().tolist(), lon.ravel().tolist(), heights, flg)
+        for o, v in zip(out, (outLat, outLon, outR)): o[...] = np.reshape(v, lat.shape)
+        return tuple(out)
+
+    aacgmConvBuf(lat, lon, height, flg, out[0], out[1], out[2], nThreads)
+    return tuple(out)
@@ -0,0 +1,316 @@
+# Copyright (C) 2012  VT SuperDARN Lab
+# Full license can be found in LICENSE.txt
+"""
+*********************
+**Module**: models.aacgm.aacgmGrid
+*********************
+Approximate aacgm conversions from a precomputed lookup grid.
+
+The exact conversion is evaluated once on a regular lat/lon grid (for one height and direction),
+and points are then converted by interpolating the grid, bilinear (order=1) or bicubic (order=3).
+The grid holds the converted positions as unit vectors, and carries on over the poles and
+past +/-180 degrees longitude, so nothing goes wrong across the meridian or near the poles.  Grids are kept in memory and in DAVIT_TMPDIR/aacgm/,
+so they are built once and reused by later runs.
+
+The aacgm coefficients used are those loaded by aacgmlib, so the grids are looked up by a
+fingerprint of the coefficients (exact conversions of a few fixed points) together with the
+height, direction and resolution: grids made with another coefficient epoch are never reused.
+
+**Accuracy**: when a grid is built its error is measured against the exact conversion where
+the interpolation is worst in a cell (the middle for bilinear, a quarter of the way in from the
+nodes for bicubic), and kept in **maxError**, the largest great circle distance in degrees for
+each order.  It is measured in a sparse subsample of the cells (one in **errorStride** along
+each axis) and in every cell of the rows next to the poles and the columns either side of
++/-180 degrees, where the coordinates bend most, so it is an estimate of the largest error
+rather than a strict bound.  The error falls with the square of **res** for bilinear and faster for bicubic,
+so halving **res** makes bilinear about 4 times better, and bicubic is far better than bilinear
+wherever the coordinates are smooth.  Near the region where aacgm itself is undefined (close to
+the magnetic equator) the grid is no better than the exact conversion there.  Use a finer
+**res** when maxError is too large for the purpose.
+
+**Functions**:
+    * :func:`models.aacgm.aacgmGrid.getGrid`
+    * :func:`models.aacgm.aacgmGrid.aacgmConvApprox`
+    * :func:`models.aacgm.aacgmGrid.clearGridCache`
+**Classes**:
+    * :class:`models.aacgm.aacgmGrid.aacgmGrid`
+"""
+
+# the default grid resolution [degree]
+gridRes = 0.5
+# the error of a grid is measured in one cell in errorStride along each axis, and in every cell
+# of the errorEdge rows next to each pole and the errorEdge columns either side of +/-180 degrees
+errorStride = 8
+errorEdge = 4
+# the threads the exact conversions of a new grid are split across
+gridThreads = 4
+
+_gridCache = {}
+_fingerprint = None
+
+
+# *************************************************************
+class aacgmGrid(object):
+    """A lookup grid of the exact aacgm conversion for one height and direction
+
+    **Members**:
+        * **height**: altitude [km]
+        * **flg**: 0 for geographic to aacgm, 1 for aacgm to geographic
+        * **res**: grid resolution [degree]
+        * **table**: the converted unit vectors x, y, z and radius on the grid, shape (4, nlat, nlon)
+        * **maxError**: {order: largest error [degree]} measured in a subsample of the grid cells
+
+    **Example**:
+        ::
+
+            grid = models.aacgm.aacgmGrid.getGrid(height=300., flg=0)
+            mlat, mlon, r = grid.convert(lat, lon, order=3)
+    """
+
+    def __init__(self, height=0., flg=0, res=None):
+        import numpy as np
+        from models.aacgm import aacgmConvArray
+
+        if res is None: res = gridRes
+        assert abs(180./res - round(180./res)) < 1e-9, 'aacgmGrid: res must divide 180 degrees'
+        self.height = float(height)
+        self.flg = int(flg)
+        self.res = float(res)
+
+        lats, lons = self._nodes()
+        # the rows beyond the poles are the points over the pole, half way round
+        over = (abs(lats) > 90.)[:, np.newaxis]
+        lat = np.where(over, np.copysign(180., lats[:, np.newaxis]) - lats[:, np.newaxis], lats[:, np.newaxis])
+        lon = lons[np.newaxis, :] + 180.*over
+        self.table = _toTable(*aacgmConvArray(lat, lon, self.height, self.flg, nThreads=gridThreads))
+
+        # measure the error between the nodes, where it is largest: bilinear is worst at the
+        # middle of each cell, bicubic about a quarter of the way in from the nodes
+        rows, cols = np.arange(int(round(180./res))), np.arange(int(round(360./res)))
+        edgeRows = (rows < errorEdge) | (rows >= len(rows)-errorEdge)
+        edgeCols = (cols < errorEdge) | (cols >= len(cols)-errorEdge)
+        sparse = (rows % errorStride == errorStride//2)[:, np.newaxis] & (cols % errorStride == errorStride//2)[np.newaxis, :]
+        ci, cj = np.nonzero(edgeRows[:, np.newaxis] | edgeCols[np.newaxis, :] | sparse)
+        self.maxError = {}
+        for order, offs in [(1, [.5]), (3, [.25, .75])]:
+            di, dj = [d.ravel() for d in np.meshgrid(offs, offs)]
+            lat = -90. + res*(ci[:, np.newaxis] + di)
+            lon = -180. + res*(cj[:, np.newaxis] + dj)
+            exact = _toTable(*aacgmConvArray(lat, lon, self.height, self.flg, nThreads=gridThreads))
+            with np.errstate(invalid='ignore'):
+                err = _arc(exact, self._interp(lat, lon, order))
+                self.maxError[order] = float(np.nanmax(err)) if np.isfinite(err).any() else np.nan
+
+    def _nodes(self):
+        """The grid latitudes with a row beyond each pole, and longitudes with 2 extra columns on either side, 
+        so that no lookup wraps"""
+        import numpy as np
+        nlat = int(round(180./self.res))+3
+        nlon = int(round(360./self.res))+5
+        return -90.-self.res + self.res*np.arange(nlat), -180.-2*self.res + self.res*np.arange(nlon)
+
+    def _interp(self, lat, lon, order):
+        """The interpolated table at lat, lon, shape (4,) + the broadcast shape"""
+        import numpy as np
+        assert order in (1, 3), 'aacgmGrid: order must be 1 (bilinear) or 3 (bicubic)'
+        lat, lon = np.broadcast_arrays(np.asarray(lat, dtype=float), np.asarray(lon, dtype=float))
+        nlat, nlon = self.table.shape[1:]
+        fi = (np.clip(lat, -90., 90.) + 90. + self.res)/self.res
+        fj = ((lon + 180.) % 360. + 2*self.res)/self.res
+        i0 = np.clip(np.floor(fi).astype(int), 1, nlat-3)
+        j0 = np.floor(fj).astype(int)
+        ti, tj = fi - i0, fj - j0
+
+        if order == 1:
+            wi = [1.-ti, ti]
+            wj = [1.-tj, tj]
+            offs = [0, 1]
+        else:
+            wi, wj = _cubicWeights(ti), _cubicWeights(tj)
+            offs = [-1, 0, 1, 2]
+        out = np.zeros((4,) + lat.shape)
+        for a, di in enumerate(offs):
+            for b, dj in enumerate(offs):
+                out += self.table[:, i0+di, j0+dj]*(wi[a]*wj[b])
+        return out
+
+    def convert(self, lat, lon, order=1, out=None):
+        """Convert points by interpolating the grid
+
+        **Args**:
+            * **lat**: latitudes [degree], an array of any shape (or a list or number)
+            * **lon**: longitudes [degree], broadcastable against lat
+            * **[order]**: 1 for bilinear or 3 for bicubic interpolation.  default = 1
+            * **[out]**: 3 preallocated arrays of the broadcast shape for lat, lon and r
+        **Returns**:
+            * **lat**: converted latitudes [degree]
+            * **lon**: converted longitudes [degree]
+            * **r**: radius [Re]
+        """
+        import numpy as np
+        x, y, z, r = self._interp(lat, lon, order)
+        with np.errstate(invalid='ignore'):
+            vals = (np.degrees(np.arctan2(z, np.hypot(x, y))), np.degrees(np.arctan2(y, x)), r)
+        if out is None: return vals
+        assert len(out) == 3, 'aacgmGrid: out must hold 3 arrays'
+        for o, v in zip(out, vals): o[...] = v
+        return tuple(out)
+
+
+# *************************************************************
+def getGrid(height=0., flg=0, res=None, disk=True):
+    """Get the lookup grid for a height and direction, building it the first time it is asked for
+
+    **Args**:
+        * **[height]**: altitude [km].  default = 0
+        * **[flg]**: 0 for geographic to aacgm, 1 for aacgm to geographic.  default = 0
+        * **[res]**: grid resolution [degree], which must divide 180.  default = gridRes
+        * **[disk]**: look for and keep the grid in DAVIT_TMPDIR/aacgm/ as well as in memory.  default = True
+    **Returns**:
+        * **grid** (:class:`aacgmGrid`): the grid
+    """
+    from utils import instrument
+
+    if res is None: res = gridRes
+    key = (_coeffFingerprint(), float(height), int(flg), float(res))
+    grid = _gridCache.get(key)
+    if grid is not None:
+        instrument.count('models.aacgmGrid.hits')
+        return grid
+    if disk:
+        grid = _gridRead(key)
+        if grid is not None: instrument.count('models.aacgmGrid.diskHits')
+    if grid is None:
+        instrument.count('models.aacgmGrid.builds')
+        with instrument.timer('models.aacgmGrid.build'):
+            grid = aacgmGrid(height=height, flg=flg, res=res)
+        if disk: _gridWrite(key, grid)
+    _gridCache[key] = grid
+    return grid
+
+
+def aacgmConvApprox(lat, lon, height, flg, res=None, order=1, out=None, disk=True):
+    """Converts points to or from aacgm coordinates by interpolating a lookup grid, see :func:`getGrid`.
+    This takes the same arguments as :func:`models.aacgm.aacgmConvArray` and gives the same
+    results, to within the grid's **maxError**.
+
+    **Args**:
+        * **lat**: latitudes [degree], an array of any shape (or a list or number)
+        * **lon**: longitudes [degree], broadcastable against lat
+        * **height**: altitude [km], a single number
+        * **flg**: 0 for geographic to aacgm, 1 for aacgm to geographic
+        * **[res]**: grid resolution [degree].  default = gridRes
+        * **[order]**: 1 for bilinear or 3 for bicubic interpolation.  default = 1
+        * **[out]**: 3 preallocated arrays of the broadcast shape for lat, lon and r
+        * **[disk]**: keep the grid on disk.  default = True
+    **Returns**:
+        * **lat**: converted latitudes [degree]
+        * **lon**: converted longitudes [degree]
+        * **r**: radius [Re]
+
+    **Example**:
+        ::
+
+            mlat, mlon, r = models.aacgm.aacgmGrid.aacgmConvApprox(lats, lons, 0., 0, order=3)
+    """
+    import numpy as np
+    assert np.ndim(height) == 0, 'aacgmConvApprox: height must be a single number'
+    return getGrid(height=height, flg=flg, res=res, disk=disk).convert(lat, lon, order=order, out=out)
+
+
+def clearGridCache(disk=False):
+    """Empty the grid cache used by :func:`getGrid`
+
+    **Args**:
+        * **[disk]**: also remove the grids kept on disk.  default = False
+    """
+    import os, glob
+    _gridCache.clear()
+    if disk:
+        for f in glob.glob(os.path.join(_gridDir(), '*.npz')):
+            try: os.remove(f)
+            except OSError: pass
+
+
+# *************************************************************
+def _toTable(lat, lon, r):
+    """Converted positions as unit vectors x, y, z and radius, stacked on the first axis"""
+    import numpy as np
+    tlat, tlon = np.radians(lat), np.radians(lon)
+    return np.array([np.cos(tlat)*np.cos(tlon), np.cos(tlat)*np.sin(tlon), np.sin(tlat), r])
+
+
+def _arc(a, b):
+    """The great circle distance [degree] between the unit vectors of two tables"""
+    import numpy as np
+    a, b = a[:3]/np.sqrt((a[:3]**2).sum(0)), b[:3]/np.sqrt((b[:3]**2).sum(0))
+    return np.degrees(2.*np.arcsin(np.clip(np.sqrt(((a-b)**2).sum(0))/2., 0., 1.)))
+
+
+def _cubicWeights(t):
+    """The cubic convolution (Keys, a=-0.5) weights of the nodes at -1, 0, 1 and 2 for a fraction t"""
+    return [((-0.5*t + 1.)*t - 0.5)*t, (1.5*t - 2.5)*t*t + 1., ((-1.5*t + 2.)*t + 0.5)*t, (0.5*t - 0.5)*t*t]
+
+
+def _coeffFingerprint():
+    """A value standing for the aacgm coefficients loaded, exact conversions of a few fixed points"""
+    global _fingerprint
+    if _fingerprint is None:
+        from models.aacgm import aacgmConvArray
+        lat, lon, _ = aacgmConvArray([75., 60., -65.], [0., 120., -100.], 0., 0)
+        _fingerprint = tuple(['%.6f' % v for v in list(lat)+list(lon)])
+    return _fingerprint
+
+
+def _gridDir():
+    """Where getGrid keeps grids on disk"""
+    import os
+    try: tmpDir = os.environ['DAVIT_TMPDIR']
+    except KeyError: tmpDir = '/tmp/sd/'
+    return os.path.join(tmpDir, 'aacgm')
+
+
+def _gridFile(key):
+    """The file of a grid on disk"""
+    import os, hashlib
+    return os.path.join(_gridDir(), hashlib.sha1(repr(key)).hexdigest()+'.npz')
+
+
+def _gridRead(key):
+    """Read a grid from disk, None if it is not there"""
+    import os
+    import numpy as np
+    fileName = _gridFile(key)
+    if not os.path.isfile(fileName): return None
+    try:
+        data = np.load(fileName)
+        try:
+            # the key is kept in the file, so a file is never taken for another grid
+            if str(data['key']) != repr(key): return None
+            grid = aacgmGrid.__new__(aacgmGrid)
+            grid.height, grid.flg, grid.res = key[1:]
+            grid.table = data['table']
+            grid.maxError = {1: float(data['maxError1']), 3: float(data['maxError3'])}
+        finally:
+            data.close()
+        return grid
+    except Exception, e:
+        print 'problem reading', fileName, e
+        return None
+
+
+def _gridWrite(key, grid):
+    """Write a grid to disk"""
+    import os
+    import numpy as np
+    fileName = _gridFile(key)
+    try:
+        if not os.path.isdir(_gridDir()): os.makedirs(_gridDir())
+        # write under another name first, so that no one reads a partial file
+        tmpName = fileName[:-4]+'.%d.tmp' % os.getpid()
+        f = open(tmpName, 'wb')
+        try: np.savez(f, key=repr(key), table=grid.table, maxError1=grid.maxError[1], maxError3=grid.maxError[3])
+        finally: f.close()
+        os.rename(tmpName, fileName)
+    except Exception, e:
+        print 'problem writing', fileName, e
@@ -15,11 +15,24 @@
 #include "AstAlg.h"
 #include "radar.h"
 #include "rpos.h"
+#include <pthread.h>
 
 #if PY_VERSION_HEX < 0x02050000
   typedef int Py_ssize_t;
 #endif
 
+/* arrays shorter than this per thread are not split across threads */
+#define AACGM_MIN_SPAN 4096
+#define AACGM_MAX_THREADS 64
+
+/* AACGMConvert keeps the coefficients for the last height it was called with in
+static variables, so every call into the library, directly or through the MLT
+functions, holds aacgm_lock.  The lock is waited for with the GIL released, so a
+thread converting without the GIL is never kept from finishing */
+static pthread_mutex_t aacgm_lock = PTHREAD_MUTEX_INITIALIZER;
+#define AACGM_LOCK() Py_BEGIN_ALLOW_THREADS pthread_mutex_lock(&aacgm_lock); Py_END_ALLOW_THREADS
+#define AACGM_UNLOCK() pthread_mutex_unlock(&aacgm_lock)
+
 static PyObject *
 aacgm_wrap(PyObject *self, PyObject *args)
 {
@@ -32,7 +45,11 @@ aacgm_wrap(PyObject *self, PyObject *args)
 	else
 	{
 		inlon = fmod(inlon, 360.);
+		Py_BEGIN_ALLOW_THREADS
+		pthread_mutex_lock(&aacgm_lock);
 		AACGMConvert(inlat, inlon, height, &outLat, &outLon, &r, flg);
+		pthread_mutex_unlock(&aacgm_lock);
+		Py_END_ALLOW_THREADS
 		 
 		return Py_BuildValue("ddd", outLat, outLon, r);
 	}
@@ -63,6 +80,7 @@ aacgm_arr_wrap(PyObject *self, PyObject *args)
 		PyObject *lonOut = PyList_New(nElem);
 		PyObject *heightOut = PyList_New(nElem);
 
+		AACGM_LOCK();
 		for (i=0; i<nElem; i++) {
 			inlat = PyFloat_AsDouble( PyList_GetItem(latList, i) );
 			inlon = PyFloat_AsDouble( PyList_GetItem(lonList, i) );
@@ -74,6 +92,7 @@ aacgm_arr_wrap(PyObject *self, PyObject *args)
 			PyList_SetItem(lonOut, i, PyFloat_FromDouble(outLon));
 			PyList_SetItem(heightOut, i, PyFloat_FromDouble(r)); 
 		}
+		AACGM_UNLOCK();
 		
 		// PyObject *outList = PyList_New(0);
 		
@@ -85,6 +104,148 @@ aacgm_arr_wrap(PyObject *self, PyObject *args)
 	}
 	
 }
+/* a run of points converted by one thread */
+typedef struct
+{
+	double *lat, *lon, *height;
+	double *outLat, *outLon, *outR;
+	Py_ssize_t start, stop, hStep;
+	int flg;
+} aacgmSpan;
+
+static void *
+aacgm_span(void *arg)
+{
+	aacgmSpan *s = (aacgmSpan *)arg;
+	Py_ssize_t i;
+
+	for (i=s->start; i<s->stop; i++)
+		AACGMConvert(s->lat[i], fmod(s->lon[i], 360.), s->height[i*s->hStep], 
+									&s->outLat[i], &s->outLon[i], &s->outR[i], s->flg);
+	return NULL;
+}
+
+/* get a contiguous buffer of doubles, returns the number of doubles or -1 */
+static Py_ssize_t
+get_doubles(PyObject *obj, Py_buffer *buf, int writable, const char *name)
+{
+	int flags = PyBUF_C_CONTIGUOUS | PyBUF_FORMAT;
+
+	if (writable) flags |= PyBUF_WRITABLE;
+	if (PyObject_GetBuffer(obj, buf, flags) < 0)
+	{
+		PyErr_Format(PyExc_TypeError, "%s must be a contiguous%s array of float64", name, writable ? " writable" : "");
+		return -1;
+	}
+	if (buf->itemsize != sizeof(double) || buf->format == NULL || strcmp(buf->format, "d") != 0)
+	{
+		PyBuffer_Release(buf);
+		PyErr_Format(PyExc_TypeError, "%s must be an array of float64", name);
+		return -1;
+	}
+	return buf->len/sizeof(double);
+}
+
+static PyObject *
+aacgm_buf_wrap(PyObject *self, PyObject *args)
+{
+	PyObject *latObj, *lonObj, *heightObj, *outLatObj, *outLonObj, *outRObj;
+	Py_buffer bufs[6];
+	const char *names[6] = {"lat", "lon", "height", "outLat", "outLon", "outR"};
+	PyObject *objs[6];
+	double *ptrs[6];
+	double height;
+	int flg, nThreads = 1, nBufs = 0, scalarHeight, i, err = 0;
+	Py_ssize_t n = 0, nElem, chunk;
+	aacgmSpan spans[AACGM_MAX_THREADS];
+	pthread_t threads[AACGM_MAX_THREADS];
+	int started[AACGM_MAX_THREADS];
+
+	if(!PyArg_ParseTuple(args, "OOOiOOO|i", &latObj,&lonObj,&heightObj,&flg,&outLatObj,&outLonObj,&outRObj,&nThreads))
+		return NULL;
+
+	/* the height may be a single number for all the points */
+	scalarHeight = PyNumber_Check(heightObj) && !PyObject_CheckBuffer(heightObj);
+	if (scalarHeight)
+	{
+		height = PyFloat_AsDouble(heightObj);
+		if (PyErr_Occurred()) return NULL;
+	}
+
+	objs[0] = latObj; objs[1] = lonObj; objs[2] = heightObj;
+	objs[3] = outLatObj; objs[4] = outLonObj; objs[5] = outRObj;
+	for (i=0; i<6; i++)
+	{
+		if (i == 2 && scalarHeight)
+		{
+			ptrs[i] = &height;
+			continue;
+		}
+		nElem = get_doubles(objs[i], &bufs[nBufs], i >= 3, names[i]);
+		if (nElem < 0)
+		{
+			err = 1;
+			break;
+		}
+		ptrs[i] = (double *)bufs[nBufs++].buf;
+		if (i == 0) n = nElem;
+		else if (nElem != n)
+		{
+			PyErr_Format(PyExc_ValueError, "%s has %zd points, lat has %zd", names[i], nElem, n);
+			err = 1;
+			break;
+		}
+	}
+	if (err)
+	{
+		while (nBufs > 0) PyBuffer_Release(&bufs[--nBufs]);
+		return NULL;
+	}
+
+	/* threads are only used when every point has the same height, AACGMConvert
+	keeps the coefficients for the last height it was called with, so after the
+	first point has set them the other points only read them.  aacgm_lock is
+	held for the whole conversion so no other call changes them meanwhile */
+	if (nThreads > AACGM_MAX_THREADS) nThreads = AACGM_MAX_THREADS;
+	if (!scalarHeight || nThreads < 1) nThreads = 1;
+	if (n/AACGM_MIN_SPAN < nThreads) nThreads = n/AACGM_MIN_SPAN > 0 ? n/AACGM_MIN_SPAN : 1;
+
+	Py_BEGIN_ALLOW_THREADS
+	pthread_mutex_lock(&aacgm_lock);
+	chunk = (n+nThreads-1)/nThreads;
+	for (i=0; i<nThreads; i++)
+	{
+		spans[i].lat = ptrs[0]; spans[i].lon = ptrs[1]; spans[i].height = ptrs[2];
+		spans[i].outLat = ptrs[3]; spans[i].outLon = ptrs[4]; spans[i].outR = ptrs[5];
+		spans[i].hStep = scalarHeight ? 0 : 1;
+		spans[i].flg = flg;
+		spans[i].start = i*chunk;
+		spans[i].stop = (i+1)*chunk < n ? (i+1)*chunk : n;
+	}
+	if (nThreads > 1)
+	{
+		/* the first point sets the coefficients before any thread starts */
+		spans[0].stop = 1;
+		aacgm_span(&spans[0]);
+		spans[0].start = 1;
+		spans[0].stop = chunk;
+		for (i=1; i<nThreads; i++)
+		{
+			started[i] = pthread_create(&threads[i], NULL, aacgm_span, &spans[i]) == 0;
+			/* do it here if a thread could not be started */
+			if (!started[i]) aacgm_span(&spans[i]);
+		}
+		aacgm_span(&spans[0]);
+		for (i=1; i<nThreads; i++)
+			if (started[i]) pthread_join(threads[i], NULL);
+	}
+	else aacgm_span(&spans[0]);
+	pthread_mutex_unlock(&aacgm_lock);
+	Py_END_ALLOW_THREADS
+
+	while (nBufs > 0) PyBuffer_Release(&bufs[--nBufs]);
+	Py_RETURN_NONE;
+}
  
 static PyObject *
 MLTConvertYMDHMS_wrap(PyObject *self, PyObject *args)
@@ -96,7 +257,9 @@ MLTConvertYMDHMS_wrap(PyObject *self, PyObject *args)
 		return NULL;
 	else
 	{ 
+		AACGM_LOCK();
 		mlt = MLTConvertYMDHMS(yr,mo,dy,hr,mt,sc,mLon); 
+		AACGM_UNLOCK();
 		return PyFloat_FromDouble(mlt);
 	}
 	
@@ -111,7 +274,9 @@ MLTConvertEpoch_wrap(PyObject *self, PyObject *args)
 		return NULL;
 	else
 	{ 
+		AACGM_LOCK();
 		mlt = MLTConvertEpoch(epoch,mLon); 
+		AACGM_UNLOCK();
 		return PyFloat_FromDouble(mlt);
 	}
 	
@@ -127,7 +292,9 @@ MLTConvertYrsec_wrap(PyObject *self, PyObject *args)
 		return NULL;
 	else
 	{
+		AACGM_LOCK();
 		mlt = MLTConvertYrsec(yr,yrSec,mLon); 
+		AACGM_UNLOCK();
 		return PyFloat_FromDouble(mlt);
 	}
 
@@ -216,6 +383,7 @@ static PyMethodDef aacgmMethods[] =
 {
 	{"aacgmConv",  aacgm_wrap, METH_VARARGS, "convert to aacgm coords\nformat: lat, lon, r = aacgmConv(inLat, inLon, height, flg)\nheight in km; flg=0: geo to aacgm; flg=1: aacgm to geo"},
 	{"aacgmConvArr",  aacgm_arr_wrap, METH_VARARGS, "convert to aacgm coords when inputs are lists\nformat: lat, lon, r = aacgmConvArr(inLat, inLon, height, flg)\nflg=0: geo to aacgm, flg=1: aacgm to geo"},
+	{"aacgmConvBuf",  aacgm_buf_wrap, METH_VARARGS, "convert to aacgm coords in place when inputs are contiguous float64 arrays\nformat: aacgmConvBuf(inLat, inLon, height, flg, outLat, outLon, outR[, nThreads])\nheight is an array or a number; the GIL is released while converting\nflg=0: geo to aacgm, flg=1: aacgm to geo"},
  	{"mltFromEpoch",  MLTConvertEpoch_wrap, METH_VARARGS, "calculate mlt from epoch time and mag lon\nformat:mlt=mltFromEpoch(epoch,mLon)"},
 	{"mltFromYmdhms",  MLTConvertYMDHMS_wrap, METH_VARARGS, "calculate mlt from y,mn,d,h,m,s and mag lon\nformat:mlt=mltFromYmdhms(yr,mo,dy,hr,mt,sc,mLon)"},
  	{"mltFromYrsec", MLTConvertYrsec_wrap , METH_VARARGS, "calculate mlt from yr seconds and mag lon\nformat:mlt=mltFromEpoch(year,yrsec,mLon)"},
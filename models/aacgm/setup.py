@@ -26,6 +26,6 @@ setup (name = "aagcmlib",
 #				libraries=["mlt.1","aacgm.1","astalg.1","rtime.1","igrf.1","radar.1","rpos.1","rcnv.1","dmap.1"]),]
 #				libraries=["mlt.1","aacgm.1","astalg.1","rtime.1","igrf.1","radar.1","rpos.1"]),]
 #				libraries=["mlt.1","aacgm.1","astalg.1","rtime.1","igrf.1","radar.1"]),]
-				libraries=["mlt.1","aacgm.1","astalg.1","rtime.1","igrf.1"]),]
+				libraries=["mlt.1","aacgm.1","astalg.1","rtime.1","igrf.1","pthread"]),]
        )
 
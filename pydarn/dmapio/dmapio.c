@@ -19,6 +19,7 @@
 #include <stdio.h>
 #include <Python.h>
 #include <datetime.h>
+#include <numpy/arrayobject.h>
 #include <zlib.h>
 #include <stdlib.h>
 #include <sys/stat.h>
@@ -37,11 +38,68 @@
 #include "fitdata.h"
 #include "fitwrite.h"
 
-/*
-void parsePyPrm(struct RadarParm *prm, PyObject *pyprm)
+/*attribute lookups for write_fit_rec.  names are looked up with
+  PyObject_GetAttrString, so no name objects are made, and every
+  reference taken is given back.  errors are left set for the caller*/
+static long
+fit_attr_long(PyObject *obj, char *name)
+{
+  long val = -1;
+  PyObject *attr = PyObject_GetAttrString(obj, name);
+  if(attr == NULL) return -1;
+  if(attr != Py_None)
+  {
+    PyObject *num = PyNumber_Int(attr);
+    if(num != NULL)
+    {
+      val = PyInt_AsLong(num);
+      Py_DECREF(num);
+    }
+  }
+  else val = 0;
+  Py_DECREF(attr);
+  return val;
+}
+
+static double
+fit_attr_double(PyObject *obj, char *name)
+{
+  double val = 0;
+  PyObject *attr = PyObject_GetAttrString(obj, name);
+  if(attr == NULL) return -1;
+  if(attr != Py_None) val = PyFloat_AsDouble(attr);
+  Py_DECREF(attr);
+  return val;
+}
+
+/*a list or array attribute as a fast sequence, an empty one if it is None*/
+static PyObject *
+fit_attr_seq(PyObject *obj, char *name)
+{
+  PyObject *seq, *attr = PyObject_GetAttrString(obj, name);
+  if(attr == NULL) return NULL;
+  if(attr == Py_None)
+  {
+    Py_DECREF(attr);
+    return PyTuple_New(0);
+  }
+  seq = PySequence_Fast(attr, "fit and prm arrays must be sequences");
+  Py_DECREF(attr);
+  return seq;
+}
+
+/*the value of a per gate sequence, 0 past its end*/
+static double
+fit_seq_double(PyObject *seq, Py_ssize_t i)
 {
+  if(i >= PySequence_Fast_GET_SIZE(seq)) return 0;
+  return PyFloat_AsDouble(PySequence_Fast_GET_ITEM(seq, i));
+}
 
-}*/
+/*the per gate fields of a fitData object, in the order they are read*/
+static char *fit_gate_names[] =
+  {"slist","v","v_e","w_l","w_l_e","p_l","p_l_e","w_s","w_s_e","p_s","p_s_e","qflg","gflg"};
+#define FIT_NGATE 13
 
 static PyObject *
 write_fit_rec(PyObject *self, PyObject *args)
@@ -52,32 +110,42 @@ write_fit_rec(PyObject *self, PyObject *args)
     return NULL;
   else
   {
-    /*declare variables*/
-    PyObject *pyfit, *pyprm, *templist, *tempobj, *tempval;
-    int size,i,yr,mo,dy,hr,mt, status, R;
+    PyObject *pyfit=NULL, *pyprm=NULL, *seq=NULL, *res, *gates[FIT_NGATE];
+    int yr,mo,dy,hr,mt,fd,status,R;
+    Py_ssize_t size,i;
     double sc;
-    char * tempchar;
-    FILE * fitfp = PyFile_AsFile(f);
+    char *chan;
+    struct RadarParm *prm;
+    struct FitData *fit;
+    time_t rawtime;
+    struct tm *timeinfo;
+    int16 *tab;
 
-    /*extract python objects*/
-    tempval = Py_BuildValue("s", "fit");
-    pyfit = PyObject_GetAttr(pybeam,tempval);
-    Py_CLEAR(tempval);
+    for(i=0;i<FIT_NGATE;i++) gates[i] = NULL;
 
-    tempval = Py_BuildValue("s", "prm");
-    pyprm = PyObject_GetAttr(pybeam,tempval);
-    Py_CLEAR(tempval);
+    /*write straight to the descriptor, after anything python has buffered*/
+    if(PyObject_HasAttrString(f, "flush"))
+    {
+      res = PyObject_CallMethod(f, "flush", NULL);
+      if(res == NULL) return NULL;
+      Py_DECREF(res);
+    }
+    fd = PyObject_AsFileDescriptor(f);
+    if(fd < 0) return NULL;
 
+    pyfit = PyObject_GetAttrString(pybeam, "fit");
+    pyprm = PyObject_GetAttrString(pybeam, "prm");
+    if(pyfit == NULL || pyprm == NULL)
+    {
+      Py_XDECREF(pyfit);
+      Py_XDECREF(pyprm);
+      return NULL;
+    }
 
-    /*declare superdarn structures*/
-    struct RadarParm *prm;
     prm=RadarParmMake();
-    struct FitData *fit;
     fit=FitMake();
 
-    time_t rawtime;
-    struct tm * timeinfo;
-    time (&rawtime);
+    time(&rawtime);
     timeinfo = gmtime(&rawtime);
     RadarParmSetOriginTime(prm,asctime(timeinfo));
     RadarParmSetOriginCommand(prm,"masking data");
@@ -88,220 +156,104 @@ write_fit_rec(PyObject *self, PyObject *args)
     prm->time.hr = (int16)hr;
     prm->time.mt = (int16)mt;
     prm->time.sc = (int16)sc;
-    prm->time.us = (int16)((sc-(int16)sc)*1e6);
-
-
-    tempval = Py_BuildValue("s", "cp");
-    tempobj = PyObject_GetAttr(pybeam,tempval);
-    prm->cp = PyInt_AsLong(tempobj);
-    Py_CLEAR(tempobj);
-    Py_CLEAR(tempval);
-
-    tempval = Py_BuildValue("s", "nrang");
-    tempobj = PyObject_GetAttr(pyprm,tempval);
-    prm->nrang = PyInt_AsLong(tempobj);
-    Py_CLEAR(tempobj);
-    Py_CLEAR(tempval);
-
-    tempval = Py_BuildValue("s", "nave");
-    tempobj = PyObject_GetAttr(pyprm,tempval);
-    prm->nave = PyInt_AsLong(tempobj);
-    Py_CLEAR(tempobj);
-    Py_CLEAR(tempval);
-
-    tempval = Py_BuildValue("s", "lagfr");
-    tempobj = PyObject_GetAttr(pyprm,tempval);
-    prm->lagfr = PyInt_AsLong(tempobj);
-    Py_CLEAR(tempobj);
-    Py_CLEAR(tempval);
-
-    tempval = Py_BuildValue("s", "smsep");
-    tempobj = PyObject_GetAttr(pyprm,tempval);
-    prm->smsep = PyInt_AsLong(tempobj);
-    Py_CLEAR(tempobj);
-    Py_CLEAR(tempval);
-
+    prm->time.us = (int32)((sc-(int)sc)*1e6);
+
+    prm->cp = fit_attr_long(pybeam,"cp");
+    prm->stid = fit_attr_long(pybeam,"stid");
+    prm->bmnum = fit_attr_long(pybeam,"bmnum");
+    prm->nrang = fit_attr_long(pyprm,"nrang");
+    prm->nave = fit_attr_long(pyprm,"nave");
+    prm->lagfr = fit_attr_long(pyprm,"lagfr");
+    prm->smsep = fit_attr_long(pyprm,"smsep");
+    prm->noise.search = fit_attr_double(pyprm,"noisesearch");
+    prm->noise.mean = fit_attr_double(pyprm,"noisemean");
+    prm->bmazm = fit_attr_double(pyprm,"bmazm");
+    prm->scan = fit_attr_long(pyprm,"scan");
+    prm->rxrise = fit_attr_long(pyprm,"rxrise");
+    prm->intt.sc = fit_attr_long(pyprm,"inttsc");
+    prm->intt.us = fit_attr_long(pyprm,"inttus");
+    prm->mpinc = fit_attr_long(pyprm,"mpinc");
+    prm->mppul = fit_attr_long(pyprm,"mppul");
+    prm->mplgs = fit_attr_long(pyprm,"mplgs");
+    prm->mplgexs = fit_attr_long(pyprm,"mplgexs");
+    prm->frang = fit_attr_long(pyprm,"frang");
+    prm->rsep = fit_attr_long(pyprm,"rsep");
+    prm->xcf = fit_attr_long(pyprm,"xcf");
+    prm->tfreq = fit_attr_long(pyprm,"tfreq");
     prm->txpow = 9000;
     prm->atten = 0;
     prm->ercod = 0;
     prm->stat.agc = 0;
     prm->stat.lopwr = 0;
-
-    tempval = Py_BuildValue("s", "smsep");
-    tempobj = PyObject_GetAttr(pyprm,Py_BuildValue("s", "noisesearch"));
-    prm->noise.search = PyFloat_AsDouble(tempobj);
-    Py_CLEAR(tempobj);
-    Py_CLEAR(tempval);
-
-    tempval = Py_BuildValue("s", "stid");
-    tempobj = PyObject_GetAttr(pybeam,Py_BuildValue("s", "stid"));
-    prm->stid = PyFloat_AsDouble(tempobj);
-    Py_CLEAR(tempobj);
-    Py_CLEAR(tempval);
-
-    tempval = Py_BuildValue("s", "smsep");
-    tempobj = PyObject_GetAttr(pyprm,Py_BuildValue("s", "noisemean"));
-    prm->noise.mean = PyFloat_AsDouble(tempobj);
-    Py_CLEAR(tempobj);
-    Py_CLEAR(tempval);
-
-    tempval = Py_BuildValue("s", "smsep");
-    tempobj = PyObject_GetAttr(pybeam,Py_BuildValue("s", "channel"));
-    tempchar = PyString_AsString(tempobj);
-    Py_CLEAR(tempobj);
-    Py_CLEAR(tempval);
-
-    if(strcmp(tempchar,"a") == 0)
-      if(prm->cp == 153)
-        prm->channel = 1;
-      else
-        prm->channel = 0;
-    else if(strcmp(tempchar,"b") == 0)
-      prm->channel = 2;
-    else if(strcmp(tempchar,"c") == 0)
-      prm->channel = 3;
-    else if(strcmp(tempchar,"d") == 0)
-      prm->channel = 4;
-    else if(strcmp(tempchar,"e") == 0)
-      prm->channel = 5;
-    else if(strcmp(tempchar,"f") == 0)
-      prm->channel = 6;
-    else if(strcmp(tempchar,"g") == 0)
-      prm->channel = 7;
-    else if(strcmp(tempchar,"h") == 0)
-      prm->channel = 8;
-    else
-      prm->channel = 0;
-
-    tempval = Py_BuildValue("s", "bmnum");
-    tempobj = PyObject_GetAttr(pybeam,tempval);
-    prm->bmnum = PyInt_AsLong(tempobj);
-    Py_CLEAR(tempobj);
-    Py_CLEAR(tempval);
-
-    tempval = Py_BuildValue("s", "bmazm");
-    tempobj = PyObject_GetAttr(pyprm,tempval);
-    prm->bmazm = PyFloat_AsDouble(tempobj);
-    Py_CLEAR(tempobj);
-    Py_CLEAR(tempval);
-
-    tempval = Py_BuildValue("s", "scan");
-    tempobj = PyObject_GetAttr(pyprm,tempval);
-    prm->scan = PyInt_AsLong(tempobj);
-    Py_CLEAR(tempobj);
-    Py_CLEAR(tempval);
-
-    tempval = Py_BuildValue("s", "rxrise");
-    tempobj = PyObject_GetAttr(pyprm,tempval);
-    prm->rxrise = PyInt_AsLong(tempobj);
-    Py_CLEAR(tempobj);
-    Py_CLEAR(tempval);
-
-    tempval = Py_BuildValue("s", "inttsc");
-    tempobj = PyObject_GetAttr(pyprm,tempval);
-    prm->intt.sc = PyInt_AsLong(tempobj);
-    Py_CLEAR(tempobj);
-    Py_CLEAR(tempval);
-
-    tempval = Py_BuildValue("s", "inttus");
-    tempobj = PyObject_GetAttr(pyprm,tempval);
-    prm->intt.us = PyInt_AsLong(tempobj);
-    Py_CLEAR(tempobj);
-    Py_CLEAR(tempval);
-
     prm->txpl = 0;
-
-    tempval = Py_BuildValue("s", "mpinc");
-    tempobj = PyObject_GetAttr(pyprm,tempval);
-    prm->mpinc = PyInt_AsLong(tempobj);
-    Py_CLEAR(tempobj);
-    Py_CLEAR(tempval);
-
-    tempval = Py_BuildValue("s", "mppul");
-    tempobj = PyObject_GetAttr(pyprm,tempval);
-    prm->mppul = PyInt_AsLong(tempobj);
-    Py_CLEAR(tempobj);
-    Py_CLEAR(tempval);
-
-    tempval = Py_BuildValue("s", "mplgs");
-    tempobj = PyObject_GetAttr(pyprm,tempval);
-    prm->mplgs = PyInt_AsLong(tempobj);
-    Py_CLEAR(tempobj);
-    Py_CLEAR(tempval);
-
-    tempval = Py_BuildValue("s", "mplgexs");
-    tempobj = PyObject_GetAttr(pyprm,tempval);
-    prm->mplgexs = PyInt_AsLong(tempobj);
-    Py_CLEAR(tempobj);
-    Py_CLEAR(tempval);
-
-    tempval = Py_BuildValue("s", "frang");
-    tempobj = PyObject_GetAttr(pyprm,tempval);
-    prm->frang = PyInt_AsLong(tempobj);
-    Py_CLEAR(tempobj);
-    Py_CLEAR(tempval);
-
-    tempval = Py_BuildValue("s", "rsep");
-    tempobj = PyObject_GetAttr(pyprm,tempval);
-    prm->rsep = PyInt_AsLong(tempobj);
-    Py_CLEAR(tempobj);
-    Py_CLEAR(tempval);
-
-    tempval = Py_BuildValue("s", "xcf");
-    tempobj = PyObject_GetAttr(pyprm,tempval);
-    prm->xcf = PyInt_AsLong(tempobj);
-    Py_CLEAR(tempobj);
-    Py_CLEAR(tempval);
-
-    tempval = Py_BuildValue("s", "tfreq");
-    tempobj = PyObject_GetAttr(pyprm,tempval);
-    prm->tfreq = PyInt_AsLong(tempobj);
-    Py_CLEAR(tempobj);
-    Py_CLEAR(tempval);
-
     prm->offset = 0;
     prm->mxpwr = 1070000000;
     prm->lvmax = 20000;
-
-    /*get the pulse table*/
-    tempval = Py_BuildValue("s", "ptab");
-    templist = PyObject_GetAttr(pyprm,tempval);
-    Py_CLEAR(tempval);
-    size = PyList_Size(templist);
-    int16 temp_pul[size];
+    if(PyErr_Occurred()) goto fail;
+
+    res = PyObject_GetAttrString(pybeam, "channel");
+    if(res == NULL) goto fail;
+    chan = PyString_Check(res) ? PyString_AS_STRING(res) : "a";
+    if(strcmp(chan,"a") == 0)
+      prm->channel = (prm->cp == 153) ? 1 : 0;
+    else if(strlen(chan) == 1 && chan[0] >= 'b' && chan[0] <= 'h')
+      prm->channel = chan[0]-'a'+1;
+    else
+      prm->channel = 0;
+    Py_DECREF(res);
+
+    /*the pulse table*/
+    seq = fit_attr_seq(pyprm, "ptab");
+    if(seq == NULL) goto fail;
+    size = PySequence_Fast_GET_SIZE(seq);
+    tab = malloc((size+1)*sizeof(int16));
+    if(tab == NULL)
+    {
+      PyErr_NoMemory();
+      goto fail;
+    }
     for(i=0;i<size;i++)
-      temp_pul[i] = PyInt_AsLong(PyList_GetItem(templist,i));
-    RadarParmSetPulse(prm,size,temp_pul);
-    Py_CLEAR(templist);
-
-    /*get the lag table*/
-    tempval = Py_BuildValue("s", "ltab");
-    templist = PyObject_GetAttr(pyprm,tempval);
-    Py_CLEAR(tempval);
-    size = PyList_Size(templist);
-    int16 temp_lag[size*2];
+      tab[i] = (int16)PyInt_AsLong(PySequence_Fast_GET_ITEM(seq,i));
+    RadarParmSetPulse(prm,(int)size,tab);
+    free(tab);
+    Py_CLEAR(seq);
+
+    /*the lag table, a sequence of pairs*/
+    seq = fit_attr_seq(pyprm, "ltab");
+    if(seq == NULL) goto fail;
+    size = PySequence_Fast_GET_SIZE(seq);
+    tab = malloc((size*2+1)*sizeof(int16));
+    if(tab == NULL)
+    {
+      PyErr_NoMemory();
+      goto fail;
+    }
     for(i=0;i<size;i++)
     {
-      temp_lag[i*2] = PyInt_AsLong(PyList_GetItem(PyList_GetItem(templist,i),0));
-      temp_lag[i*2+1] = PyInt_AsLong(PyList_GetItem(PyList_GetItem(templist,i),1));
+      PyObject *a = PySequence_GetItem(PySequence_Fast_GET_ITEM(seq,i),0);
+      PyObject *b = PySequence_GetItem(PySequence_Fast_GET_ITEM(seq,i),1);
+      tab[i*2] = (a == NULL) ? 0 : (int16)PyInt_AsLong(a);
+      tab[i*2+1] = (b == NULL) ? 0 : (int16)PyInt_AsLong(b);
+      Py_XDECREF(a);
+      Py_XDECREF(b);
     }
-    Py_CLEAR(templist);
-
-    RadarParmSetLag(prm,size*2,temp_lag);
+    RadarParmSetLag(prm,(int)size*2,tab);
+    free(tab);
+    Py_CLEAR(seq);
     RadarParmSetCombf(prm,"combf");
+    if(PyErr_Occurred()) goto fail;
 
     FitSetRng(fit,prm->nrang);
     FitSetXrng(fit,prm->nrang);
     FitSetElv(fit,prm->nrang);
 
-    tempval = Py_BuildValue("s", "pwr0");
-    templist = PyObject_GetAttr(pyfit,tempval);
-    Py_CLEAR(tempval);
+    seq = fit_attr_seq(pyfit, "pwr0");
+    if(seq == NULL) goto fail;
     for(R=0;R<prm->nrang;R++)
     {
       fit->rng[R].v        = 0.;
       fit->rng[R].v_err    = 0.;
-      fit->rng[R].p_0 = PyFloat_AsDouble(PyList_GetItem(templist,R));
+      fit->rng[R].p_0      = fit_seq_double(seq,R);
       fit->rng[R].w_l      = 0.0;
       fit->rng[R].w_l_err  = 0.0;
       fit->rng[R].p_l      = 0.0;
@@ -317,142 +269,82 @@ write_fit_rec(PyObject *self, PyObject *args)
       fit->rng[R].gsct     = 0;
       fit->rng[R].nump     = 0;
     }
-    Py_CLEAR(templist);
-
-    tempval = Py_BuildValue("s", "slist");
-    templist = PyObject_GetAttr(pyfit,tempval);
-    size = PyList_Size(templist);
-    Py_CLEAR(templist);
-    Py_CLEAR(tempval);
+    Py_CLEAR(seq);
 
+    /*each per gate list is fetched once, not once per gate*/
+    for(i=0;i<FIT_NGATE;i++)
+    {
+      gates[i] = fit_attr_seq(pyfit, fit_gate_names[i]);
+      if(gates[i] == NULL) goto fail;
+    }
+    size = PySequence_Fast_GET_SIZE(gates[0]);
     for(i=0;i<size;i++)
     {
+      R = (int)PyInt_AsLong(PySequence_Fast_GET_ITEM(gates[0],i));
+      if(R < 0 || R >= prm->nrang) continue;
+      fit->rng[R].v       = fit_seq_double(gates[1],i);
+      fit->rng[R].v_err   = fit_seq_double(gates[2],i);
+      fit->rng[R].w_l     = fit_seq_double(gates[3],i);
+      fit->rng[R].w_l_err = fit_seq_double(gates[4],i);
+      fit->rng[R].p_l     = fit_seq_double(gates[5],i);
+      fit->rng[R].p_l_err = fit_seq_double(gates[6],i);
+      fit->rng[R].w_s     = fit_seq_double(gates[7],i);
+      fit->rng[R].w_s_err = fit_seq_double(gates[8],i);
+      fit->rng[R].p_s     = fit_seq_double(gates[9],i);
+      fit->rng[R].p_s_err = fit_seq_double(gates[10],i);
+      fit->rng[R].qflg    = (int)fit_seq_double(gates[11],i);
+      fit->rng[R].gsct    = (int)fit_seq_double(gates[12],i);
+    }
+    if(PyErr_Occurred()) goto fail;
 
-      tempval = Py_BuildValue("s", "slist");
-      templist = PyObject_GetAttr(pyfit,tempval);
-      R = PyInt_AsLong(PyList_GetItem(templist,i));
-      Py_CLEAR(templist);
-      Py_CLEAR(tempval);
-
-      tempval = Py_BuildValue("s", "v");
-      templist = PyObject_GetAttr(pyfit,tempval);
-      fit->rng[R].v = PyFloat_AsDouble(PyList_GetItem(templist,i));
-      Py_CLEAR(templist);
-      Py_CLEAR(tempval);
-
-      tempval = Py_BuildValue("s", "v_e");
-      templist = PyObject_GetAttr(pyfit,tempval);
-      fit->rng[R].v_err = PyFloat_AsDouble(PyList_GetItem(templist,i));
-      Py_CLEAR(templist);
-      Py_CLEAR(tempval);
-
-      tempval = Py_BuildValue("s", "w_l");
-      templist = PyObject_GetAttr(pyfit,tempval);
-      fit->rng[R].w_l = PyFloat_AsDouble(PyList_GetItem(templist,i));
-      Py_CLEAR(templist);
-      Py_CLEAR(tempval);
-
-      tempval = Py_BuildValue("s", "w_l_e");
-      templist = PyObject_GetAttr(pyfit,tempval);
-      fit->rng[R].w_l_err = PyFloat_AsDouble(PyList_GetItem(templist,i));
-      Py_CLEAR(templist);
-      Py_CLEAR(tempval);
-
-      tempval = Py_BuildValue("s", "p_l");
-      templist = PyObject_GetAttr(pyfit,tempval);
-      fit->rng[R].p_l = PyFloat_AsDouble(PyList_GetItem(templist,i));
-      Py_CLEAR(templist);
-      Py_CLEAR(tempval);
-
-      tempval = Py_BuildValue("s", "p_l_e");
-      templist = PyObject_GetAttr(pyfit,tempval);
-      fit->rng[R].p_l_err = PyFloat_AsDouble(PyList_GetItem(templist,i));
-      Py_CLEAR(templist);
-      Py_CLEAR(tempval);
-
-      tempval = Py_BuildValue("s", "w_s");
-      templist = PyObject_GetAttr(pyfit,tempval);
-      fit->rng[R].w_s = PyFloat_AsDouble(PyList_GetItem(templist,i));
-      Py_CLEAR(templist);
-      Py_CLEAR(tempval);
-
-      tempval = Py_BuildValue("s", "w_s_e");
-      templist = PyObject_GetAttr(pyfit,tempval);
-      fit->rng[R].w_s_err = PyFloat_AsDouble(PyList_GetItem(templist,i));
-      Py_CLEAR(templist);
-      Py_CLEAR(tempval);
-
-      tempval = Py_BuildValue("s", "p_s");
-      templist = PyObject_GetAttr(pyfit,tempval);
-      fit->rng[R].p_s = PyFloat_AsDouble(PyList_GetItem(templist,i));
-      Py_CLEAR(templist);
-      Py_CLEAR(tempval);
-
-      tempval = Py_BuildValue("s", "p_s_e");
-      templist = PyObject_GetAttr(pyfit,tempval);
-      fit->rng[R].p_s_err = PyFloat_AsDouble(PyList_GetItem(templist,i));
-      Py_CLEAR(templist);
-      Py_CLEAR(tempval);
-
-      tempval = Py_BuildValue("s", "qflg");
-      templist = PyObject_GetAttr(pyfit,tempval);
-      fit->rng[R].qflg = PyInt_AsLong(PyList_GetItem(templist,i));
-      Py_CLEAR(templist);
-      Py_CLEAR(tempval);
-
-      tempval = Py_BuildValue("s", "gflg");
-      templist = PyObject_GetAttr(pyfit,tempval);
-      fit->rng[R].gsct = PyInt_AsLong(PyList_GetItem(templist,i));
-      Py_CLEAR(templist);
-      Py_CLEAR(tempval);
-    }
-
-    Py_CLEAR(pyfit);
-    Py_CLEAR(pyprm);
-    Py_CLEAR(pybeam);
-    Py_CLEAR(templist);
-
-    status=FitFwrite(fitfp,prm,fit);
+    Py_BEGIN_ALLOW_THREADS
+    status = FitWrite(fd,prm,fit);
+    Py_END_ALLOW_THREADS
+    for(i=0;i<FIT_NGATE;i++) Py_XDECREF(gates[i]);
+    Py_DECREF(pyfit);
+    Py_DECREF(pyprm);
     FitFree(fit);
     RadarParmFree(prm);
-
-    PyObject *myObj = Py_BuildValue("i", 1);
-    PyErr_PrintEx(0);
-    return myObj;
+    if(status < 0) return PyErr_SetFromErrno(PyExc_IOError);
+    return Py_BuildValue("i", 1);
+
+  fail:
+    for(i=0;i<FIT_NGATE;i++) Py_XDECREF(gates[i]);
+    Py_XDECREF(seq);
+    Py_DECREF(pyfit);
+    Py_DECREF(pyprm);
+    FitFree(fit);
+    RadarParmFree(prm);
+    return NULL;
   }
 }
+/*the offset functions work on the descriptor directly, wrapping it in a
+  FILE with fdopen leaked a stream on every call*/
 static PyObject *
 get_dmap_offset(PyObject *self, PyObject *args)
 {
   int fd;
-  long offset;
-  FILE* fp=NULL;
+  off_t offset;
   if(!PyArg_ParseTuple(args, "i", &fd))
     return NULL;
   else
   {
-    PyObject *recordOffset = NULL;
-    fp = fdopen(fd,"r");
-    offset=ftell(fp);
-    recordOffset=PyInt_FromLong(offset);
-    return recordOffset;
+    offset=lseek(fd,0,SEEK_CUR);
+    return PyLong_FromLongLong((PY_LONG_LONG)offset);
   }  
 }
 static PyObject *
 set_dmap_offset(PyObject *self, PyObject *args)
 {
   int fd;
-  long offset,noffset;
-  FILE* fp=NULL;
-  if(!PyArg_ParseTuple(args, "il", &fd,&offset))
+  PY_LONG_LONG offset;
+  off_t noffset;
+  if(!PyArg_ParseTuple(args, "iL", &fd,&offset))
     return NULL;
   else
   {
-    PyObject *recordOffset = NULL;
-    fp = fdopen(fd,"r");
-    fseek(fp,offset,SEEK_SET);
-    noffset=ftell(fp);
-    if (noffset==offset) {
+    noffset=lseek(fd,(off_t)offset,SEEK_SET);
+    if (noffset==(off_t)offset) {
       Py_RETURN_TRUE;
     } else {
       Py_RETURN_FALSE;
@@ -460,218 +352,2513 @@ set_dmap_offset(PyObject *self, PyObject *args)
   }  
 }
 
+/*the scalars kept in a record index*/
+struct DmapRecKey
+{
+  double time;
+  int stid,bmnum,channel,cp,scan,tfreq;
+};
+
+/*number of bytes taken by a fixed size dmap scalar type*/
+static int
+dmap_type_size(int type)
+{
+  if(type==DATACHAR || type==DATAUCHAR) return 1;
+  else if(type==DATASHORT || type==DATAUSHORT) return 2;
+  else if(type==DATAINT || type==DATAUINT || type==DATAFLOAT) return 4;
+  else if(type==DATADOUBLE || type==DATALONG || type==DATAULONG) return 8;
+  return -1;
+}
+
+/*decode an encoded little endian dmap scalar as a double*/
+static double
+dmap_scalar_as_double(unsigned char *buf, int type)
+{
+  int16 sval;
+  int32 ival;
+  float fval;
+  double dval;
+  int64 lval;
+  if(type==DATACHAR) return (double)*((char *)buf);
+  else if(type==DATAUCHAR) return (double)*buf;
+  else if(type==DATASHORT || type==DATAUSHORT)
+  {
+    ConvertToShort(buf,&sval);
+    return (type==DATASHORT) ? (double)sval : (double)(uint16)sval;
+  }
+  else if(type==DATAINT || type==DATAUINT)
+  {
+    ConvertToInt(buf,&ival);
+    return (type==DATAINT) ? (double)ival : (double)(uint32)ival;
+  }
+  else if(type==DATAFLOAT)
+  {
+    ConvertToFloat(buf,&fval);
+    return (double)fval;
+  }
+  else if(type==DATADOUBLE)
+  {
+    ConvertToDouble(buf,&dval);
+    return dval;
+  }
+  else if(type==DATALONG || type==DATAULONG)
+  {
+    ConvertToLong(buf,&lval);
+    return (double)lval;
+  }
+  return 0;
+}
+
+/*walk the scalar block of an encoded record (the bytes after the 16 byte
+  header) and pull out the index keys without decoding any arrays.
+  returns 0 on success, -1 if the buffer ends before the scalars do*/
+static int
+dmap_parse_key(unsigned char *buf, int len, int snum, struct DmapRecKey *key)
+{
+  int c,pos=0,nlen,type,size;
+  int yr=0,mo=0,dy=0,hr=0,mt=0,sc=0,us=0;
+  int syr=0,smo=0,sdy=0,shr=0,smt=0,ssc=0;
+  char *name;
+  double val;
+
+  key->stid=key->bmnum=key->channel=key->cp=key->scan=key->tfreq=-1;
+  for(c=0;c<snum;c++)
+  {
+    name=(char *)(buf+pos);
+    nlen=strnlen(name,len-pos);
+    if(pos+nlen+2 > len) return -1;
+    type=buf[pos+nlen+1];
+    pos+=nlen+2;
+    if(type==DATASTRING)
+    {
+      size=strnlen((char *)(buf+pos),len-pos);
+      if(pos+size+1 > len) return -1;
+      pos+=size+1;
+      continue;
+    }
+    size=dmap_type_size(type);
+    if(size < 0 || pos+size > len) return -1;
+    val=dmap_scalar_as_double(buf+pos,type);
+    pos+=size;
+
+    if(strcmp(name,"time.yr")==0) yr=(int)val;
+    else if(strcmp(name,"time.mo")==0) mo=(int)val;
+    else if(strcmp(name,"time.dy")==0) dy=(int)val;
+    else if(strcmp(name,"time.hr")==0) hr=(int)val;
+    else if(strcmp(name,"time.mt")==0) mt=(int)val;
+    else if(strcmp(name,"time.sc")==0) sc=(int)val;
+    else if(strcmp(name,"time.us")==0) us=(int)(((int)(val*1e-3))*1e3);
+    else if(strcmp(name,"stid")==0) key->stid=(int)val;
+    else if(strcmp(name,"bmnum")==0) key->bmnum=(int)val;
+    else if(strcmp(name,"channel")==0) key->channel=(int)val;
+    else if(strcmp(name,"cp")==0) key->cp=(int)val;
+    else if(strcmp(name,"scan")==0) key->scan=(int)val;
+    else if(strcmp(name,"tfreq")==0) key->tfreq=(int)val;
+    else if(strcmp(name,"start.year")==0) syr=(int)val;
+    else if(strcmp(name,"start.month")==0) smo=(int)val;
+    else if(strcmp(name,"start.day")==0) sdy=(int)val;
+    else if(strcmp(name,"start.hour")==0) shr=(int)val;
+    else if(strcmp(name,"start.minute")==0) smt=(int)val;
+    else if(strcmp(name,"start.second")==0) ssc=(int)val;
+  }
+  /*grid and map records are timed by the start of their integration*/
+  if(yr == 0 && syr != 0)
+    key->time=TimeYMDHMSToEpoch(syr,smo,sdy,shr,smt,(double)ssc);
+  else
+    key->time=TimeYMDHMSToEpoch(yr,mo,dy,hr,mt,(double)sc+us/1.e6);
+  return 0;
+}
+
+/*a request pushed down into the reader, so that records which do not
+  match can be skipped after looking at their scalars only*/
+struct DmapFilter
+{
+  int active;
+  int useStart,useEnd,useStid,useBmnum,useChannel,useCp,useFreq;
+  double sTime,eTime;
+  int stid,bmnum,channel,cp,fLow,fHigh;
+};
+
+/*fill in one optional filter value, None leaves it unset*/
+static int
+dmap_filter_int(PyObject *obj, int *use, int *val)
+{
+  *use = 0;
+  if(obj == NULL || obj == Py_None)
+    return 0;
+  *val = (int)PyInt_AsLong(obj);
+  if(*val == -1 && PyErr_Occurred())
+    return -1;
+  *use = 1;
+  return 0;
+}
+
+static int
+dmap_filter_double(PyObject *obj, int *use, double *val)
+{
+  *use = 0;
+  if(obj == NULL || obj == Py_None)
+    return 0;
+  *val = PyFloat_AsDouble(obj);
+  if(*val == -1 && PyErr_Occurred())
+    return -1;
+  *use = 1;
+  return 0;
+}
+
+/*times are epoch seconds, channel is the dmap channel number (anything
+  below 2 is channel a) and tfreq is a (low,high) band in kHz*/
+static int
+dmap_filter_init(struct DmapFilter *f, PyObject *sTime, PyObject *eTime,
+                 PyObject *stid, PyObject *channel, PyObject *bmnum,
+                 PyObject *cp, PyObject *tfreq)
+{
+  f->useFreq = 0;
+  if(dmap_filter_double(sTime,&f->useStart,&f->sTime) < 0 ||
+     dmap_filter_double(eTime,&f->useEnd,&f->eTime) < 0 ||
+     dmap_filter_int(stid,&f->useStid,&f->stid) < 0 ||
+     dmap_filter_int(channel,&f->useChannel,&f->channel) < 0 ||
+     dmap_filter_int(bmnum,&f->useBmnum,&f->bmnum) < 0 ||
+     dmap_filter_int(cp,&f->useCp,&f->cp) < 0)
+    return -1;
+  if(tfreq != NULL && tfreq != Py_None)
+  {
+    if(!PyArg_ParseTuple(tfreq, "ii", &f->fLow, &f->fHigh))
+    {
+      PyErr_Clear();
+      PyErr_SetString(PyExc_TypeError, "tfreq must be a (low,high) tuple");
+      return -1;
+    }
+    f->useFreq = 1;
+  }
+  f->active = f->useStart || f->useEnd || f->useStid || f->useChannel ||
+              f->useBmnum || f->useCp || f->useFreq;
+  return 0;
+}
+
+/*returns 1 if a record matches the filter, 0 if it does not and -1 if
+  it is past the end of the time window*/
+static int
+dmap_filter_test(struct DmapFilter *f, struct DmapRecKey *key)
+{
+  if(f->useEnd && key->time > f->eTime) return -1;
+  if(f->useStart && key->time < f->sTime) return 0;
+  if(f->useStid && key->stid != f->stid) return 0;
+  if(f->useChannel)
+  {
+    if(f->channel < 2 && key->channel >= 2) return 0;
+    if(f->channel >= 2 && key->channel != f->channel) return 0;
+  }
+  if(f->useBmnum && key->bmnum != f->bmnum) return 0;
+  if(f->useCp && key->cp != f->cp) return 0;
+  if(f->useFreq && (key->tfreq < f->fLow || key->tfreq > f->fHigh)) return 0;
+  return 1;
+}
+
+/*read exactly n bytes from a file descriptor*/
+static int
+dmap_read_bytes(int fd, unsigned char *buf, int n)
+{
+  int got=0,r;
+  while(got < n)
+  {
+    r=read(fd,buf+got,n-got);
+    if(r <= 0) return got;
+    got+=r;
+  }
+  return got;
+}
+
+/*build a numpy array from a plain C buffer*/
+static PyObject *
+dmap_index_array(void *data, npy_intp n, int typenum)
+{
+  PyObject *arr = PyArray_SimpleNew(1, &n, typenum);
+  if(arr != NULL && n > 0)
+    memcpy(PyArray_DATA((PyArrayObject *)arr), data,
+           n*PyArray_ITEMSIZE((PyArrayObject *)arr));
+  return arr;
+}
+
 static PyObject *
-read_dmap_rec(PyObject *self, PyObject *args)
+read_dmap_index(PyObject *self, PyObject *args)
 {
   int fd;
   if(!PyArg_ParseTuple(args, "i", &fd))
     return NULL;
   else
   {
-    PyObject *beamData = PyDict_New();
-    int c,yr=0,mo=0,dy=0,hr=0,mt=0,sc=0,us=0,i,j,k,nrang;
-    double epoch;
-    struct DataMap *ptr;
-    struct DataMapScalar *s;
-    struct DataMapArray *a;
-    nrang=0;
+    const char *names[] = {"stid","bmnum","channel","cp","scan","tfreq"};
+    PyObject *index, *arr;
+    struct DmapRecKey key;
+    unsigned char hdr[16], *buf=NULL;
+    int32 code,size,snum,anum;
+    int bufsize=0,want,got,i,j,err=0;
+    npy_intp n=0,nmax=0;
+    void *tmp;
+    off_t start,pos;
+    npy_int64 *offset=NULL;
+    double *time=NULL;
+    int32 *keys[6];
+    for(j=0;j<6;j++) keys[j]=NULL;
+
     Py_BEGIN_ALLOW_THREADS
-    ptr = DataMapRead(fd);
-    Py_END_ALLOW_THREADS
-    
-    if(ptr == NULL)
-      return Py_None;
-    
-    else
+    start=lseek(fd,0,SEEK_CUR);
+    pos=lseek(fd,0,SEEK_SET);
+    while(pos >= 0)
     {
-      /*first, parse all of the scalars in the file*/
-      for (c=0;c<ptr->snum;c++) 
+      if(dmap_read_bytes(fd,hdr,16) != 16) break;
+      ConvertToInt(hdr,&code);
+      ConvertToInt(hdr+4,&size);
+      ConvertToInt(hdr+8,&snum);
+      ConvertToInt(hdr+12,&anum);
+      if(code != 0x00010001 || size < 16) break;
+
+      /*the scalars sit at the front of the record, so try a short read
+        first and only pull in the whole record if they run past it*/
+      want = (size-16 < 4096) ? size-16 : 4096;
+      if(bufsize < size-16)
       {
-        s=ptr->scl[c];
-        if ((strcmp(s->name,"nrang")==0) && (s->type==DATASHORT))
-          nrang = *(s->data.sptr);
-        if ((strcmp(s->name,"time.yr")==0) && (s->type==DATASHORT))
-          yr=*(s->data.sptr);
-        else if ((strcmp(s->name,"time.mo")==0) && (s->type==DATASHORT))
-          mo=*(s->data.sptr);
-        else if ((strcmp(s->name,"time.dy")==0) && (s->type==DATASHORT))
-          dy=*(s->data.sptr);
-        else if ((strcmp(s->name,"time.hr")==0) && (s->type==DATASHORT))
-          hr=*(s->data.sptr);
-        else if ((strcmp(s->name,"time.mt")==0) && (s->type==DATASHORT))
-          mt=*(s->data.sptr);
-        else if ((strcmp(s->name,"time.sc")==0) && (s->type==DATASHORT))
-          sc=*(s->data.sptr);
-        else if ((strcmp(s->name,"time.us")==0) && (s->type==DATAINT))
-          us=(int)(((int)(*(s->data.iptr)*1e-3))*1e3);
-        else
+        tmp=realloc(buf,size-16);
+        if(tmp == NULL) {err=1; break;}
+        buf=tmp;
+        bufsize=size-16;
+      }
+      got=dmap_read_bytes(fd,buf,want);
+      if(got != want) break;
+      if(dmap_parse_key(buf,got,snum,&key) != 0)
+      {
+        if(want == size-16) break;
+        got+=dmap_read_bytes(fd,buf+want,size-16-want);
+        if(got != size-16 || dmap_parse_key(buf,got,snum,&key) != 0) break;
+      }
+
+      if(n == nmax)
+      {
+        /*each column keeps its old block until its new one is had, so
+          nothing leaks when one of them cannot be grown*/
+        nmax = (nmax == 0) ? 1024 : nmax*2;
+        if((tmp=realloc(offset,nmax*sizeof(npy_int64))) == NULL) {err=1; break;}
+        offset=tmp;
+        if((tmp=realloc(time,nmax*sizeof(double))) == NULL) {err=1; break;}
+        time=tmp;
+        for(j=0;j<6 && !err;j++)
         {
-          PyObject *myStr = Py_BuildValue("s", s->name);
-          if(s->type==DATASHORT) 
-          {
-            PyObject *myNum = Py_BuildValue("i", *(s->data.sptr));
-            PyDict_SetItem(beamData,myStr,myNum);
-            Py_CLEAR(myNum);
-          }
-          else if(s->type==DATAINT)
-          {
-            PyObject *myNum = Py_BuildValue("i", *(s->data.iptr));
-            PyDict_SetItem(beamData,myStr,myNum);
-            Py_CLEAR(myNum);
-          }
-          else if(s->type==DATASTRING) 
-          {
-            PyObject *myNum = Py_BuildValue("s", *((char **) s->data.vptr));
-            PyDict_SetItem(beamData,myStr,myNum);
-            Py_CLEAR(myNum);
-          }
-          else if(s->type==DATAFLOAT) 
-          {
-            PyObject *myNum = Py_BuildValue("d", *(s->data.fptr));
-            PyDict_SetItem(beamData,myStr,myNum);
-            Py_CLEAR(myNum);
-          }
-          else if(s->type==DATADOUBLE) 
-          {
-            PyObject *myNum = Py_BuildValue("d", *(s->data.dptr));
-            PyDict_SetItem(beamData,myStr,myNum);
-            Py_CLEAR(myNum);
-          }
-          else if(s->type==DATACHAR) 
-          {
-            PyObject *myNum = Py_BuildValue("c", *(s->data.cptr));
-            PyDict_SetItem(beamData,myStr,myNum);
-            Py_CLEAR(myNum);    
-          }
-          else
-          {
-            PyObject *myNum = Py_BuildValue("i", -1);
-            PyDict_SetItem(beamData,myStr,myNum);
-            Py_CLEAR(myNum);
-          }
-          Py_CLEAR(myStr);
+          if((tmp=realloc(keys[j],nmax*sizeof(int32))) == NULL) err=1;
+          else keys[j]=tmp;
         }
+        if(err) break;
+      }
+      offset[n]=(npy_int64)pos;
+      time[n]=key.time;
+      keys[0][n]=key.stid;
+      keys[1][n]=key.bmnum;
+      keys[2][n]=key.channel;
+      keys[3][n]=key.cp;
+      keys[4][n]=key.scan;
+      keys[5][n]=key.tfreq;
+      n++;
+
+      pos=lseek(fd,pos+size,SEEK_SET);
+    }
+    lseek(fd,start,SEEK_SET);
+    Py_END_ALLOW_THREADS
+    free(buf);
+
+    if(err)
+    {
+      free(offset); free(time);
+      for(j=0;j<6;j++) free(keys[j]);
+      return PyErr_NoMemory();
+    }
+
+    index = PyDict_New();
+    arr = dmap_index_array(offset,n,NPY_INT64);
+    PyDict_SetItemString(index,"offset",arr);
+    Py_XDECREF(arr);
+    arr = dmap_index_array(time,n,NPY_FLOAT64);
+    PyDict_SetItemString(index,"time",arr);
+    Py_XDECREF(arr);
+    for(i=0;i<6;i++)
+    {
+      arr = dmap_index_array(keys[i],n,NPY_INT32);
+      PyDict_SetItemString(index,names[i],arr);
+      Py_XDECREF(arr);
+    }
+    free(offset); free(time);
+    for(j=0;j<6;j++) free(keys[j]);
+    return index;
+  }
+}
+
+/*map a dmap data type onto the matching numpy type number*/
+static int
+dmap_numpy_type(int type)
+{
+  if(type==DATACHAR) return NPY_INT8;
+  else if(type==DATASHORT) return NPY_INT16;
+  else if(type==DATAINT) return NPY_INT32;
+  else if(type==DATAFLOAT) return NPY_FLOAT32;
+  else if(type==DATADOUBLE) return NPY_FLOAT64;
+  return -1;
+}
+
+/*copy a dmap array into a typed numpy array, with the dmap ranges
+  reversed so the fastest varying range is the last numpy axis*/
+static PyObject *
+dmap_array_to_numpy(struct DataMapArray *a)
+{
+  int i, typenum;
+  npy_intp dims[NPY_MAXDIMS], nelem=1;
+  PyObject *arr;
+
+  typenum = dmap_numpy_type(a->type);
+  if(typenum < 0)
+  {
+    PyErr_Format(PyExc_ValueError, "dmap array %s has no numpy type", a->name);
+    return NULL;
+  }
+  if(a->dim < 1 || a->dim > NPY_MAXDIMS)
+  {
+    PyErr_Format(PyExc_ValueError, "dmap array %s has %d dimensions, numpy allows 1 to %d",
+                 a->name, a->dim, NPY_MAXDIMS);
+    return NULL;
+  }
+
+  for(i=0;i<a->dim;i++)
+  {
+    dims[i] = a->rng[a->dim-1-i];
+    nelem *= dims[i];
+  }
+  /*the last entry of the lag table is the alternate lag 0, the
+    list form has always dropped it*/
+  if((strcmp(a->name,"ltab")==0) && (a->dim==2) && (dims[0] > 0))
+  {
+    dims[0] -= 1;
+    nelem = dims[0]*dims[1];
+  }
+
+  arr = PyArray_SimpleNew(a->dim, dims, typenum);
+  if(arr == NULL)
+    return NULL;
+  if(nelem > 0)
+    memcpy(PyArray_DATA((PyArrayObject *)arr), a->data.vptr,
+           nelem*PyArray_ITEMSIZE((PyArrayObject *)arr));
+  return arr;
+}
+
+/*the array fields wanted by a reader, n < 0 means all of them.  the
+  names point into seq, which must be kept alive while they are used*/
+struct DmapFields
+{
+  int n;
+  char **names;
+  PyObject *seq;
+};
+
+static int
+dmap_fields_init(struct DmapFields *f, PyObject *fields)
+{
+  int i;
+  f->n = -1;
+  f->names = NULL;
+  f->seq = NULL;
+  if(fields == NULL || fields == Py_None)
+    return 0;
+  f->seq = PySequence_Fast(fields, "fields must be a sequence or set of field names");
+  if(f->seq == NULL)
+    return -1;
+  f->n = PySequence_Fast_GET_SIZE(f->seq);
+  f->names = malloc(sizeof(char *)*(f->n+1));
+  if(f->names == NULL)
+  {
+    Py_CLEAR(f->seq);
+    PyErr_NoMemory();
+    return -1;
+  }
+  for(i=0;i<f->n;i++)
+  {
+    PyObject *item = PySequence_Fast_GET_ITEM(f->seq, i);
+    if(!PyString_Check(item))
+    {
+      free(f->names);
+      Py_CLEAR(f->seq);
+      PyErr_SetString(PyExc_TypeError, "field names must be strings");
+      return -1;
+    }
+    f->names[i] = PyString_AS_STRING(item);
+  }
+  return 0;
+}
+
+static int
+dmap_fields_wanted(struct DmapFields *f, char *name)
+{
+  int i;
+  if(f == NULL || f->n < 0)
+    return 1;
+  for(i=0;i<f->n;i++)
+    if(strcmp(f->names[i], name)==0)
+      return 1;
+  return 0;
+}
+
+static void
+dmap_fields_free(struct DmapFields *f)
+{
+  if(f->names != NULL)
+    free(f->names);
+  f->names = NULL;
+  Py_CLEAR(f->seq);
+}
+
+static double dmap_rec_time(struct DataMap *ptr);
+
+/*convert a decoded dmap record into a python dictionary.  every scalar
+  is kept, arrays which are not in fields are skipped without creating
+  any python objects for them*/
+static PyObject *
+dmap_to_dict(struct DataMap *ptr, int use_numpy, struct DmapFields *fields)
+{
+  PyObject *beamData = PyDict_New();
+  int c,yr=0,mo=0,dy=0,hr=0,mt=0,sc=0,us=0,i,j,k,nrang;
+  double epoch;
+  struct DataMapScalar *s;
+  struct DataMapArray *a;
+  nrang=0;
+
+  /*first, parse all of the scalars in the file*/
+  for (c=0;c<ptr->snum;c++) 
+  {
+    s=ptr->scl[c];
+    if ((strcmp(s->name,"nrang")==0) && (s->type==DATASHORT))
+      nrang = *(s->data.sptr);
+    if ((strcmp(s->name,"time.yr")==0) && (s->type==DATASHORT))
+      yr=*(s->data.sptr);
+    else if ((strcmp(s->name,"time.mo")==0) && (s->type==DATASHORT))
+      mo=*(s->data.sptr);
+    else if ((strcmp(s->name,"time.dy")==0) && (s->type==DATASHORT))
+      dy=*(s->data.sptr);
+    else if ((strcmp(s->name,"time.hr")==0) && (s->type==DATASHORT))
+      hr=*(s->data.sptr);
+    else if ((strcmp(s->name,"time.mt")==0) && (s->type==DATASHORT))
+      mt=*(s->data.sptr);
+    else if ((strcmp(s->name,"time.sc")==0) && (s->type==DATASHORT))
+      sc=*(s->data.sptr);
+    else if ((strcmp(s->name,"time.us")==0) && (s->type==DATAINT))
+      us=(int)(((int)(*(s->data.iptr)*1e-3))*1e3);
+    else
+    {
+      PyObject *myStr = Py_BuildValue("s", s->name);
+      if(s->type==DATASHORT) 
+      {
+        PyObject *myNum = Py_BuildValue("i", *(s->data.sptr));
+        PyDict_SetItem(beamData,myStr,myNum);
+        Py_CLEAR(myNum);
       }
-      /*now, parse the arrays*/
-      for(c=0;c<ptr->anum;c++) 
+      else if(s->type==DATAINT)
       {
-        a=ptr->arr[c];
-        PyObject *myStr = Py_BuildValue("s", a->name);
-        if ((strcmp(a->name,"ltab")==0) && (a->type==DATASHORT) && (a->dim==2))
-        {
-          PyObject *myList = PyList_New(0);
-          for(i=0;i<a->rng[1]-1;i++)
+        PyObject *myNum = Py_BuildValue("i", *(s->data.iptr));
+        PyDict_SetItem(beamData,myStr,myNum);
+        Py_CLEAR(myNum);
+      }
+      else if(s->type==DATASTRING) 
+      {
+        PyObject *myNum = Py_BuildValue("s", *((char **) s->data.vptr));
+        PyDict_SetItem(beamData,myStr,myNum);
+        Py_CLEAR(myNum);
+      }
+      else if(s->type==DATAFLOAT) 
+      {
+        PyObject *myNum = Py_BuildValue("d", *(s->data.fptr));
+        PyDict_SetItem(beamData,myStr,myNum);
+        Py_CLEAR(myNum);
+      }
+      else if(s->type==DATADOUBLE) 
+      {
+        PyObject *myNum = Py_BuildValue("d", *(s->data.dptr));
+        PyDict_SetItem(beamData,myStr,myNum);
+        Py_CLEAR(myNum);
+      }
+      else if(s->type==DATACHAR) 
+      {
+        PyObject *myNum = Py_BuildValue("c", *(s->data.cptr));
+        PyDict_SetItem(beamData,myStr,myNum);
+        Py_CLEAR(myNum);    
+      }
+      else
+      {
+        PyObject *myNum = Py_BuildValue("i", -1);
+        PyDict_SetItem(beamData,myStr,myNum);
+        Py_CLEAR(myNum);
+      }
+      Py_CLEAR(myStr);
+    }
+  }
+  /*now, parse the arrays*/
+  for(c=0;c<ptr->anum;c++) 
+  {
+    a=ptr->arr[c];
+    if(!dmap_fields_wanted(fields,a->name))
+      continue;
+    PyObject *myStr = Py_BuildValue("s", a->name);
+    /*numpy mode, one typed array per field*/
+    if(use_numpy && dmap_numpy_type(a->type) >= 0)
+    {
+      PyObject *myArr = dmap_array_to_numpy(a);
+      if(myArr == NULL)
+      {
+        Py_CLEAR(myStr);
+        Py_CLEAR(beamData);
+        return NULL;
+      }
+      PyDict_SetItem(beamData,myStr,myArr);
+      Py_CLEAR(myArr);
+    }
+    else if ((strcmp(a->name,"ltab")==0) && (a->type==DATASHORT) && (a->dim==2))
+    {
+      PyObject *myList = PyList_New(0);
+      for(i=0;i<a->rng[1]-1;i++)
+      {
+        PyObject *myNum = Py_BuildValue("[i,i]", a->data.sptr[i*2], a->data.sptr[i*2+1]);
+        PyList_Append(myList,myNum);
+        Py_CLEAR(myNum);
+      }
+      PyDict_SetItem(beamData,myStr,myList);
+      Py_CLEAR(myList);
+    }
+    else if(((strcmp(a->name,"acfd")==0) || (strcmp(a->name,"xcfd")==0)) && 
+            (a->type==DATAFLOAT) && (a->dim==3))
+    {
+      PyObject *myList = PyList_New(0);
+      for(i=0;i<nrang;i++)
+        for(j=0;j<a->rng[1];j++)
+          for(k=0;k<2;k++)
           {
-            PyObject *myNum = Py_BuildValue("[i,i]", a->data.sptr[i*2], a->data.sptr[i*2+1]);
+            PyObject *myNum = Py_BuildValue("f", a->data.fptr[(i*a->rng[1]+j)*2+k]);
             PyList_Append(myList,myNum);
             Py_CLEAR(myNum);
           }
-          PyDict_SetItem(beamData,Py_BuildValue("s", "ltab"), myList);
-          Py_CLEAR(myList);
+      PyDict_SetItem(beamData,myStr,myList);
+      Py_CLEAR(myList);
+    }
+    else
+    {
+      PyObject *myList = PyList_New(0);
+      for(i=0;i<a->rng[0];i++)
+      {
+        if(a->type==DATASHORT)
+        {
+          PyObject *myNum = Py_BuildValue("i", a->data.sptr[i]);
+          PyList_Append(myList,myNum);
+          Py_CLEAR(myNum);
+        }
+        else if(a->type==DATAINT) 
+        {
+          PyObject *myNum = Py_BuildValue("i", a->data.iptr[i]);
+          PyList_Append(myList,myNum);
+          Py_CLEAR(myNum);
+        }
+        else if(a->type==DATAFLOAT)
+        {
+          PyObject *myNum = Py_BuildValue("f", a->data.fptr[i]);
+          PyList_Append(myList,myNum);
+          Py_CLEAR(myNum);
         }
-        else if((strcmp(a->name,"acfd")==0) && (a->type==DATAFLOAT) && (a->dim==3))
+        else if(a->type==DATADOUBLE)
         {
-          PyObject *myList = PyList_New(0);
-          for(i=0;i<nrang;i++)
-            for(j=0;j<a->rng[1];j++)
-              for(k=0;k<2;k++)
-              {
-                PyObject *myNum = Py_BuildValue("f", a->data.fptr[(i*a->rng[1]+j)*2+k]);
-                PyList_Append(myList,myNum);
-                Py_CLEAR(myNum);
-              }
-          PyDict_SetItem(beamData,Py_BuildValue("s", "acfd"), myList);
-          Py_CLEAR(myList);
+          PyObject *myNum = Py_BuildValue("f", a->data.dptr[i]);
+          PyList_Append(myList,myNum);
+          Py_CLEAR(myNum);
         }
-        else if((strcmp(a->name,"xcfd")==0) && (a->type==DATAFLOAT) && (a->dim==3))
+        else if(a->type==DATACHAR)
         {
-          PyObject *myList = PyList_New(0);
-          for(i=0;i<nrang;i++)
-            for(j=0;j<a->rng[1];j++)
-              for(k=0;k<2;k++)
-              {
-                PyObject *myNum = Py_BuildValue("f", a->data.fptr[(i*a->rng[1]+j)*2+k]);
-                PyList_Append(myList,myNum);
-                Py_CLEAR(myNum);
-              }
-          PyDict_SetItem(beamData,Py_BuildValue("s", "xcfd"), myList);
-          Py_CLEAR(myList);
+          PyObject *myNum = Py_BuildValue("i", a->data.cptr[i]);
+          PyList_Append(myList,myNum);
+          Py_CLEAR(myNum);
         }
         else
         {
-          PyObject *myList = PyList_New(0);
-          for(i=0;i<a->rng[0];i++)
-          {
-            if(a->type==DATASHORT)
-            {
-              PyObject *myNum = Py_BuildValue("i", a->data.sptr[i]);
-              PyList_Append(myList,myNum);
-              Py_CLEAR(myNum);
-            }
-            else if(a->type==DATAINT) 
-            {
-              PyObject *myNum = Py_BuildValue("i", a->data.iptr[i]);
-              PyList_Append(myList,myNum);
-              Py_CLEAR(myNum);
-            }
-            else if(a->type==DATAFLOAT)
-            {
-              PyObject *myNum = Py_BuildValue("f", a->data.fptr[i]);
-              PyList_Append(myList,myNum);
-              Py_CLEAR(myNum);
-            }
-            else if(a->type==DATADOUBLE)
-            {
-              PyObject *myNum = Py_BuildValue("f", a->data.dptr[i]);
-              PyList_Append(myList,myNum);
-              Py_CLEAR(myNum);
-            }
-            else if(a->type==DATACHAR)
-            {
-              PyObject *myNum = Py_BuildValue("i", a->data.cptr[i]);
-              PyList_Append(myList,myNum);
-              Py_CLEAR(myNum);
-            }
-            else
-            {
-              PyObject *myNum = Py_BuildValue("i",-1);
-              PyList_Append(myList,myNum);
-              Py_CLEAR(myNum);
-            }
-          }
-          PyDict_SetItem(beamData,myStr,myList);
-          Py_CLEAR(myList);
+          PyObject *myNum = Py_BuildValue("i",-1);
+          PyList_Append(myList,myNum);
+          Py_CLEAR(myNum);
         }
-        Py_CLEAR(myStr);
-      
       }
-      
-      epoch = TimeYMDHMSToEpoch(yr,mo,dy,hr,mt,(double)sc+us/1.e6);
-      
-      PyObject *myStr = Py_BuildValue("s", "time");
-      PyObject *myNum = Py_BuildValue("d", epoch);
-      PyDict_SetItem(beamData,myStr,myNum);
-      Py_CLEAR(myStr);
-      Py_CLEAR(myNum);
-      
-      DataMapFree(ptr);
+      PyDict_SetItem(beamData,myStr,myList);
+      Py_CLEAR(myList);
     }
-    return beamData;
+    Py_CLEAR(myStr);
+  
   }
+  
+  if(yr == 0) epoch = dmap_rec_time(ptr);
+  else epoch = TimeYMDHMSToEpoch(yr,mo,dy,hr,mt,(double)sc+us/1.e6);
+  
+  PyObject *myNum = Py_BuildValue("d", epoch);
+  PyDict_SetItemString(beamData,"time",myNum);
+  Py_CLEAR(myNum);
+
+  return beamData;
 }
 
+/*read records until one matches the filter, looking at the scalars of
+  the others only.  returns NULL at the end of the file, or if the next
+  record is past the end of the time window, in which case the file is
+  left positioned at that record.  nomem is set when it returns NULL
+  because the record buffer could not be grown*/
+static struct DataMap *
+dmap_read_filtered(int fd, struct DmapFilter *f, int *nomem)
+{
+  unsigned char hdr[16], *buf=NULL, *tmp;
+  int32 code,size,snum,anum;
+  int bufsize=0,match;
+  off_t pos;
+  struct DmapRecKey key;
+  struct DataMap *ptr=NULL;
+
+  while(1)
+  {
+    pos=lseek(fd,0,SEEK_CUR);
+    if(dmap_read_bytes(fd,hdr,16) != 16) break;
+    ConvertToInt(hdr,&code);
+    ConvertToInt(hdr+4,&size);
+    ConvertToInt(hdr+8,&snum);
+    ConvertToInt(hdr+12,&anum);
+    if(code != 0x00010001 || size < 16) break;
+    if(bufsize < size)
+    {
+      /*keep the old block if it cannot be grown, so it is still freed*/
+      tmp=realloc(buf,size);
+      if(tmp == NULL)
+      {
+        *nomem=1;
+        break;
+      }
+      buf=tmp;
+      bufsize=size;
+    }
+    memcpy(buf,hdr,16);
+    if(dmap_read_bytes(fd,buf+16,size-16) != size-16) break;
+    if(dmap_parse_key(buf+16,size-16,snum,&key) != 0) break;
+    match=dmap_filter_test(f,&key);
+    if(match < 0)
+    {
+      lseek(fd,pos,SEEK_SET);
+      break;
+    }
+    if(match == 0) continue;
+    ptr=DataMapDecodeBuffer((char *)buf,size);
+    break;
+  }
+  free(buf);
+  return ptr;
+}
+
+static PyObject *
+read_dmap_rec(PyObject *self, PyObject *args, PyObject *kwds)
+{
+  int fd, use_numpy=0;
+  PyObject *fieldObj=NULL, *sTime=NULL, *eTime=NULL, *stid=NULL, *channel=NULL;
+  PyObject *bmnum=NULL, *cp=NULL, *tfreq=NULL;
+  static char *kwlist[] = {"fd","numpy","fields","sTime","eTime","stid","channel",
+                           "bmnum","cp","tfreq",NULL};
+  if(!PyArg_ParseTupleAndKeywords(args, kwds, "i|iOOOOOOOO", kwlist, &fd, &use_numpy,
+                                  &fieldObj, &sTime, &eTime, &stid, &channel,
+                                  &bmnum, &cp, &tfreq))
+    return NULL;
+  else
+  {
+    PyObject *beamData;
+    struct DataMap *ptr;
+    struct DmapFields fields;
+    struct DmapFilter filter;
+    int nomem=0;
+    if(dmap_filter_init(&filter,sTime,eTime,stid,channel,bmnum,cp,tfreq) < 0)
+      return NULL;
+    if(dmap_fields_init(&fields,fieldObj) < 0)
+      return NULL;
+    Py_BEGIN_ALLOW_THREADS
+    if(filter.active)
+      ptr = dmap_read_filtered(fd,&filter,&nomem);
+    else
+      ptr = DataMapRead(fd);
+    Py_END_ALLOW_THREADS
+    
+    if(ptr == NULL)
+    {
+      dmap_fields_free(&fields);
+      if(nomem) return PyErr_NoMemory();
+      Py_RETURN_NONE;
+    }
+
+    beamData = dmap_to_dict(ptr,use_numpy,&fields);
+    DataMapFree(ptr);
+    dmap_fields_free(&fields);
+    return beamData;
+  }
+}
+
+
+static PyObject *
+decode_dmap_rec(PyObject *self, PyObject *args, PyObject *kwds)
+{
+  char *buf;
+  int size, use_numpy=0;
+  PyObject *fieldObj=NULL, *sTime=NULL, *eTime=NULL, *stid=NULL, *channel=NULL;
+  PyObject *bmnum=NULL, *cp=NULL, *tfreq=NULL;
+  static char *kwlist[] = {"buf","numpy","fields","sTime","eTime","stid","channel",
+                           "bmnum","cp","tfreq",NULL};
+  if(!PyArg_ParseTupleAndKeywords(args, kwds, "s#|iOOOOOOOO", kwlist, &buf, &size,
+                                  &use_numpy, &fieldObj, &sTime, &eTime, &stid,
+                                  &channel, &bmnum, &cp, &tfreq))
+    return NULL;
+  else
+  {
+    PyObject *beamData;
+    struct DataMap *ptr;
+    struct DmapFields fields;
+    struct DmapFilter filter;
+    if(dmap_filter_init(&filter,sTime,eTime,stid,channel,bmnum,cp,tfreq) < 0)
+      return NULL;
+    if(filter.active)
+    {
+      struct DmapRecKey key;
+      int32 snum;
+      if(size < 16)
+        Py_RETURN_NONE;
+      ConvertToInt((unsigned char *)buf+8,&snum);
+      if(dmap_parse_key((unsigned char *)buf+16,size-16,snum,&key) != 0)
+        Py_RETURN_NONE;
+      if(dmap_filter_test(&filter,&key) != 1)
+        Py_RETURN_FALSE;
+    }
+    if(dmap_fields_init(&fields,fieldObj) < 0)
+      return NULL;
+    Py_BEGIN_ALLOW_THREADS
+    ptr = DataMapDecodeBuffer(buf,size);
+    Py_END_ALLOW_THREADS
+
+    if(ptr == NULL)
+    {
+      dmap_fields_free(&fields);
+      Py_RETURN_NONE;
+    }
+
+    beamData = dmap_to_dict(ptr,use_numpy,&fields);
+    DataMapFree(ptr);
+    dmap_fields_free(&fields);
+    return beamData;
+  }
+}
+
+/*the numpy type used for a column of dmap scalars or array values*/
+static int
+dmap_column_type(int type)
+{
+  if(type==DATAUCHAR) return NPY_UINT8;
+  else if(type==DATAUSHORT) return NPY_UINT16;
+  else if(type==DATAUINT) return NPY_UINT32;
+  else if(type==DATALONG) return NPY_INT64;
+  else if(type==DATAULONG) return NPY_UINT64;
+  return dmap_numpy_type(type);
+}
+
+/*read a native (already decoded) dmap value as a double*/
+static double
+dmap_native_as_double(void *ptr, int type)
+{
+  if(type==DATACHAR) return (double)*((char *)ptr);
+  else if(type==DATAUCHAR) return (double)*((unsigned char *)ptr);
+  else if(type==DATASHORT) return (double)*((int16 *)ptr);
+  else if(type==DATAUSHORT) return (double)*((uint16 *)ptr);
+  else if(type==DATAINT) return (double)*((int32 *)ptr);
+  else if(type==DATAUINT) return (double)*((uint32 *)ptr);
+  else if(type==DATAFLOAT) return (double)*((float *)ptr);
+  else if(type==DATADOUBLE) return *((double *)ptr);
+  else if(type==DATALONG) return (double)*((int64 *)ptr);
+  else if(type==DATAULONG) return (double)*((uint64 *)ptr);
+  return 0;
+}
+
+/*copy count values of one dmap type into a column of another*/
+static void
+dmap_copy_values(void *dst, int dsttype, void *src, int srctype, int count)
+{
+  int i, size=dmap_type_size(srctype);
+  PyArray_Descr *descr;
+  if(count <= 0) return;
+  if(srctype == dsttype)
+  {
+    memcpy(dst, src, (size_t)count*size);
+    return;
+  }
+  descr = PyArray_DescrFromType(dmap_column_type(dsttype));
+  for(i=0;i<count;i++)
+  {
+    double val = dmap_native_as_double((char *)src+i*size, srctype);
+    char *out = (char *)dst+(size_t)i*descr->elsize;
+    switch(descr->type_num)
+    {
+      case NPY_INT8: *((npy_int8 *)out) = (npy_int8)val; break;
+      case NPY_UINT8: *((npy_uint8 *)out) = (npy_uint8)val; break;
+      case NPY_INT16: *((npy_int16 *)out) = (npy_int16)val; break;
+      case NPY_UINT16: *((npy_uint16 *)out) = (npy_uint16)val; break;
+      case NPY_INT32: *((npy_int32 *)out) = (npy_int32)val; break;
+      case NPY_UINT32: *((npy_uint32 *)out) = (npy_uint32)val; break;
+      case NPY_INT64: *((npy_int64 *)out) = (npy_int64)val; break;
+      case NPY_UINT64: *((npy_uint64 *)out) = (npy_uint64)val; break;
+      case NPY_FLOAT32: *((npy_float32 *)out) = (npy_float32)val; break;
+      default: *((npy_float64 *)out) = val; break;
+    }
+  }
+  Py_DECREF(descr);
+}
+
+/*the epoch time of a decoded record, with microseconds truncated to
+  milliseconds as in dmap_to_dict.  grid and map records, which have no
+  time.* fields, are timed by the whole second of their start.* fields*/
+static double
+dmap_rec_time(struct DataMap *ptr)
+{
+  int c,yr=0,mo=0,dy=0,hr=0,mt=0,sc=0,us=0,val;
+  int syr=0,smo=0,sdy=0,shr=0,smt=0,ssc=0;
+  struct DataMapScalar *s;
+  for(c=0;c<ptr->snum;c++)
+  {
+    s=ptr->scl[c];
+    if(s->type==DATASTRING) continue;
+    if(strncmp(s->name,"time.",5) == 0)
+    {
+      val=(int)dmap_native_as_double(s->data.vptr,s->type);
+      if(strcmp(s->name,"time.yr")==0) yr=val;
+      else if(strcmp(s->name,"time.mo")==0) mo=val;
+      else if(strcmp(s->name,"time.dy")==0) dy=val;
+      else if(strcmp(s->name,"time.hr")==0) hr=val;
+      else if(strcmp(s->name,"time.mt")==0) mt=val;
+      else if(strcmp(s->name,"time.sc")==0) sc=val;
+      else if(strcmp(s->name,"time.us")==0) us=(int)(((int)(val*1e-3))*1e3);
+    }
+    else if(strncmp(s->name,"start.",6) == 0)
+    {
+      val=(int)dmap_native_as_double(s->data.vptr,s->type);
+      if(strcmp(s->name,"start.year")==0) syr=val;
+      else if(strcmp(s->name,"start.month")==0) smo=val;
+      else if(strcmp(s->name,"start.day")==0) sdy=val;
+      else if(strcmp(s->name,"start.hour")==0) shr=val;
+      else if(strcmp(s->name,"start.minute")==0) smt=val;
+      else if(strcmp(s->name,"start.second")==0) ssc=val;
+    }
+  }
+  if(yr == 0 && syr != 0)
+    return TimeYMDHMSToEpoch(syr,smo,sdy,shr,smt,(double)ssc);
+  return TimeYMDHMSToEpoch(yr,mo,dy,hr,mt,(double)sc+us/1.e6);
+}
+
+/*a column of a block.  columns are numbered in the order their names
+  are first met; data is Py_None for a name that is not read*/
+struct DmapBlockCol
+{
+  char *name;
+  int type;
+  int seen;
+  PyObject *data;
+  PyObject *offsets;
+};
+
+/*the column number of each scalar (or array) of the last record mapped*/
+struct DmapLayout
+{
+  int num, max;
+  char **names;
+  int *col;
+};
+
+/*map the scalars (or arrays) of a record onto column numbers.  records
+  in a file nearly always share one layout, so the names are only looked
+  up in the index when they differ from the last record's, and new names
+  are given the next column number.  returns the number of columns, or
+  -1 with an exception set*/
+static int
+dmap_layout_map(struct DmapLayout *l, struct DataMap *rec, int arrays,
+                PyObject *index, int ncol)
+{
+  int k, num = arrays ? rec->anum : rec->snum;
+  char *name;
+  PyObject *c;
+
+  if(num == l->num)
+  {
+    for(k=0;k<num;k++)
+    {
+      name = arrays ? rec->arr[k]->name : rec->scl[k]->name;
+      if(strcmp(name,l->names[k]) != 0) break;
+    }
+    if(k == num) return ncol;
+  }
+  if(num > l->max)
+  {
+    char **names;
+    int *col;
+    names = realloc(l->names, num*sizeof(char *));
+    if(names == NULL) goto nomem;
+    l->names = names;
+    col = realloc(l->col, num*sizeof(int));
+    if(col == NULL) goto nomem;
+    l->col = col;
+    l->max = num;
+  }
+  l->num = -1;
+  for(k=0;k<num;k++)
+  {
+    name = arrays ? rec->arr[k]->name : rec->scl[k]->name;
+    l->names[k] = name;
+    c = PyDict_GetItemString(index,name);
+    if(c == NULL)
+    {
+      c = PyInt_FromLong(ncol);
+      if(c == NULL || PyDict_SetItemString(index,name,c) < 0)
+      {
+        Py_XDECREF(c);
+        return -1;
+      }
+      Py_DECREF(c);
+      l->col[k] = ncol++;
+    }
+    else
+      l->col[k] = (int)PyInt_AS_LONG(c);
+  }
+  l->num = num;
+  return ncol;
+
+nomem:
+  PyErr_NoMemory();
+  return -1;
+}
+
+/*make room for ncol columns, clearing the new ones*/
+static int
+dmap_block_cols_grow(struct DmapBlockCol **cols, int *have, int *max, int ncol)
+{
+  if(ncol > *max)
+  {
+    int m = (*max == 0) ? 64 : *max;
+    struct DmapBlockCol *tmp;
+    while(m < ncol) m *= 2;
+    tmp = realloc(*cols, m*sizeof(struct DmapBlockCol));
+    if(tmp == NULL)
+    {
+      PyErr_NoMemory();
+      return -1;
+    }
+    *cols = tmp;
+    *max = m;
+  }
+  for(;*have<ncol;(*have)++)
+  {
+    (*cols)[*have].name = NULL;
+    (*cols)[*have].type = 0;
+    (*cols)[*have].seen = -1;
+    (*cols)[*have].data = NULL;
+    (*cols)[*have].offsets = NULL;
+  }
+  return 0;
+}
+
+static void
+dmap_block_cols_free(struct DmapBlockCol *cols, int ncol)
+{
+  int c;
+  for(c=0;c<ncol;c++)
+  {
+    Py_XDECREF(cols[c].data);
+    Py_XDECREF(cols[c].offsets);
+  }
+  free(cols);
+}
+
+/*turn a run of decoded records into a columnar block.  scalars become
+  one numpy array per name, with missing values zeroed, and string
+  scalars become lists.  arrays are flattened and concatenated into a
+  values array, with an offsets array of length nrec+1 marking where
+  each record starts.  each record's fields are matched to columns
+  through a name map that is only rebuilt when the layout changes, and
+  the first of two fields with the same name is the one read*/
+static PyObject *
+dmap_block(struct DataMap **recs, int n, struct DmapFields *fields)
+{
+  PyObject *block=NULL, *scalars=NULL, *arrays=NULL, *index=NULL, *col, *times;
+  struct DmapBlockCol *cols=NULL, *cl;
+  struct DmapLayout lay={-1,0,NULL,NULL};
+  npy_intp dims[1];
+  int r,c,k,ncol=0,nmax=0,have=0;
+  struct DataMapScalar *s;
+  struct DataMapArray *a;
+
+  block = PyDict_New();
+  scalars = PyDict_New();
+  arrays = PyDict_New();
+  index = PyDict_New();
+  if(block == NULL || scalars == NULL || arrays == NULL || index == NULL) goto fail;
+  if(PyDict_SetItemString(block,"scalars",scalars) < 0 ||
+     PyDict_SetItemString(block,"arrays",arrays) < 0) goto fail;
+  col = PyInt_FromLong(n);
+  if(col == NULL || PyDict_SetItemString(block,"nrec",col) < 0)
+  {
+    Py_XDECREF(col);
+    goto fail;
+  }
+  Py_DECREF(col);
+
+  dims[0] = n;
+  times = PyArray_SimpleNew(1, dims, NPY_FLOAT64);
+  if(times == NULL) goto fail;
+  for(r=0;r<n;r++)
+    ((double *)PyArray_DATA((PyArrayObject *)times))[r] = dmap_rec_time(recs[r]);
+  k = PyDict_SetItemString(scalars,"time",times);
+  Py_DECREF(times);
+  if(k < 0) goto fail;
+
+  /*scalars, each new name makes a column, typed by its first value*/
+  for(r=0;r<n;r++)
+  {
+    ncol = dmap_layout_map(&lay, recs[r], 0, index, ncol);
+    if(ncol < 0 || dmap_block_cols_grow(&cols, &have, &nmax, ncol) < 0) goto fail;
+    for(k=0;k<recs[r]->snum;k++)
+    {
+      s = recs[r]->scl[k];
+      cl = &cols[lay.col[k]];
+      if(cl->seen == r) continue;
+      cl->seen = r;
+      if(cl->data == NULL)
+      {
+        cl->name = s->name;
+        cl->type = s->type;
+        if(strncmp(s->name,"time.",5) == 0 || strcmp(s->name,"time") == 0 ||
+           (s->type != DATASTRING && dmap_column_type(s->type) < 0))
+        {
+          Py_INCREF(Py_None);
+          cl->data = Py_None;
+        }
+        else if(s->type == DATASTRING)
+          cl->data = PyList_New(n);
+        else
+          cl->data = PyArray_ZEROS(1, dims, dmap_column_type(s->type), 0);
+        if(cl->data == NULL) goto fail;
+      }
+      if(cl->data == Py_None || (cl->type == DATASTRING) != (s->type == DATASTRING))
+        continue;
+      if(cl->type == DATASTRING)
+      {
+        col = PyString_FromString(*((char **)s->data.vptr));
+        if(col == NULL) goto fail;
+        PyList_SET_ITEM(cl->data, r, col);
+      }
+      else
+        dmap_copy_values((char *)PyArray_DATA((PyArrayObject *)cl->data)+
+                         (size_t)r*PyArray_ITEMSIZE((PyArrayObject *)cl->data),
+                         cl->type, s->data.vptr, s->type, 1);
+    }
+  }
+  for(c=0;c<ncol;c++)
+  {
+    cl = &cols[c];
+    if(cl->data == Py_None) continue;
+    if(cl->type == DATASTRING)
+    {
+      for(r=0;r<n;r++)
+      {
+        if(PyList_GET_ITEM(cl->data, r) != NULL) continue;
+        col = PyString_FromString("");
+        if(col == NULL) goto fail;
+        PyList_SET_ITEM(cl->data, r, col);
+      }
+    }
+    if(PyDict_SetItemString(scalars, cl->name, cl->data) < 0) goto fail;
+  }
+  dmap_block_cols_free(cols, have);
+  cols = NULL;
+  have = nmax = ncol = 0;
+  lay.num = -1;
+  PyDict_Clear(index);
+
+  /*arrays, counted into offsets on a first pass and copied into the
+    flattened values on a second*/
+  dims[0] = n+1;
+  for(r=0;r<n;r++)
+  {
+    ncol = dmap_layout_map(&lay, recs[r], 1, index, ncol);
+    if(ncol < 0 || dmap_block_cols_grow(&cols, &have, &nmax, ncol) < 0) goto fail;
+    for(k=0;k<recs[r]->anum;k++)
+    {
+      npy_int64 nelem=1;
+      int d;
+      a = recs[r]->arr[k];
+      cl = &cols[lay.col[k]];
+      if(cl->seen == r) continue;
+      cl->seen = r;
+      if(cl->offsets == NULL)
+      {
+        cl->name = a->name;
+        cl->type = a->type;
+        if(!dmap_fields_wanted(fields,a->name) || dmap_column_type(a->type) < 0)
+        {
+          Py_INCREF(Py_None);
+          cl->offsets = Py_None;
+        }
+        else
+          cl->offsets = PyArray_ZEROS(1, dims, NPY_INT64, 0);
+        if(cl->offsets == NULL) goto fail;
+      }
+      if(cl->offsets == Py_None || a->type == DATASTRING) continue;
+      for(d=0;d<a->dim;d++) nelem *= a->rng[d];
+      ((npy_int64 *)PyArray_DATA((PyArrayObject *)cl->offsets))[r+1] = nelem;
+    }
+  }
+  for(c=0;c<ncol;c++)
+  {
+    npy_int64 *off;
+    npy_intp total;
+    cl = &cols[c];
+    cl->seen = -1;
+    if(cl->offsets == Py_None) continue;
+    off = (npy_int64 *)PyArray_DATA((PyArrayObject *)cl->offsets);
+    for(r=0;r<n;r++) off[r+1] += off[r];
+    total = (npy_intp)off[n];
+    cl->data = PyArray_SimpleNew(1, &total, dmap_column_type(cl->type));
+    if(cl->data == NULL) goto fail;
+  }
+  for(r=0;r<n;r++)
+  {
+    if(dmap_layout_map(&lay, recs[r], 1, index, ncol) < 0) goto fail;
+    for(k=0;k<recs[r]->anum;k++)
+    {
+      npy_int64 *off;
+      a = recs[r]->arr[k];
+      cl = &cols[lay.col[k]];
+      if(cl->seen == r) continue;
+      cl->seen = r;
+      if(cl->offsets == Py_None || a->type == DATASTRING) continue;
+      off = (npy_int64 *)PyArray_DATA((PyArrayObject *)cl->offsets);
+      dmap_copy_values((char *)PyArray_DATA((PyArrayObject *)cl->data)+
+                       (size_t)off[r]*PyArray_ITEMSIZE((PyArrayObject *)cl->data),
+                       cl->type, a->data.vptr, a->type, (int)(off[r+1]-off[r]));
+    }
+  }
+  for(c=0;c<ncol;c++)
+  {
+    cl = &cols[c];
+    if(cl->offsets == Py_None) continue;
+    col = PyTuple_Pack(2, cl->data, cl->offsets);
+    if(col == NULL) goto fail;
+    k = PyDict_SetItemString(arrays, cl->name, col);
+    Py_DECREF(col);
+    if(k < 0) goto fail;
+  }
+
+  dmap_block_cols_free(cols, have);
+  free(lay.names);
+  free(lay.col);
+  Py_DECREF(index);
+  Py_DECREF(scalars);
+  Py_DECREF(arrays);
+  return block;
+
+fail:
+  dmap_block_cols_free(cols, have);
+  free(lay.names);
+  free(lay.col);
+  Py_XDECREF(index);
+  Py_XDECREF(scalars);
+  Py_XDECREF(arrays);
+  Py_XDECREF(block);
+  return NULL;
+}
+
+/*append a record to a growing list of decoded records*/
+static int
+dmap_block_append(struct DataMap ***recs, int *n, int *nmax, struct DataMap *ptr)
+{
+  if(*n == *nmax)
+  {
+    struct DataMap **tmp;
+    *nmax = (*nmax == 0) ? 256 : *nmax*2;
+    tmp = realloc(*recs, *nmax*sizeof(struct DataMap *));
+    if(tmp == NULL) return -1;
+    *recs = tmp;
+  }
+  (*recs)[(*n)++] = ptr;
+  return 0;
+}
+
+static void
+dmap_block_free(struct DataMap **recs, int n)
+{
+  int r;
+  for(r=0;r<n;r++) DataMapFree(recs[r]);
+  free(recs);
+}
+
+static PyObject *
+read_dmap_block(PyObject *self, PyObject *args, PyObject *kwds)
+{
+  int fd, nrec=-1;
+  PyObject *fieldObj=NULL, *sTime=NULL, *eTime=NULL, *stid=NULL, *channel=NULL;
+  PyObject *bmnum=NULL, *cp=NULL, *tfreq=NULL;
+  static char *kwlist[] = {"fd","nrec","fields","sTime","eTime","stid","channel",
+                           "bmnum","cp","tfreq",NULL};
+  if(!PyArg_ParseTupleAndKeywords(args, kwds, "i|iOOOOOOOO", kwlist, &fd, &nrec,
+                                  &fieldObj, &sTime, &eTime, &stid, &channel,
+                                  &bmnum, &cp, &tfreq))
+    return NULL;
+  else
+  {
+    PyObject *block;
+    struct DataMap *ptr, **recs=NULL;
+    struct DmapFields fields;
+    struct DmapFilter filter;
+    int n=0, nmax=0, err=0;
+    if(dmap_filter_init(&filter,sTime,eTime,stid,channel,bmnum,cp,tfreq) < 0)
+      return NULL;
+    if(dmap_fields_init(&fields,fieldObj) < 0)
+      return NULL;
+
+    Py_BEGIN_ALLOW_THREADS
+    while(nrec < 0 || n < nrec)
+    {
+      if(filter.active)
+        ptr = dmap_read_filtered(fd,&filter,&err);
+      else
+        ptr = DataMapRead(fd);
+      if(ptr == NULL) break;
+      if(dmap_block_append(&recs,&n,&nmax,ptr) < 0)
+      {
+        DataMapFree(ptr);
+        err = 1;
+        break;
+      }
+    }
+    Py_END_ALLOW_THREADS
+
+    if(err)
+    {
+      dmap_block_free(recs,n);
+      dmap_fields_free(&fields);
+      return PyErr_NoMemory();
+    }
+    if(n == 0)
+    {
+      free(recs);
+      dmap_fields_free(&fields);
+      Py_RETURN_NONE;
+    }
+    block = dmap_block(recs,n,&fields);
+    dmap_block_free(recs,n);
+    dmap_fields_free(&fields);
+    return block;
+  }
+}
+
+static PyObject *
+decode_dmap_block(PyObject *self, PyObject *args, PyObject *kwds)
+{
+  PyObject *recList, *fieldObj=NULL, *sTime=NULL, *eTime=NULL, *stid=NULL;
+  PyObject *channel=NULL, *bmnum=NULL, *cp=NULL, *tfreq=NULL, *seq;
+  static char *kwlist[] = {"recs","fields","sTime","eTime","stid","channel",
+                           "bmnum","cp","tfreq",NULL};
+  if(!PyArg_ParseTupleAndKeywords(args, kwds, "O|OOOOOOOO", kwlist, &recList,
+                                  &fieldObj, &sTime, &eTime, &stid, &channel,
+                                  &bmnum, &cp, &tfreq))
+    return NULL;
+  else
+  {
+    PyObject *block;
+    struct DataMap *ptr, **recs=NULL;
+    struct DmapFields fields;
+    struct DmapFilter filter;
+    struct DmapRecKey key;
+    int i, n=0, nmax=0, size, match;
+    int32 snum;
+    char *buf;
+    if(dmap_filter_init(&filter,sTime,eTime,stid,channel,bmnum,cp,tfreq) < 0)
+      return NULL;
+    seq = PySequence_Fast(recList, "recs must be a sequence of encoded records");
+    if(seq == NULL)
+      return NULL;
+    if(dmap_fields_init(&fields,fieldObj) < 0)
+    {
+      Py_DECREF(seq);
+      return NULL;
+    }
+
+    for(i=0;i<PySequence_Fast_GET_SIZE(seq);i++)
+    {
+      PyObject *item = PySequence_Fast_GET_ITEM(seq,i);
+      if(!PyString_Check(item)) continue;
+      buf = PyString_AS_STRING(item);
+      size = (int)PyString_GET_SIZE(item);
+      if(size < 16) continue;
+      if(filter.active)
+      {
+        ConvertToInt((unsigned char *)buf+8,&snum);
+        if(dmap_parse_key((unsigned char *)buf+16,size-16,snum,&key) != 0) continue;
+        match = dmap_filter_test(&filter,&key);
+        if(match < 0) break;
+        if(match == 0) continue;
+      }
+      ptr = DataMapDecodeBuffer(buf,size);
+      if(ptr == NULL) continue;
+      if(dmap_block_append(&recs,&n,&nmax,ptr) < 0)
+      {
+        DataMapFree(ptr);
+        dmap_block_free(recs,n);
+        dmap_fields_free(&fields);
+        Py_DECREF(seq);
+        return PyErr_NoMemory();
+      }
+    }
+    Py_DECREF(seq);
+
+    if(n == 0)
+    {
+      free(recs);
+      dmap_fields_free(&fields);
+      Py_RETURN_NONE;
+    }
+    block = dmap_block(recs,n,&fields);
+    dmap_block_free(recs,n);
+    dmap_fields_free(&fields);
+    return block;
+  }
+}
+
+/*a scalar value being encoded, the map points at it until the record
+  has been encoded*/
+union DmapValue
+{
+  char c;
+  unsigned char uc;
+  int16 s;
+  uint16 us;
+  int32 i;
+  uint32 ui;
+  int64 l;
+  uint64 ul;
+  float f;
+  double d;
+  char *str;
+};
+
+/*a record being encoded.  the map only points at its names, values,
+  ranges and arrays, so everything it points at is held here until the
+  record has been encoded.  vals and rngs are sized for the record up
+  front and never moved*/
+struct DmapEncoder
+{
+  struct DataMap *ptr;
+  union DmapValue *vals;
+  int nval, maxval;
+  int32 *rngs;
+  int nrng, maxrng;
+  PyObject *keep;
+};
+
+static int
+dmap_encoder_init(struct DmapEncoder *e, int nfield)
+{
+  e->ptr = NULL;
+  e->nval = 0;
+  e->nrng = 0;
+  /*room for the time.* fields made from the epoch time*/
+  e->maxval = nfield+8;
+  e->maxrng = (nfield+1)*NPY_MAXDIMS;
+  e->vals = malloc(e->maxval*sizeof(union DmapValue));
+  e->rngs = malloc(e->maxrng*sizeof(int32));
+  e->keep = PyList_New(0);
+  if(e->vals == NULL || e->rngs == NULL || e->keep == NULL)
+  {
+    free(e->vals);
+    free(e->rngs);
+    Py_XDECREF(e->keep);
+    PyErr_NoMemory();
+    return -1;
+  }
+  return 0;
+}
+
+/*start a new record, dropping what the last one held*/
+static int
+dmap_encoder_start(struct DmapEncoder *e)
+{
+  if(e->ptr != NULL) DataMapFree(e->ptr);
+  e->ptr = DataMapMake();
+  e->nval = 0;
+  e->nrng = 0;
+  if(PyList_SetSlice(e->keep, 0, PyList_GET_SIZE(e->keep), NULL) < 0)
+    return -1;
+  if(e->ptr == NULL)
+  {
+    PyErr_NoMemory();
+    return -1;
+  }
+  return 0;
+}
+
+static void
+dmap_encoder_free(struct DmapEncoder *e)
+{
+  if(e->ptr != NULL) DataMapFree(e->ptr);
+  e->ptr = NULL;
+  free(e->vals);
+  free(e->rngs);
+  Py_XDECREF(e->keep);
+}
+
+/*the dmap type of numpy values, -1 if there is none*/
+static int
+dmap_type_of_descr(PyArray_Descr *d)
+{
+  if(d->kind == 'b') return DATACHAR;
+  if(d->kind == 'i')
+  {
+    if(d->elsize == 1) return DATACHAR;
+    if(d->elsize == 2) return DATASHORT;
+    if(d->elsize == 4) return DATAINT;
+    if(d->elsize == 8) return DATALONG;
+  }
+  if(d->kind == 'u')
+  {
+    if(d->elsize == 1) return DATAUCHAR;
+    if(d->elsize == 2) return DATAUSHORT;
+    if(d->elsize == 4) return DATAUINT;
+    if(d->elsize == 8) return DATAULONG;
+  }
+  if(d->kind == 'f')
+  {
+    if(d->elsize == 4) return DATAFLOAT;
+    if(d->elsize == 8) return DATADOUBLE;
+  }
+  return -1;
+}
+
+/*the dmap type to write a field as.  types, if given, says so by name,
+  numpy values keep their own type, python ints are written as int,
+  floats as double and strings as string.  returns -1 with an error set
+  if there is no type for the value*/
+static int
+dmap_field_type(PyObject *types, PyObject *name, PyObject *val)
+{
+  int type = -1;
+  if(types != NULL && types != Py_None)
+  {
+    PyObject *t = PyDict_GetItem(types, name);
+    if(t != NULL)
+    {
+      type = (int)PyInt_AsLong(t);
+      if(type == -1 && PyErr_Occurred()) return -1;
+      if(type == DATASTRING || dmap_type_size(type) > 0) return type;
+      PyErr_Format(PyExc_ValueError, "unknown dmap type %d for %s", type, PyString_AsString(name));
+      return -1;
+    }
+  }
+  if(PyArray_Check(val))
+    type = dmap_type_of_descr(PyArray_DESCR((PyArrayObject *)val));
+  else if(PyArray_IsScalar(val, Generic))
+  {
+    PyArray_Descr *d = PyArray_DescrFromScalar(val);
+    type = dmap_type_of_descr(d);
+    if(PyArray_IsScalar(val, String)) type = DATASTRING;
+    Py_DECREF(d);
+  }
+  else if(PyString_Check(val)) type = DATASTRING;
+  else if(PyInt_Check(val) || PyLong_Check(val)) type = DATAINT;
+  else if(PyFloat_Check(val)) type = DATADOUBLE;
+  else if(PySequence_Check(val))
+  {
+    /*a list, typed by what numpy makes of it, with python ints kept as int*/
+    PyObject *arr = PyArray_FROM_O(val);
+    if(arr == NULL) return -1;
+    type = dmap_type_of_descr(PyArray_DESCR((PyArrayObject *)arr));
+    if(type == DATALONG) type = DATAINT;
+    Py_DECREF(arr);
+  }
+  if(type < 0)
+    PyErr_Format(PyExc_TypeError, "can not write %s, %s has no dmap type",
+                 PyString_AsString(name), Py_TYPE(val)->tp_name);
+  return type;
+}
+
+/*add a scalar of a given type to the record being encoded*/
+static int
+dmap_encode_scalar(struct DmapEncoder *e, char *name, int type, PyObject *val)
+{
+  union DmapValue *v;
+  if(e->nval == e->maxval)
+  {
+    PyErr_SetString(PyExc_RuntimeError, "too many scalars in a dmap record");
+    return -1;
+  }
+  v = &e->vals[e->nval++];
+  if(type == DATASTRING)
+  {
+    if(!PyString_Check(val))
+    {
+      PyErr_Format(PyExc_TypeError, "%s must be a string", name);
+      return -1;
+    }
+    if(PyList_Append(e->keep, val) < 0) return -1;
+    v->str = PyString_AS_STRING(val);
+  }
+  else if(type == DATAFLOAT || type == DATADOUBLE)
+  {
+    double d = PyFloat_AsDouble(val);
+    if(d == -1 && PyErr_Occurred()) return -1;
+    if(type == DATAFLOAT) v->f = (float)d;
+    else v->d = d;
+  }
+  else
+  {
+    PY_LONG_LONG l;
+    /*char scalars are read back as one character strings*/
+    if(PyString_Check(val) && PyString_GET_SIZE(val) == 1)
+      l = (unsigned char)PyString_AS_STRING(val)[0];
+    else
+    {
+      PyObject *num = PyNumber_Long(val);
+      if(num == NULL) return -1;
+      l = PyLong_AsLongLong(num);
+      Py_DECREF(num);
+      if(l == -1 && PyErr_Occurred()) return -1;
+    }
+    if(type == DATACHAR) v->c = (char)l;
+    else if(type == DATAUCHAR) v->uc = (unsigned char)l;
+    else if(type == DATASHORT) v->s = (int16)l;
+    else if(type == DATAUSHORT) v->us = (uint16)l;
+    else if(type == DATAINT) v->i = (int32)l;
+    else if(type == DATAUINT) v->ui = (uint32)l;
+    else if(type == DATALONG) v->l = (int64)l;
+    else v->ul = (uint64)l;
+  }
+  DataMapAddScalar(e->ptr, name, type, v);
+  return 0;
+}
+
+/*add the time.* scalars of an epoch time*/
+static int
+dmap_encode_time(struct DmapEncoder *e, double epoch)
+{
+  int yr,mo,dy,hr,mt,c;
+  double sc;
+  int16 vals[6];
+  static char *names[] = {"time.yr","time.mo","time.dy","time.hr","time.mt","time.sc"};
+  if(e->nval+7 > e->maxval)
+  {
+    PyErr_SetString(PyExc_RuntimeError, "too many scalars in a dmap record");
+    return -1;
+  }
+  TimeEpochToYMDHMS(epoch,&yr,&mo,&dy,&hr,&mt,&sc);
+  vals[0]=yr; vals[1]=mo; vals[2]=dy; vals[3]=hr; vals[4]=mt; vals[5]=(int16)sc;
+  for(c=0;c<6;c++)
+  {
+    e->vals[e->nval].s = vals[c];
+    DataMapAddScalar(e->ptr, names[c], DATASHORT, &e->vals[e->nval++]);
+  }
+  e->vals[e->nval].i = (int32)((sc-(int)sc)*1e6+0.5);
+  if(e->vals[e->nval].i > 999999) e->vals[e->nval].i = 999999;
+  DataMapAddScalar(e->ptr, "time.us", DATAINT, &e->vals[e->nval++]);
+  return 0;
+}
+
+/*the ranges of a flat array.  the lag table and the acfs are kept with
+  more than one range, as dmap_to_dict expects, everything else has one*/
+static int
+dmap_flat_ranges(char *name, npy_intp n, int mplgs, int32 *rng)
+{
+  if(strcmp(name,"ltab") == 0 && n%2 == 0)
+  {
+    rng[0] = 2;
+    rng[1] = (int32)(n/2);
+    return 2;
+  }
+  if((strcmp(name,"acfd") == 0 || strcmp(name,"xcfd") == 0) &&
+     mplgs > 0 && n%(2*mplgs) == 0)
+  {
+    rng[0] = 2;
+    rng[1] = mplgs;
+    rng[2] = (int32)(n/(2*mplgs));
+    return 3;
+  }
+  rng[0] = (int32)n;
+  return 1;
+}
+
+/*add n values at data, which the caller keeps alive, as an array.  dims
+  are numpy dimensions, slowest first, or NULL for a flat array*/
+static int
+dmap_encode_values(struct DmapEncoder *e, char *name, int type, void *data,
+                   int ndim, npy_intp *dims, npy_intp n, int mplgs)
+{
+  int32 *rng = e->rngs+e->nrng;
+  int i, dim;
+  if(e->nrng+NPY_MAXDIMS > e->maxrng)
+  {
+    PyErr_SetString(PyExc_RuntimeError, "too many arrays in a dmap record");
+    return -1;
+  }
+  if(dims == NULL || ndim <= 1)
+    dim = dmap_flat_ranges(name, n, mplgs, rng);
+  else
+  {
+    /*dmap ranges run fastest first*/
+    dim = ndim;
+    for(i=0;i<ndim;i++) rng[i] = (int32)dims[ndim-1-i];
+  }
+  e->nrng += dim;
+  DataMapAddArray(e->ptr, name, type, dim, rng, data);
+  return 0;
+}
+
+/*add an array field, converting it to the numpy type of the dmap type*/
+static int
+dmap_encode_array(struct DmapEncoder *e, char *name, int type, PyObject *val, int mplgs)
+{
+  PyObject *arr;
+  int typenum = dmap_column_type(type);
+  if(typenum < 0)
+  {
+    PyErr_Format(PyExc_TypeError, "%s can not be written as an array", name);
+    return -1;
+  }
+  arr = PyArray_FROMANY(val, typenum, 0, 0, NPY_ARRAY_C_CONTIGUOUS | NPY_ARRAY_ALIGNED | NPY_ARRAY_FORCECAST);
+  if(arr == NULL) return -1;
+  if(PyList_Append(e->keep, arr) < 0)
+  {
+    Py_DECREF(arr);
+    return -1;
+  }
+  Py_DECREF(arr);
+  return dmap_encode_values(e, name, type, PyArray_DATA((PyArrayObject *)arr),
+                            PyArray_NDIM((PyArrayObject *)arr), PyArray_DIMS((PyArrayObject *)arr),
+                            PyArray_SIZE((PyArrayObject *)arr), mplgs);
+}
+
+/*encode the record held by an encoder, appending it to a growing buffer*/
+static int
+dmap_encoder_flush(struct DmapEncoder *e, char **out, Py_ssize_t *len, Py_ssize_t *cap)
+{
+  int size = 0;
+  char *buf = DataMapEncodeBuffer(e->ptr, &size);
+  if(buf == NULL)
+  {
+    PyErr_NoMemory();
+    return -1;
+  }
+  if(*len+size > *cap)
+  {
+    char *tmp;
+    Py_ssize_t ncap = (*cap == 0) ? 65536 : *cap;
+    while(ncap < *len+size) ncap *= 2;
+    tmp = realloc(*out, ncap);
+    if(tmp == NULL)
+    {
+      free(buf);
+      PyErr_NoMemory();
+      return -1;
+    }
+    *out = tmp;
+    *cap = ncap;
+  }
+  memcpy(*out+*len, buf, size);
+  *len += size;
+  free(buf);
+  return 0;
+}
+
+/*an int scalar of a record dict, def if it is missing*/
+static int
+dmap_dict_int(PyObject *rec, char *name, int def)
+{
+  PyObject *val = PyDict_GetItemString(rec, name);
+  long l;
+  if(val == NULL || val == Py_None) return def;
+  l = PyInt_AsLong(val);
+  if(l == -1 && PyErr_Occurred())
+  {
+    PyErr_Clear();
+    return def;
+  }
+  return (int)l;
+}
+
+/*encode one record dict with an encoder*/
+static int
+dmap_encode_dict(struct DmapEncoder *e, PyObject *rec, PyObject *types)
+{
+  PyObject *key, *val;
+  Py_ssize_t pos = 0;
+  int mplgs = dmap_dict_int(rec, "mplgs", 0);
+  /*the epoch time stands in for the time.* fields it was made from, grid
+    and map records are timed by their start.* fields instead*/
+  int useTime = (PyDict_GetItemString(rec, "time.yr") == NULL &&
+                 PyDict_GetItemString(rec, "start.year") == NULL);
+
+  if(dmap_encoder_start(e) < 0) return -1;
+  while(PyDict_Next(rec, &pos, &key, &val))
+  {
+    char *name;
+    int type;
+    if(val == Py_None) continue;
+    if(!PyString_Check(key))
+    {
+      PyErr_SetString(PyExc_TypeError, "record field names must be strings");
+      return -1;
+    }
+    name = PyString_AS_STRING(key);
+    if(strcmp(name, "time") == 0)
+    {
+      double epoch;
+      if(!useTime) continue;
+      epoch = PyFloat_AsDouble(val);
+      if(epoch == -1 && PyErr_Occurred()) return -1;
+      if(dmap_encode_time(e, epoch) < 0) return -1;
+      continue;
+    }
+    type = dmap_field_type(types, key, val);
+    if(type < 0) return -1;
+    if(PyString_Check(val) || (PyArray_Check(val) && PyArray_NDIM((PyArrayObject *)val) == 0) ||
+       PyArray_IsScalar(val, Generic) || !PySequence_Check(val))
+    {
+      if(dmap_encode_scalar(e, name, type, val) < 0) return -1;
+    }
+    else if(dmap_encode_array(e, name, type, val, mplgs) < 0) return -1;
+  }
+  return 0;
+}
+
+static PyObject *
+encode_dmap_rec(PyObject *self, PyObject *args, PyObject *kwds)
+{
+  PyObject *rec, *types=NULL, *out;
+  static char *kwlist[] = {"rec","types",NULL};
+  struct DmapEncoder e;
+  char *buf = NULL;
+  Py_ssize_t len = 0, cap = 0;
+  if(!PyArg_ParseTupleAndKeywords(args, kwds, "O!|O", kwlist, &PyDict_Type, &rec, &types))
+    return NULL;
+  if(dmap_encoder_init(&e, (int)PyDict_Size(rec)) < 0)
+    return NULL;
+  if(dmap_encode_dict(&e, rec, types) < 0 || dmap_encoder_flush(&e, &buf, &len, &cap) < 0)
+  {
+    dmap_encoder_free(&e);
+    free(buf);
+    return NULL;
+  }
+  dmap_encoder_free(&e);
+  out = PyString_FromStringAndSize(buf, len);
+  free(buf);
+  return out;
+}
+
+static PyObject *
+encode_dmap_recs(PyObject *self, PyObject *args, PyObject *kwds)
+{
+  PyObject *recList, *types=NULL, *seq, *out;
+  static char *kwlist[] = {"recs","types",NULL};
+  char *buf = NULL;
+  Py_ssize_t len = 0, cap = 0, i, nfield = 0;
+  struct DmapEncoder e;
+  if(!PyArg_ParseTupleAndKeywords(args, kwds, "O|O", kwlist, &recList, &types))
+    return NULL;
+  seq = PySequence_Fast(recList, "recs must be a sequence of record dicts");
+  if(seq == NULL)
+    return NULL;
+  for(i=0;i<PySequence_Fast_GET_SIZE(seq);i++)
+  {
+    PyObject *rec = PySequence_Fast_GET_ITEM(seq,i);
+    if(!PyDict_Check(rec))
+    {
+      Py_DECREF(seq);
+      PyErr_SetString(PyExc_TypeError, "recs must be a sequence of record dicts");
+      return NULL;
+    }
+    if(PyDict_Size(rec) > nfield) nfield = PyDict_Size(rec);
+  }
+  if(dmap_encoder_init(&e, (int)nfield) < 0)
+  {
+    Py_DECREF(seq);
+    return NULL;
+  }
+  for(i=0;i<PySequence_Fast_GET_SIZE(seq);i++)
+  {
+    if(dmap_encode_dict(&e, PySequence_Fast_GET_ITEM(seq,i), types) < 0 ||
+       dmap_encoder_flush(&e, &buf, &len, &cap) < 0)
+    {
+      dmap_encoder_free(&e);
+      Py_DECREF(seq);
+      free(buf);
+      return NULL;
+    }
+  }
+  dmap_encoder_free(&e);
+  Py_DECREF(seq);
+  out = PyString_FromStringAndSize(buf, len);
+  free(buf);
+  return out;
+}
+
+/*a column of a block being encoded*/
+struct DmapColumn
+{
+  char *name;
+  int type;
+  PyObject *values;   /*contiguous numpy values, or the list of strings*/
+  npy_int64 *offsets; /*arrays only*/
+};
+
+static void
+dmap_columns_free(struct DmapColumn *cols, int n)
+{
+  int i;
+  for(i=0;i<n;i++) Py_XDECREF(cols[i].values);
+  free(cols);
+}
+
+static PyObject *
+encode_dmap_block(PyObject *self, PyObject *args, PyObject *kwds)
+{
+  PyObject *block, *types=NULL, *scalars, *arrays, *key, *val, *keep, *out;
+  static char *kwlist[] = {"block","types",NULL};
+  struct DmapColumn *scl, *arr;
+  struct DmapEncoder e;
+  Py_ssize_t pos, len = 0, cap = 0;
+  char *buf = NULL;
+  double *times = NULL;
+  int nrec, nscl = 0, narr = 0, r, c, mplgsCol = -1, err = 0;
+  if(!PyArg_ParseTupleAndKeywords(args, kwds, "O!|O", kwlist, &PyDict_Type, &block, &types))
+    return NULL;
+  scalars = PyDict_GetItemString(block, "scalars");
+  arrays = PyDict_GetItemString(block, "arrays");
+  val = PyDict_GetItemString(block, "nrec");
+  if(scalars == NULL || arrays == NULL || val == NULL ||
+     !PyDict_Check(scalars) || !PyDict_Check(arrays))
+  {
+    PyErr_SetString(PyExc_ValueError, "block must be a dict of nrec, scalars and arrays");
+    return NULL;
+  }
+  nrec = (int)PyInt_AsLong(val);
+  if(nrec == -1 && PyErr_Occurred())
+    return NULL;
+
+  scl = calloc(PyDict_Size(scalars)+1, sizeof(struct DmapColumn));
+  arr = calloc(PyDict_Size(arrays)+1, sizeof(struct DmapColumn));
+  keep = PyList_New(0);
+  if(scl == NULL || arr == NULL || keep == NULL)
+  {
+    free(scl);
+    free(arr);
+    Py_XDECREF(keep);
+    return PyErr_NoMemory();
+  }
+
+  /*convert every column to its dmap type once, records then point into them*/
+  pos = 0;
+  while(!err && PyDict_Next(scalars, &pos, &key, &val))
+  {
+    struct DmapColumn *col;
+    if(!PyString_Check(key)) continue;
+    if(strcmp(PyString_AS_STRING(key), "time") == 0)
+    {
+      PyObject *t = PyArray_FROMANY(val, NPY_FLOAT64, 1, 1, NPY_ARRAY_CARRAY | NPY_ARRAY_FORCECAST);
+      if(t == NULL || PyArray_DIM((PyArrayObject *)t, 0) < nrec) { Py_XDECREF(t); err = 1; break; }
+      PyList_Append(keep, t);
+      Py_DECREF(t);
+      times = (double *)PyArray_DATA((PyArrayObject *)t);
+      continue;
+    }
+    col = &scl[nscl];
+    col->name = PyString_AS_STRING(key);
+    if(PyList_Check(val))
+    {
+      col->type = DATASTRING;
+      Py_INCREF(val);
+      col->values = val;
+    }
+    else
+    {
+      int typenum;
+      col->type = dmap_field_type(types, key, val);
+      typenum = dmap_column_type(col->type);
+      if(col->type < 0 || typenum < 0) { err = 1; break; }
+      col->values = PyArray_FROMANY(val, typenum, 1, 1, NPY_ARRAY_CARRAY | NPY_ARRAY_FORCECAST);
+    }
+    if(col->values == NULL) { err = 1; break; }
+    if(PySequence_Size(col->values) < nrec)
+    {
+      PyErr_Format(PyExc_ValueError, "the %s column is shorter than the block", col->name);
+      err = 1;
+      break;
+    }
+    if(strcmp(col->name, "mplgs") == 0 && col->type != DATASTRING) mplgsCol = nscl;
+    nscl++;
+  }
+  pos = 0;
+  while(!err && PyDict_Next(arrays, &pos, &key, &val))
+  {
+    struct DmapColumn *col = &arr[narr];
+    PyObject *values, *offsets;
+    int typenum;
+    if(!PyString_Check(key)) continue;
+    if(!PyTuple_Check(val) || PyTuple_GET_SIZE(val) != 2)
+    {
+      PyErr_Format(PyExc_ValueError, "the %s array must be (values, offsets)", PyString_AS_STRING(key));
+      err = 1;
+      break;
+    }
+    col->name = PyString_AS_STRING(key);
+    col->type = dmap_field_type(types, key, PyTuple_GET_ITEM(val,0));
+    typenum = dmap_column_type(col->type);
+    if(col->type < 0 || typenum < 0) { err = 1; break; }
+    values = PyArray_FROMANY(PyTuple_GET_ITEM(val,0), typenum, 1, 1, NPY_ARRAY_CARRAY | NPY_ARRAY_FORCECAST);
+    offsets = PyArray_FROMANY(PyTuple_GET_ITEM(val,1), NPY_INT64, 1, 1, NPY_ARRAY_CARRAY | NPY_ARRAY_FORCECAST);
+    col->values = values;
+    if(values == NULL || offsets == NULL) { Py_XDECREF(offsets); err = 1; break; }
+    PyList_Append(keep, offsets);
+    Py_DECREF(offsets);
+    col->offsets = (npy_int64 *)PyArray_DATA((PyArrayObject *)offsets);
+    if(PyArray_DIM((PyArrayObject *)offsets, 0) < nrec+1 ||
+       col->offsets[nrec] > PyArray_DIM((PyArrayObject *)values, 0))
+    {
+      PyErr_Format(PyExc_ValueError, "the %s offsets do not match its values", col->name);
+      err = 1;
+      break;
+    }
+    narr++;
+  }
+  if(!err && dmap_encoder_init(&e, nscl+narr) < 0) err = 1;
+  if(err)
+  {
+    dmap_columns_free(scl, nscl+1);
+    dmap_columns_free(arr, narr+1);
+    Py_DECREF(keep);
+    return NULL;
+  }
+
+  for(r=0;r<nrec && !err;r++)
+  {
+    int mplgs = 0;
+    if(dmap_encoder_start(&e) < 0) { err = 1; break; }
+    if(times != NULL && PyDict_GetItemString(scalars, "start.year") == NULL)
+      if(dmap_encode_time(&e, times[r]) < 0) { err = 1; break; }
+    for(c=0;c<nscl;c++)
+    {
+      if(scl[c].type == DATASTRING)
+      {
+        if(dmap_encode_scalar(&e, scl[c].name, DATASTRING, PyList_GET_ITEM(scl[c].values,r)) < 0) { err = 1; break; }
+      }
+      else
+      {
+        /*point straight into the column*/
+        PyArrayObject *a = (PyArrayObject *)scl[c].values;
+        DataMapAddScalar(e.ptr, scl[c].name, scl[c].type, (char *)PyArray_DATA(a)+(npy_intp)r*PyArray_ITEMSIZE(a));
+      }
+    }
+    if(err) break;
+    if(mplgsCol >= 0)
+    {
+      PyArrayObject *a = (PyArrayObject *)scl[mplgsCol].values;
+      mplgs = (int)dmap_native_as_double((char *)PyArray_DATA(a)+(npy_intp)r*PyArray_ITEMSIZE(a), scl[mplgsCol].type);
+    }
+    for(c=0;c<narr;c++)
+    {
+      PyArrayObject *a = (PyArrayObject *)arr[c].values;
+      npy_int64 start = arr[c].offsets[r], n = arr[c].offsets[r+1]-start;
+      if(dmap_encode_values(&e, arr[c].name, arr[c].type, (char *)PyArray_DATA(a)+start*PyArray_ITEMSIZE(a),
+                            1, NULL, (npy_intp)n, mplgs) < 0) { err = 1; break; }
+    }
+    if(err) break;
+    if(dmap_encoder_flush(&e, &buf, &len, &cap) < 0) err = 1;
+  }
+  dmap_encoder_free(&e);
+  dmap_columns_free(scl, nscl+1);
+  dmap_columns_free(arr, narr+1);
+  Py_DECREF(keep);
+  if(err)
+  {
+    free(buf);
+    return NULL;
+  }
+  out = PyString_FromStringAndSize(buf, len);
+  free(buf);
+  return out;
+}
+
+/*a buffered reader for a dmap file.  it owns its descriptor and reads
+  with pread, so the descriptor position is never relied on and other
+  users of fileno() (eg readDmapIndex) can not upset it*/
+typedef struct
+{
+  PyObject_HEAD
+  int fd;
+  PyObject *name;
+  unsigned char *buf;
+  Py_ssize_t bufsize, buflen, bufpos;
+  off_t bufstart;
+  /*running totals for instrumentation, see utils.instrument*/
+  PY_LONG_LONG nbytes, nrecs, nskipped;
+} DmapReaderObject;
+
+static PyTypeObject DmapReaderType;
+
+/*make sure need bytes are buffered from bufpos on.  returns 0 on
+  success, -1 at the end of the file and -2 if memory ran out*/
+static int
+reader_fill(DmapReaderObject *r, Py_ssize_t need)
+{
+  ssize_t got;
+  if(r->buflen-r->bufpos >= need)
+    return 0;
+  if(r->bufpos > 0)
+  {
+    memmove(r->buf, r->buf+r->bufpos, r->buflen-r->bufpos);
+    r->bufstart += r->bufpos;
+    r->buflen -= r->bufpos;
+    r->bufpos = 0;
+  }
+  if(need > r->bufsize)
+  {
+    unsigned char *tmp = realloc(r->buf, need);
+    if(tmp == NULL) return -2;
+    r->buf = tmp;
+    r->bufsize = need;
+  }
+  while(r->buflen < need)
+  {
+    got = pread(r->fd, r->buf+r->buflen, r->bufsize-r->buflen, r->bufstart+r->buflen);
+    if(got <= 0) return -1;
+    r->buflen += got;
+  }
+  return 0;
+}
+
+/*find the next record which matches the filter and decode it.  returns
+  NULL at the end of the file, at a bad record, or at a record past the
+  end of the time window, which is left unread.  must not touch python*/
+static struct DataMap *
+reader_next(DmapReaderObject *r, struct DmapFilter *f)
+{
+  int32 code,size,snum;
+  struct DmapRecKey key;
+  struct DataMap *ptr;
+  unsigned char *rec;
+  int match;
+
+  while(1)
+  {
+    if(reader_fill(r,16) != 0) return NULL;
+    rec = r->buf+r->bufpos;
+    ConvertToInt(rec,&code);
+    ConvertToInt(rec+4,&size);
+    ConvertToInt(rec+8,&snum);
+    if(code != 0x00010001 || size < 16) return NULL;
+    if(reader_fill(r,size) != 0) return NULL;
+    rec = r->buf+r->bufpos;
+    if(f != NULL && f->active)
+    {
+      if(dmap_parse_key(rec+16,size-16,snum,&key) != 0) return NULL;
+      match = dmap_filter_test(f,&key);
+      if(match < 0) return NULL;
+      if(match == 0)
+      {
+        r->bufpos += size;
+        r->nbytes += size;
+        r->nskipped++;
+        continue;
+      }
+    }
+    ptr = DataMapDecodeBuffer((char *)rec,size);
+    r->bufpos += size;
+    r->nbytes += size;
+    r->nrecs++;
+    return ptr;
+  }
+}
+
+/*fill a filter from a dict of readDmapRec keywords*/
+static int
+dmap_filter_from_dict(struct DmapFilter *f, PyObject *filters)
+{
+  if(filters != NULL && filters != Py_None && !PyDict_Check(filters))
+  {
+    PyErr_SetString(PyExc_TypeError, "filters must be a dict");
+    return -1;
+  }
+  if(filters == NULL || filters == Py_None)
+    return dmap_filter_init(f,NULL,NULL,NULL,NULL,NULL,NULL,NULL);
+  return dmap_filter_init(f,PyDict_GetItemString(filters,"sTime"),
+                          PyDict_GetItemString(filters,"eTime"),
+                          PyDict_GetItemString(filters,"stid"),
+                          PyDict_GetItemString(filters,"channel"),
+                          PyDict_GetItemString(filters,"bmnum"),
+                          PyDict_GetItemString(filters,"cp"),
+                          PyDict_GetItemString(filters,"tfreq"));
+}
+
+static int
+reader_check(DmapReaderObject *r)
+{
+  if(r->fd < 0)
+  {
+    PyErr_SetString(PyExc_ValueError, "I/O operation on closed DmapReader");
+    return -1;
+  }
+  return 0;
+}
+
+static void
+reader_close_fd(DmapReaderObject *r)
+{
+  if(r->fd >= 0) close(r->fd);
+  r->fd = -1;
+  free(r->buf);
+  r->buf = NULL;
+  r->bufsize = r->buflen = r->bufpos = 0;
+}
+
+static void
+DmapReader_dealloc(DmapReaderObject *r)
+{
+  reader_close_fd(r);
+  Py_XDECREF(r->name);
+  Py_TYPE(r)->tp_free((PyObject *)r);
+}
+
+static PyObject *
+DmapReader_new(PyTypeObject *type, PyObject *args, PyObject *kwds)
+{
+  /*the allocation is zeroed, which would make descriptor 0 look like ours*/
+  DmapReaderObject *r = (DmapReaderObject *)type->tp_alloc(type, 0);
+  if(r != NULL) r->fd = -1;
+  return (PyObject *)r;
+}
+
+static int
+DmapReader_init(DmapReaderObject *r, PyObject *args, PyObject *kwds)
+{
+  char *filename;
+  Py_ssize_t bufsize = 1<<20;
+  static char *kwlist[] = {"filename","bufferSize",NULL};
+  if(!PyArg_ParseTupleAndKeywords(args, kwds, "s|n", kwlist, &filename, &bufsize))
+    return -1;
+  if(bufsize < 4096) bufsize = 4096;
+  reader_close_fd(r);
+  Py_CLEAR(r->name);
+  r->fd = open(filename, O_RDONLY);
+  if(r->fd < 0)
+  {
+    PyErr_SetFromErrnoWithFilename(PyExc_IOError, filename);
+    return -1;
+  }
+  r->buf = malloc(bufsize);
+  if(r->buf == NULL)
+  {
+    reader_close_fd(r);
+    PyErr_NoMemory();
+    return -1;
+  }
+  r->bufsize = bufsize;
+  r->buflen = r->bufpos = 0;
+  r->bufstart = 0;
+  r->nbytes = r->nrecs = r->nskipped = 0;
+  r->name = PyString_FromString(filename);
+  return 0;
+}
+
+static PyObject *
+DmapReader_readRec(DmapReaderObject *r, PyObject *args, PyObject *kwds)
+{
+  int use_numpy=0;
+  PyObject *fieldObj=NULL, *filterObj=NULL, *beamData;
+  struct DmapFields fields;
+  struct DmapFilter filter;
+  struct DataMap *ptr;
+  static char *kwlist[] = {"numpy","fields","filters",NULL};
+  if(!PyArg_ParseTupleAndKeywords(args, kwds, "|iOO", kwlist, &use_numpy, &fieldObj, &filterObj))
+    return NULL;
+  if(reader_check(r) < 0 || dmap_filter_from_dict(&filter,filterObj) < 0)
+    return NULL;
+  if(dmap_fields_init(&fields,fieldObj) < 0)
+    return NULL;
+  Py_BEGIN_ALLOW_THREADS
+  ptr = reader_next(r,&filter);
+  Py_END_ALLOW_THREADS
+  if(ptr == NULL)
+  {
+    dmap_fields_free(&fields);
+    Py_RETURN_NONE;
+  }
+  beamData = dmap_to_dict(ptr,use_numpy,&fields);
+  DataMapFree(ptr);
+  dmap_fields_free(&fields);
+  return beamData;
+}
+
+static PyObject *
+DmapReader_readBlock(DmapReaderObject *r, PyObject *args, PyObject *kwds)
+{
+  PyObject *nrecObj=NULL, *fieldObj=NULL, *filterObj=NULL, *block;
+  struct DmapFields fields;
+  struct DmapFilter filter;
+  struct DataMap *ptr, **recs=NULL;
+  long nrec=-1;
+  int n=0, nmax=0, err=0;
+  static char *kwlist[] = {"nrec","fields","filters",NULL};
+  if(!PyArg_ParseTupleAndKeywords(args, kwds, "|OOO", kwlist, &nrecObj, &fieldObj, &filterObj))
+    return NULL;
+  if(nrecObj != NULL && nrecObj != Py_None)
+  {
+    nrec = PyInt_AsLong(nrecObj);
+    if(nrec == -1 && PyErr_Occurred()) return NULL;
+  }
+  if(reader_check(r) < 0 || dmap_filter_from_dict(&filter,filterObj) < 0)
+    return NULL;
+  if(dmap_fields_init(&fields,fieldObj) < 0)
+    return NULL;
+  Py_BEGIN_ALLOW_THREADS
+  while(nrec < 0 || n < nrec)
+  {
+    ptr = reader_next(r,&filter);
+    if(ptr == NULL) break;
+    if(dmap_block_append(&recs,&n,&nmax,ptr) < 0)
+    {
+      DataMapFree(ptr);
+      err = 1;
+      break;
+    }
+  }
+  Py_END_ALLOW_THREADS
+  if(err)
+  {
+    dmap_block_free(recs,n);
+    dmap_fields_free(&fields);
+    return PyErr_NoMemory();
+  }
+  if(n == 0)
+  {
+    free(recs);
+    dmap_fields_free(&fields);
+    Py_RETURN_NONE;
+  }
+  block = dmap_block(recs,n,&fields);
+  dmap_block_free(recs,n);
+  dmap_fields_free(&fields);
+  return block;
+}
+
+static PyObject *
+DmapReader_tell(DmapReaderObject *r)
+{
+  if(reader_check(r) < 0) return NULL;
+  return PyLong_FromLongLong((PY_LONG_LONG)(r->bufstart+r->bufpos));
+}
+
+static PyObject *
+DmapReader_seek(DmapReaderObject *r, PyObject *args)
+{
+  PY_LONG_LONG offset;
+  if(!PyArg_ParseTuple(args, "L", &offset))
+    return NULL;
+  if(reader_check(r) < 0) return NULL;
+  if(offset < 0)
+    Py_RETURN_FALSE;
+  /*stay inside the buffer if we can*/
+  if((off_t)offset >= r->bufstart && (off_t)offset <= r->bufstart+r->buflen)
+    r->bufpos = (Py_ssize_t)(offset-r->bufstart);
+  else
+  {
+    r->bufstart = (off_t)offset;
+    r->buflen = r->bufpos = 0;
+  }
+  Py_RETURN_TRUE;
+}
+
+static PyObject *
+DmapReader_rewind(DmapReaderObject *r)
+{
+  PyObject *args = Py_BuildValue("(i)",0), *ret;
+  ret = DmapReader_seek(r,args);
+  Py_DECREF(args);
+  return ret;
+}
+
+static PyObject *
+DmapReader_fileno(DmapReaderObject *r)
+{
+  if(reader_check(r) < 0) return NULL;
+  return PyInt_FromLong(r->fd);
+}
+
+static PyObject *
+DmapReader_close(DmapReaderObject *r)
+{
+  reader_close_fd(r);
+  Py_RETURN_NONE;
+}
+
+static PyObject *
+DmapReader_enter(DmapReaderObject *r)
+{
+  if(reader_check(r) < 0) return NULL;
+  Py_INCREF(r);
+  return (PyObject *)r;
+}
+
+static PyObject *
+DmapReader_exit(DmapReaderObject *r, PyObject *args)
+{
+  reader_close_fd(r);
+  Py_RETURN_FALSE;
+}
+
+static PyObject *
+DmapReader_iternext(DmapReaderObject *r)
+{
+  struct DataMap *ptr;
+  PyObject *beamData;
+  if(reader_check(r) < 0) return NULL;
+  Py_BEGIN_ALLOW_THREADS
+  ptr = reader_next(r,NULL);
+  Py_END_ALLOW_THREADS
+  if(ptr == NULL)
+    return NULL;
+  beamData = dmap_to_dict(ptr,0,NULL);
+  DataMapFree(ptr);
+  return beamData;
+}
+
+static PyObject *
+DmapReader_getclosed(DmapReaderObject *r, void *closure)
+{
+  return PyBool_FromLong(r->fd < 0);
+}
+
+static PyObject *
+DmapReader_repr(DmapReaderObject *r)
+{
+  return PyString_FromFormat("DmapReader: %s, at %lld%s",
+                             r->name ? PyString_AsString(r->name) : "?",
+                             (long long)(r->bufstart+r->bufpos),
+                             (r->fd < 0) ? ", closed" : "");
+}
+
+static PyMethodDef DmapReader_methods[] =
+{
+  {"readRec", (PyCFunction)DmapReader_readRec, METH_VARARGS | METH_KEYWORDS,
+    "read the next record\nformat: rec = reader.readRec(numpy=False, fields=None, filters=None)\nfilters is a dict of readDmapRec filter keywords.  returns None at the end of the file or once a record is later than filters['eTime']"},
+  {"readBlock", (PyCFunction)DmapReader_readBlock, METH_VARARGS | METH_KEYWORDS,
+    "read a run of records into columns\nformat: block = reader.readBlock(nrec=None, fields=None, filters=None)\nsee readDmapBlock"},
+  {"tell", (PyCFunction)DmapReader_tell, METH_NOARGS, "the byte offset of the next record"},
+  {"seek", (PyCFunction)DmapReader_seek, METH_VARARGS, "jump to the record at a byte offset"},
+  {"rewind", (PyCFunction)DmapReader_rewind, METH_NOARGS, "jump to the first record"},
+  {"fileno", (PyCFunction)DmapReader_fileno, METH_NOARGS, "the file descriptor"},
+  {"close", (PyCFunction)DmapReader_close, METH_NOARGS, "close the file"},
+  {"__enter__", (PyCFunction)DmapReader_enter, METH_NOARGS, ""},
+  {"__exit__", (PyCFunction)DmapReader_exit, METH_VARARGS, ""},
+  {NULL}
+};
+
+static PyMemberDef DmapReader_members[] =
+{
+  {"name", T_OBJECT, offsetof(DmapReaderObject,name), READONLY, "the file being read"},
+  {"bufferSize", T_PYSSIZET, offsetof(DmapReaderObject,bufsize), READONLY, "the size of the read buffer in bytes"},
+  {"bytesRead", T_LONGLONG, offsetof(DmapReaderObject,nbytes), READONLY, "the bytes of the records read or skipped so far"},
+  {"recordsRead", T_LONGLONG, offsetof(DmapReaderObject,nrecs), READONLY, "the records decoded so far"},
+  {"recordsSkipped", T_LONGLONG, offsetof(DmapReaderObject,nskipped), READONLY, "the records skipped by the filters so far"},
+  {NULL}
+};
+
+static PyGetSetDef DmapReader_getset[] =
+{
+  {"closed", (getter)DmapReader_getclosed, NULL, "True once the reader has been closed", NULL},
+  {NULL}
+};
+
+static PyTypeObject DmapReaderType =
+{
+  PyObject_HEAD_INIT(NULL)
+  0,                                  /*ob_size*/
+  "dmapio.DmapReader",                /*tp_name*/
+  sizeof(DmapReaderObject),           /*tp_basicsize*/
+  0,                                  /*tp_itemsize*/
+  (destructor)DmapReader_dealloc,     /*tp_dealloc*/
+  0,                                  /*tp_print*/
+  0,                                  /*tp_getattr*/
+  0,                                  /*tp_setattr*/
+  0,                                  /*tp_compare*/
+  (reprfunc)DmapReader_repr,          /*tp_repr*/
+  0,                                  /*tp_as_number*/
+  0,                                  /*tp_as_sequence*/
+  0,                                  /*tp_as_mapping*/
+  0,                                  /*tp_hash */
+  0,                                  /*tp_call*/
+  0,                                  /*tp_str*/
+  0,                                  /*tp_getattro*/
+  0,                                  /*tp_setattro*/
+  0,                                  /*tp_as_buffer*/
+  Py_TPFLAGS_DEFAULT,                 /*tp_flags*/
+  "a buffered reader for a dmap file\nformat: reader = DmapReader(filename, bufferSize=1048576)\nholds one descriptor and a read buffer, iterating gives each record as a dict.  a reader should only be used by one thread at a time", /*tp_doc*/
+  0,                                  /*tp_traverse*/
+  0,                                  /*tp_clear*/
+  0,                                  /*tp_richcompare*/
+  0,                                  /*tp_weaklistoffset*/
+  PyObject_SelfIter,                  /*tp_iter*/
+  (iternextfunc)DmapReader_iternext,  /*tp_iternext*/
+  DmapReader_methods,                 /*tp_methods*/
+  DmapReader_members,                 /*tp_members*/
+  DmapReader_getset,                  /*tp_getset*/
+  0,                                  /*tp_base*/
+  0,                                  /*tp_dict*/
+  0,                                  /*tp_descr_get*/
+  0,                                  /*tp_descr_set*/
+  0,                                  /*tp_dictoffset*/
+  (initproc)DmapReader_init,          /*tp_init*/
+  0,                                  /*tp_alloc*/
+  0,                                  /*tp_new*/
+};
 
 static PyMethodDef dmapioMethods[] = 
 {
-  {"readDmapRec",  read_dmap_rec, METH_VARARGS, "read a dmap record"},
+  {"readDmapRec",  (PyCFunction)read_dmap_rec, METH_VARARGS | METH_KEYWORDS, 
+    "read a dmap record\nformat: rec = readDmapRec(fd, numpy=False, fields=None, sTime=None, eTime=None, stid=None, channel=None, bmnum=None, cp=None, tfreq=None)\nnumpy=True returns array fields as typed numpy arrays\nfields is a set of the array names to return, None returns all of them.  scalars are always returned\nthe other keywords skip records which do not match, looking at their scalars only.  times are epoch seconds, channel is the dmap channel number and tfreq is a (low,high) band.  returns None at the end of the file or once a record is later than eTime"},
+  {"decodeDmapRec",  (PyCFunction)decode_dmap_rec, METH_VARARGS | METH_KEYWORDS, 
+    "decode a dmap record held in a string\nformat: rec = decodeDmapRec(buf, numpy=False, fields=None, sTime=None, ...)\ntakes the same keywords as readDmapRec, returns False if the record does not match them"},
+  {"readDmapBlock",  (PyCFunction)read_dmap_block, METH_VARARGS | METH_KEYWORDS, 
+    "read a run of dmap records into columns\nformat: block = readDmapBlock(fd, nrec=-1, fields=None, sTime=None, eTime=None, stid=None, channel=None, bmnum=None, cp=None, tfreq=None)\nreads nrec matching records, or all of them if nrec < 0, taking the same filters as readDmapRec\nreturns a dict with nrec, scalars (name -> 1-D numpy array, or list for strings, plus the record time) and arrays (name -> (values, offsets) with the flattened values of record i in values[offsets[i]:offsets[i+1]]).  returns None if no records were read"},
+  {"decodeDmapBlock",  (PyCFunction)decode_dmap_block, METH_VARARGS | METH_KEYWORDS, 
+    "decode a list of encoded dmap records into columns\nformat: block = decodeDmapBlock(recs, fields=None, sTime=None, ...)\ntakes the same keywords as readDmapBlock and returns the same kind of block"},
+  {"encodeDmapRec",  (PyCFunction)encode_dmap_rec, METH_VARARGS | METH_KEYWORDS,
+    "encode a record dict as a dmap record\nformat: buf = encodeDmapRec(rec, types=None)\ntypes maps field names to dmap type codes, other fields keep their numpy type, python ints are written as int, floats as double and strings as string.  sequences are written as arrays, numpy arrays keep their shape.  an epoch time float is written as the time.* fields, unless the record has those or start.* fields.  None values are left out"},
+  {"encodeDmapRecs",  (PyCFunction)encode_dmap_recs, METH_VARARGS | METH_KEYWORDS,
+    "encode a list of record dicts as one string of dmap records\nformat: buf = encodeDmapRecs(recs, types=None)\nthe records are encoded as encodeDmapRec does"},
+  {"encodeDmapBlock",  (PyCFunction)encode_dmap_block, METH_VARARGS | METH_KEYWORDS,
+    "encode a columnar block as one string of dmap records\nformat: buf = encodeDmapBlock(block, types=None)\nblock is a dict as returned by readDmapBlock, the time column is written as the time.* fields.  columns are converted to their dmap types once and the records point into them"},
   {"getDmapOffset",  get_dmap_offset, METH_VARARGS, "get current dmap file offset"},
   {"setDmapOffset",  set_dmap_offset, METH_VARARGS, "set dmap file offset"},
   {"writeFitRec",  write_fit_rec, METH_VARARGS, "write a fitacf record"},
+  {"readDmapIndex",  read_dmap_index, METH_VARARGS, 
+    "index a dmap file from its scalar blocks only\nformat: index = readDmapIndex(fd)\nreturns a dict of numpy arrays: offset, time, stid, bmnum, channel, cp, scan, tfreq"},
   {NULL, NULL, 0, NULL}        /* Sentinel */
 };
 
 PyMODINIT_FUNC
 initdmapio(void)
 {
-  (void) Py_InitModule("dmapio", dmapioMethods);
+  PyObject *m;
+  m = Py_InitModule("dmapio", dmapioMethods);
+  if(m == NULL)
+    return;
+  import_array();
+  DmapReaderType.tp_new = DmapReader_new;
+  if(PyType_Ready(&DmapReaderType) < 0)
+    return;
+  Py_INCREF(&DmapReaderType);
+  PyModule_AddObject(m, "DmapReader", (PyObject *)&DmapReaderType);
 }
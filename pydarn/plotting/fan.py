@@ -36,6 +36,7 @@ import matplotlib.patches as patches
 from matplotlib.collections import PolyCollection,LineCollection
 from mpl_toolkits.basemap import Basemap, pyproj
 from utils.timeUtils import *
+from utils import instrument
 from pydarn.sdio.radDataRead import *
 from matplotlib.figure import Figure
 import matplotlib.cm as cm
@@ -45,7 +46,7 @@ def plotFan(sTime,rad,interval=60,fileType='fitex',param='velocity',filtered=Fal
     scale=[],channel='a',coords='geo',colors='lasse',gsct=False,fov=True,edgeColors='face',lowGray=False,fill=True,\
     velscl=1000.,legend=True,overlayPoes=False,poesparam='ted',poesMin=-3.,poesMax=0.5, \
     poesLabel=r"Total Log Energy Flux [ergs cm$^{-2}$ s$^{-1}$]",overlayBnd=False, \
-    show=True,png=False,pdf=False,dpi=500,tFreqBands=[]):
+    show=True,png=False,pdf=False,dpi=500,tFreqBands=[],approx=False):
 
   """A function to make a fan plot
   
@@ -78,6 +79,7 @@ def plotFan(sTime,rad,interval=60,fileType='fitex',param='velocity',filtered=Fal
     * **[png]** (boolean): a flag indicating whether to output to a png file.  default = False
     * **[dpi]** (int): dots per inch if saving as png.  default = 300
     * **[tFreqBands]** (list): upper and lower bounds of frequency in kHz to be used.  Must be unset (or set to []) or have a pair for each radar, and for any band set to [] the default will be used.  default = [[8000,20000]], [[8000,20000],[8000,20000]], etc.
+    * **[approx]** (boolean): with coords='mag', a flag indicating whether the map, fields of view and poes data may be converted with the approximate aacgm lookup grid, see :mod:`models.aacgm.aacgmGrid`.  default = False
   **Returns**:
     * Nothing
 
@@ -95,8 +97,8 @@ def plotFan(sTime,rad,interval=60,fileType='fitex',param='velocity',filtered=Fal
   
   import datetime as dt, gme, pickle
   from matplotlib.backends.backend_pdf import PdfPages
-  import models.aacgm as aacgm, os, copy
-  tt = dt.datetime.now()
+  import models.aacgm as aacgm, os, copy, time
+  tt = time.time()
   
   #check the inputs
   assert(isinstance(sTime,dt.datetime)),'error, sTime must be a datetime object'
@@ -137,7 +139,8 @@ def plotFan(sTime,rad,interval=60,fileType='fitex',param='velocity',filtered=Fal
   myFiles = []
   myBands = []
   for i in range(len(rad)):
-    f = radDataOpen(sTime,rad[i],sTime+datetime.timedelta(seconds=interval),fileType=fileType,filtered=filtered,channel=channel)
+    #decode ahead in the background while the beams are drawn
+    f = radDataOpen(sTime,rad[i],sTime+datetime.timedelta(seconds=interval),fileType=fileType,filtered=filtered,channel=channel,prefetch=16)
     if(f != None): 
       myFiles.append(f)
       myBands.append(tbands[i])
@@ -180,8 +183,8 @@ def plotFan(sTime,rad,interval=60,fileType='fitex',param='velocity',filtered=Fal
       lonFull.append(x[1])
       latC.append(x[0])
       lonC.append(x[1])
-    myFov = pydarn.radar.radFov.fov(site=site,rsep=allBeams[i].prm.rsep,\
-            ngates=allBeams[i].prm.nrang+1,nbeams=site.maxbeam,coords=coords)
+    myFov = pydarn.radar.radFov.getFov(site=site,rsep=allBeams[i].prm.rsep,\
+            ngates=allBeams[i].prm.nrang+1,nbeams=site.maxbeam,coords=coords,approx=approx)
     fovs.append(myFov)
     for b in range(0,site.maxbeam+1):
       for k in range(0,allBeams[i].prm.nrang+1):
@@ -213,11 +216,12 @@ def plotFan(sTime,rad,interval=60,fileType='fitex',param='velocity',filtered=Fal
 
   #Now do some stuff in map projection coords to get necessary width and height of map
   #and also figure out the corners of the map
-  t1=dt.datetime.now()
+  instrument.addTime('plot.fan.read',time.time()-tt)
+  t1 = time.time()
   lonFull,latFull = (numpy.array(lonFull)+360.)%360.0,numpy.array(latFull)
 
   tmpmap = utils.mapObj(coords=coords,projection='stere', width=10.0**3, 
-                        height=10.0**3, lat_0=lat_0, lon_0=lon_0)
+                        height=10.0**3, lat_0=lat_0, lon_0=lon_0, approx=approx)
   x,y = tmpmap(lonFull,latFull)
   minx = x.min()*1.05     #since we don't want the map to cut off labels or
   miny = y.min()*1.05     #FOVs of the radars we should alter the extrema a bit.
@@ -236,7 +240,7 @@ def plotFan(sTime,rad,interval=60,fileType='fitex',param='velocity',filtered=Fal
   #draw the actual map we want
   myMap = utils.mapObj(coords=coords, projection='stere', lat_0=lat_0, lon_0=lon_0,
                        llcrnrlon=llcrnrlon, llcrnrlat=llcrnrlat, urcrnrlon=urcrnrlon,
-                       urcrnrlat=urcrnrlat)
+                       urcrnrlat=urcrnrlat, approx=approx)
   myMap.drawparallels(numpy.arange(-80.,81.,10.),labels=[1,0,0,0])
   myMap.drawmeridians(numpy.arange(-180.,181.,20.),labels=[0,0,0,1])
   #if(coords == 'geo'):
@@ -250,7 +254,7 @@ def plotFan(sTime,rad,interval=60,fileType='fitex',param='velocity',filtered=Fal
       #this was missing fovObj! We need to plot the fov for this particular sTime.
       pydarn.plotting.overlayFov(myMap, codes=r, dateTime=sTime, fovObj=fovs[i]) 
   
-  print dt.datetime.now()-t1
+  instrument.addTime('plot.fan.map',time.time()-t1)
   #manually draw the legend
   if((not fill) and legend):
     #draw the box
@@ -278,7 +282,7 @@ def plotFan(sTime,rad,interval=60,fileType='fitex',param='velocity',filtered=Fal
   bbox = myFig.gca().get_axes().get_position()
   #now, loop through desired time interval
 
-  tz = dt.datetime.now()
+  tz = time.time()
   cols = []
   bndTime = sTime + datetime.timedelta(seconds=interval)
   
@@ -299,7 +303,7 @@ def plotFan(sTime,rad,interval=60,fileType='fitex',param='velocity',filtered=Fal
       allBeams[i] = radDataReadRec(myFiles[i])
     #if there is no data in scans, overlayFan will object
     if scans == []: continue
-    intensities, pcoll = overlayFan(scans,myMap,myFig,param,coords,gsct=gsct,site=sites[i],fov=fovs[i], fill=fill,velscl=velscl,dist=dist,cmap=cmap,norm=norm)
+    intensities, pcoll = overlayFan(scans,myMap,myFig,param,coords,gsct=gsct,site=sites[i],fov=fovs[i], fill=fill,velscl=velscl,dist=dist,cmap=cmap,norm=norm,approx=approx)
 
                                       
   #if no data has been found pcoll will not have been set, and the following code will object                                   
@@ -348,7 +352,7 @@ def plotFan(sTime,rad,interval=60,fileType='fitex',param='velocity',filtered=Fal
         ' MHz',ha='right',size=8,weight=550)
   
   if(overlayPoes):
-    pcols = gme.sat.poes.overlayPoesTed(myMap, myFig.gca(), cTime, param=poesparam, scMin=poesMin, scMax=poesMax)
+    pcols = gme.sat.poes.overlayPoesTed(myMap, myFig.gca(), cTime, param=poesparam, scMin=poesMin, scMax=poesMax, approx=approx)
     if(pcols != None):
       cols.append(pcols)
       pTicks = numpy.linspace(poesMin,poesMax,8)
@@ -361,7 +365,7 @@ def plotFan(sTime,rad,interval=60,fileType='fitex',param='velocity',filtered=Fal
         ti.set_fontsize(12)
       
   if(overlayBnd):
-    gme.sat.poes.overlayPoesBnd(myMap, myFig.gca(), cTime)
+    gme.sat.poes.overlayPoesBnd(myMap, myFig.gca(), cTime, approx=approx)
 
   #handle the outputs
   if png == True:
@@ -374,10 +378,12 @@ def plotFan(sTime,rad,interval=60,fileType='fitex',param='velocity',filtered=Fal
     myFig.savefig(sTime.strftime("%Y%m%d.%H%M.")+str(interval)+'.fan.pdf')
   if show:
     myFig.show()
+  instrument.addTime('plot.fan.render',time.time()-tz)
 
+@instrument.timed('plot.fan.overlayFan')
 def overlayFan(myData,myMap,myFig,param,coords='geo',gsct=0,site=None,\
                 fov=None,gs_flg=[],fill=True,velscl=1000.,dist=1000.,
-                cmap=None,norm=None,alpha=1):
+                cmap=None,norm=None,alpha=1,approx=False):
 
   """A function of overlay radar scan data on a map
 
@@ -395,6 +401,7 @@ def overlayFan(myData,myMap,myFig,param,coords='geo',gsct=0,site=None,\
     * **[velscl]**: the velocity to use as baseline for velocity vector length, only applicable if fill = 0.  default = 1000
     * **[lines]**: an array to have the endpoints of velocity vectors.  only applicable if fill = 0.  default = []
     * **[dist]**: the length in map projection coords of a velscl length velocity vector.  default = 1000. km
+    * **[approx]**: with coords='mag', a flag indicating whether the fov made here may use the approximate aacgm lookup grid.  default = False
   **OUTPUTS**:
     NONE
 
@@ -410,8 +417,8 @@ def overlayFan(myData,myMap,myFig,param,coords='geo',gsct=0,site=None,\
   if(site == None):
     site = pydarn.radar.site(radId=myData[0].stid, dt=myData[0].time)
   if(fov == None):
-    fov = pydarn.radar.radFov.fov(site=site,rsep=myData[0].prm.rsep,\
-    ngates=myData[0].prm.nrang+1,nbeams= site.maxbeam,coords=coords) 
+    fov = pydarn.radar.radFov.getFov(site=site,rsep=myData[0].prm.rsep,\
+    ngates=myData[0].prm.nrang+1,nbeams= site.maxbeam,coords=coords,approx=approx) 
   
   if(isinstance(myData,pydarn.sdio.beamData)): myData = [myData]
   
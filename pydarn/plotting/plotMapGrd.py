@@ -11,6 +11,7 @@
 convection contours, fitted velocity vectors, model vectors and Heppnard-Maynard Boundary.
 
 """
+from utils import instrument
 
 class MapConv(object):
     """Plot/retrieve data from mapex and grdex files
@@ -48,6 +49,7 @@ class MapConv(object):
     """
     import matplotlib.cm as cm
 
+    @instrument.timed('plot.mapConv.read')
     def __init__(self, startTime, mObj, 
         axisHandle, hemi = 'north', 
         maxVelScale = 1000., plotCoords = 'mag'):
@@ -89,6 +91,7 @@ class MapConv(object):
         mapPtr = sdDataOpen(startTime, hemi, eTime=endTime, fileType='mapex')
         self.mapData = sdDataReadRec(mapPtr)
 
+    @instrument.timed('plot.mapConv.overlayGridVel')
     def overlayGridVel(self, pltColBar=True, 
         overlayRadNames=True, annotateTime=True, 
         colorBarLabelSize = 15., colMap = cm.jet):
@@ -164,6 +167,7 @@ class MapConv(object):
                 bbox=dict(boxstyle='round,pad=0.2', 
                 fc="w", alpha=0.3) )
 
+    @instrument.timed('plot.mapConv.calcFitCnvVel')
     def calcFitCnvVel(self):
         """Calculate fitted convection velocity magnitude and azimuth from mapex data (basically coefficients of the fit)
         
@@ -347,6 +351,7 @@ class MapConv(object):
                         
         return mlatsPlot, mlonsPlot, velMagn, velAzm
 
+    @instrument.timed('plot.mapConv.calcCnvPots')
     def calcCnvPots(self):
         """Calculate equipotential contour values from mapex data (basically coefficients of the fit)
         
@@ -491,6 +496,7 @@ class MapConv(object):
         
         return latCntr, lonCntr, potArr
 
+    @instrument.timed('plot.mapConv.overlayCnvCntrs')
     def overlayCnvCntrs(self):
         """Overlay convection contours from mapex data
         
@@ -519,6 +525,7 @@ class MapConv(object):
             locator=LinearLocator(12) )
         plt.clabel(cntrPlt, inline=1, fontsize=10)
 
+    @instrument.timed('plot.mapConv.overlayHMB')
     def overlayHMB(self, hmbCol='Gray'):
         """Overlay Heppnard-Maynard boundary from mapex data
         
@@ -538,6 +545,7 @@ class MapConv(object):
         grdPltHMB2 = self.mObj.plot( xVecHMB, yVecHMB, 
             linewidth = 2., linestyle = '--', color = hmbCol, zorder = 4. )
 
+    @instrument.timed('plot.mapConv.overlayMapModelVel')
     def overlayMapModelVel(self, pltColBar=False, 
         annotateTime=True, colorBarLabelSize=15., 
         colMap=cm.jet):
@@ -607,6 +615,7 @@ class MapConv(object):
                 ha="center", xycoords="axes fraction",
                 bbox=dict(boxstyle='round,pad=0.2', fc="w", alpha=0.3) )
 
+    @instrument.timed('plot.mapConv.overlayMapFitVel')
     def overlayMapFitVel(self, pltColBar=True, 
         overlayRadNames=True, annotateTime=True, 
         colorBarLabelSize=15., colMap=cm.jet):
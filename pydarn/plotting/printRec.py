@@ -138,7 +138,7 @@ def fitPrintRec(sTime, eTime, rad, outfile, fileType='fitex', summ=0):
     Written by AJ 20130327
   """
 
-  import pydarn, utils, models
+  import pydarn, utils, models, numpy
   
   myPtr = pydarn.sdio.radDataOpen(sTime,rad,eTime=eTime,fileType=fileType)
   if(myPtr == None): return None
@@ -149,7 +149,7 @@ def fitPrintRec(sTime, eTime, rad, outfile, fileType='fitex', summ=0):
   
   radar = pydarn.radar.network().getRadarByCode(rad)
   site = radar.getSiteByDate(myData.time)
-  myFov = pydarn.radar.radFov.fov(site=site,rsep=myData.prm.rsep,ngates=myData.prm.nrang, model=None, altitude=300.)
+  myFov = pydarn.radar.radFov.getFov(site=site,rsep=myData.prm.rsep,ngates=myData.prm.nrang, model=None, altitude=300.)
   
   
   f = open(outfile, 'w')
@@ -185,25 +185,17 @@ def fitPrintRec(sTime, eTime, rad, outfile, fileType='fitex', summ=0):
       ('gate','pwr_0','pwr_l','vel','gsf','vel_err','width_l','geo_lat','geo_lon','geo_azm',
         'mag_lat','mag_lon','mag_azm','range'))
       
-      for i in range(len(myData.fit.slist)):
-
-        d = utils.geoPack.calcDistPnt(myFov.latFull[myData.bmnum][myData.fit.slist[i]],
-                                      myFov.lonFull[myData.bmnum][myData.fit.slist[i]], 300,
-                                      distLat=myFov.latFull[myData.bmnum][myData.fit.slist[i]+1], \
-                                      distLon=myFov.lonFull[myData.bmnum][myData.fit.slist[i]+1 ],distAlt=300)
-
-        gazm = d['az']
-
-        mlat,mlon,a = models.aacgm.aacgmConv(myFov.latFull[myData.bmnum][myData.fit.slist[i]],
-                                                myFov.lonFull[myData.bmnum][myData.fit.slist[i]],300,0)
+      #the geographic and magnetic azimuths along the beam, for all the gates at once
+      slist = numpy.array(myData.fit.slist,dtype=int)
+      bmLat,bmLon = myFov.latFull[myData.bmnum],myFov.lonFull[myData.bmnum]
+      gazms = utils.geoPack.calcDistPnt(bmLat[slist],bmLon[slist],300,distLat=bmLat[slist+1], \
+                                        distLon=bmLon[slist+1],distAlt=300)['az']
+      mlats,mlons,a = models.aacgm.aacgmConvArray(bmLat[numpy.array([slist,slist+1])],bmLon[numpy.array([slist,slist+1])],300.,0)
+      mazms = utils.geoPack.calcDistPnt(mlats[0],mlons[0],300,distLat=mlats[1],distLon=mlons[1],distAlt=300)['az']
 
-        mlat2,mlon2,b = models.aacgm.aacgmConv(myFov.latFull[myData.bmnum][myData.fit.slist[i]+1],
-                                                myFov.lonFull[myData.bmnum][myData.fit.slist[i]+1],300,0)
-
-
-        d = utils.geoPack.calcDistPnt(mlat,mlon,300,distLat=mlat2,distLon=mlon2,distAlt=300)
+      for i in range(len(myData.fit.slist)):
 
-        mazm = d['az']
+        gazm,mlat,mlon,mazm = gazms[i],mlats[0][i],mlons[0][i],mazms[i]
 
         f.write('{0:4d} {13:5d} {1:>5.1f} / {2:<5.1f} {3:>8.1f} {4:>3d} {5:>8.1f} {6:>8.1f} {7:>8.2f} {8:>8.2f} {9:>8.2f} {10:>8.2f} {11:>8.2f} {12:>8.2f}\n'.format \
                   (myData.fit.slist[i],myData.fit.pwr0[i],myData.fit.p_l[i],\
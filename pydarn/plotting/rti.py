@@ -94,10 +94,11 @@ def plotRti(sTime,rad,eTime=None,bmnum=7,fileType='fitex',params=['velocity','po
   Modified by Matt W. 20130715
   Modified by Nathaniel F. 20131031 (added plotTerminator)
   """
-  import os
+  import os, time
+  from utils import instrument
     
     
-  t1 = datetime.datetime.now()
+  t1 = time.time()
   #check the inputs
   assert(isinstance(sTime,datetime.datetime)),'error, sTime must be a datetime object'
   assert(isinstance(rad,str) and len(rad) == 3),'error, rad must be a string 3 chars long'
@@ -144,7 +145,11 @@ def plotRti(sTime,rad,eTime=None,bmnum=7,fileType='fitex',params=['velocity','po
   #open the file if a pointer was not given to us
   #if fileName is specified then it will be read
   if not myFile:
-    myFile = radDataOpen(sTime,rad,eTime,channel=channel,bmnum=bmnum,fileType=fileType,filtered=filtered,fileName=fileName)
+    #only decode the arrays we are going to plot, and decode them
+    #ahead in the background while the previous beams are sorted
+    fitFields = {'velocity':'v','power':'p_l','width':'w_l','elevation':'elv','phi0':'phi0'}
+    fields = set(['slist','gflg']+[fitFields[p] for p in params])
+    myFile = radDataOpen(sTime,rad,eTime,channel=channel,bmnum=bmnum,fileType=fileType,filtered=filtered,fileName=fileName,useNumpy=True,fields=fields,prefetch=16)
   else:
     #make sure that we will only plot data for the time range specified by sTime and eTime
     if myFile.sTime <= sTime and myFile.eTime > sTime and myFile.eTime >= eTime:
@@ -215,8 +220,10 @@ def plotRti(sTime,rad,eTime=None,bmnum=7,fileType='fitex',params=['velocity','po
           gsflg[i].append(myBeam.fit.gflg)
       
     myBeam = radDataReadRec(myFile)
+  instrument.addTime('plot.rti.read',time.time()-t1)
 
   for fplot in range(len(tbands)):
+    t1 = time.time()
     #Check to ensure that data exists for the requested frequency band else
     #continue on to the next range of frequencies
     if not freq[fplot]:
@@ -278,18 +285,21 @@ def plotRti(sTime,rad,eTime=None,bmnum=7,fileType='fitex',params=['velocity','po
             dt_list.append(matplotlib.dates.num2date(x[tcnt]))
         tcnt += 1
             
-        if(pArr[i] == []): continue
+        if(pArr[i] is None or len(pArr[i]) == 0): continue
         
-        if slist[fplot][i] != None:
-          for j in range(len(slist[fplot][i])):
-            if(not gsct or gsflg[fplot][i][j] == 0):
-              data[tcnt][slist[fplot][i][j]] = pArr[i][j]
-            elif gsct and gsflg[fplot][i][j] == 1:
-              data[tcnt][slist[fplot][i][j]] = -100000.
+        if slist[fplot][i] is not None:
+          gates = numpy.asarray(slist[fplot][i],dtype=int)
+          vals = numpy.asarray(pArr[i])
+          if(not gsct):
+            data[tcnt][gates] = vals
+          else:
+            flg = numpy.asarray(gsflg[fplot][i])
+            data[tcnt][gates[flg == 0]] = vals[flg == 0]
+            data[tcnt][gates[flg == 1]] = -100000.
   
       if (coords != 'gate' and coords != 'rng') or plotTerminator == True:
         site    = pydarn.radar.network().getRadarByCode(rad).getSiteByDate(times[fplot][0])
-        myFov   = pydarn.radar.radFov.fov(site=site,ngates=rmax,nbeams=site.maxbeam,rsep=rsep[fplot][0],coords=coords)
+        myFov   = pydarn.radar.radFov.getFov(site=site,ngates=rmax,nbeams=site.maxbeam,rsep=rsep[fplot][0],coords=coords)
         myLat   = myFov.latCenter[bmnum]
         myLon   = myFov.lonCenter[bmnum]
           
@@ -382,7 +392,7 @@ def plotRti(sTime,rad,eTime=None,bmnum=7,fileType='fitex',params=['velocity','po
     if show:
       rtiFig.show()
       
-    print 'plotting took:',datetime.datetime.now()-t1
+    instrument.addTime('plot.rti.render',time.time()-t1)
     #end of plotting for loop
     
   if retfig:
@@ -440,7 +450,7 @@ def drawAxes(myFig,times,rad,cpid,bmnum,nrang,frang,rsep,bottom,yrng=-1,coords='
         oldCpid = cpid[i]
         if(coords == 'geo' or coords == 'mag'):
           site = pydarn.radar.network().getRadarByCode(rad).getSiteByDate(times[i])
-          myFov = pydarn.radar.radFov.fov(site=site, ngates=nrang[i],nbeams=site.maxbeam,rsep=rsep[i],coords=coords)
+          myFov = pydarn.radar.radFov.getFov(site=site, ngates=nrang[i],nbeams=site.maxbeam,rsep=rsep[i],coords=coords)
           if(myFov.latFull[bmnum].max() > ymax): ymax = myFov.latFull[bmnum].max()
           if(myFov.latFull[bmnum].min() < ymin): ymin = myFov.latFull[bmnum].min()
         else:
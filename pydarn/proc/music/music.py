@@ -71,6 +71,7 @@ import time
 import copy
 
 import pydarn
+from utils import instrument
 
 Re = 6378   #Earth radius
 
@@ -434,7 +435,7 @@ class musicArray(object):
                         1: ground backscatter only
                         2: ionospheric backscatter only
                         3: all backscatter data with a ground backscatter flag.
-        * [**fovElevation**] (float or None): Passed directly to pydarn.radar.radFov.fov()
+        * [**fovElevation**] (float or None): Passed directly to pydarn.radar.radFov.getFov()
         * [**fovModel**] (str): Scatter mapping model.
                         'GS': Ground Scatter Mapping Model.  See Bristow et al. [1994]
                         'IS': Standard SuperDARN scatter mapping model.
@@ -504,73 +505,84 @@ class musicArray(object):
         prm.mpinc       = []
         prm.nrang       = []
 
-        while beamTime < eTime:
-            #Load one scan into memory.
-            myScan = pydarn.sdio.radDataRead.radDataReadScan(myPtr)
-            if myScan == None: break
-
-            for myBeam in myScan:
-                #Calculate the field of view if it has not yet been calculated.
-                if fov == None:
-                    radStruct = pydarn.radar.radStruct.radar(radId=myPtr.stid)
-                    site      = pydarn.radar.radStruct.site(radId=myPtr.stid,dt=sTime)
-                    fov       = pydarn.radar.radFov.fov(frang=myBeam.prm.frang, rsep=myBeam.prm.rsep, site=site,elevation=fovElevation,model=fovModel,coords=fovCoords)
-
-                #Get information from each beam in the scan.
-                beamTime = myBeam.time 
-                bmnum    = myBeam.bmnum
-
-                # Save all of the radar operational parameters.
-                prm.time.append(beamTime)
-                prm.mplgs.append(myBeam.prm.mplgs)
-                prm.nave.append(myBeam.prm.nave)
-                prm.noisesearch.append(myBeam.prm.noisesearch)
-                prm.scan.append(myBeam.prm.scan)
-                prm.smsep.append(myBeam.prm.smsep)
-                prm.mplgexs.append(myBeam.prm.mplgexs)
-                prm.xcf.append(myBeam.prm.xcf)
-                prm.noisesky.append(myBeam.prm.noisesky)
-                prm.rsep.append(myBeam.prm.rsep)
-                prm.mppul.append(myBeam.prm.mppul)
-                prm.inttsc.append(myBeam.prm.inttsc)
-                prm.frang.append(myBeam.prm.frang)
-                prm.bmazm.append(myBeam.prm.bmazm)
-                prm.lagfr.append(myBeam.prm.lagfr)
-                prm.ifmode.append(myBeam.prm.ifmode)
-                prm.noisemean.append(myBeam.prm.noisemean)
-                prm.tfreq.append(myBeam.prm.tfreq)
-                prm.inttus.append(myBeam.prm.inttus)
-                prm.rxrise.append(myBeam.prm.rxrise)
-                prm.mpinc.append(myBeam.prm.mpinc)
-                prm.nrang.append(myBeam.prm.nrang)
-
-                #Get the fitData.
-                fitDataList = getattr(myBeam.fit,param)
-                slist       = getattr(myBeam.fit,'slist')
-                gflag       = getattr(myBeam.fit,'gflg')
-
-                if len(slist) > 1:
-                    for (gate,data,flag) in zip(slist,fitDataList,gflag):
+        #Only decode the fit arrays we need, decoding the next beams in the background
+        #while this scan is gridded, then put the pointer back how we found it.
+        origFields  = myPtr.fields
+        myPtr.fields = frozenset([param,'slist','gflg'])
+        origPrefetch = myPtr.prefetch
+        if origPrefetch == 0: myPtr.setPrefetch(32)
+
+        try:
+            while beamTime < eTime:
+                #Load one scan into memory.
+                myScan = pydarn.sdio.radDataRead.radDataReadScan(myPtr)
+                if myScan == None: break
+
+                for myBeam in myScan:
+                    #Calculate the field of view if it has not yet been calculated.
+                    if fov == None:
+                        radStruct = pydarn.radar.radStruct.radar(radId=myPtr.stid)
+                        site      = pydarn.radar.radStruct.site(radId=myPtr.stid,dt=sTime)
+                        fov       = pydarn.radar.radFov.getFov(frang=myBeam.prm.frang, rsep=myBeam.prm.rsep, site=site,elevation=fovElevation,model=fovModel,coords=fovCoords)
+
+                    #Get information from each beam in the scan.
+                    beamTime = myBeam.time 
+                    bmnum    = myBeam.bmnum
+
+                    # Save all of the radar operational parameters.
+                    prm.time.append(beamTime)
+                    prm.mplgs.append(myBeam.prm.mplgs)
+                    prm.nave.append(myBeam.prm.nave)
+                    prm.noisesearch.append(myBeam.prm.noisesearch)
+                    prm.scan.append(myBeam.prm.scan)
+                    prm.smsep.append(myBeam.prm.smsep)
+                    prm.mplgexs.append(myBeam.prm.mplgexs)
+                    prm.xcf.append(myBeam.prm.xcf)
+                    prm.noisesky.append(myBeam.prm.noisesky)
+                    prm.rsep.append(myBeam.prm.rsep)
+                    prm.mppul.append(myBeam.prm.mppul)
+                    prm.inttsc.append(myBeam.prm.inttsc)
+                    prm.frang.append(myBeam.prm.frang)
+                    prm.bmazm.append(myBeam.prm.bmazm)
+                    prm.lagfr.append(myBeam.prm.lagfr)
+                    prm.ifmode.append(myBeam.prm.ifmode)
+                    prm.noisemean.append(myBeam.prm.noisemean)
+                    prm.tfreq.append(myBeam.prm.tfreq)
+                    prm.inttus.append(myBeam.prm.inttus)
+                    prm.rxrise.append(myBeam.prm.rxrise)
+                    prm.mpinc.append(myBeam.prm.mpinc)
+                    prm.nrang.append(myBeam.prm.nrang)
+
+                    #Get the fitData.
+                    fitDataList = getattr(myBeam.fit,param)
+                    slist       = getattr(myBeam.fit,'slist')
+                    gflag       = getattr(myBeam.fit,'gflg')
+
+                    if len(slist) > 1:
+                        for (gate,data,flag) in zip(slist,fitDataList,gflag):
+                            #Get information from each gate in scan.  Skip record if the chosen ground scatter option is not met.
+                            if (gscat == 1) and (flag == 0): continue
+                            if (gscat == 2) and (flag == 1): continue
+                            tmp = (scanNr,beamTime,bmnum,gate,data)
+                            dataList.append(tmp)
+                    elif len(slist) == 1:
+                        gate,data,flag = (slist[0],fitDataList[0],gflag[0])
                         #Get information from each gate in scan.  Skip record if the chosen ground scatter option is not met.
                         if (gscat == 1) and (flag == 0): continue
                         if (gscat == 2) and (flag == 1): continue
                         tmp = (scanNr,beamTime,bmnum,gate,data)
                         dataList.append(tmp)
-                elif len(slist) == 1:
-                    gate,data,flag = (slist[0],fitDataList[0],gflag[0])
-                    #Get information from each gate in scan.  Skip record if the chosen ground scatter option is not met.
-                    if (gscat == 1) and (flag == 0): continue
-                    if (gscat == 2) and (flag == 1): continue
-                    tmp = (scanNr,beamTime,bmnum,gate,data)
-                    dataList.append(tmp)
-                else:
-                    continue
-
-            #Determine the start time for each scan and save to list.
-            scanTimeList.append(min([x.time for x in myScan]))
-
-            #Advance to the next scan number.
-            scanNr = scanNr + 1
+                    else:
+                        continue
+
+                #Determine the start time for each scan and save to list.
+                scanTimeList.append(min([x.time for x in myScan]))
+
+                #Advance to the next scan number.
+                scanNr = scanNr + 1
+        finally:
+            myPtr.fields = origFields
+            myPtr.setPrefetch(origPrefetch)
 
         #Convert lists to numpy arrays.
         timeArray       = np.array(scanTimeList)
@@ -888,13 +900,10 @@ def determineRelativePosition(dataObj,dataSet='active',altitude=250.):
 
     currentData.fov.relative_centerInx = [ctrBeamInx, ctrGateInx]
 
-    #Set arrays of lat1/lon1 to the center cell value.  Use this to calculate all other positions
-    #with numpy array math.
-    lat1 = np.zeros_like(currentData.fov.latCenter)   
-    lon1 = np.zeros_like(currentData.fov.latCenter)   
-
-    lat1[:] = currentData.fov.latCenter[ctrBeamInx,ctrGateInx]
-    lon1[:] = currentData.fov.lonCenter[ctrBeamInx,ctrGateInx]
+    #lat1/lon1 is the center cell.  The great circle functions broadcast it against all the
+    #other positions, so no arrays of it need to be made.
+    lat1 = currentData.fov.latCenter[ctrBeamInx,ctrGateInx]
+    lon1 = currentData.fov.lonCenter[ctrBeamInx,ctrGateInx]
 
     #Make lat2/lon2 the center position array of the dataset.
     lat2    = currentData.fov.latCenter
@@ -1394,6 +1403,7 @@ def windowData(dataObj,dataSet='active',newDataSetName='windowed',comment=None,w
     newDataSet.data = newDataArr
     newDataSet.setActive()
 
+@instrument.timed('proc.music.calculateFFT')
 def calculateFFT(dataObj,dataSet='active',comment=None):
     """Calculate the spectrum of an object.
 
@@ -1419,6 +1429,7 @@ def calculateFFT(dataObj,dataSet='active',comment=None):
 
     #Use complex64, not complex128!  If you use complex128, too much numerical noise will accumulate and the final plot will be bad!
     newDataArr= np.zeros((nrTimes,nrBeams,nrGates),dtype=np.complex64)
+    instrument.peak('proc.music.spectrumBytes',newDataArr.nbytes)
     for bm in range(nrBeams):
         for rg in range(nrGates):
             newDataArr[:,bm,rg] = sp.fftpack.fftshift(sp.fftpack.fft(currentData.data[:,bm,rg])) / np.size(currentData.data[:,bm,rg])
@@ -1439,6 +1450,7 @@ def calculateFFT(dataObj,dataSet='active',comment=None):
     currentData.dominantFreq = posFreqVec[np.argmax(avg_psd)]
     currentData.appendHistory('Calculated FFT')
   
+@instrument.timed('proc.music.calculateDlm')
 def calculateDlm(dataObj,dataSet='active',comment=None):
     """Calculate the cross-spectral matrix of a musicaArray object. FFT must already have been calculated.
 
@@ -1456,6 +1468,7 @@ def calculateDlm(dataObj,dataSet='active',comment=None):
     nCells                    = nrBeams * nrGates
     currentData.llLookupTable = np.zeros([5,nCells])
     currentData.Dlm           = np.zeros([nCells,nCells],dtype=np.complex128)
+    instrument.peak('proc.music.DlmBytes',currentData.Dlm.nbytes)
 
     #Only use positive frequencies...
     posInx = np.where(currentData.freqVec > 0)[0]
@@ -1481,6 +1494,7 @@ def calculateDlm(dataObj,dataSet='active',comment=None):
 
     currentData.appendHistory('Calculated Cross-Spectral Matrix Dlm')
 
+@instrument.timed('proc.music.calculateKarr')
 def calculateKarr(dataObj,dataSet='active',kxMax=0.05,kyMax=0.05,dkx=0.001,dky=0.001,threshold=0.15):
     """Calculate the two-dimensional horizontal wavenumber array of a musicArray/musicDataObj object.
     Cross-spectrum array Dlm must already have been calculated.
@@ -1540,20 +1554,20 @@ def calculateKarr(dataObj,dataSet='active',kxMax=0.05,kyMax=0.05,dkx=0.001,dky=0
     print 'Number of Noise Evals: ' + str(cnt)
 
     print 'Starting kArr Calculation...'
-    t0 = datetime.datetime.now()
     def vCalc(um,v):
         return np.dot( np.conj(um), v) * np.dot( np.conj(v), um)
 
     vList = [eVecs[:,minEvalsInx[ee]] for ee in xrange(cnt)]
     kArr  = np.zeros((nkx,nky),dtype=np.complex64)
-    for kk_kx in xrange(nkx):
-        kx  = kxVec[kk_kx]
-        for kk_ky in xrange(nky):
-            ky  = kyVec[kk_ky]
-            um  = np.exp(1j*(kx*xm + ky*ym))
-            kArr[kk_kx,kk_ky]= 1. / np.sum(map(lambda v: vCalc(um,v), vList))
-    t1 = datetime.datetime.now()
-    print 'Finished kArr Calculation.  Total time: ' + str(t1-t0)
+    instrument.peak('proc.music.kArrBytes',kArr.nbytes)
+    with instrument.timer('proc.music.calculateKarr.kArr'):
+        for kk_kx in xrange(nkx):
+            kx  = kxVec[kk_kx]
+            for kk_ky in xrange(nky):
+                ky  = kyVec[kk_ky]
+                um  = np.exp(1j*(kx*xm + ky*ym))
+                kArr[kk_kx,kk_ky]= 1. / np.sum(map(lambda v: vCalc(um,v), vList))
+    print 'Finished kArr Calculation.'
 
     currentData.karr  = kArr
     currentData.kxVec = kxVec
@@ -10,6 +10,8 @@ This module handles generating field-of-view projctions
     * :class:`fov`: field of view position
 
 **Functions**:
+    * :func:`pydarn.radar.radFov.getFov`: Get a field of view from the cache, or calculate it
+    * :func:`pydarn.radar.radFov.clearFovCache`: Empty the field of view cache
     * :func:`pydarn.radar.radFov.slantRange`: Calculate slant range
     * :func:`pydarn.radar.radFov.calcAzOffBore`: Calculate off-array-normal azimuth
     * :func:`pydarn.radar.radFov.calcFieldPnt`: Calculate field point projection
@@ -17,6 +19,16 @@ This module handles generating field-of-view projctions
 Based on Mike Ruohoniemi's GEOPACK
 Based on R.J. Barnes radar.pro
 """
+from collections import OrderedDict
+
+# The number of fov objects kept in memory by getFov
+fovCacheSize = 64
+# The number of fov files kept on disk by getFov, in DAVIT_TMPDIR/fov/
+fovDiskSize = 512
+# fov attributes which are saved
+fovFields = ['latCenter', 'lonCenter', 'slantRCenter', 'latFull', 'lonFull', 'slantRFull', 'beams', 'gates']
+# key: fov, the most recently used last
+_fovCache = OrderedDict()
 
 # *************************************************************
 class fov(object):
@@ -47,6 +59,8 @@ class fov(object):
             * **None**: if you are really confident in your elevation or altitude values
             * ... more to come
         * **coords**: 'geo', 'mag'
+        * **approx**: with coords='mag', convert from a precomputed aacgm lookup grid, which is 
+          faster but approximate, see :mod:`models.aacgm.aacgmGrid` (defaults to False)
 
     """
     def __init__(self, \
@@ -54,9 +68,11 @@ class fov(object):
             nbeams=None, ngates=None, bmsep=None, recrise=None, \
             siteLat=None, siteLon=None, siteBore=None, siteAlt=None, \
             elevation=None, altitude=300., \
-            model='IS', coords='geo'):
+            model='IS', coords='geo', approx=False):
         # Get fov
-        from numpy import ndarray, array, arange, zeros, nan
+        from numpy import ndarray, array, arange, zeros, ones, nan, newaxis, resize, append
+        from utils import instrument
+        from time import time
         import models.aacgm as aacgm
         
         # Test that we have enough input arguments to work with
@@ -69,7 +85,7 @@ class fov(object):
             if not nbeams: nbeams = site.maxbeam
             if not ngates: ngates = site.maxgate
             if not bmsep: bmsep = site.bmsep
-            if not recrise: recrise = site.recrise
+            if recrise is None: recrise = site.recrise
             if not siteLat: siteLat = site.geolat
             if not siteLon: siteLon = site.geolon
             if not siteAlt: siteAlt = site.alt
@@ -77,143 +93,109 @@ class fov(object):
             
         # Some type checking. Look out for arrays
         # If frang, rsep or recrise are arrays, then they should be of shape (nbeams,)
-        # Set a flag if any of frang, rsep or recrise is an array
-        isParamArray = False
         if isinstance(frang, ndarray):
-            isParamArray = True
             if len(frang) != nbeams: 
                 print 'getFov: frang must be of a scalar or ndarray(nbeams). Using first element: {}'.format(frang[0])
                 frang = frang[0] * ones(nbeams+1)
             # Array is adjusted to add on extra beam edge by copying the last element
-            else: frang = np.append(frang, frang[-1])
+            else: frang = append(frang, frang[-1])
         else: frang = array([frang])
         if isinstance(rsep, ndarray):
-            isParamArray = True
             if len(rsep) != nbeams: 
                 print 'getFov: rsep must be of a scalar or ndarray(nbeams). Using first element: {}'.format(rsep[0])
                 rsep = rsep[0] * ones(nbeams+1)
             # Array is adjusted to add on extra beam edge by copying the last element
-            else: rsep = np.append(rsep, rsep[-1])
+            else: rsep = append(rsep, rsep[-1])
         else: rsep = array([rsep])
         if isinstance(recrise, ndarray):
-            isParamArray = True
             if len(recrise) != nbeams: 
                 print 'getFov: recrise must be of a scalar or ndarray(nbeams). Using first element: {}'.format(recrise[0])
                 recrise = recrise[0] * ones(nbeams+1)
             # Array is adjusted to add on extra beam edge by copying the last element
-            else: recrise = np.append(recrise, recrise[-1])
+            else: recrise = append(recrise, recrise[-1])
         else: recrise = array([recrise])
         
         # If altitude or elevation are arrays, then they should be of shape (nbeams,ngates)
         if isinstance(altitude, ndarray):
             if altitude.ndim == 1:
                 if altitude.size != ngates:
-                    print 'getFov: altitude must be of a scalar or ndarray(ngates) or ndarray(nbeans,ngates). Using first element: {}'.format(altitude[0])
-                    altitude = altitude[0] * ones((nbeams+1, ngates+1))
+                    print 'getFov: altitude must be of a scalar or ndarray(ngates) or ndarray(nbeans,ngates). Using first element: {}'.format(altitude.flat[0])
+                    altitude = altitude.flat[0] * ones((nbeams+1, ngates+1))
                 # Array is adjusted to add on extra beam/gate edge by copying the last element and replicating the whole array as many times as beams
-                else: altitude = np.resize( np.append(altitude, altitude[-1]), (nbeams+1,ngates+1) )
+                else: altitude = resize( append(altitude, altitude[-1]), (nbeams+1,ngates+1) )
             elif altitude.ndim == 2:
                 if altitude.shape != (nbeams, ngates):
-                    print 'getFov: altitude must be of a scalar or ndarray(ngates) or ndarray(nbeans,ngates). Using first element: {}'.format(altitude[0])
-                    altitude = altitude[0] * ones((nbeams+1, ngates+1))
+                    print 'getFov: altitude must be of a scalar or ndarray(ngates) or ndarray(nbeans,ngates). Using first element: {}'.format(altitude.flat[0])
+                    altitude = altitude.flat[0] * ones((nbeams+1, ngates+1))
                 # Array is adjusted to add on extra beam/gate edge by copying the last row and column
                 else: 
-                    altitude = np.append(altitude, altitude[-1,:].reshape(1,ngates), axis=0)
-                    altitude = np.append(altitude, altitude[:,-1].reshape(nbeams,1), axis=1)
+                    altitude = append(altitude, altitude[-1,:].reshape(1,ngates), axis=0)
+                    altitude = append(altitude, altitude[:,-1].reshape(nbeams+1,1), axis=1)
             else:
-                print 'getFov: altitude must be of a scalar or ndarray(ngates) or ndarray(nbeans,ngates). Using first element: {}'.format(altitude[0])
-                altitude = altitude[0] * ones((nbeams+1, ngates+1))
+                print 'getFov: altitude must be of a scalar or ndarray(ngates) or ndarray(nbeans,ngates). Using first element: {}'.format(altitude.flat[0])
+                altitude = altitude.flat[0] * ones((nbeams+1, ngates+1))
         if isinstance(elevation, ndarray):
             if elevation.ndim == 1:
                 if elevation.size != ngates:
-                    print 'getFov: elevation must be of a scalar or ndarray(ngates) or ndarray(nbeans,ngates). Using first element: {}'.format(elevation[0])
-                    elevation = elevation[0] * ones((nbeams+1, ngates+1))
+                    print 'getFov: elevation must be of a scalar or ndarray(ngates) or ndarray(nbeans,ngates). Using first element: {}'.format(elevation.flat[0])
+                    elevation = elevation.flat[0] * ones((nbeams+1, ngates+1))
                 # Array is adjusted to add on extra beam/gate edge by copying the last element and replicating the whole array as many times as beams
-                else: elevation = np.resize( np.append(elevation, elevation[-1]), (nbeams+1,ngates+1) )
+                else: elevation = resize( append(elevation, elevation[-1]), (nbeams+1,ngates+1) )
             elif elevation.ndim == 2:
                 if elevation.shape != (nbeams, ngates):
-                    print 'getFov: elevation must be of a scalar or ndarray(ngates) or ndarray(nbeans,ngates). Using first element: {}'.format(elevation[0])
-                    elevation = elevation[0] * ones((nbeams+1, ngates+1))
+                    print 'getFov: elevation must be of a scalar or ndarray(ngates) or ndarray(nbeans,ngates). Using first element: {}'.format(elevation.flat[0])
+                    elevation = elevation.flat[0] * ones((nbeams+1, ngates+1))
                 # Array is adjusted to add on extra beam/gate edge by copying the last row and column
                 else: 
-                    elevation = np.append(elevation, elevation[-1,:].reshape(1,ngates), axis=0)
-                    elevation = np.append(elevation, elevation[:,-1].reshape(nbeams,1), axis=1)
+                    elevation = append(elevation, elevation[-1,:].reshape(1,ngates), axis=0)
+                    elevation = append(elevation, elevation[:,-1].reshape(nbeams+1,1), axis=1)
             else:
-                print 'getFov: elevation must be of a scalar or ndarray(ngates) or ndarray(nbeans,ngates). Using first element: {}'.format(elevation[0])
-                elevation = elevation[0] * ones((nbeams+1, ngates+1))
+                print 'getFov: elevation must be of a scalar or ndarray(ngates) or ndarray(nbeans,ngates). Using first element: {}'.format(elevation.flat[0])
+                elevation = elevation.flat[0] * ones((nbeams+1, ngates+1))
         
+        t0 = time()
         # Generate beam/gate arrays
         beams = arange(nbeams+1)
         gates = arange(ngates+1)
+        shape = (nbeams+1, ngates+1)
         
-        # Create output arrays
-        slantRangeFull = zeros((nbeams+1, ngates+1), dtype='float')
-        latFull = zeros((nbeams+1, ngates+1), dtype='float')
-        lonFull = zeros((nbeams+1, ngates+1), dtype='float')
-        slantRangeCenter = zeros((nbeams+1, ngates+1), dtype='float')
-        latCenter = zeros((nbeams+1, ngates+1), dtype='float')
-        lonCenter = zeros((nbeams+1, ngates+1), dtype='float')
+        # Calculate deviation from boresight for center and edge of each beam, one row per beam
+        bOffCenter = zeros(shape) + (bmsep * (beams - nbeams/2.0))[:,newaxis]
+        bOffEdge = zeros(shape) + (bmsep * (beams - nbeams/2.0 - 0.5))[:,newaxis]
         
-        # Calculate deviation from boresight for center of beam
-        bOffCenter = bmsep * (beams - nbeams/2.0)
-        # Calculate deviation from boresight for edge of beam
-        bOffEdge = bmsep * (beams - nbeams/2.0 - 0.5)
+        # Calculate center and edges slant range, frang, rsep and recrise give one row or one row per beam
+        slantRangeCenter = zeros(shape) + slantRange(frang[:,newaxis], rsep[:,newaxis], recrise[:,newaxis], gates, center=True)
+        slantRangeFull = zeros(shape) + slantRange(frang[:,newaxis], rsep[:,newaxis], recrise[:,newaxis], gates, center=False)
+        if model == 'GS':
+            slantRangeCenter = gsMapSlantRange(slantRangeCenter,altitude=None,elevation=None)
+            slantRangeFull = gsMapSlantRange(slantRangeFull,altitude=None,elevation=None)
         
-        # Iterates through beams
-        for ib in beams:
-            # if none of frang, rsep or recrise are arrays, then only execute this for the first loop, otherwise, repeat for every beam
-            if (~isParamArray and ib == 0) or isParamArray:
-                # Calculate center slant range
-                sRangCenter = slantRange(frang[ib], rsep[ib], recrise[ib], gates, center=True)
-                # Calculate edges slant range
-                sRangEdge = slantRange(frang[ib], rsep[ib], recrise[ib], gates, center=False)
-            # Save into output arrays
-            slantRangeCenter[ib, :-1] = sRangCenter[:-1]
-            slantRangeFull[ib,:] = sRangEdge
-            
-            # Calculate coordinates for Edge and Center of the current beam
-            for ig in gates:
-                # This is a bit redundant, but I could not think of any other way to deal with the array-or-not-array issue
-                if not isinstance(altitude, ndarray) and not isinstance(elevation, ndarray):
-                    tElev = elevation
-                    tAlt = altitude
-                elif isinstance(altitude, ndarray) and not isinstance(elevation, ndarray):
-                    tElev = elevation
-                    tAlt = altitude[ib,ig]
-                elif isinstance(elevation, ndarray) and not isinstance(altitude, ndarray):
-                    tElev = elevation[ib,ig]
-                    tAlt = altitude
-                else:
-                    tElev = elevation[ib,ig]
-                    tAlt = altitude[ib,ig]
-
-                if model == 'GS':
-                  if (~isParamArray and ib == 0) or isParamArray:
-                    slantRangeCenter[ib,ig] = gsMapSlantRange(sRangCenter[ig],altitude=None,elevation=None)
-                    slantRangeFull[ib,ig]   = gsMapSlantRange(sRangEdge[ig],altitude=None,elevation=None)
-                    sRangCenter[ig]         = slantRangeCenter[ib,ig]
-                    sRangEdge[ig]           = slantRangeFull[ib,ig] 
-
-                if (sRangCenter[ig] != -1) and (sRangEdge[ig] != -1):
-                  # Then calculate projections
-                  latC, lonC = calcFieldPnt(siteLat, siteLon, siteAlt*1e-3, siteBore, bOffCenter[ib], sRangCenter[ig], \
-                              elevation=tElev, altitude=tAlt, model=model)
-                  latE, lonE = calcFieldPnt(siteLat, siteLon, siteAlt*1e-3, siteBore, bOffEdge[ib], sRangEdge[ig], \
-                              elevation=tElev, altitude=tAlt, model=model)
-                              
-                  if(coords == 'mag'):
-                      latC, lonC, _ = aacgm.aacgmlib.aacgmConv(latC,lonC,0.,0)
-                      latE, lonE, _ = aacgm.aacgmlib.aacgmConv(latE,lonE,0.,0)
-                else:
-                  latC, lonC = nan, nan
-                  latE, lonE = nan, nan
-                    
-                # Save into output arrays
-                latCenter[ib, ig] = latC
-                lonCenter[ib, ig] = lonC
-                latFull[ib, ig] = latE
-                lonFull[ib, ig] = lonE
+        # Calculate coordinates for Edge and Center of all the cells at once,
+        # cells too close for the ground scatter mapping are left as nan
+        valid = (slantRangeCenter != -1) & (slantRangeFull != -1)
+        if isinstance(elevation, ndarray): tElev = elevation[valid]
+        else: tElev = elevation
+        if isinstance(altitude, ndarray): tAlt = altitude[valid]
+        else: tAlt = altitude
+        latCenter = zeros(shape) + nan
+        lonCenter = zeros(shape) + nan
+        latFull = zeros(shape) + nan
+        lonFull = zeros(shape) + nan
+        latCenter[valid], lonCenter[valid] = calcFieldPnt(siteLat, siteLon, siteAlt*1e-3, siteBore, bOffCenter[valid], \
+                    slantRangeCenter[valid], elevation=tElev, altitude=tAlt, model=model)
+        latFull[valid], lonFull[valid] = calcFieldPnt(siteLat, siteLon, siteAlt*1e-3, siteBore, bOffEdge[valid], \
+                    slantRangeFull[valid], elevation=tElev, altitude=tAlt, model=model)
+        
+        if(coords == 'mag'):
+            for lat, lon in [(latCenter, lonCenter), (latFull, lonFull)]:
+                latM, lonM, _ = aacgm.aacgmConvArray(lat[valid], lon[valid], 0., 0, approx=approx)
+                lat[valid], lon[valid] = latM, lonM
         
+        if instrument.enabled:
+            instrument.addTime('radar.fov', time()-t0)
+            instrument.count('radar.fov.cells', (nbeams+1)*(ngates+1))
+            instrument.peak('radar.fov.bytes', 6*latFull.nbytes)
+
         # Output is...
         self.latCenter= latCenter[:-1,:-1]
         self.lonCenter = lonCenter[:-1,:-1]
@@ -249,6 +231,159 @@ class fov(object):
         return outstring
 
 
+# *************************************************************
+# *************************************************************
+def getFov(frang=180.0, rsep=45.0, site=None, \
+            nbeams=None, ngates=None, bmsep=None, recrise=None, \
+            siteLat=None, siteLon=None, siteBore=None, siteAlt=None, \
+            elevation=None, altitude=300., \
+            model='IS', coords='geo', approx=False, disk=True):
+    """Get a field of view, from the cache if the same one has been asked for before. 
+This takes the same arguments as :class:`fov`, and gives the same object. 
+Field of views are kept in memory (the last fovCacheSize used), and in DAVIT_TMPDIR/fov/ 
+so that they are reused by later runs (the last fovDiskSize written). 
+They are looked up by all of the parameters which go into the projection, including 
+those taken from the site (ie hdw.dat), so that a change to the radar hardware 
+description is never answered from the cache.
+
+**INPUTS**:
+    * see :class:`fov`
+    * **disk**: look for and keep the field of view on disk as well as in memory
+
+**OUTPUT**:
+    * **myFov** (:class:`fov`): a copy of the cached field of view, which can be changed freely
+
+**EXAMPLE**:
+    ::
+
+        site = pydarn.radar.site(code='bks')
+        myFov = pydarn.radar.radFov.getFov(site=site, rsep=45., ngates=75, coords='geo')
+
+    """
+    import copy
+    from utils import instrument
+    
+    # Resolve the parameters from the site as fov does, so that the key holds the values used
+    if site:
+        if not nbeams: nbeams = site.maxbeam
+        if not ngates: ngates = site.maxgate
+        if not bmsep: bmsep = site.bmsep
+        if recrise is None: recrise = site.recrise
+        if not siteLat: siteLat = site.geolat
+        if not siteLon: siteLon = site.geolon
+        if not siteAlt: siteAlt = site.alt
+        if not siteBore: siteBore = site.boresite
+    params = [nbeams, ngates, bmsep, recrise, siteLat, siteLon, siteBore, siteAlt]
+    if None in [p for p in params if not hasattr(p, 'shape')]:
+        return fov(frang=frang, rsep=rsep, site=site, nbeams=nbeams, ngates=ngates, bmsep=bmsep, recrise=recrise, \
+                   siteLat=siteLat, siteLon=siteLon, siteBore=siteBore, siteAlt=siteAlt, \
+                   elevation=elevation, altitude=altitude, model=model, coords=coords, approx=approx)
+    key = (getattr(site, 'id', None), str(getattr(site, 'tval', None)), model, coords, bool(approx and coords == 'mag')) + \
+          tuple([_fovSignature(p) for p in params + [frang, rsep, elevation, altitude]])
+    
+    myFov = _fovCache.pop(key, None)
+    if myFov is not None:
+        instrument.count('radar.fovCache.hits')
+    elif disk:
+        myFov = _fovRead(key)
+        if myFov is not None: instrument.count('radar.fovCache.diskHits')
+    if myFov is None:
+        instrument.count('radar.fovCache.misses')
+        myFov = fov(frang=frang, rsep=rsep, site=site, nbeams=nbeams, ngates=ngates, bmsep=bmsep, recrise=recrise, \
+                    siteLat=siteLat, siteLon=siteLon, siteBore=siteBore, siteAlt=siteAlt, \
+                    elevation=elevation, altitude=altitude, model=model, coords=coords, approx=approx)
+        if disk: _fovWrite(key, myFov)
+    
+    _fovCache[key] = myFov
+    while len(_fovCache) > fovCacheSize: _fovCache.popitem(last=False)
+    return copy.deepcopy(myFov)
+
+
+def clearFovCache(disk=False):
+    """Empty the field of view cache used by :func:`getFov`
+
+**INPUTS**:
+    * **disk**: also remove the field of views kept on disk
+
+    """
+    import os, glob
+    _fovCache.clear()
+    if disk:
+        for f in glob.glob(os.path.join(_fovDir(), '*.npz')):
+            try: os.remove(f)
+            except OSError: pass
+
+
+def _fovSignature(val):
+    """A hashable value standing for a fov parameter, arrays are represented by their shape and a digest of their values"""
+    import hashlib
+    import numpy as np
+    if val is None: return None
+    if isinstance(val, np.ndarray):
+        val = np.ascontiguousarray(val, dtype=float)
+        return (val.shape, hashlib.sha1(val.tostring()).hexdigest())
+    return float(val)
+
+
+def _fovDir():
+    """Where getFov keeps field of views on disk"""
+    import os
+    try: tmpDir = os.environ['DAVIT_TMPDIR']
+    except KeyError: tmpDir = '/tmp/sd/'
+    return os.path.join(tmpDir, 'fov')
+
+
+def _fovFile(key):
+    """The file of a field of view on disk"""
+    import os, hashlib
+    return os.path.join(_fovDir(), hashlib.sha1(repr(key)).hexdigest()+'.npz')
+
+
+def _fovRead(key):
+    """Read a field of view from disk, None if it is not there"""
+    import os
+    import numpy as np
+    fileName = _fovFile(key)
+    if not os.path.isfile(fileName): return None
+    try:
+        data = np.load(fileName)
+        try:
+            # the key is kept in the file, so a file is never taken for another fov
+            if str(data['key']) != repr(key): return None
+            myFov = fov.__new__(fov)
+            for name in fovFields: setattr(myFov, name, data[name])
+            myFov.coords = str(data['coords'])
+        finally:
+            data.close()
+        os.utime(fileName, None)
+        return myFov
+    except Exception, e:
+        print 'problem reading', fileName, e
+        return None
+
+
+def _fovWrite(key, myFov):
+    """Write a field of view to disk, and remove the least recently used ones beyond fovDiskSize"""
+    import os, glob
+    import numpy as np
+    fileName = _fovFile(key)
+    try:
+        if not os.path.isdir(_fovDir()): os.makedirs(_fovDir())
+        # write under another name first, so that no one reads a partial file
+        tmpName = fileName[:-4]+'.%d.tmp' % os.getpid()
+        data = dict([(name, getattr(myFov, name)) for name in fovFields])
+        f = open(tmpName, 'wb')
+        try: np.savez(f, key=repr(key), coords=myFov.coords, **data)
+        finally: f.close()
+        os.rename(tmpName, fileName)
+        files = glob.glob(os.path.join(_fovDir(), '*.npz'))
+        if len(files) > fovDiskSize:
+            files.sort(key=os.path.getmtime)
+            for f in files[:len(files)-fovDiskSize]: os.remove(f)
+    except Exception, e:
+        print 'problem writing', fileName, e
+
+
 # *************************************************************
 # *************************************************************
 def calcFieldPnt(tGeoLat, tGeoLon, tAlt, boreSight, boreOffset, slantRange, \
@@ -259,6 +394,8 @@ the pointing direction deviation from boresight and elevation angle, and the
 field point slant range and altitude. Either the elevation or the altitude must 
 be provided. If none is provided, the altitude is set to 300 km and the elevation 
 evaluated to accomodate altitude and range.
+boreOffset, slantRange, elevation and altitude may be arrays, which are broadcast 
+against each other so that many field points are calculated at once.
 
 **INPUTS**:
     * **tGeoLat**: transmitter latitude [degree, N]
@@ -276,78 +413,87 @@ evaluated to accomodate altitude and range.
         * ... more to come
     * **coords**: 'geo' (more to come)
 
+**OUTPUT**:
+    * **lat, lon**: latitude and longitude of the field point(s) [degree], arrays of the broadcast shape of the inputs if any was an array
+
     """
-    from math import radians, degrees, sin, cos, asin, atan, sqrt, pi
+    from numpy import radians, degrees, sin, arcsin, sqrt, where, asarray, zeros, ndim, broadcast, errstate, arange
     from utils import Re, geoPack
     
-    # Make sure we have enough input stuff
-    # if (not model) and (not elevation or not altitude): model = 'IS'
+    # Everything is done on arrays, so that a whole field of view is projected at once.
+    # As for scalars, an elevation or altitude of None or 0 is taken as not known, cell by cell
+    isScalar = ndim(boreOffset) == 0 and ndim(slantRange) == 0 and ndim(elevation) == 0 and ndim(altitude) == 0
+    if elevation is None: elevation = 0.
+    if altitude is None: altitude = 0.
+    shape = broadcast(asarray(boreOffset), asarray(slantRange), asarray(elevation), asarray(altitude)).shape
+    boreOffset, slantRange, elevation, altitude = [(zeros(shape) + x).ravel() for x in [boreOffset, slantRange, elevation, altitude]]
     
     # Now let's get to work
     # Classic Ionospheric/Ground scatter projection model
     if model in ['IS','GS']:
         # Make sure you have altitude, because these 2 projection models rely on it
-        if not elevation and not altitude:
-            # Set default altitude to 300 km
-            altitude = 300.0
-        elif elevation and not altitude:
-            # If you have elevation but not altitude, then you calculate altitude, and elevation will be adjusted anyway
-            altitude = sqrt( Re**2 + slantRange**2 + 2. * slantRange * Re * sin( radians(elevation) ) ) - Re
+        # Set default altitude to 300 km, and if you have elevation but not altitude, then you calculate altitude, 
+        # and elevation will be adjusted anyway
+        altitude = where(altitude != 0, altitude, 
+                    where(elevation != 0, sqrt( Re**2 + slantRange**2 + 2. * slantRange * Re * sin( radians(elevation) ) ) - Re, 300.0))
         
         # Now you should have altitude (and maybe elevation too, but it won't be used in the rest of the algorithm)
         # Adjust altitude so that it makes sense with common scatter distribution
-        xAlt = altitude
-        if model == 'IS':
-            if altitude > 150. and slantRange <= 600: 
-                xAlt = 115.
-            elif altitude > 150. and slantRange > 600. and  slantRange <= 800.:
-                xAlt = 115. + ( slantRange - 600. ) / 200. * ( altitude - 115. )
-        elif model == 'GS':
-            if altitude > 150. and slantRange <= 300: 
-                xAlt = 115.
-            elif altitude > 150. and slantRange > 300. and  slantRange <= 500.:
-                xAlt = 115. + ( slantRange - 300. ) / 200. * ( altitude - 115. )
-        if slantRange < 150.: xAlt = slantRange / 150. * 115.
+        if model == 'IS': near, far = 600., 800.
+        else: near, far = 300., 500.
+        high = altitude > 150.
+        xAlt = where(high & (slantRange <= near), 115., altitude)
+        xAlt = where(high & (slantRange > near) & (slantRange <= far), 115. + ( slantRange - near ) / 200. * ( altitude - 115. ), xAlt)
+        xAlt = where(slantRange < 150., slantRange / 150. * 115., xAlt)
         
         # To start, set Earth radius below field point to Earth radius at radar
         (lat,lon,tRe) = geoPack.geodToGeoc(tGeoLat, tGeoLon)
-        RePos = tRe
+        RePos = zeros(xAlt.shape) + tRe
+        latOut = zeros(xAlt.shape)
+        lonOut = zeros(xAlt.shape)
         
-        # Iterate until the altitude corresponding to the calculated elevation matches the desired altitude
-        n = 0L # safety counter
-        while True:
-            # pointing elevation (spherical Earth value) [degree]
-            tel = degrees( asin( ((RePos+xAlt)**2 - (tRe+tAlt)**2 - slantRange**2) / (2. * (tRe+tAlt) * slantRange) ) )
-            
-            # estimate off-array-normal azimuth (because it varies slightly with elevation) [degree]
-            bOff = calcAzOffBore(tel, boreOffset)
-            
-            # pointing azimuth
-            taz = boreSight + bOff
-            
-            # calculate position of field point
-            dictOut = geoPack.calcDistPnt(tGeoLat, tGeoLon, tAlt, dist=slantRange, el=tel, az=taz)
+        # Iterate until the altitude corresponding to the calculated elevation matches the desired altitude,
+        # each cell keeps the position of the pass where it got close enough, 3 passes at most
+        todo = arange(xAlt.size)
+        for n in range(3):
+            with errstate(invalid='ignore'):
+                # pointing elevation (spherical Earth value) [degree]
+                tel = degrees( arcsin( ((RePos[todo]+xAlt[todo])**2 - (tRe+tAlt)**2 - slantRange[todo]**2) / (2. * (tRe+tAlt) * slantRange[todo]) ) )
+                
+                # estimate off-array-normal azimuth (because it varies slightly with elevation) [degree]
+                bOff = calcAzOffBore(tel, boreOffset[todo])
+                
+                # pointing azimuth
+                taz = boreSight + bOff
+                
+                # calculate position of field point
+                dictOut = geoPack.calcDistPnt(tGeoLat, tGeoLon, tAlt, dist=slantRange[todo], el=tel, az=taz)
             
             # Update Earth radius 
-            RePos = dictOut['distRe']
+            RePos[todo] = dictOut['distRe']
+            latOut[todo] = dictOut['distLat']
+            lonOut[todo] = dictOut['distLon']
             
             # stop if the altitude is what we want it to be (or close enough)
-            n += 1L
-            if abs(xAlt - dictOut['distAlt']) <= 0.5 or n > 2:
-                return dictOut['distLat'], dictOut['distLon']
-                break
+            todo = todo[~(abs(xAlt[todo] - dictOut['distAlt']) <= 0.5)]
+            if len(todo) == 0: break
     
     # No projection model (i.e., the elevation or altitude is so good that it gives you the proper projection by simple geometric considerations)
     elif not model:
         # Using no models simply means tracing based on trustworthy elevation or altitude
-        if not altitude:
-            altitude = sqrt( Re**2 + slantRange**2 + 2. * slantRange * Re * sin( radians(elevation) ) ) - Re
-        if not elevation:
-            if(slantRange < altitude): altitude = slantRange - 10
-            elevation = degrees( asin( ((Re+altitude)**2 - (Re+tAlt)**2 - slantRange**2) / (2. * (Re+tAlt) * slantRange) ) )
-        # The tracing is done by calcDistPnt
-        dict = geoPack.calcDistPnt(tGeoLat, tGeoLon, tAlt, dist=slantRange, el=elevation, az=boreSight+boreOffset)
-        return dict['distLat'], dict['distLon']
+        noElev = elevation == 0
+        with errstate(invalid='ignore'):
+            altitude = where(altitude != 0, altitude, sqrt( Re**2 + slantRange**2 + 2. * slantRange * Re * sin( radians(elevation) ) ) - Re)
+            altitude = where(noElev & (slantRange < altitude), slantRange - 10, altitude)
+            elevation = where(noElev, degrees( arcsin( ((Re+altitude)**2 - (Re+tAlt)**2 - slantRange**2) / (2. * (Re+tAlt) * slantRange) ) ), elevation)
+            # The tracing is done by calcDistPnt
+            dict = geoPack.calcDistPnt(tGeoLat, tGeoLon, tAlt, dist=slantRange, el=elevation, az=boreSight+boreOffset)
+        latOut, lonOut = dict['distLat'], dict['distLon']
+    
+    else: return
+    
+    if isScalar: return latOut[0], lonOut[0]
+    return latOut.reshape(shape), lonOut.reshape(shape)
     
 
 # *************************************************************
@@ -387,23 +533,22 @@ Calculate off-boresight azimuth as a function of elevation angle and zero-elevat
 See Milan et al. [1997] for more details on how this works.
 
 **INPUTS**:
-    * **elevation**: elevation angle [degree]
-    * **boreOffset0**: zero-elevation off-boresight azimuth [degree]
+    * **elevation**: elevation angle [degree] (scalar or ndarray)
+    * **boreOffset0**: zero-elevation off-boresight azimuth [degree] (scalar or ndarray)
 
 **OUTPUT**:
     * **boreOffset**: off-boresight azimuth [degree]
 
     """
-    from math import radians, degrees, cos, sin, atan, pi, sqrt
+    from numpy import radians, degrees, cos, sin, arctan, pi, sqrt, where, errstate, ndim
     
-    if ( cos(radians(boreOffset0))**2 - sin(radians(elevation))**2 ) < 0:
-        if boreOffset0 >= 0: boreOffset = pi/2.
-        else: boreOffset = -pi/2.
-    else:
-        tan_bOff = sqrt( sin(radians(boreOffset0))**2 / ( cos(radians(boreOffset0))**2 - sin(radians(elevation))**2 ) )
-        if boreOffset0 >= 0: boreOffset = atan( tan_bOff )
-        else: boreOffset = -atan( tan_bOff )
-        
+    c = cos(radians(boreOffset0))**2 - sin(radians(elevation))**2
+    with errstate(divide='ignore', invalid='ignore'):
+        tan_bOff = sqrt( sin(radians(boreOffset0))**2 / where(c < 0, 1., c) )
+    boreOffset = where(c < 0, pi/2., arctan( tan_bOff ))
+    boreOffset = where(boreOffset0 >= 0, boreOffset, -boreOffset)
+    
+    if ndim(boreOffset) == 0: return degrees(boreOffset[()])
     return degrees(boreOffset)
 
 def gsMapSlantRange(slantRange,altitude=None,elevation=None):
@@ -411,7 +556,7 @@ def gsMapSlantRange(slantRange,altitude=None,elevation=None):
 Calculate the ground scatter mapped slant range. See Bristow et al. [1994] for more details.
 
 **INPUTS**:
-    * **slantRange**: normal slant range [km]
+    * **slantRange**: normal slant range [km] (scalar or ndarray)
     * **altitude**:   altitude [km] (defaults to 300 km)
     * **elevation**:  elevation angle [degree]
 
@@ -421,20 +566,21 @@ Calculate the ground scatter mapped slant range. See Bristow et al. [1994] for m
       this model breaks down.
 
   """
-  from math import radians, degrees, sin, cos, asin, atan, sqrt, pi
-  from utils import Re, geoPack
+  from numpy import radians, sin, arcsin, sqrt, where, ndim, asarray
+  from utils import Re
 
   # Make sure you have altitude, because these 2 projection models rely on it
-  if not elevation and not altitude:
-      # Set default altitude to 300 km
-      altitude = 300.0
-  elif elevation and not altitude:
-      # If you have elevation but not altitude, then you calculate altitude, and elevation will be adjusted anyway
-      altitude = sqrt( Re**2 + slantRange**2 + 2. * slantRange * Re * sin( radians(elevation) ) ) - Re
-
-  if (slantRange**2)/4. - altitude**2 >= 0:
-    gsSlantRange = Re * asin(sqrt(slantRange**2/4. - altitude**2)/Re) #From Bristow et al. [1994]
-  else:
-    gsSlantRange = -1
+  # Set default altitude to 300 km, or if you have elevation but not altitude, then you calculate altitude
+  isScalar = ndim(slantRange) == 0 and ndim(altitude) == 0 and ndim(elevation) == 0
+  slantRange = asarray(slantRange, dtype=float)
+  if altitude is None: altitude = 0.
+  if elevation is None: elevation = 0.
+  altitude = where(altitude != 0, altitude, 
+              where(elevation != 0, sqrt( Re**2 + slantRange**2 + 2. * slantRange * Re * sin( radians(elevation) ) ) - Re, 300.0))
+
+  #From Bristow et al. [1994], -1 where the scatter is too close
+  x = (slantRange**2)/4. - altitude**2
+  gsSlantRange = where(x >= 0, Re * arcsin(sqrt(where(x >= 0, x, 0.))/Re), -1)
 
+  if isScalar: gsSlantRange = gsSlantRange[()]
   return gsSlantRange
@@ -11,6 +11,24 @@ This includes the following module(s):
 		defines the fundamental radar data types
 	radDataRead
 		contains the functions necessary for reading radar data
+	radDataIndex
+		persistent record index for dmap radar data files
+	dmapStream
+		reads dmap records from chains of plain, gzip or bzip2 files
+	dmapWriter
+		writes dmap records from dicts, beams, scans and blocks
+	radDataArchive
+		columnar archive files of fit data, by radar and day
+	dataCache
+		size bounded cache of data files in DAVIT_TMPDIR
+	dataFetch
+		concurrent fetching of data files from the sftp server
+	dataPrefetch
+		reads and decodes dmap records ahead in a background thread
+	radDataMerge
+		reads several radars as one stream in time order
+	radDataDemux
+		splits one read of a multi-channel file into per-channel streams
 	pygridIo
 		library for reading and writing pygrid files
 	dbUtils
@@ -31,6 +49,51 @@ try:
 	from radDataRead import *
 except: print 'problem importing radDataRead'
 
+try:
+	import radDataIndex
+	from radDataIndex import *
+except: print 'problem importing radDataIndex'
+
+try:
+	import dmapStream
+	from dmapStream import *
+except: print 'problem importing dmapStream'
+
+try:
+	import dmapWriter
+	from dmapWriter import *
+except: print 'problem importing dmapWriter'
+
+try:
+	import radDataArchive
+	from radDataArchive import *
+except: print 'problem importing radDataArchive'
+
+try:
+	import dataCache
+	from dataCache import *
+except: print 'problem importing dataCache'
+
+try:
+	import dataFetch
+	from dataFetch import *
+except: print 'problem importing dataFetch'
+
+try:
+	import dataPrefetch
+	from dataPrefetch import *
+except: print 'problem importing dataPrefetch'
+
+try:
+	import radDataMerge
+	from radDataMerge import *
+except: print 'problem importing radDataMerge'
+
+try:
+	import radDataDemux
+	from radDataDemux import *
+except: print 'problem importing radDataDemux'
+
 try:
 	import sdDataTypes
 	from sdDataTypes import *
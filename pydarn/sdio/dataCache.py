@@ -0,0 +1,303 @@
+# Copyright (C) 2012  VT SuperDARN Lab
+# Full license can be found in LICENSE.txt
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+.. module:: dataCache
+   :synopsis: a size bounded cache of data files in DAVIT_TMPDIR
+
+*********************************
+**Module**: pydarn.sdio.dataCache
+*********************************
+
+**Functions**:
+  * :func:`pydarn.sdio.dataCache.cacheKey`
+
+**Classes**:
+  * :class:`pydarn.sdio.dataCache.dataCache`
+"""
+from utils import instrument
+
+catalogName = '.davitcache.json'
+lockName = '.davitcache.lock'
+#the cache size used if DAVIT_TMPSIZE is not set
+defaultMaxBytes = 10*1024**3
+
+def cacheKey(name, fileType, filtered=False):
+  """build the catalog key for a kind of cached data.  This matches the suffix of the cached file names.
+
+  **Args**:
+    * **name** (str): the radar code or hemisphere of the data
+    * **fileType** (str): the file type, eg 'fitex' or 'grdex'
+    * **[filtered]** (bool): whether the data has been boxcar filtered. default = False
+  **Returns**:
+    * **key** (str): the catalog key, eg 'bks.fitex' or 'bks.fitexf'
+  """
+  key = '%s.%s' % (name,fileType)
+  if filtered: key += 'f'
+  return key
+
+def parseSize(size):
+  """convert a size such as '500M' or '10G' to a number of bytes"""
+  size = str(size).strip().upper()
+  mult = 1
+  for suffix,m in [('K',1024),('M',1024**2),('G',1024**3),('T',1024**4)]:
+    if size.endswith(suffix):
+      size,mult = size[:-1],m
+      break
+  return int(float(size)*mult)
+
+
+class dataCache():
+  """A class which manages the data files cached in DAVIT_TMPDIR.  A small JSON catalog records the time span, size and last access time of each cached file.  A request can be served by several adjacent cached spans, and the least recently used files are removed when the cache grows past its size budget.  The catalog is only changed while holding a lock file, so several processes can share the cache.
+
+  **Public Attrs**:
+    * **tmpDir** (str): the cache directory
+    * **maxBytes** (int): the size budget of the cache in bytes
+    * **hits** (int): the number of lookups by this object which were served from the cache
+    * **misses** (int): the number of lookups by this object which were not
+
+  **Methods**:
+    * :func:`lookup`
+    * :func:`fileName`
+    * :func:`store`
+    * :func:`evict`
+    * :func:`discard`
+    * :func:`stats`
+
+  **ENVIRONMENT Variables**:
+    * DAVIT_TMPDIR :  Directory used for davitpy temporary file cache.
+    * DAVIT_TMPSIZE :  Size budget of the cache, eg '500M' or '10G'.  default = 10G
+
+  **Example**:
+    ::
+
+      myCache = pydarn.sdio.dataCache()
+      pieces = myCache.lookup(pydarn.sdio.cacheKey('bks','fitex'),dt.datetime(2011,1,1),dt.datetime(2011,1,2))
+  """
+  def __init__(self, tmpDir=None, maxBytes=None):
+    import os
+
+    if tmpDir is None:
+      tmpDir = os.environ.get('DAVIT_TMPDIR','/tmp/sd/')
+    if not tmpDir.endswith('/'): tmpDir += '/'
+    if maxBytes is None:
+      try: maxBytes = parseSize(os.environ['DAVIT_TMPSIZE'])
+      except Exception: maxBytes = defaultMaxBytes
+    self.tmpDir = tmpDir
+    self.maxBytes = maxBytes
+    self.hits = 0
+    self.misses = 0
+    if not os.path.exists(tmpDir):
+      os.makedirs(tmpDir)
+    self.__lockFile = None
+
+  def __repr__(self):
+    return 'dataCache: %s, %d hits, %d misses' % (self.tmpDir,self.hits,self.misses)
+
+  def __lock(self):
+    import fcntl
+    self.__lockFile = open(self.tmpDir+lockName,'a')
+    fcntl.flock(self.__lockFile.fileno(),fcntl.LOCK_EX)
+
+  def __unlock(self):
+    import fcntl
+    if self.__lockFile is not None:
+      fcntl.flock(self.__lockFile.fileno(),fcntl.LOCK_UN)
+      self.__lockFile.close()
+      self.__lockFile = None
+
+  def __read(self):
+    """read the catalog, must be called with the lock held"""
+    import json, os
+    try:
+      f = open(self.tmpDir+catalogName,'r')
+      try: catalog = json.load(f)
+      finally: f.close()
+    except Exception:
+      catalog = self.__adopt()
+    #forget about files which have been removed behind our back
+    catalog['entries'] = [e for e in catalog['entries'] \
+                          if os.path.isfile(self.tmpDir+e['file'])]
+    return catalog
+
+  def __write(self, catalog):
+    """write the catalog, must be called with the lock held"""
+    import json, os
+    tmpName = self.tmpDir+catalogName+'.%d.tmp' % os.getpid()
+    f = open(tmpName,'w')
+    try: json.dump(catalog,f)
+    finally: f.close()
+    os.rename(tmpName,self.tmpDir+catalogName)
+
+  def __adopt(self):
+    """build a new catalog from any cached files named with the old time span convention"""
+    import glob, os, calendar, time
+
+    catalog = {'hits':0,'misses':0,'entries':[]}
+    for f in glob.glob(self.tmpDir+'????????.??????.????????.??????.*'):
+      ff = os.path.basename(f)
+      if ff.endswith('.idx.npz') or ff.endswith('.tmp'): continue
+      try:
+        t1 = calendar.timegm(time.strptime(ff[0:15],'%Y%m%d.%H%M%S'))
+        t2 = calendar.timegm(time.strptime(ff[16:31],'%Y%m%d.%H%M%S'))
+      except ValueError:
+        continue
+      stat = os.stat(f)
+      catalog['entries'].append({'file':ff,'key':ff[32:],'sTime':t1,'eTime':t2, \
+                                 'size':stat.st_size,'atime':stat.st_atime})
+    return catalog
+
+  def lookup(self, key, sTime, eTime):
+    """find cached files which together cover a time span.  Overlapping spans are trimmed so that each piece covers a distinct part of the request.
+
+    **Args**:
+      * **key** (str): the kind of data, from :func:`cacheKey`
+      * **sTime** (`datetime <http://tinyurl.com/bl352yx>`_): the start of the request
+      * **eTime** (`datetime <http://tinyurl.com/bl352yx>`_): the end of the request
+    **Returns**:
+      * **pieces** (list): (file name, start epoch, end epoch) tuples in time order, or None if the cache can not cover the request
+    """
+    import time
+    from utils.timeUtils import datetimeToEpoch
+
+    t1,t2 = datetimeToEpoch(sTime),datetimeToEpoch(eTime)
+    self.__lock()
+    try:
+      catalog = self.__read()
+      entries = [e for e in catalog['entries'] if e['key'] == key]
+      pieces,used = [],[]
+      cur = t1
+      while True:
+        #take the span which reaches furthest past where we are
+        best = None
+        for e in entries:
+          if e['sTime'] <= cur and e['eTime'] > cur and \
+             (best is None or e['eTime'] > best['eTime']):
+            best = e
+        if best is None:
+          pieces = None
+          break
+        pieces.append((str(self.tmpDir+best['file']),cur,min(best['eTime'],t2)))
+        used.append(best)
+        cur = best['eTime']
+        if cur >= t2: break
+      if pieces:
+        for e in used: e['atime'] = time.time()
+        self.hits += 1
+        catalog['hits'] = catalog.get('hits',0)+1
+      else:
+        pieces = None
+        self.misses += 1
+        catalog['misses'] = catalog.get('misses',0)+1
+      self.__write(catalog)
+    finally:
+      self.__unlock()
+    if pieces is not None:
+      for f,p1,p2 in pieces: print 'Found cached file: %s' % f
+      instrument.count('sdio.cacheHits')
+    else: instrument.count('sdio.cacheMisses')
+    return pieces
+
+  def fileName(self, name, fileType, sTime, eTime, filtered=False):
+    """the name to give a new cached file, following the time span naming convention
+
+    **Args**:
+      * **name** (str): the radar code or hemisphere of the data
+      * **fileType** (str): the file type
+      * **sTime** (`datetime <http://tinyurl.com/bl352yx>`_): the start of the span the file covers
+      * **eTime** (`datetime <http://tinyurl.com/bl352yx>`_): the end of the span the file covers
+      * **[filtered]** (bool): whether the data has been boxcar filtered. default = False
+    **Returns**:
+      * **fileName** (str): the full path of the file
+    """
+    return '%s%s.%s.%s' % (self.tmpDir,sTime.strftime("%Y%m%d.%H%M%S"), \
+                           eTime.strftime("%Y%m%d.%H%M%S"),cacheKey(name,fileType,filtered))
+
+  def store(self, key, sTime, eTime, filename):
+    """add a file in the cache directory to the catalog, then evict old files if the cache is over budget.
+
+    **Args**:
+      * **key** (str): the kind of data, from :func:`cacheKey`
+      * **sTime** (`datetime <http://tinyurl.com/bl352yx>`_): the start of the span the file covers
+      * **eTime** (`datetime <http://tinyurl.com/bl352yx>`_): the end of the span the file covers
+      * **filename** (str): the file, which must be in the cache directory
+    """
+    import os, time
+    from utils.timeUtils import datetimeToEpoch
+
+    ff = os.path.basename(filename)
+    self.__lock()
+    try:
+      catalog = self.__read()
+      catalog['entries'] = [e for e in catalog['entries'] if e['file'] != ff]
+      catalog['entries'].append({'file':ff,'key':key,'sTime':datetimeToEpoch(sTime), \
+                                 'eTime':datetimeToEpoch(eTime), \
+                                 'size':os.path.getsize(filename),'atime':time.time()})
+      self.__evict(catalog,self.maxBytes,keep=ff)
+      self.__write(catalog)
+    finally:
+      self.__unlock()
+
+  def __evict(self, catalog, maxBytes, keep=None):
+    """remove least recently used files until the catalog fits in maxBytes"""
+    entries = sorted(catalog['entries'],key=lambda e: e['atime'])
+    total = sum([e['size'] for e in entries])
+    for e in entries:
+      if total <= maxBytes: break
+      if e['file'] == keep: continue
+      print 'removing cached file',self.tmpDir+e['file']
+      self.discard(self.tmpDir+e['file'])
+      catalog['entries'].remove(e)
+      total -= e['size']
+
+  def evict(self, maxBytes=None):
+    """remove least recently used files until the cache fits in a size budget
+
+    **Args**:
+      * **[maxBytes]** (int): the size budget, if None use self.maxBytes. default = None
+    """
+    if maxBytes is None: maxBytes = self.maxBytes
+    self.__lock()
+    try:
+      catalog = self.__read()
+      self.__evict(catalog,maxBytes)
+      self.__write(catalog)
+    finally:
+      self.__unlock()
+
+  def discard(self, filename):
+    """remove a file and its record index sidecar, if it has one.  This does not touch the catalog."""
+    import os
+    for f in [filename,filename+'.idx.npz']:
+      try: os.remove(f)
+      except OSError: pass
+
+  def stats(self):
+    """report the state of the cache
+
+    **Returns**:
+      * **stats** (dict): hits and misses for this object, the shared hit and miss totals, the number of files and bytes cached and the size budget
+    """
+    self.__lock()
+    try:
+      catalog = self.__read()
+    finally:
+      self.__unlock()
+    return {'hits':self.hits,'misses':self.misses, \
+            'totalHits':catalog.get('hits',0),'totalMisses':catalog.get('misses',0), \
+            'files':len(catalog['entries']), \
+            'bytes':sum([e['size'] for e in catalog['entries']]), \
+            'maxBytes':self.maxBytes}
@@ -0,0 +1,156 @@
+# Copyright (C) 2012  VT SuperDARN Lab
+# Full license can be found in LICENSE.txt
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+.. module:: dataFetch
+   :synopsis: concurrent fetching of data files from the sftp server
+
+*********************************
+**Module**: pydarn.sdio.dataFetch
+*********************************
+
+**Functions**:
+  * :func:`pydarn.sdio.dataFetch.defaultWorkers`
+  * :func:`pydarn.sdio.dataFetch.fetchFiles`
+
+**Classes**:
+  * :class:`pydarn.sdio.dataFetch.sftpSource`
+"""
+
+def defaultWorkers():
+  """the number of files to fetch or decompress at once when a request does not say.  This is DAVIT_NWORKERS if it is set, otherwise the number of cpus up to 4.
+
+  **Returns**:
+    * **nWorkers** (int)
+  """
+  import os, multiprocessing
+  try:
+    return max(1,int(os.environ['DAVIT_NWORKERS']))
+  except Exception:
+    try: return min(4,multiprocessing.cpu_count())
+    except NotImplementedError: return 1
+
+
+class sftpSource():
+  """A connection to the sftp data server.  One transport is opened per request and shared by all of the download threads, each of which opens its own sftp channel on it.
+
+  **Public Attrs**:
+    * **transport** (paramiko.Transport): the shared transport.  Anything with an open_sftp_client() method returning an object with listdir, get and close methods will do, eg a local stand-in for testing
+
+  **Methods**:
+    * :func:`listdir`
+    * :func:`get`
+    * :func:`close`
+
+  **ENVIRONMENT Variables**:
+    * VTDB :  the sftp server host
+    * DBREADUSER :  the sftp user name
+    * DBREADPASS :  the sftp password
+
+  **Example**:
+    ::
+
+      source = pydarn.sdio.sftpSource()
+      files = source.listdir('/data/2011/fitex/bks/')
+  """
+  def __init__(self, host=None, username=None, password=None, port=22, transport=None):
+    import os, threading
+    if transport is None:
+      import paramiko as p
+      if host is None: host = os.environ['VTDB']
+      if username is None: username = os.environ['DBREADUSER']
+      if password is None: password = os.environ['DBREADPASS']
+      transport = p.Transport((host,port))
+      transport.connect(username=username,password=password)
+    self.transport = transport
+    self.__local = threading.local()
+    self.__clients = []
+    self.__lock = threading.Lock()
+    self.__listings = {}
+
+  def __client(self):
+    """the sftp channel of the calling thread"""
+    client = getattr(self.__local,'client',None)
+    if client is None:
+      client = self.transport.open_sftp_client()
+      self.__local.client = client
+      self.__lock.acquire()
+      try: self.__clients.append(client)
+      finally: self.__lock.release()
+    return client
+
+  def listdir(self, path):
+    """list a remote directory.  listings are remembered for the life of the source.
+
+    **Args**:
+      * **path** (str): the remote directory
+    **Returns**:
+      * **files** (list): the file names in the directory
+    """
+    if not self.__listings.has_key(path):
+      self.__listings[path] = self.__client().listdir(path)
+    return self.__listings[path]
+
+  def get(self, remotePath, localPath):
+    """download a file
+
+    **Args**:
+      * **remotePath** (str): the file on the server
+      * **localPath** (str): where to put it
+    """
+    self.__client().get(remotePath,localPath)
+
+  def close(self):
+    """close all of the sftp channels and the transport"""
+    for client in self.__clients:
+      try: client.close()
+      except Exception: pass
+    self.__clients = []
+    try: self.transport.close()
+    except Exception: pass
+
+
+def fetchFiles(source, remoteFiles, localDir, nWorkers=None):
+  """download several files at once with a bounded pool of threads.
+
+  **Args**:
+    * **source** (:class:`pydarn.sdio.dataFetch.sftpSource`): the server to fetch from
+    * **remoteFiles** (list): the remote file paths
+    * **localDir** (str): the directory to put the files in
+    * **[nWorkers]** (int): the most files to fetch at once.  if None, use :func:`defaultWorkers`. default = None
+  **Returns**:
+    * **localFiles** (list): the local file paths, in the same order as remoteFiles
+  """
+  import os
+  from multiprocessing.pool import ThreadPool
+
+  if nWorkers is None: nWorkers = defaultWorkers()
+  pairs = [(f,os.path.join(localDir,os.path.basename(f))) for f in remoteFiles]
+
+  def fetch(pair):
+    print 'copying file '+pair[0]+' to '+pair[1]
+    source.get(pair[0],pair[1])
+    return pair[1]
+
+  if nWorkers <= 1 or len(pairs) <= 1:
+    return [fetch(pair) for pair in pairs]
+  pool = ThreadPool(min(nWorkers,len(pairs)))
+  try:
+    #map keeps the results in the order of the input
+    return pool.map(fetch,pairs)
+  finally:
+    pool.close()
+    pool.join()
@@ -0,0 +1,238 @@
+# Copyright (C) 2012  VT SuperDARN Lab
+# Full license can be found in LICENSE.txt
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+.. module:: dataPrefetch
+   :synopsis: read and decode dmap records ahead of use in a background thread
+
+************************************
+**Module**: pydarn.sdio.dataPrefetch
+************************************
+
+**Classes**:
+  * :class:`pydarn.sdio.dataPrefetch.dmapPrefetcher`
+"""
+
+class dmapPrefetcher():
+  """A wrapper around a :class:`pydarn.dmapio.DmapReader` or :class:`pydarn.sdio.dmapStream.dmapStream` which reads and decodes records in a background thread, into a bounded queue, while the caller works on the previous ones.  Decoding releases the GIL, so it overlaps with plotting or processing in the main thread.
+
+  The thread repeats the last readRec or readBlock call with the same arguments.  A call with different arguments, or a seek anywhere but the next queued record, stops the thread, puts the reader back at the first record which has not been handed out and starts again, so records always come back in order and exactly once.  Other attributes are passed through to the wrapped reader.
+
+  **Public Attrs**:
+    * **ptr** (:class:`pydarn.dmapio.DmapReader` or :class:`pydarn.sdio.dmapStream.dmapStream`): the wrapped reader
+    * **depth** (int): the most records (or blocks) read ahead
+
+  **Methods**:
+    * :func:`readRec`
+    * :func:`readBlock`
+    * :func:`tell`
+    * :func:`seek`
+    * :func:`rewind`
+    * :func:`stats`
+    * :func:`cancel`
+    * :func:`close`
+
+  **Example**:
+    ::
+
+      myPtr = pydarn.sdio.dmapPrefetcher(pydarn.dmapio.DmapReader('20110101.000000.20110102.000000.bks.fitex'))
+      rec = myPtr.readRec()
+  """
+  def __init__(self, ptr, depth=8):
+    self.ptr = ptr
+    self.depth = max(1,int(depth))
+    self.__thread = None
+    self.__queue = None
+    self.__stop = None
+    self.__call = None
+    self.__pos = None
+    self.__head = None
+    self.__dropped = None
+    self.__counts = {'reads':0,'stalls':0,'stallTime':0.,'fullTime':0.,'maxDepth':0,'restarts':0}
+
+  def __repr__(self):
+    return 'dmapPrefetcher: %s, %s' % (repr(self.ptr),str(self.stats()))
+
+  def __getattr__(self, name):
+    #only called for attributes we do not have, eg closed or name
+    if name.startswith('__'): raise AttributeError(name)
+    return getattr(self.ptr,name)
+
+  def __run(self, method, kwargs, queue, stop):
+    """the background thread, reads until the end of the data or until told to stop"""
+    import sys, time, Queue
+    method = getattr(self.ptr,method)
+    while not stop.isSet():
+      before = self.ptr.tell()
+      try:
+        item = ('ok',method(**kwargs))
+      except Exception:
+        item = ('error',sys.exc_info())
+      entry = (before,self.ptr.tell(),item)
+      t = time.time()
+      while True:
+        try:
+          queue.put(entry,timeout=0.05)
+          break
+        except Queue.Full:
+          if stop.isSet():
+            #nobody took this one, so the reader has to be put back to it
+            self.__dropped = before
+            return
+      self.__counts['fullTime'] += time.time()-t
+      self.__counts['reads'] += 1
+      self.__counts['maxDepth'] = max(self.__counts['maxDepth'],queue.qsize())
+      if item[0] == 'error' or item[1] is None: return
+
+  def __start(self, method, kwargs):
+    import threading, Queue
+    self.__call = (method,self.__key(kwargs))
+    self.__queue = Queue.Queue(self.depth)
+    self.__stop = threading.Event()
+    self.__dropped = None
+    self.__head = None
+    self.__pos = self.ptr.tell()
+    self.__thread = threading.Thread(target=self.__run,args=(method,kwargs,self.__queue,self.__stop))
+    self.__thread.daemon = True
+    self.__thread.start()
+
+  def cancel(self):
+    """stop the background thread and put the wrapped reader back at the first record which has not been handed out."""
+    import Queue
+    if self.__thread is None: return
+    self.__stop.set()
+    resume = None
+    if self.__head is not None: resume = self.__head[0]
+    #empty the queue so the thread is not stuck waiting to put
+    while self.__thread.isAlive():
+      try:
+        entry = self.__queue.get(timeout=0.05)
+        if resume is None: resume = entry[0]
+      except Queue.Empty:
+        pass
+    self.__thread.join()
+    while True:
+      try: entry = self.__queue.get_nowait()
+      except Queue.Empty: break
+      if resume is None: resume = entry[0]
+    if resume is None: resume = self.__dropped
+    if resume is None: resume = self.__pos
+    self.__thread = None
+    self.__queue = None
+    self.__head = None
+    self.__call = None
+    if resume is not None and not self.ptr.closed: self.ptr.seek(resume)
+
+  def __peek(self):
+    """wait for the next queued entry without taking it"""
+    import time
+    if self.__head is None:
+      if self.__queue.empty():
+        self.__counts['stalls'] += 1
+        t = time.time()
+        self.__head = self.__queue.get()
+        self.__counts['stallTime'] += time.time()-t
+      else:
+        self.__head = self.__queue.get()
+    return self.__head
+
+  def __next(self, method, kwargs):
+    if self.__thread is not None and self.__call != (method,self.__key(kwargs)):
+      self.__counts['restarts'] += 1
+      self.cancel()
+    if self.__thread is None:
+      self.__start(method,kwargs)
+    before,after,item = self.__peek()
+    self.__head = None
+    self.__pos = after
+    if item[0] == 'error':
+      #the thread has stopped, let the next read try again from here
+      self.__thread.join()
+      self.__thread = None
+      self.ptr.seek(before)
+      raise item[1][0],item[1][1],item[1][2]
+    if item[1] is None:
+      #end of data, the thread has stopped
+      self.__thread.join()
+      self.__thread = None
+      self.ptr.seek(before)
+      self.__pos = before
+    return item[1]
+
+  def readRec(self, numpy=False, fields=None, filters=None):
+    """read the next record, see :func:`pydarn.sdio.dmapStream.dmapStream.readRec`"""
+    return self.__next('readRec',{'numpy':numpy,'fields':fields,'filters':filters})
+
+  def readBlock(self, nrec=None, fields=None, filters=None):
+    """read the next block of records, see :func:`pydarn.sdio.dmapStream.dmapStream.readBlock`"""
+    return self.__next('readBlock',{'nrec':nrec,'fields':fields,'filters':filters})
+
+  def __key(self, kwargs):
+    """a comparable form of a set of read arguments"""
+    key = []
+    for k,v in sorted(kwargs.items()):
+      if isinstance(v,dict): v = tuple(sorted(v.items()))
+      elif isinstance(v,(set,frozenset,list)): v = tuple(sorted(v))
+      key.append((k,v))
+    return tuple(key)
+
+  def tell(self):
+    """the position of the next record which will be handed out"""
+    if self.__thread is None: return self.ptr.tell()
+    return self.__pos
+
+  def seek(self, pos):
+    """jump to a position returned by :func:`tell`.  Seeking to the next record read ahead, or past records skipped by the filters on the way to it, keeps the thread going."""
+    if self.__thread is not None:
+      if pos == self.__pos: return True
+      head = self.__peek()
+      #a record read skips the ones which do not match on the way, so
+      #seeking to any of them, or to the record itself, reads the same one
+      if pos == head[0] or (self.__call[0] == 'readRec' and head[0] <= pos < head[1]):
+        self.__pos = pos
+        return True
+      self.cancel()
+    return self.ptr.seek(pos)
+
+  def rewind(self):
+    """jump to the first record"""
+    self.cancel()
+    return self.ptr.rewind()
+
+  def stats(self):
+    """report how the read ahead is going
+
+    **Returns**:
+      * **stats** (dict): depth (entries waiting now), maxDepth, reads (entries read by the thread), stalls (reads which had to wait for the thread), stallTime (seconds spent waiting for the thread), fullTime (seconds the thread spent waiting for room in the queue) and restarts
+    """
+    stats = dict(self.__counts)
+    stats['depth'] = 0
+    if self.__queue is not None: stats['depth'] = self.__queue.qsize()+(self.__head is not None)
+    return stats
+
+  def close(self):
+    """stop the thread and close the wrapped reader"""
+    if self.__thread is not None:
+      self.__stop.set()
+      import Queue
+      while self.__thread.isAlive():
+        try: self.__queue.get(timeout=0.05)
+        except Queue.Empty: pass
+      self.__thread.join()
+      self.__thread = None
+      self.__queue = None
+      self.__head = None
+    self.ptr.close()
@@ -0,0 +1,395 @@
+# Copyright (C) 2012  VT SuperDARN Lab
+# Full license can be found in LICENSE.txt
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+.. module:: dmapStream
+   :synopsis: read dmap records from a chain of plain, gzip or bzip2 files
+
+**********************************
+**Module**: pydarn.sdio.dmapStream
+**********************************
+
+**Classes**:
+  * :class:`pydarn.sdio.dmapStream.dmapStream`
+"""
+
+#the first int32 of every dmap record
+dmapCode = 0x00010001
+#bytes read from disk at a time
+chunkSize = 1 << 20
+#chunks a file decompressed ahead of the reader may hold in memory
+aheadChunks = 8
+
+def readChunks(filename, skip=0):
+  """A generator which yields the decompressed contents of a plain, gzip (.gz) or bzip2 (.bz2) file in large chunks.  Concatenated gzip members and multi-stream bzip2 files (eg from pbzip2) are handled.
+
+  **Args**:
+    * **filename** (str): the file to read
+    * **[skip]** (int): the number of decompressed bytes to skip at the start of the file. default = 0
+  **Returns**:
+    * a generator of strings
+  """
+  import bz2, zlib
+
+  if filename.endswith('.bz2'): make = bz2.BZ2Decompressor
+  elif filename.endswith('.gz'): make = lambda: zlib.decompressobj(16+zlib.MAX_WBITS)
+  else: make = None
+
+  f = open(filename,'rb')
+  try:
+    #plain files can just seek past the skipped part
+    if make is None:
+      f.seek(skip)
+      skip = 0
+    dec = None
+    if make is not None: dec = make()
+    member = 0
+    while True:
+      data = f.read(chunkSize)
+      if not data: break
+      while data:
+        if dec is None:
+          out,data = data,''
+        else:
+          try:
+            out = dec.decompress(data)
+          except EOFError:
+            #the previous bzip2 stream finished right at the chunk boundary
+            dec,member = make(),member+1
+            continue
+          except (IOError,zlib.error):
+            #trailing padding after the last member, nothing more to read
+            if member == 0: raise
+            return
+          data = dec.unused_data
+          if data: dec,member = make(),member+1
+        if skip > 0:
+          n = min(skip,len(out))
+          out,skip = out[n:],skip-n
+        if out: yield out
+  finally:
+    f.close()
+
+
+class _chunkFeeder():
+  """decompresses a file in a pool thread into a bounded queue of chunks of at most chunkSize bytes, so a file read ahead holds no more than aheadChunks of them until the stream gets to it.  cancel stops the thread at its next chunk."""
+  def __init__(self, filename):
+    import Queue, threading
+    self.filename = filename
+    self.queue = Queue.Queue(aheadChunks)
+    self.cancelled = threading.Event()
+
+  def __put(self, item):
+    """wait for room in the queue, returns False once cancelled"""
+    import Queue
+    while not self.cancelled.is_set():
+      try:
+        self.queue.put(item,timeout=.1)
+        return True
+      except Queue.Full:
+        pass
+    return False
+
+  def run(self, skip=0):
+    """the pool thread, the file ends with None or the exception which stopped it"""
+    try:
+      for out in readChunks(self.filename,skip=skip):
+        #a decompressor can give back many times what it was fed
+        pieces = [out]
+        if len(out) > chunkSize: pieces = [out[i:i+chunkSize] for i in xrange(0,len(out),chunkSize)]
+        for piece in pieces:
+          if not self.__put(piece): return
+      self.__put(None)
+    except Exception,e:
+      self.__put(e)
+
+  def chunks(self):
+    """a generator of the chunks, for the reading thread"""
+    while True:
+      item = self.queue.get()
+      if item is None: return
+      if isinstance(item,Exception): raise item
+      yield item
+
+  def cancel(self):
+    self.cancelled.set()
+
+
+def readFile(filename):
+  """read and decompress a whole plain, gzip or bzip2 file into memory
+
+  **Args**:
+    * **filename** (str): the file to read
+  **Returns**:
+    * **data** (str): the decompressed contents
+  """
+  return ''.join(readChunks(filename))
+
+
+class dmapStream():
+  """A class which reads dmap records in order from a chain of plain, gzip or bzip2 files, decompressing them in memory instead of writing temporary files.  It has the same reading methods as :class:`pydarn.dmapio.DmapReader`, which is used for single plain files.
+
+  **Public Attrs**:
+    * **files** (list): the files being read, in order
+    * **windows** (list): an optional (start epoch, end epoch) pair for each file.  :func:`readRec` skips records of a file outside of [start,end), either end may be None.  This is used to join files whose time spans overlap.
+    * **recTime** (function): gives the epoch time of a record dictionary, used with windows.  default reads the 'time' key
+    * **nWorkers** (int): the number of files decompressed at once.  when more than 1, the next nWorkers files are decompressed by a thread pool while the current one is read.  each holds at most aheadChunks chunks of chunkSize bytes until the stream gets to it, so memory stays bounded whatever the size of the files.  records are always returned in file order
+    * **closed** (bool): True once the stream has been closed
+    * **bytesRead** (int): the decompressed bytes of the records read so far
+    * **recordsRead** (int): the records decoded so far
+    * **recordsSkipped** (int): the records passed over by the filters and windows so far
+
+  **Methods**:
+    * :func:`readRaw`
+    * :func:`readRec`
+    * :func:`readBlock`
+    * :func:`tell`
+    * :func:`seek`
+    * :func:`rewind`
+    * :func:`dump`
+    * :func:`close`
+
+  **Example**:
+    ::
+
+      myStream = pydarn.sdio.dmapStream(['20110101.0001.00.bks.fitex.bz2','20110101.0201.00.bks.fitex.bz2'])
+      rec = myStream.readRec()
+  """
+  def __init__(self, files, windows=None, recTime=None, nWorkers=1):
+    self.files = list(files)
+    self.windows = windows
+    self.recTime = recTime
+    if self.recTime is None: self.recTime = lambda aDict: aDict['time']
+    self.nWorkers = nWorkers
+    self.closed = False
+    self.bytesRead = self.recordsRead = self.recordsSkipped = 0
+    self.__pool = None
+    self.__pending = {}
+    self.__feeder = None
+    self.__fileNum = 0
+    self.__filePos = 0
+    self.__chunks = None
+    self.__buf = ''
+    self.__bufPos = 0
+
+  def __repr__(self):
+    return 'dmapStream: %d files, at %s' % (len(self.files),str(self.tell()))
+
+  def __openFile(self, fileNum, skip=0):
+    """start reading a file of the chain, returns False past the last file"""
+    self.__fileNum = fileNum
+    self.__filePos = skip
+    self.__buf = ''
+    self.__bufPos = 0
+    self.__chunks = None
+    if self.__feeder is not None: self.__feeder.cancel()
+    self.__feeder = None
+    if fileNum >= len(self.files): return False
+    if self.nWorkers > 1 and len(self.files) > 1:
+      self.__prefetch(fileNum,skip)
+      self.__feeder = self.__pending.pop(fileNum)
+      self.__chunks = self.__feeder.chunks()
+    else:
+      self.__chunks = readChunks(self.files[fileNum],skip=skip)
+    return True
+
+  def __prefetch(self, fileNum, skip=0):
+    """make sure the files from fileNum on are being decompressed, up to nWorkers at a time.  fileNum is started skip bytes in."""
+    from multiprocessing.pool import ThreadPool
+    if self.__pool is None: self.__pool = ThreadPool(self.nWorkers)
+    #stop the files outside of the ones wanted now, and fileNum if it was
+    #started from somewhere else, so their threads are free for these
+    for i in self.__pending.keys():
+      if i < fileNum or i >= fileNum+self.nWorkers or (i == fileNum and skip > 0):
+        self.__pending.pop(i).cancel()
+    for i in range(fileNum,min(fileNum+self.nWorkers,len(self.files))):
+      if not self.__pending.has_key(i):
+        feeder = _chunkFeeder(self.files[i])
+        self.__pool.apply_async(feeder.run,(skip if i == fileNum else 0,))
+        self.__pending[i] = feeder
+
+  def __fill(self, n):
+    """make sure at least n bytes are buffered, returns False at the end of the current file"""
+    while len(self.__buf)-self.__bufPos < n:
+      try:
+        chunk = self.__chunks.next()
+      except StopIteration:
+        return False
+      self.__buf = self.__buf[self.__bufPos:]+chunk
+      self.__bufPos = 0
+    return True
+
+  def readRaw(self):
+    """read the next record as an encoded string.
+
+    **Returns**:
+      * **rec** (str): the encoded record, None when there is no more data
+    """
+    import struct
+
+    if self.closed: return None
+    while True:
+      if self.__chunks is None:
+        if not self.__openFile(self.__fileNum,self.__filePos): return None
+      if not self.__fill(8):
+        self.__openFile(self.__fileNum+1)
+        continue
+      code,size = struct.unpack_from('<ii',self.__buf,self.__bufPos)
+      if code != dmapCode or size < 16 or not self.__fill(size):
+        print 'problem reading',self.files[self.__fileNum],'at byte',self.__filePos,', skipping rest of file'
+        self.__openFile(self.__fileNum+1)
+        continue
+      rec = self.__buf[self.__bufPos:self.__bufPos+size]
+      self.__bufPos += size
+      self.__filePos += size
+      self.bytesRead += size
+      return rec
+
+  def readRec(self, numpy=False, fields=None, filters=None):
+    """read and decode the next record.
+
+    **Args**:
+      * **[numpy]** (bool): return array fields as numpy arrays. default = False
+      * **[fields]** (set): the names of the array fields to decode, None decodes all of them.  scalars are always decoded. default = None
+      * **[filters]** (dict): keywords for decodeDmapRec (sTime, eTime, stid, channel, bmnum, cp, tfreq).  records which do not match are skipped after looking at their scalars only. default = None
+    **Returns**:
+      * **rec** (dict): the decoded record, as returned by readDmapRec.  None when there is no more data, or once a matching record is later than filters['eTime']
+    """
+    from pydarn.dmapio import decodeDmapRec
+    filters,eTime = self.__splitFilters(filters)
+    while True:
+      rec = self.readRaw()
+      if rec is None: return None
+      dfile = decodeDmapRec(rec,numpy=numpy,fields=fields,**filters)
+      if dfile is None or dfile is False:
+        self.recordsSkipped += 1
+        continue
+      t = self.recTime(dfile)
+      if self.windows is not None and self.windows[self.__fileNum] is not None:
+        t1,t2 = self.windows[self.__fileNum]
+        if (t1 is not None and t < t1) or (t2 is not None and t >= t2):
+          self.recordsSkipped += 1
+          continue
+      if eTime is not None and t > eTime: return None
+      self.recordsRead += 1
+      return dfile
+
+  def __splitFilters(self, filters):
+    """take eTime out of the filters.  a chained stream may hold records past eTime in one file and earlier ones in the next, so the end of the request is only decided on records which pass the file windows."""
+    if filters is None: return {},None
+    filters = dict(filters)
+    return filters,filters.pop('eTime',None)
+
+  def readBlock(self, nrec=None, fields=None, filters=None):
+    """read a run of records into columns, see decodeDmapBlock.
+
+    **Args**:
+      * **[nrec]** (int): the most records to read, None reads to the end. default = None
+      * **[fields]** (set): the names of the array fields to decode, None decodes all of them. default = None
+      * **[filters]** (dict): keywords for decodeDmapRec, as for :func:`readRec`. default = None
+    **Returns**:
+      * **block** (dict): the columns of the records read, None if there were none
+    """
+    from pydarn.dmapio import decodeDmapRec, decodeDmapBlock
+    filters,eTime = self.__splitFilters(filters)
+    recs = []
+    while nrec is None or len(recs) < nrec:
+      rec = self.readRaw()
+      if rec is None: break
+      #look at the scalars only to decide whether we want the record
+      dfile = decodeDmapRec(rec,fields=(),**filters)
+      if dfile is None or dfile is False:
+        self.recordsSkipped += 1
+        continue
+      t = self.recTime(dfile)
+      if self.windows is not None and self.windows[self.__fileNum] is not None:
+        t1,t2 = self.windows[self.__fileNum]
+        if (t1 is not None and t < t1) or (t2 is not None and t >= t2):
+          self.recordsSkipped += 1
+          continue
+      if eTime is not None and t > eTime: break
+      recs.append(rec)
+    self.recordsRead += len(recs)
+    if len(recs) == 0: return None
+    return decodeDmapBlock(recs,fields=fields)
+
+  def tell(self):
+    """the position of the next record.
+
+    **Returns**:
+      * **pos** (tuple): (file number, decompressed byte offset in that file)
+    """
+    return (self.__fileNum,self.__filePos)
+
+  def seek(self, pos):
+    """jump to a position returned by :func:`tell`.  Seeking backwards within a compressed file restarts decompression of that file.
+
+    **Args**:
+      * **pos** (tuple): (file number, decompressed byte offset in that file)
+    **Returns**:
+      * **success** (bool)
+    """
+    fileNum,filePos = pos
+    if (fileNum,filePos) == self.tell(): return True
+    #move forward inside the current file without restarting it
+    if fileNum == self.__fileNum and filePos > self.__filePos and self.__chunks is not None:
+      while self.__filePos < filePos:
+        n = min(filePos-self.__filePos,chunkSize)
+        if not self.__fill(n): return False
+        self.__bufPos += n
+        self.__filePos += n
+      return True
+    return self.__openFile(fileNum,filePos)
+
+  def rewind(self):
+    """jump to the first record of the first file."""
+    return self.seek((0,0))
+
+  def dump(self, filename):
+    """write all of the remaining records into a single uncompressed dmap file.
+
+    **Args**:
+      * **filename** (str): the file to write
+    **Returns**:
+      * **nrec** (int): the number of records written
+    """
+    nrec = 0
+    f = open(filename,'wb')
+    try:
+      while True:
+        rec = self.readRaw()
+        if rec is None: break
+        f.write(rec)
+        nrec += 1
+    finally:
+      f.close()
+    return nrec
+
+  def close(self):
+    """stop reading and release the current file."""
+    if self.__chunks is not None and hasattr(self.__chunks,'close'): self.__chunks.close()
+    self.__chunks = None
+    self.__buf = ''
+    if self.__feeder is not None: self.__feeder.cancel()
+    self.__feeder = None
+    for feeder in self.__pending.values(): feeder.cancel()
+    self.__pending = {}
+    if self.__pool is not None:
+      #the cancelled feeders give up their threads at their next chunk
+      self.__pool.close()
+      self.__pool.join()
+      self.__pool = None
+    self.closed = True
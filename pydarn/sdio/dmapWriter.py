@@ -0,0 +1,242 @@
+# Copyright (C) 2012  VT SuperDARN Lab
+# Full license can be found in LICENSE.txt
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+.. module:: dmapWriter
+   :synopsis: write dmap records from dicts, beams, scans and columnar blocks
+
+**********************************
+**Module**: pydarn.sdio.dmapWriter
+**********************************
+
+**Classes**:
+  * :class:`pydarn.sdio.dmapWriter.dmapWriter`
+**Functions**:
+  * :func:`pydarn.sdio.dmapWriter.beamToDict`
+"""
+
+#dmap type codes
+DATACHAR,DATASHORT,DATAINT,DATAFLOAT,DATADOUBLE,DATASTRING,DATALONG = 1,2,3,4,8,9,10
+
+def _typeTable(spec):
+  table = {}
+  for code,names in spec:
+    for name in names.split(): table[name] = code
+  return table
+
+#the dmap types of the standard radar fields.  records read back from a file lose the types of
+#their scalars, and RST readers only accept a field with its own type, so these are always used
+dmapTypes = _typeTable([
+  (DATACHAR,'radar.revision.major radar.revision.minor origin.code qflg gflg x_qflg x_gflg'),
+  (DATASTRING,'origin.time origin.command combf'),
+  (DATASHORT,'cp stid time.yr time.mo time.dy time.hr time.mt time.sc txpow nave atten lagfr ' \
+             'smsep ercod stat.agc stat.lopwr channel bmnum scan offset rxrise intt.sc txpl mpinc ' \
+             'mppul mplgs mplgexs ifmode nrang frang rsep xcf tfreq ptab ltab slist nlag tatten ' \
+             'start.year start.month start.day start.hour start.minute end.year end.month end.day ' \
+             'end.hour end.minute'),
+  (DATAINT,'time.us intt.us mxpwr lvmax fitacf.revision.major fitacf.revision.minor ' \
+           'rawacf.revision.major rawacf.revision.minor iqdata.revision.major iqdata.revision.minor ' \
+           'seqnum chnnum smpnum skpnum tsc tus toff tsze'),
+  (DATAFLOAT,'noise.search noise.mean bmazm noise.sky noise.lag0 noise.vel thr pwr0 p_l p_l_e p_s ' \
+             'p_s_e v v_e w_l w_l_e w_s w_s_e sd_l sd_s sd_phi x_p_l x_p_l_e x_p_s x_p_s_e x_v x_v_e ' \
+             'x_w_l x_w_l_e x_w_s x_w_s_e x_sd_l x_sd_s x_sd_phi phi0 phi0_e elv elv_low elv_high ' \
+             'acfd xcfd tnoise'),
+  (DATADOUBLE,'start.second end.second'),
+])
+
+def beamToDict(myBeam):
+  """the record dict of a beam, as read from a dmap file.  Fields are taken from the attributes of the beam, so changes made to it are written out.  Fields which no attribute holds come from its recordDict, if it has one.
+
+  .. note::
+    The lag table is written as it is held.  The reader drops its last (alternate lag 0) entry, so a lag table which has been read and written is one entry shorter.
+
+  **Args**:
+    * **myBeam** (:class:`pydarn.sdio.radDataTypes.beamData`): the beam
+  **Returns**:
+    * **aDict** (dict): the record, with the time as an epoch float
+  """
+  from utils.timeUtils import datetimeToEpoch
+  from pydarn.sdio.radDataTypes import channelAlpha
+
+  aDict = myBeam.recordDict
+  if aDict is None: aDict = {}
+  for srcName,src in myBeam._sources():
+    unmap = getattr(src,'_fieldUnmap',{})
+    for name,attr,conv,default in src._fieldMap:
+      val = getattr(src,attr,None)
+      if val is None: continue
+      if unmap.has_key(name): val = unmap[name](val)
+      #the other converted fields either have no inverse or are put back below
+      elif conv is not None: continue
+      if val is not None: aDict[name] = val
+  if myBeam.time is not None: aDict['time'] = datetimeToEpoch(myBeam.time)
+  ch = myBeam.channel
+  if ch is not None:
+    old = aDict.get('channel')
+    if not isinstance(old,int) or channelAlpha[min(max(old,0),len(channelAlpha)-1)] != ch:
+      if ch == 'a':
+        if myBeam.cp == 153: aDict['channel'] = 1
+        else: aDict['channel'] = 0
+      elif ch in channelAlpha: aDict['channel'] = channelAlpha.index(ch)
+  return aDict
+
+def _blockDict(block):
+  """the dict form of a columnar block"""
+  if isinstance(block,dict): return block
+  return {'nrec':block.nrec,'scalars':block.scalars,'arrays':block.arrays}
+
+
+class dmapWriter():
+  """A class which writes dmap records to a plain, gzip (.gz) or bzip2 (.bz2) file.  Records are encoded in C, a scan, list or columnar block at a time, by :func:`pydarn.dmapio.encodeDmapRecs` and :func:`pydarn.dmapio.encodeDmapBlock`, and written through a buffer, so a day of records is written in seconds instead of the minutes of writing them a beam at a time.  Compressed files are compressed as they are written.
+
+  Fields are written with the dmap types in dmapTypes, or the types given, so RST will read the files.  Other fields keep their numpy type, or for plain python values are written as int, double or string.
+
+  **Public Attrs**:
+    * **fileName** (str): the file being written
+    * **compress** (str): None, 'gz' or 'bz2'
+    * **types** (dict): field name -> dmap type code, dmapTypes plus any given
+    * **nrec** (int): the number of records written
+    * **nbytes** (int): the number of (uncompressed) bytes written
+    * **closed** (bool): True once the file has been closed
+
+  **Methods**:
+    * :func:`writeRec`
+    * :func:`writeRecs`
+    * :func:`writeScan`
+    * :func:`writeBlock`
+    * :func:`flush`
+    * :func:`close`
+
+  **Example**:
+    ::
+
+      myPtr = pydarn.sdio.radDataOpen(dt.datetime(2011,1,1),'bks',eTime=dt.datetime(2011,1,2))
+      myWriter = pydarn.sdio.dmapWriter('20110101.bks.fitex.bz2')
+      myBlock = myPtr.readBlock()
+      myWriter.writeBlock(myBlock.select(myBlock['tfreq'] < 12000))
+      myWriter.close()
+  """
+  def __init__(self, fileName, compress=None, types=None, append=False, bufferSize=1<<20, level=6):
+    """open a file for writing
+
+    **Args**:
+      * **fileName** (str): the file to write
+      * **[compress]** (str): None, 'gz' or 'bz2'.  if None, taken from the end of fileName.  default = None
+      * **[types]** (dict): field name -> dmap type code, for fields not in dmapTypes or to override them.  default = None
+      * **[append]** (bool): add to the end of the file instead of replacing it.  default = False
+      * **[bufferSize]** (int): the number of bytes encoded before they are written.  default = 1MB
+      * **[level]** (int): the compression level, 1 (fast) to 9 (small).  default = 6
+    """
+    import gzip, bz2
+    if compress is None:
+      if fileName.endswith('.gz'): compress = 'gz'
+      elif fileName.endswith('.bz2'): compress = 'bz2'
+    assert(compress in (None,'gz','bz2')),"error, compress must be None, 'gz' or 'bz2'"
+    self.fileName = fileName
+    self.compress = compress
+    self.types = dict(dmapTypes)
+    if types is not None: self.types.update(types)
+    self.bufferSize = bufferSize
+    self.nrec = 0
+    self.nbytes = 0
+    self.closed = False
+    mode = 'wb'
+    if append: mode = 'ab'
+    if compress == 'gz': self.__f = gzip.GzipFile(fileName,mode,level)
+    elif compress == 'bz2': self.__f = bz2.BZ2File(fileName,mode,compresslevel=level)
+    else: self.__f = open(fileName,mode)
+    self.__buf = []
+    self.__buflen = 0
+
+  def __repr__(self):
+    return 'dmapWriter: %s, %d records' % (self.fileName,self.nrec)
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, type, value, traceback):
+    self.close()
+
+  def __add(self, data, nrec):
+    """buffer encoded records, writing them once there are enough"""
+    assert(not self.closed),'error, '+self.fileName+' is closed'
+    self.__buf.append(data)
+    self.__buflen += len(data)
+    self.nrec += nrec
+    self.nbytes += len(data)
+    if self.__buflen >= self.bufferSize: self.flush()
+
+  def writeRec(self, rec):
+    """write one record
+
+    **Args**:
+      * **rec** (dict or :class:`pydarn.sdio.radDataTypes.beamData`): a record dict, as read by :func:`pydarn.dmapio.readDmapRec`, or a beam
+    **Returns**:
+      * Nothing.
+    """
+    self.writeRecs([rec])
+
+  def writeRecs(self, recs):
+    """write a list of records, encoded in one call
+
+    **Args**:
+      * **recs** (list): record dicts or beams
+    **Returns**:
+      * Nothing.
+    """
+    from pydarn.dmapio import encodeDmapRecs
+    recs = [r if isinstance(r,dict) else beamToDict(r) for r in recs]
+    if len(recs) == 0: return
+    self.__add(encodeDmapRecs(recs,types=self.types),len(recs))
+
+  def writeScan(self, myScan):
+    """write the beams of a scan
+
+    **Args**:
+      * **myScan** (:class:`pydarn.sdio.radDataTypes.scanData`): the scan, or any list of beams
+    **Returns**:
+      * Nothing.
+    """
+    self.writeRecs(myScan)
+
+  def writeBlock(self, block):
+    """write a columnar block, one record per row.  the block's time column is written as the time.* fields, to the millisecond it was read with.
+
+    **Args**:
+      * **block** (:class:`pydarn.sdio.radDataTypes.radDataBlock`): the block, or a block dict as read by :func:`pydarn.dmapio.readDmapBlock`
+    **Returns**:
+      * Nothing.
+    """
+    from pydarn.dmapio import encodeDmapBlock
+    block = _blockDict(block)
+    if block['nrec'] == 0: return
+    self.__add(encodeDmapBlock(block,types=self.types),block['nrec'])
+
+  def flush(self):
+    """write out the records buffered so far"""
+    if self.__buflen == 0: return
+    self.__f.write(''.join(self.__buf))
+    self.__buf = []
+    self.__buflen = 0
+
+  def close(self):
+    """write out anything buffered and close the file"""
+    if self.closed: return
+    try:
+      self.flush()
+    finally:
+      self.__f.close()
+      self.closed = True
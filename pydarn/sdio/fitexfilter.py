@@ -25,6 +25,7 @@ Filter fitexfiles natively in python
 **Functions**:
   * :func:`pydarn.sdio.fitexfilter.combBeams`
   * :func:`pydarn.sdio.fitexfilter.fitFilter`
+  * :func:`pydarn.sdio.fitexfilter.fitRecord`
   * :func:`pydarn.sdio.fitexfilter.doFilter`
 **Classes**:
   * :class:`pydarn.sdio.fitexfilter.Gate`
@@ -35,6 +36,11 @@ import numpy as np
 import datetime as dt
 import utils
 
+#the per gate fields of a fit record, those which are not filtered are written as zeros
+gateFields = ['nlag','qflg','gflg','p_l','p_l_e','p_s','p_s_e','v','v_e','w_l','w_l_e','w_s','w_s_e', \
+              'sd_l','sd_s','sd_phi','phi0','phi0_e','elv','elv_low','elv_high','x_qflg','x_gflg', \
+              'x_p_l','x_p_l_e','x_p_s','x_p_s_e','x_v','x_v_e','x_w_l','x_w_l_e','x_w_s','x_w_s_e', \
+              'x_sd_l','x_sd_s','x_sd_phi']
 
 class Gate(object):
   """A class to represent a single range gate
@@ -100,7 +106,7 @@ def combBeams(scan):
 
       #initialize a new beam object
       myBeam.copyData(beams[0])
-      for key,val in myBeam.fit.__dict__.iteritems(): 
+      for key in myBeam.fit.__slots__: 
         setattr(myBeam.fit,key,[])
       myBeam.prm.nrang = nrang
 
@@ -111,7 +117,7 @@ def combBeams(scan):
         if cnt/pos > .5:
           myBeam.fit.slist.append(j)
           myBeam.fit.qflg = 1
-          for key in myBeam.fit.__dict__.iterkeys():
+          for key in myBeam.fit.__slots__:
             if key == 'qflg' or key == 'gflg' or key == 'slist':
               continue
             arr = []
@@ -150,7 +156,7 @@ def fitFilter(inFile,outFile,thresh=0.4,vb=False):
   """
   inp = pydarn.sdio.radDataOpen(dt.datetime(2010,5,1),'bks',fileName=inFile)
 
-  outp = open(outFile,'w')
+  outp = pydarn.sdio.dmapWriter(outFile)
 
   scans = [None, None, None]
 
@@ -163,10 +169,8 @@ def fitFilter(inFile,outFile,thresh=0.4,vb=False):
   while sc != None:
 
     tsc = doFilter(scans,thresh=thresh)
-
-    for b in tsc:
-      print b
-      pydarn.dmapio.writeFitRec(b,utils.datetimeToEpoch(b.time),outp)
+    if vb and len(tsc) > 0: print tsc[0].time
+    outp.writeScan([fitRecord(b) for b in tsc])
 
     sc = pydarn.sdio.radDataReadScan(inp)
     
@@ -175,13 +179,41 @@ def fitFilter(inFile,outFile,thresh=0.4,vb=False):
     scans[2] = sc
 
   tsc = doFilter(scans,thresh=thresh)
-  print tsc.time
-  for b in tsc:
-    pydarn.dmapio.writeFitRec(b,utils.datetimeToEpoch(b.time),outp)
+  outp.writeScan([fitRecord(b) for b in tsc])
 
   outp.close()
 
 
+def fitRecord(myBeam):
+  """This function makes the record dict written for a filtered beam.  The filter only fills in some of the fit fields, so the others are written as zeros for each gate, and the filtered lag 0 powers are put back at their gates.
+    
+  **Args**: 
+    * **myBeam** (:class:`pydarn.sdio.radDataTypes.beamData`): a beam from :func:`doFilter`
+  **Returns**:
+    * **aDict** (dict): the record, see :func:`pydarn.sdio.dmapWriter.beamToDict`
+
+  **Example**:
+    ::
+    
+      myWriter.writeRec(fitRecord(myBeam))
+    
+  """
+  aDict = pydarn.sdio.beamToDict(myBeam)
+  fit = myBeam.fit
+  ngate = len(fit.slist)
+  #doFilter keeps a lag 0 power for each gate it keeps
+  if fit.pwr0 is not None and len(fit.pwr0) == ngate:
+    pwr0 = np.zeros(myBeam.prm.nrang,dtype=np.float32)
+    for r,p in zip(fit.slist,fit.pwr0):
+      if r < len(pwr0): pwr0[r] = p
+    aDict['pwr0'] = pwr0
+  aDict.pop('npnts',None)
+  for key in gateFields:
+    if not aDict.has_key(key): continue
+    if key not in fit.__slots__ or len(aDict[key]) != ngate: aDict[key] = np.zeros(ngate)
+  return aDict
+
+
 def doFilter(scans,thresh=.4):
   """This function applies a boxcar filter to consecutive scans
     
@@ -233,7 +265,7 @@ def doFilter(scans,thresh=.4):
     #make a new beam
     myBeam = pydarn.sdio.beamData()
     myBeam.copyData(b)
-    for key,val in myBeam.fit.__dict__.iteritems(): 
+    for key in myBeam.fit.__slots__: 
       setattr(myBeam.fit,key,[])
 
     for r in range(0,b.prm.nrang):
@@ -0,0 +1,607 @@
+# Copyright (C) 2012  VT SuperDARN Lab
+# Full license can be found in LICENSE.txt
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+.. module:: radDataArchive
+   :synopsis: a chunked columnar HDF5 archive of fit data, one file per radar and day
+
+**************************************
+**Module**: pydarn.sdio.radDataArchive
+**************************************
+
+An archive file holds one day of fitacf, fitex or lmfit records for one radar, in columns.  Each scalar field is a dataset of one value per record, and each array field (slist, v, p_l, etc) is a dataset of all of the values of all of the records, flattened, plus a dataset of nrec+1 offsets marking where each record starts, as in a :class:`pydarn.sdio.radDataTypes.radDataBlock`.  Records are grouped into chunks of a fixed number of rows, and the time and beam range of each chunk is kept, so a request only reads the chunks and the columns it needs.
+
+The layout of a file is::
+
+  /scalars/<name>            one value per record, 'time' is the epoch time
+  /arrays/<name>/values      the flattened values
+  /arrays/<name>/offsets     nrec+1 offsets into values
+  /chunks/start              nchunk+1 row numbers
+  /chunks/tmin, /chunks/tmax the first and last record time of each chunk
+  /chunks/bmmin, /chunks/bmmax, /chunks/beams  the beam range of each chunk, and a mask of the beams below 64
+
+Archive files are read by :func:`pydarn.sdio.radDataRead.radDataOpen`, from DAVIT_ARCHIVEDIR with src='archive' or when they are there, or by name with fileName, and so by everything that reads a :class:`pydarn.sdio.radDataTypes.radDataPtr`.  h5py is needed.
+
+**Functions**:
+  * :func:`pydarn.sdio.radDataArchive.archivePath`
+  * :func:`pydarn.sdio.radDataArchive.archiveFiles`
+  * :func:`pydarn.sdio.radDataArchive.archiveConvert`
+**Classes**:
+  * :class:`pydarn.sdio.radDataArchive.archiveWriter`
+  * :class:`pydarn.sdio.radDataArchive.radDataArchive`
+"""
+
+#the suffix of archive files
+archiveSuffix = '.h5'
+#the number of records in a chunk
+archiveChunkRows = 2048
+#the number of array values in an hdf5 chunk of an array field
+archiveValueChunk = 1 << 16
+#the archive file layout version
+archiveVersion = 1
+
+def archiveDir():
+  """the archive directory, DAVIT_ARCHIVEDIR or /sd-data/archive/"""
+  import os
+  return os.environ.get('DAVIT_ARCHIVEDIR','/sd-data/archive/')
+
+def archivePath(radcode, fileType, day, baseDir=None):
+  """the name of the archive file of a radar for a day
+
+  **Args**:
+    * **radcode** (str): the 3-letter radar code
+    * **fileType** (str): 'fitex', 'fitacf' or 'lmfit'
+    * **day** (`datetime <http://tinyurl.com/bl352yx>`_): any time in the day
+    * **[baseDir]** (str): the archive directory, if None use :func:`archiveDir`. default = None
+  **Returns**:
+    * **fileName** (str): eg /sd-data/archive/2011/bks/20110101.bks.fitex.h5
+  """
+  import os
+  if baseDir is None: baseDir = archiveDir()
+  return os.path.join(baseDir,day.strftime('%Y'),radcode,day.strftime('%Y%m%d')+'.'+radcode+'.'+fileType+archiveSuffix)
+
+def archiveFiles(radcode, fileType, sTime, eTime, baseDir=None):
+  """the archive files which exist for a radar over a span of time, in order
+
+  **Args**:
+    * **radcode** (str): the 3-letter radar code
+    * **fileType** (str): 'fitex', 'fitacf' or 'lmfit'
+    * **sTime** (`datetime <http://tinyurl.com/bl352yx>`_): the start of the span
+    * **eTime** (`datetime <http://tinyurl.com/bl352yx>`_): the end of the span
+    * **[baseDir]** (str): the archive directory, if None use :func:`archiveDir`. default = None
+  **Returns**:
+    * **files** (list): the file names, one for each day which has a file
+  """
+  import os, datetime as dt
+  files = []
+  day = dt.datetime(sTime.year,sTime.month,sTime.day)
+  while day <= eTime:
+    fileName = archivePath(radcode,fileType,day,baseDir=baseDir)
+    if os.path.isfile(fileName): files.append(fileName)
+    day += dt.timedelta(days=1)
+  return files
+
+def archiveConvert(myPtr, radcode=None, baseDir=None, level=4):
+  """write the records of a :class:`pydarn.sdio.radDataTypes.radDataPtr` into archive files, one for each day.  The files of the days read are replaced.
+
+  **Args**:
+    * **myPtr** (:class:`pydarn.sdio.radDataTypes.radDataPtr`): the records to archive, read with :func:`pydarn.sdio.radDataTypes.radDataPtr.readBlock`
+    * **[radcode]** (str): the 3-letter radar code used in the file names.  if None, looked up from the station id of the first record.  default = None
+    * **[baseDir]** (str): the archive directory, if None use :func:`archiveDir`. default = None
+    * **[level]** (int): the gzip compression level of the columns. default = 4
+  **Returns**:
+    * **files** (list): the files written
+  **Example**:
+    ::
+
+      myPtr = pydarn.sdio.radDataOpen(dt.datetime(2011,1,1),'bks',eTime=dt.datetime(2011,2,1))
+      pydarn.sdio.archiveConvert(myPtr,'bks')
+  """
+  import os, datetime as dt
+  import numpy as np
+  from utils.timeUtils import datetimeToEpoch
+
+  files = []
+  writer,dayEnd = None,None
+  try:
+    while True:
+      block = myPtr.readBlock(nrec=8*archiveChunkRows)
+      if block is None: break
+      times = block.scalars['time']
+      start = 0
+      while start < block.nrec:
+        if writer is None:
+          t = dt.datetime.utcfromtimestamp(times[start])
+          day = dt.datetime(t.year,t.month,t.day)
+          dayEnd = datetimeToEpoch(day+dt.timedelta(days=1))
+          if radcode is None:
+            from pydarn.radar import network
+            radcode = network().getRadarById(int(block.scalars['stid'][start])).code[0]
+          fileName = archivePath(radcode,myPtr.fType,day,baseDir=baseDir)
+          if not os.path.exists(os.path.dirname(fileName)): os.makedirs(os.path.dirname(fileName))
+          writer = archiveWriter(fileName,fType=myPtr.fType,radcode=radcode,level=level)
+          files.append(fileName)
+        stop = start+int(np.searchsorted(times[start:],dayEnd,side='left'))
+        if stop > start:
+          writer.append(block.select(np.arange(start,stop)))
+        if stop < block.nrec:
+          #the rest of the block is in a later day
+          writer.close()
+          writer = None
+        start = stop
+  finally:
+    if writer is not None: writer.close()
+  return files
+
+
+class archiveWriter():
+  """A class which writes columnar blocks into an archive file.  Blocks are appended in time order, columns which turn up part way through are zero filled before they start, and the chunk table is written when the file is closed.
+
+  **Public Attrs**:
+    * **fileName** (str): the file being written
+    * **nrec** (int): the number of records written
+
+  **Methods**:
+    * :func:`append`
+    * :func:`close`
+
+  **Example**:
+    ::
+
+      myWriter = pydarn.sdio.archiveWriter('20110101.bks.fitex.h5',fType='fitex',radcode='bks')
+      myWriter.append(myPtr.readBlock())
+      myWriter.close()
+  """
+  def __init__(self, fileName, fType='fitex', radcode='', level=4):
+    import h5py
+    self.fileName = fileName
+    self.nrec = 0
+    self.level = level
+    self.__f = h5py.File(fileName,'w')
+    self.__f.attrs['version'] = archiveVersion
+    self.__f.attrs['fType'] = fType
+    self.__f.attrs['radcode'] = radcode
+    self.__f.attrs['chunkRows'] = archiveChunkRows
+    self.__scalars = self.__f.create_group('scalars')
+    self.__arrays = self.__f.create_group('arrays')
+
+  def __repr__(self):
+    return 'archiveWriter: %s, %d records' % (self.fileName,self.nrec)
+
+  def __grow(self, dset, n):
+    dset.resize((n,))
+
+  def __newColumn(self, group, name, dtype, chunk, length=None, fill=0):
+    """a resizable column of length values, by default already holding fill for the records written so far"""
+    import h5py
+    if dtype is None: dtype = h5py.special_dtype(vlen=str)
+    if length is None: length = self.nrec
+    dset = group.create_dataset(name,shape=(length,),maxshape=(None,),dtype=dtype,chunks=(chunk,), \
+                                compression='gzip',compression_opts=self.level,shuffle=True)
+    if length > 0 and fill != 0: dset[:] = fill
+    return dset
+
+  def append(self, block):
+    """add the records of a block to the end of the file
+
+    **Args**:
+      * **block** (:class:`pydarn.sdio.radDataTypes.radDataBlock`): the records, later than those already written
+    **Returns**:
+      * Nothing.
+    """
+    import numpy as np
+    n0,n = self.nrec,self.nrec+block.nrec
+    if block.nrec == 0: return
+    for name,col in block.scalars.iteritems():
+      if not name in self.__scalars:
+        dtype = None
+        if isinstance(col,np.ndarray): dtype = col.dtype
+        self.__newColumn(self.__scalars,name,dtype,archiveChunkRows)
+    for name,dset in self.__scalars.iteritems():
+      self.__grow(dset,n)
+      if block.scalars.has_key(name):
+        col = block.scalars[name]
+        if not isinstance(col,np.ndarray): col = np.array(col,dtype=object)
+        dset[n0:n] = col
+    for name,(values,offsets) in block.arrays.iteritems():
+      if not name in self.__arrays:
+        group = self.__arrays.create_group(name)
+        #a new field is empty for the records before it, so it starts with no values
+        self.__newColumn(group,'values',values.dtype,archiveValueChunk,length=0)
+        group.create_dataset('offsets',data=np.zeros(n0+1,dtype=np.int64),maxshape=(None,), \
+                             chunks=(archiveChunkRows,),compression='gzip',compression_opts=self.level)
+    for name,group in self.__arrays.iteritems():
+      vals,offs = group['values'],group['offsets']
+      total = vals.shape[0]
+      if block.arrays.has_key(name):
+        values,offsets = block.arrays[name]
+        self.__grow(vals,total+len(values))
+        if len(values) > 0: vals[total:] = values
+        newOffs = total+(offsets[1:]-offsets[0])
+      else:
+        newOffs = np.repeat(total,block.nrec)
+      offs.resize((n+1,))
+      offs[n0+1:] = newOffs
+    self.nrec = n
+
+  def close(self):
+    """write the chunk table and close the file"""
+    import numpy as np
+    if self.__f is None: return
+    try:
+      starts = np.append(np.arange(0,self.nrec,archiveChunkRows),self.nrec).astype(np.int64)
+      times = np.zeros(0)
+      beams = np.zeros(0,dtype=np.int64)
+      if self.nrec > 0:
+        times = self.__scalars['time'][:]
+        if 'bmnum' in self.__scalars: beams = self.__scalars['bmnum'][:].astype(np.int64)
+        else: beams = np.zeros(self.nrec,dtype=np.int64)
+      chunks = self.__f.create_group('chunks')
+      nchunk = len(starts)-1
+      tmin,tmax = np.zeros(nchunk),np.zeros(nchunk)
+      bmmin,bmmax = np.zeros(nchunk,dtype=np.int64),np.zeros(nchunk,dtype=np.int64)
+      mask = np.zeros(nchunk,dtype=np.uint64)
+      for i in range(nchunk):
+        t,b = times[starts[i]:starts[i+1]],beams[starts[i]:starts[i+1]]
+        tmin[i],tmax[i] = t.min(),t.max()
+        bmmin[i],bmmax[i] = b.min(),b.max()
+        bits = np.unique(np.clip(b,0,63)).astype(np.uint64)
+        mask[i] = np.bitwise_or.reduce(np.left_shift(np.uint64(1),bits))
+      chunks['start'] = starts
+      chunks['tmin'],chunks['tmax'] = tmin,tmax
+      chunks['bmmin'],chunks['bmmax'] = bmmin,bmmax
+      chunks['beams'] = mask
+      self.__f.attrs['nrec'] = self.nrec
+    finally:
+      self.__f.close()
+      self.__f = None
+
+
+class radDataArchive():
+  """A class which reads records from a list of archive files, in order.  It has the same reading methods as :class:`pydarn.dmapio.DmapReader`, returning record dicts and block dicts of the same form, so a :class:`pydarn.sdio.radDataTypes.radDataPtr` reads it as it would a dmap file.  Filters are applied to whole chunks from the chunk table first, then to the rows of the chunks which are left, and only the array fields asked for are read.
+
+  **Public Attrs**:
+    * **files** (list): the archive files, in time order
+    * **closed** (bool): True once the archive has been closed
+    * **bytesRead** (int): the bytes of the columns read so far
+    * **recordsRead** (int): the records handed out so far
+    * **recordsSkipped** (int): the records passed over by the filters so far
+
+  **Methods**:
+    * :func:`readRec`
+    * :func:`readBlock`
+    * :func:`readSlice`
+    * :func:`tell`
+    * :func:`seek`
+    * :func:`rewind`
+    * :func:`close`
+
+  **Example**:
+    ::
+
+      myArchive = pydarn.sdio.radDataArchive(pydarn.sdio.archiveFiles('bks','fitex',sTime,eTime))
+      myBlock = myArchive.readSlice(['v'],sTime=sTime,eTime=eTime,bmnum=7,gates=(10,40))
+  """
+  def __init__(self, files):
+    if isinstance(files,basestring): files = [files]
+    self.files = list(files)
+    self.closed = False
+    self.bytesRead = self.recordsRead = self.recordsSkipped = 0
+    self.__fileNum = 0
+    self.__row = 0
+    self.__f = None
+    self.__openNum = None
+    self.__chunk = None
+    self.__tables = {}
+
+  def __repr__(self):
+    return 'radDataArchive: %d files, at %s' % (len(self.files),str(self.tell()))
+
+  def __file(self, fileNum):
+    """the open h5py file of a file number, only one is kept open"""
+    import h5py
+    if self.__openNum != fileNum:
+      if self.__f is not None: self.__f.close()
+      self.__f = h5py.File(self.files[fileNum],'r')
+      self.__openNum = fileNum
+      self.__chunk = None
+    return self.__f
+
+  def __table(self, fileNum):
+    """the chunk table and column names of a file, read once and kept"""
+    import numpy as np
+    if not self.__tables.has_key(fileNum):
+      f = self.__file(fileNum)
+      table = {}
+      for name in ('start','tmin','tmax','bmmin','bmmax','beams'):
+        table[name] = np.asarray(f['chunks/'+name][:])
+      table['nrec'] = int(table['start'][-1])
+      table['scalars'] = [str(name) for name in f['scalars']]
+      table['arrays'] = [str(name) for name in f['arrays']]
+      self.__tables[fileNum] = table
+    return self.__tables[fileNum]
+
+  def __nrec(self, fileNum):
+    return self.__table(fileNum)['nrec']
+
+  def __chunkRange(self, fileNum, row):
+    """the chunk holding a row, as (chunk number, first row, end row)"""
+    import numpy as np
+    starts = self.__table(fileNum)['start']
+    i = int(np.searchsorted(starts,row,side='right'))-1
+    return i,int(starts[i]),int(starts[i+1])
+
+  def __loadChunk(self, fileNum, i, fields=None, scalars=None):
+    """read the scalar columns of a chunk, and the array fields wanted.  columns already read for the chunk are kept."""
+    table = self.__table(fileNum)
+    a,b = int(table['start'][i]),int(table['start'][i+1])
+    if self.__chunk is None or self.__chunk['key'] != (fileNum,i):
+      self.__chunk = {'key':(fileNum,i),'start':a,'stop':b,'scalars':{},'arrays':{},'values':{},'wanted':None}
+    chunk = self.__chunk
+    if chunk['wanted'] == (fields,scalars): return chunk
+    for name in table['scalars']:
+      if scalars is not None and name not in scalars: continue
+      if chunk['scalars'].has_key(name): continue
+      col = self.__file(fileNum)['scalars'][name][a:b]
+      #string columns are lists, as the dmap reader gives them
+      if col.dtype == object: col = list(col)
+      else: self.bytesRead += col.nbytes
+      chunk['scalars'][name] = col
+      chunk['rows'] = None
+    for name in table['arrays']:
+      if fields is not None and name not in fields: continue
+      if chunk['arrays'].has_key(name): continue
+      group = self.__file(fileNum)['arrays'][name]
+      offsets = group['offsets'][a:b+1]
+      values = group['values'][offsets[0]:offsets[-1]]
+      self.bytesRead += values.nbytes+offsets.nbytes
+      chunk['arrays'][name] = (values,offsets-offsets[0])
+    chunk['wanted'] = (fields,scalars)
+    return chunk
+
+  def __chunkMatches(self, table, i, filters):
+    """whether a chunk may hold records matching the filters, from the chunk table only.  -1 if it is past the end of the time window."""
+    if filters.get('eTime') is not None and table['tmin'][i] > filters['eTime']: return -1
+    if filters.get('sTime') is not None and table['tmax'][i] < filters['sTime']: return 0
+    bm = filters.get('bmnum')
+    if bm is not None:
+      if bm < table['bmmin'][i] or bm > table['bmmax'][i]: return 0
+      if bm < 64 and not (int(table['beams'][i]) >> bm) & 1: return 0
+    return 1
+
+  def __rowMask(self, chunk, filters):
+    """which rows of a chunk match the filters, as readDmapRec would pick them"""
+    import numpy as np
+    sc = chunk['scalars']
+    t = sc['time']
+    mask = np.ones(len(t),dtype=bool)
+    if filters.get('sTime') is not None: mask &= t >= filters['sTime']
+    if filters.get('eTime') is not None: mask &= t <= filters['eTime']
+    for name in ('stid','bmnum','cp'):
+      if filters.get(name) is not None: mask &= sc[name] == filters[name]
+    ch = filters.get('channel')
+    if ch is not None:
+      if ch < 2: mask &= sc['channel'] < 2
+      else: mask &= sc['channel'] == ch
+    if filters.get('tfreq') is not None:
+      low,high = filters['tfreq']
+      mask &= (sc['tfreq'] >= low) & (sc['tfreq'] <= high)
+    return mask
+
+  def __chunkRows(self, chunk, filters):
+    """the matching rows of a chunk and the rows past the end of the time window, kept on the chunk while the filters stay the same"""
+    import numpy as np
+    if chunk.get('rows') is None or chunk['filters'] != filters:
+      eTime = filters.get('eTime')
+      if eTime is None: eTime = np.inf
+      chunk['filters'] = dict(filters)
+      chunk['rows'] = np.nonzero(self.__rowMask(chunk,filters))[0]
+      chunk['late'] = np.nonzero(chunk['scalars']['time'] > eTime)[0]
+    return chunk['rows'],chunk['late']
+
+  def __scan(self, filters, fields=None, scalars=None, nrec=None):
+    """a generator of (chunk, matching rows) from the current position on, moving the position past the rows handed out.  stops at the end of the time window."""
+    import numpy as np
+    if filters is None: filters = {}
+    while not self.closed and self.__fileNum < len(self.files):
+      fileNum = self.__fileNum
+      table = self.__table(fileNum)
+      if self.__row >= table['nrec']:
+        self.__fileNum,self.__row = fileNum+1,0
+        continue
+      i,a,b = self.__chunkRange(fileNum,self.__row)
+      match = self.__chunkMatches(table,i,filters)
+      if match < 0: return
+      if match == 0:
+        self.recordsSkipped += b-self.__row
+        self.__row = b
+        continue
+      chunk = self.__loadChunk(fileNum,i,fields=fields,scalars=scalars)
+      rows,late = self.__chunkRows(chunk,filters)
+      rows = rows[np.searchsorted(rows,self.__row-a):]
+      late = late[np.searchsorted(late,self.__row-a):]
+      #rows past the end of the time window end the request, the position stays on the first of them
+      end = b
+      if len(late) > 0:
+        end = a+int(late[0])
+        rows = rows[rows < end-a]
+      if nrec is not None: rows = rows[:nrec]
+      if len(rows) > 0:
+        row,self.__row = self.__row,a+int(rows[-1])+1
+        self.recordsRead += len(rows)
+        self.recordsSkipped += self.__row-row-len(rows)
+        yield chunk,rows
+        if nrec is not None:
+          nrec -= len(rows)
+          if nrec <= 0: return
+      else:
+        self.recordsSkipped += end-self.__row
+        self.__row = end
+      if len(late) > 0: return
+
+  def readRec(self, numpy=False, fields=None, filters=None):
+    """read the next record which matches the filters
+
+    **Args**:
+      * **[numpy]** (bool): return array fields as numpy arrays. default = False
+      * **[fields]** (set): the names of the array fields to read, None reads all of them.  scalars are always read. default = None
+      * **[filters]** (dict): keywords as for readDmapRec (sTime, eTime, stid, channel, bmnum, cp, tfreq). default = None
+    **Returns**:
+      * **rec** (dict): the record, as readDmapRec would return it.  None when there is no more data, or once a record is later than filters['eTime']
+    """
+    for chunk,rows in self.__scan(filters,fields=fields,nrec=1):
+      return _recordDict(chunk,int(rows[0]),numpy,fields)
+    return None
+
+  def readBlock(self, nrec=None, fields=None, filters=None):
+    """read a run of records which match the filters into columns, see readDmapBlock
+
+    **Args**:
+      * **[nrec]** (int): the most records to read, None reads to the end. default = None
+      * **[fields]** (set): the names of the array fields to read, None reads all of them. default = None
+      * **[filters]** (dict): keywords as for readDmapRec. default = None
+    **Returns**:
+      * **block** (dict): the columns of the records read, None if there were none
+    """
+    parts = [_select(chunk,rows,fields) for chunk,rows in self.__scan(filters,fields=fields,nrec=nrec)]
+    if len(parts) == 0: return None
+    return _concat(parts)
+
+  def readSlice(self, fields=None, scalars=None, sTime=None, eTime=None, bmnum=None, channel=None, cp=None, gates=None):
+    """read some columns of the records in a span of time, from the start of the archive, touching only the chunks and columns needed.  This is the fast way to pull a few parameters out of years of data.
+
+    **Args**:
+      * **[fields]** (list): the array fields to read, eg ['v','gflg'].  slist is always read.  None reads all of them.  default = None
+      * **[scalars]** (list): the scalar fields to read besides time, bmnum, channel, cp, stid and tfreq.  None reads all of them.  default = None
+      * **[sTime]** (`datetime <http://tinyurl.com/bl352yx>`_): the start of the span.  default = None
+      * **[eTime]** (`datetime <http://tinyurl.com/bl352yx>`_): the end of the span.  default = None
+      * **[bmnum]** (int): only this beam.  default = None
+      * **[channel]** (str): only this channel, eg 'a'.  default = None
+      * **[cp]** (int): only this control program.  default = None
+      * **[gates]** (list): a [first,last] range of gates to keep from the gate fields.  default = None
+    **Returns**:
+      * **myBlock** (:class:`pydarn.sdio.radDataTypes.radDataBlock`): the records, None if there were none
+    """
+    import numpy as np
+    from utils.timeUtils import datetimeToEpoch
+    from pydarn.sdio.radDataTypes import radDataBlock, alpha
+    filters = {'bmnum':bmnum,'cp':cp}
+    if sTime is not None: filters['sTime'] = datetimeToEpoch(sTime)
+    if eTime is not None: filters['eTime'] = datetimeToEpoch(eTime)
+    if channel is not None: filters['channel'] = alpha.index(channel)+1
+    if fields is not None: fields = set(fields) | set(['slist'])
+    if scalars is not None: scalars = set(scalars) | set(['time','bmnum','channel','cp','stid','tfreq','nrang'])
+    self.rewind()
+    parts = [_select(chunk,rows,fields,scalars) for chunk,rows in self.__scan(filters,fields=fields,scalars=scalars)]
+    if len(parts) == 0: return None
+    block = _concat(parts)
+    if gates is not None and block['arrays'].has_key('slist'):
+      slist,offsets = block['arrays']['slist']
+      keep = (slist >= gates[0]) & (slist <= gates[1])
+      counts = np.add.reduceat(keep.astype(np.int64),offsets[:-1]) if len(keep) > 0 else np.zeros(block['nrec'],dtype=np.int64)
+      #reduceat gives the element at an offset for an empty record, zero those
+      counts[np.diff(offsets) == 0] = 0
+      newOffsets = np.zeros(block['nrec']+1,dtype=np.int64)
+      np.cumsum(counts,out=newOffsets[1:])
+      for name,(values,offs) in block['arrays'].items():
+        if len(values) == len(slist) and np.array_equal(offs,offsets):
+          block['arrays'][name] = (values[keep],newOffsets)
+    return radDataBlock(block)
+
+  def tell(self):
+    """the (file number, row) of the next record"""
+    return (self.__fileNum,self.__row)
+
+  def seek(self, pos):
+    """jump to a (file number, row) as returned by tell"""
+    self.__fileNum,self.__row = int(pos[0]),int(pos[1])
+
+  def rewind(self):
+    """jump to the first record"""
+    self.seek((0,0))
+
+  def close(self):
+    """close the open file"""
+    if self.__f is not None: self.__f.close()
+    self.__f = None
+    self.__openNum = None
+    self.__chunk = None
+    self.closed = True
+
+
+def _scalarValues(col):
+  """a scalar column as readDmapRec returns the values: chars as one character strings, numbers as python numbers"""
+  import numpy as np
+  if not isinstance(col,np.ndarray): return col
+  if col.dtype == np.int8: return [chr(v & 0xff) for v in col.tolist()]
+  return col.tolist()
+
+def _recordDict(chunk, row, numpy, fields=None):
+  """the record dict of one row of a loaded chunk, with the array fields in fields"""
+  aDict = {}
+  #the python values of the scalar columns are made once for the chunk
+  pyValues = chunk['values']
+  for name,col in chunk['scalars'].iteritems():
+    if not pyValues.has_key(name): pyValues[name] = _scalarValues(col)
+    aDict[name] = pyValues[name][row]
+  for name,(values,offsets) in chunk['arrays'].iteritems():
+    if fields is not None and name not in fields: continue
+    val = values[offsets[row]:offsets[row+1]]
+    if name == 'ltab':
+      #as the dmap reader gives it, pairs without the last (alternate lag 0) one
+      val = val.reshape(-1,2)[:-1]
+    if numpy: aDict[name] = val.copy()
+    else: aDict[name] = val.tolist()
+  return aDict
+
+def _select(chunk, rows, fields=None, scalars=None):
+  """some rows of a loaded chunk as a block dict, with the array fields in fields and the scalars in scalars"""
+  from pydarn.sdio.radDataTypes import radDataBlock
+  sc = dict([(k,v) for k,v in chunk['scalars'].iteritems() if scalars is None or k in scalars])
+  ar = dict([(k,v) for k,v in chunk['arrays'].iteritems() if fields is None or k in fields])
+  block = radDataBlock({'nrec':chunk['stop']-chunk['start'],'scalars':sc,'arrays':ar})
+  block = block.select(rows)
+  return {'nrec':block.nrec,'scalars':block.scalars,'arrays':block.arrays}
+
+def _concat(parts):
+  """join block dicts end to end.  the result has every column of any of the blocks, a column a block lacks is zero (or '') for its records, and an array field it lacks is empty for them, as the writer fills a column which turns up part way through."""
+  import numpy as np
+  if len(parts) == 1: return parts[0]
+  nrec = sum([p['nrec'] for p in parts])
+  scalars = {}
+  for name in set().union(*[p['scalars'].keys() for p in parts]):
+    cols = [p['scalars'].get(name) for p in parts]
+    model = [c for c in cols if c is not None][0]
+    if isinstance(model,np.ndarray):
+      cols = [c if c is not None else np.zeros(p['nrec'],dtype=model.dtype) for c,p in zip(cols,parts)]
+      scalars[name] = np.concatenate(cols)
+    else:
+      cols = [c if c is not None else ['']*p['nrec'] for c,p in zip(cols,parts)]
+      scalars[name] = sum([list(c) for c in cols],[])
+  arrays = {}
+  for name in set().union(*[p['arrays'].keys() for p in parts]):
+    values,counts = [],[]
+    for p in parts:
+      if p['arrays'].has_key(name):
+        values.append(p['arrays'][name][0])
+        counts.append(np.diff(p['arrays'][name][1]))
+      else:
+        counts.append(np.zeros(p['nrec'],dtype=np.int64))
+    values = np.concatenate(values)
+    offsets = np.zeros(nrec+1,dtype=np.int64)
+    np.cumsum(np.concatenate(counts),out=offsets[1:])
+    arrays[name] = (values,offsets)
+  return {'nrec':nrec,'scalars':scalars,'arrays':arrays}
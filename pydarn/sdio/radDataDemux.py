@@ -0,0 +1,330 @@
+# Copyright (C) 2012  VT SuperDARN Lab
+# Full license can be found in LICENSE.txt
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+.. module:: radDataDemux
+   :synopsis: split one read of a multi-channel file into per-channel streams
+
+************************************
+**Module**: pydarn.sdio.radDataDemux
+************************************
+
+**Classes**:
+  * :class:`pydarn.sdio.radDataDemux.radDataDemux`
+  * :class:`pydarn.sdio.radDataDemux.demuxPtr`
+"""
+
+class radDataDemux():
+  """A class which reads a :class:`pydarn.sdio.radDataTypes.radDataPtr` once and hands each record to a sub-stream for its channel, its cp, or both.  Each record is decoded a single time however many sub-streams there are, so the channels of a stereo radar, or the modes of an interleaved program, cost one read instead of one each.
+
+  Sub-streams are read independently.  Records are only kept for the sub-streams which have been made and not closed: those of a sub-stream which is behind are queued until it reads them, and those of any other key are dropped.  So make the sub-streams wanted before reading any of them, and close one which is not going to be read any more.  Seeking or rewinding moves all of the sub-streams, as they share one read.
+
+  **Public Attrs**:
+    * **ptr** (:class:`pydarn.sdio.radDataTypes.radDataPtr`): the pointer being read, it must not be limited to one channel
+    * **by** (str or tuple): 'channel', 'cp' or ('channel','cp'), what the records are split on
+    * **keys** (list): the only keys kept, eg ['a','b'].  None keeps them all
+
+  **Methods**:
+    * :func:`stream`
+    * :func:`keyOf`
+    * :func:`seen`
+    * :func:`readBlock`
+    * :func:`offsetSeek`
+    * :func:`rewind`
+    * :func:`close`
+
+  **Example**:
+    ::
+
+      myPtr = pydarn.sdio.radDataOpen(dt.datetime(2011,1,1),'han',eTime=dt.datetime(2011,1,1,2))
+      myDemux = pydarn.sdio.radDataDemux(myPtr)
+      chanA,chanB = myDemux['a'],myDemux['b']
+      for beam in chanB:
+        print beam
+      myScan = chanA.readScan()
+  """
+  def __init__(self, ptr, by='channel', keys=None):
+    from pydarn.sdio.radDataTypes import radDataPtr
+    assert(isinstance(ptr,radDataPtr)),'error, ptr must be a radDataPtr'
+    assert(by in ('channel','cp',('channel','cp'))),"error, by must be 'channel', 'cp' or ('channel','cp')"
+    assert(by == 'cp' or ptr.channel is None), \
+      'error, the pointer is limited to channel '+str(ptr.channel)+', open it with channel=None'
+    self.ptr = ptr
+    self.by = by
+    self.keys = keys
+    if keys is not None: self.keys = list(keys)
+    self.__queues = {}
+    self.__streams = {}
+    self.__seen = []
+    self.__done = False
+
+  def __repr__(self):
+    return 'radDataDemux: by %s, streams %s, queued %s' % \
+      (str(self.by),sorted(self.__streams.keys()),dict([(k,len(q)) for k,q in self.__queues.iteritems()]))
+
+  def __getitem__(self, key):
+    return self.stream(key)
+
+  def keyOf(self, beam):
+    """the sub-stream key of a beam"""
+    if self.by == 'channel': return beam.channel
+    if self.by == 'cp': return beam.cp
+    return (beam.channel,beam.cp)
+
+  def stream(self, key):
+    """the sub-stream for a key, made the first time it is asked for
+
+    **Args**:
+      * **key**: a channel letter, a cp number or a (channel, cp) pair, to match by
+    **Returns**:
+      * **myPtr** (:class:`pydarn.sdio.radDataDemux.demuxPtr`): the sub-stream
+    """
+    assert(self.keys is None or key in self.keys),'error, '+str(key)+' is not one of the keys kept'
+    if not self.__streams.has_key(key):
+      self.__streams[key] = demuxPtr(self,key)
+    return self.__streams[key]
+
+  def seen(self):
+    """the keys of the records read so far, in the order they first turned up"""
+    return list(self.__seen)
+
+  def _next(self, key):
+    """the next record for a sub-stream, reading and queueing records for the other live sub-streams on the way.  None at the end of the data."""
+    from collections import deque
+    while True:
+      queue = self.__queues.get(key)
+      if queue: return queue.popleft()
+      if self.__done: return None
+      beam = self.ptr.readRec()
+      if beam is None:
+        self.__done = True
+        return None
+      k = self.keyOf(beam)
+      if k not in self.__seen: self.__seen.append(k)
+      #nothing is going to read the records of a key without a stream
+      if not self.__streams.has_key(k): continue
+      self.__queues.setdefault(k,deque()).append(beam)
+
+  def _unread(self, key, beams):
+    """put beams back at the front of a sub-stream"""
+    from collections import deque
+    self.__queues.setdefault(key,deque()).extendleft(reversed(beams))
+
+  def _close(self, key):
+    """stop keeping records for a sub-stream"""
+    self.__queues.pop(key,None)
+    self.__streams.pop(key,None)
+
+  def offsetSeek(self, offset):
+    """jump to the record at an offset, eg the offset of a beam read from any of the sub-streams.  Everything queued is dropped, and all of the sub-streams carry on from there.
+
+    **Args**:
+      * **offset**: a record offset, as for :func:`pydarn.sdio.radDataTypes.radDataPtr.offsetSeek`
+    **Returns**:
+      * **success** (bool)
+    """
+    self.__restart()
+    return self.ptr.offsetSeek(offset)
+
+  def rewind(self):
+    """jump back to the first record, for all of the sub-streams"""
+    self.__restart()
+    return self.ptr.rewind()
+
+  def __restart(self):
+    """forget what has been read ahead, before the pointer is moved"""
+    self.__queues = {}
+    self.__done = False
+    for myPtr in self.__streams.values(): myPtr.fBeam = None
+
+  def readBlock(self, nrec=None):
+    """read a run of records into a columnar block for each key, see :func:`pydarn.sdio.radDataTypes.radDataPtr.readBlock`.  This reads the pointer directly, so it should not be mixed with reading the sub-streams, but it is much faster than reading blocks from each of them.
+
+    **Args**:
+      * **[nrec]** (int): the most records to read, split between all of the keys.  if None, read to the end of the request.  default = None
+    **Returns**:
+      * **blocks** (dict): key -> :class:`pydarn.sdio.radDataTypes.radDataBlock`, for the keys which had records.  *will return None when finished reading*
+    """
+    import numpy as np
+    from pydarn.sdio.radDataTypes import channelAlpha
+    block = self.ptr.readBlock(nrec=nrec)
+    if block is None: return None
+    cols = []
+    if self.by == 'channel' or self.by == ('channel','cp'):
+      chans = np.clip(np.asarray(block.scalars['channel'],dtype=np.int64),0,len(channelAlpha)-1)
+      cols.append(np.array(channelAlpha)[chans])
+    if self.by == 'cp' or self.by == ('channel','cp'):
+      cols.append(np.asarray(block.scalars['cp']))
+    if len(cols) == 1:
+      keyCol = cols[0].tolist()
+    else:
+      keyCol = zip(cols[0].tolist(),cols[1].tolist())
+    rows = {}
+    for i,k in enumerate(keyCol):
+      if self.keys is not None and k not in self.keys: continue
+      rows.setdefault(k,[]).append(i)
+    blocks = {}
+    for k,r in rows.iteritems():
+      blocks[k] = block.select(np.array(r,dtype=np.int64))
+    return blocks
+
+  def close(self):
+    """close the pointer and drop anything queued"""
+    self.__queues = {}
+    self.__streams = {}
+    self.ptr.close()
+
+
+class demuxPtr():
+  """one sub-stream of a :class:`pydarn.sdio.radDataDemux.radDataDemux`.  It is read like a :class:`pydarn.sdio.radDataTypes.radDataPtr`.
+
+  **Public Attrs**:
+    * **key**: the channel, cp or (channel, cp) this stream holds
+    * **sTime**, **eTime**, **fType**: those of the pointer being split
+    * **fBeam** (:class:`pydarn.sdio.radDataTypes.beamData`): the first beam of the next scan, once :func:`readScan` has read past it
+
+  **Methods**:
+    * :func:`readRec`
+    * :func:`readScan`
+    * :func:`readScanGrid`
+    * :func:`readScanCube`
+    * :func:`readBlock`
+    * :func:`offsetSeek`
+    * :func:`rewind`
+    * :func:`close`
+  """
+  def __init__(self, demux, key):
+    self.__demux = demux
+    self.key = key
+    self.sTime = demux.ptr.sTime
+    self.eTime = demux.ptr.eTime
+    self.fType = demux.ptr.fType
+    self.fBeam = None
+
+  def __repr__(self):
+    return 'demuxPtr: %s of %s' % (str(self.key),repr(self.__demux))
+
+  def __iter__(self):
+    return self
+
+  def next(self):
+    beam = self.readRec()
+    if beam is None: raise StopIteration
+    return beam
+
+  def readRec(self):
+    """read the next beam of this sub-stream
+
+    **Returns**:
+      * **myBeam** (:class:`pydarn.sdio.radDataTypes.beamData`): the next beam.  *will return None when finished reading*
+    """
+    if self.__demux is None:
+      print 'error, this stream is closed'
+      return None
+    if self.fBeam is not None:
+      myBeam,self.fBeam = self.fBeam,None
+      return myBeam
+    return self.__demux._next(self.key)
+
+  def readScan(self):
+    """read a full scan of this sub-stream, as :func:`pydarn.sdio.radDataTypes.radDataPtr.readScan` does
+
+    **Returns**:
+      * **myScan** (:class:`pydarn.sdio.radDataTypes.scanData`): the scan.  *will return None when finished reading*
+    """
+    from pydarn.sdio.radDataTypes import scanData
+    myBeam = self.readRec()
+    if myBeam is None: return None
+    myScan = scanData()
+    myScan.append(myBeam)
+    while(1):
+      myBeam = self.readRec()
+      if myBeam is None: break
+      if(myBeam.prm.scan == 0):
+        myScan.append(myBeam)
+      else:
+        #the first beam of the next scan, keep it for next time
+        self.fBeam = myBeam
+        break
+    return myScan
+
+  def readScanGrid(self,params=None,nbeam=None,ngate=None,repeats='last'):
+    """read a full scan into dense beam x gate arrays, see :func:`pydarn.sdio.radDataTypes.radDataPtr.readScanGrid`"""
+    from pydarn.sdio.radDataTypes import scanGrid
+    myScan = self.readScan()
+    if myScan is None: return None
+    return scanGrid(myScan,params=params,nbeam=nbeam,ngate=ngate,repeats=repeats)
+
+  def readScanCube(self,eTime=None,params=None,nbeam=None,ngate=None,repeats='last'):
+    """read all of the scans of this sub-stream which start before a time into (nscan, nbeam, ngate) arrays, see :func:`pydarn.sdio.radDataTypes.radDataPtr.readScanCube`.  The first scan starting at or after eTime is left to be read next."""
+    from pydarn.sdio.radDataTypes import scanGrid
+    scans = []
+    while True:
+      myScan = self.readScan()
+      if myScan is None: break
+      if eTime is not None and myScan[0].time >= eTime:
+        #put the whole scan back, ahead of the beam which ended it
+        beams = list(myScan)
+        if self.fBeam is not None: beams.append(self.fBeam)
+        self.fBeam = None
+        self.__demux._unread(self.key,beams)
+        break
+      scans.append(myScan)
+    if len(scans) == 0: return None
+    return scanGrid(scans,params=params,nbeam=nbeam,ngate=ngate,repeats=repeats)
+
+  def readBlock(self, nrec=None):
+    """read the next records of this sub-stream into a columnar block, see :func:`pydarn.sdio.radDataTypes.radDataPtr.readBlock`.  The block is made from the beams the sub-stream is fed, so it is slower than :func:`pydarn.sdio.radDataDemux.radDataDemux.readBlock`, which splits blocks read straight from the pointer.
+
+    **Args**:
+      * **[nrec]** (int): the most records to read, if None read to the end of the request. default = None
+    **Returns**:
+      * **myBlock** (:class:`pydarn.sdio.radDataTypes.radDataBlock`): the records read.  *will return None when finished reading*
+    """
+    from pydarn.dmapio import encodeDmapRec, decodeDmapBlock
+    from pydarn.sdio.dmapWriter import beamToDict, dmapTypes
+    from pydarn.sdio.radDataTypes import radDataBlock
+    if self.__demux is None:
+      print 'error, this stream is closed'
+      return None
+    fields = self.__demux.ptr.fields
+    recs = []
+    while nrec is None or len(recs) < nrec:
+      myBeam = self.readRec()
+      if myBeam is None: break
+      recs.append(encodeDmapRec(beamToDict(myBeam),types=dmapTypes))
+    if len(recs) == 0: return None
+    return radDataBlock(decodeDmapBlock(recs,fields=fields),fType=self.fType)
+
+  def offsetSeek(self, offset):
+    """jump to the record at an offset.  This moves all of the sub-streams, see :func:`pydarn.sdio.radDataDemux.radDataDemux.offsetSeek`"""
+    if self.__demux is None:
+      print 'error, this stream is closed'
+      return False
+    return self.__demux.offsetSeek(offset)
+
+  def rewind(self):
+    """jump back to the first record.  This moves all of the sub-streams, see :func:`pydarn.sdio.radDataDemux.radDataDemux.rewind`"""
+    if self.__demux is None:
+      print 'error, this stream is closed'
+      return False
+    return self.__demux.rewind()
+
+  def close(self):
+    """stop reading this sub-stream.  the other sub-streams carry on, and its records are no longer kept."""
+    if self.__demux is not None: self.__demux._close(self.key)
+    self.__demux = None
+    self.fBeam = None
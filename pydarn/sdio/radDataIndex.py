@@ -0,0 +1,216 @@
+# Copyright (C) 2012  VT SuperDARN Lab
+# Full license can be found in LICENSE.txt
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+.. module:: radDataIndex
+   :synopsis: a persistent record index for dmap radar data files
+
+*************************************
+**Module**: pydarn.sdio.radDataIndex
+*************************************
+
+**Classes**:
+  * :class:`pydarn.sdio.radDataIndex.radDataIndex`
+**Functions**:
+  * :func:`pydarn.sdio.radDataIndex.isDataFile`
+"""
+
+#bump this if the layout of the sidecar file changes
+indexVersion = 1
+indexFields = ['offset','time','stid','bmnum','channel','cp','scan','tfreq']
+
+def isDataFile(filename):
+  """check that a file found next to data files is not an index sidecar, or a sidecar or cache catalog still being written.  These match the same globs as the data files they sit next to.
+
+  **Args**:
+    * **filename** (str): the file name, with or without its directory
+  **Returns**:
+    * True if the file may be read as data, False if it is a sidecar or temporary file
+  """
+  return not (filename.endswith('.idx.npz') or filename.endswith('.tmp'))
+
+class radDataIndex():
+  """A record index for a dmap file.  The index holds one entry per record, built from the record scalars only, and is stored in a sidecar file next to the data file (or in DAVIT_TMPDIR if that is not writable).  The sidecar is reused as long as the size and mtime of the data file have not changed.
+
+  **Public Attrs**:
+    * **filename** (str): the dmap file which is indexed
+    * **sidecar** (str): the sidecar file the index was loaded from or saved to, None if it could not be saved
+    * **offset** (numpy.ndarray): byte offset of each record
+    * **time** (numpy.ndarray): epoch time of each record
+    * **stid** (numpy.ndarray): station id of each record
+    * **bmnum** (numpy.ndarray): beam number of each record
+    * **channel** (numpy.ndarray): dmap channel number of each record
+    * **cp** (numpy.ndarray): control program id of each record
+    * **scan** (numpy.ndarray): scan flag of each record
+    * **tfreq** (numpy.ndarray): transmit frequency of each record
+
+  **Methods**:
+    * :func:`bisect`
+    * :func:`select`
+    * :func:`scanStarts`
+
+  **Example**:
+    ::
+
+      myIndex = pydarn.sdio.radDataIndex('/tmp/sd/20110101.000000.20110102.000000.bks.fitex')
+  """
+  def __init__(self, filename, fd=None, rebuild=False):
+    import os
+
+    self.filename = filename
+    self.sidecar = None
+    stat = os.stat(filename)
+    self.__size = stat.st_size
+    self.__mtime = stat.st_mtime
+
+    if not rebuild:
+      for fname in self.__sidecarNames():
+        if self.__load(fname):
+          self.sidecar = fname
+          return
+
+    self.__build(fd)
+    for fname in self.__sidecarNames():
+      if self.__save(fname):
+        self.sidecar = fname
+        break
+
+  def __repr__(self):
+    return 'radDataIndex: %s, %d records' % (self.filename,len(self.offset))
+
+  def __len__(self):
+    return len(self.offset)
+
+  def __sidecarNames(self):
+    """the places the sidecar may live, in order of preference"""
+    import os
+    names = [self.filename+'.idx.npz']
+    tmpDir = os.environ.get('DAVIT_TMPDIR','/tmp/sd/')
+    names.append(os.path.join(tmpDir,os.path.basename(self.filename)+'.idx.npz'))
+    return names
+
+  def __load(self, fname):
+    """load a sidecar file, returns False if it is missing or stale"""
+    import os
+    import numpy as np
+
+    if not os.path.isfile(fname): return False
+    try:
+      sidecar = np.load(fname)
+      try:
+        if(int(sidecar['version']) != indexVersion or \
+           int(sidecar['size']) != self.__size or \
+           float(sidecar['mtime']) != self.__mtime):
+          return False
+        for key in indexFields:
+          setattr(self,key,sidecar[key])
+      finally:
+        sidecar.close()
+    except Exception,e:
+      print 'problem reading index',fname,e
+      return False
+    return True
+
+  def __save(self, fname):
+    """write the sidecar file, returns False if it could not be written"""
+    import os
+    import numpy as np
+
+    tmpName = fname+'.%d.tmp' % os.getpid()
+    try:
+      f = open(tmpName,'wb')
+      try:
+        arrs = dict([(key,getattr(self,key)) for key in indexFields])
+        np.savez(f,version=indexVersion,size=self.__size,mtime=self.__mtime,**arrs)
+      finally:
+        f.close()
+      #rename so that a concurrent reader never sees a partial sidecar
+      os.rename(tmpName,fname)
+    except Exception:
+      try: os.remove(tmpName)
+      except Exception: pass
+      return False
+    return True
+
+  def __build(self, fd):
+    """scan the dmap file scalar blocks to build the index"""
+    import os
+    from pydarn.dmapio import readDmapIndex
+
+    myFd = fd
+    if myFd is None: myFd = os.open(self.filename,os.O_RDONLY)
+    try:
+      index = readDmapIndex(myFd)
+    finally:
+      if fd is None: os.close(myFd)
+    for key in indexFields:
+      setattr(self,key,index[key])
+
+  def bisect(self, sTime):
+    """find the position of the first record at or after a time.  The records are assumed to be in time order, as they are in dmap files.
+
+    **Args**:
+      * **sTime** (`datetime <http://tinyurl.com/bl352yx>`_): the time to look for
+    **Returns**:
+      * **pos** (int): the index position of the first record at or after sTime, len(self) if there is none
+    """
+    import numpy as np
+    from utils.timeUtils import datetimeToEpoch
+    return int(np.searchsorted(self.time,datetimeToEpoch(sTime),side='left'))
+
+  def select(self, sTime=None, eTime=None, stid=None, channel=None, bmnum=None, cp=None, tfreq=None):
+    """find the records which match a request
+
+    **Args**:
+      * **[sTime]** (`datetime <http://tinyurl.com/bl352yx>`_): the earliest record time. default = None
+      * **[eTime]** (`datetime <http://tinyurl.com/bl352yx>`_): the latest record time. default = None
+      * **[stid]** (int): station id. default = None
+      * **[channel]** (str): 1-letter channel code, 'a' also matches dmap channels 0 and 1. default = None
+      * **[bmnum]** (int): beam number. default = None
+      * **[cp]** (int): control program id. default = None
+      * **[tfreq]** (list): [low,high] transmit frequency band in kHz. default = None
+    **Returns**:
+      * **pos** (numpy.ndarray): the index positions of the matching records, in file order
+    """
+    import numpy as np
+    from utils.timeUtils import datetimeToEpoch
+    from pydarn.sdio.radDataTypes import alpha
+
+    mask = np.ones(len(self.offset),dtype=bool)
+    if sTime is not None: mask &= self.time >= datetimeToEpoch(sTime)
+    if eTime is not None: mask &= self.time <= datetimeToEpoch(eTime)
+    if stid is not None: mask &= self.stid == stid
+    if channel is not None:
+      chan = alpha.index(channel)+1
+      if chan < 2: mask &= self.channel < 2
+      else: mask &= self.channel == chan
+    if bmnum is not None: mask &= self.bmnum == bmnum
+    if cp is not None: mask &= self.cp == cp
+    if tfreq is not None: mask &= (self.tfreq >= tfreq[0]) & (self.tfreq <= tfreq[1])
+    return np.flatnonzero(mask)
+
+  def scanStarts(self, sTime=None, eTime=None):
+    """find the records which start a scan
+
+    **Args**:
+      * **[sTime]** (`datetime <http://tinyurl.com/bl352yx>`_): the earliest record time. default = None
+      * **[eTime]** (`datetime <http://tinyurl.com/bl352yx>`_): the latest record time. default = None
+    **Returns**:
+      * **pos** (numpy.ndarray): the index positions of the scan start records, in file order
+    """
+    import numpy as np
+    pos = self.select(sTime=sTime,eTime=eTime)
+    return pos[self.scan[pos] == 1]
@@ -0,0 +1,256 @@
+# Copyright (C) 2012  VT SuperDARN Lab
+# Full license can be found in LICENSE.txt
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+.. module:: radDataMerge
+   :synopsis: read several radars at once in time order
+
+************************************
+**Module**: pydarn.sdio.radDataMerge
+************************************
+
+**Classes**:
+  * :class:`pydarn.sdio.radDataMerge.radDataMerge`
+"""
+
+#request keywords which can be changed on a pointer which is already open
+ptrFilters = ('channel','bmnum','cp','tfreq')
+
+class radDataMerge():
+  """A class which reads several radars (or several requests on one radar) as one stream in time order.  Each source is a :class:`pydarn.sdio.radDataTypes.radDataPtr`, and the next record of each one is kept in a heap, so beams come out in order of time across all of them.  Scans are merged by the time of their first beam, and records can also be grouped into fixed windows of time across the network, as beams, scans or columnar blocks.
+
+  Only the next record of each source is held, so a radar with much more data than the others is read no faster than it is used.  With prefetch, each source reads ahead at most that many records, so memory stays bounded however unbalanced the sources are.
+
+  **Public Attrs**:
+    * **keys** (list): the name of each source, its radar code, or its position in sources for a pointer
+    * **ptrs** (dict): key -> :class:`pydarn.sdio.radDataTypes.radDataPtr`
+    * **interval** (float): the default window length in seconds for :func:`readWindow`
+    * **lastKey**: the key of the source of the last record or scan read
+
+  **Methods**:
+    * :func:`readRec`
+    * :func:`readScan`
+    * :func:`readWindow`
+    * :func:`windows`
+    * :func:`close`
+
+  **Example**:
+    ::
+
+      import datetime as dt
+      myMerge = pydarn.sdio.radDataMerge(['bks','fhe','fhw'],sTime=dt.datetime(2011,1,1),eTime=dt.datetime(2011,1,1,2), \\
+                                         filters={'bks':{'channel':'a'}},interval=60)
+      for wStart,wEnd,beams in myMerge.windows():
+        print wStart,[len(beams[k]) for k in beams]
+  """
+  def __init__(self, sources, sTime=None, eTime=None, filters=None, interval=None, prefetch=0, **openArgs):
+    """open or take the sources
+
+    **Args**:
+      * **sources** (list or dict): radar codes to open with :func:`pydarn.sdio.radDataRead.radDataOpen`, or open :class:`pydarn.sdio.radDataTypes.radDataPtr` objects, or a dict of key -> either of these
+      * **[sTime]** (`datetime <http://tinyurl.com/bl352yx>`_): the start time for radar codes, and the start of the first window.  required if any source is a radar code.  default = None
+      * **[eTime]** (`datetime <http://tinyurl.com/bl352yx>`_): the end time for radar codes.  default = None
+      * **[filters]** (dict): key -> dict of radDataOpen keywords for that source only, eg {'bks':{'channel':'a','tfreq':[10000,12000]}}.  for an open pointer only channel, bmnum, cp and tfreq may be given.  default = None
+      * **[interval]** (float): the default window length in seconds.  default = None
+      * **[prefetch]** (int): the prefetch depth for sources opened from radar codes, see radDataOpen.  default = 0
+      * **[openArgs]**: other radDataOpen keywords used for all of the radar codes, eg fileType or fields
+    """
+    from pydarn.sdio.radDataTypes import radDataPtr
+    from pydarn.sdio.radDataRead import radDataOpen
+
+    if filters is None: filters = {}
+    if isinstance(sources,dict):
+      items = sorted(sources.items())
+    else:
+      items = []
+      for i,src in enumerate(sources):
+        if isinstance(src,basestring): items.append((src,src))
+        else: items.append((i,src))
+    self.keys = []
+    self.ptrs = {}
+    self.interval = interval
+    self.sTime = sTime
+    self.lastKey = None
+    self.__owned = []
+    for key,src in items:
+      assert(not self.ptrs.has_key(key)),'error, source '+str(key)+' is given more than once'
+      request = filters.get(key,{})
+      if isinstance(src,basestring):
+        assert(sTime is not None),'error, sTime is needed to open '+src
+        args = dict(openArgs)
+        args['prefetch'] = prefetch
+        args.update(request)
+        ptr = radDataOpen(sTime,src,eTime=eTime,**args)
+        if ptr is None: continue
+        self.__owned.append(ptr)
+      else:
+        assert(isinstance(src,radDataPtr)),'error, sources must be radar codes or radDataPtr objects'
+        for name,val in request.iteritems():
+          assert(name in ptrFilters),'error, '+name+' can not be changed on an open pointer'
+          setattr(src,name,val)
+        ptr = src
+      self.keys.append(key)
+      self.ptrs[key] = ptr
+    #(time, source number, record or scan), the next one from each source
+    self.__heap = None
+    self.__mode = None
+    self.__wStart = None
+
+  def __repr__(self):
+    return 'radDataMerge: %d sources %s' % (len(self.keys),self.keys)
+
+  def __iter__(self):
+    return self
+
+  def next(self):
+    beam = self.readRec()
+    if beam is None: raise StopIteration
+    return beam
+
+  def __pull(self, i, mode):
+    """read the next record or scan of source i into the heap"""
+    import heapq
+    ptr = self.ptrs[self.keys[i]]
+    if mode == 'scan':
+      item = ptr.readScan()
+      if item is None or len(item) == 0: return
+      heapq.heappush(self.__heap,(item[0].time,i,item))
+    else:
+      item = ptr.readRec()
+      if item is None: return
+      heapq.heappush(self.__heap,(item.time,i,item))
+
+  def __fill(self, mode):
+    """make sure the heap holds the kind of thing wanted.  beams and blocks share the heap, a scan is whole beams so switching to or from scans puts what is held back on the sources."""
+    if mode == 'block': mode = 'rec'
+    if self.__heap is not None and self.__mode == mode: return
+    if self.__heap is not None:
+      for t,i,item in self.__heap:
+        if mode == 'rec': item = item[0]
+        self.ptrs[self.keys[i]].offsetSeek(item.offset)
+    self.__heap = []
+    self.__mode = mode
+    for i in range(len(self.keys)): self.__pull(i,mode)
+
+  def readRec(self):
+    """read the next beam of all of the sources
+
+    **Returns**:
+      * **myBeam** (:class:`pydarn.sdio.radDataTypes.beamData`): the earliest beam not read yet, its source is in lastKey.  *will return None when finished reading*
+    """
+    import heapq
+    self.__fill('rec')
+    if len(self.__heap) == 0: return None
+    t,i,beam = heapq.heappop(self.__heap)
+    self.__pull(i,'rec')
+    self.lastKey = self.keys[i]
+    return beam
+
+  def readScan(self):
+    """read the next scan of all of the sources, by the time of its first beam
+
+    **Returns**:
+      * **myScan** (:class:`pydarn.sdio.radDataTypes.scanData`): the earliest scan not read yet, its source is in lastKey.  *will return None when finished reading*
+    """
+    import heapq
+    self.__fill('scan')
+    if len(self.__heap) == 0: return None
+    t,i,scan = heapq.heappop(self.__heap)
+    self.__pull(i,'scan')
+    self.lastKey = self.keys[i]
+    return scan
+
+  def readWindow(self, interval=None, kind='rec', skipEmpty=False):
+    """read everything in the next window of time from all of the sources.  Windows follow on from each other, the first one starts at sTime, or if that was not given at the first record time rounded down to a whole number of intervals.
+
+    **Args**:
+      * **[interval]** (float): the window length in seconds.  if None, the interval the object was made with.  default = None
+      * **[kind]** (str): 'rec' groups beams, 'scan' groups scans by the time of their first beam, 'block' reads each source's beams into a :class:`pydarn.sdio.radDataTypes.radDataBlock`.  default = 'rec'
+      * **[skipEmpty]** (bool): move past windows with no data in them instead of returning them.  default = False
+    **Returns**:
+      * **wStart** (`datetime <http://tinyurl.com/bl352yx>`_): the start of the window
+      * **wEnd** (`datetime <http://tinyurl.com/bl352yx>`_): the end of the window, it holds times from wStart up to but not including wEnd
+      * **groups** (dict): key -> list of beams, list of scans or a radDataBlock.  sources with nothing in the window are left out.  *will return None when finished reading*
+    """
+    import heapq, datetime as dt
+    from utils.timeUtils import datetimeToEpoch
+
+    if interval is None: interval = self.interval
+    assert(interval is not None and interval > 0),'error, a window interval in seconds is needed'
+    assert(kind in ('rec','scan','block')),"error, kind must be 'rec', 'scan' or 'block'"
+    self.__fill(kind)
+    if len(self.__heap) == 0: return None
+    step = dt.timedelta(seconds=interval)
+    if self.__wStart is None:
+      if self.sTime is not None: self.__wStart = self.sTime
+      else:
+        t = datetimeToEpoch(self.__heap[0][0])
+        self.__wStart = dt.datetime.utcfromtimestamp(t-t%interval)
+    if skipEmpty:
+      while self.__heap[0][0] >= self.__wStart+step: self.__wStart += step
+    wStart,wEnd = self.__wStart,self.__wStart+step
+    self.__wStart = wEnd
+
+    groups = {}
+    if kind == 'block':
+      for i in [i for t,i,beam in self.__heap if t < wEnd]:
+        groups[self.keys[i]] = self.__readBlock(i,wEnd)
+      return wStart,wEnd,groups
+
+    while len(self.__heap) > 0 and self.__heap[0][0] < wEnd:
+      t,i,item = heapq.heappop(self.__heap)
+      self.__pull(i,kind)
+      groups.setdefault(self.keys[i],[]).append(item)
+    return wStart,wEnd,groups
+
+  def __readBlock(self, i, wEnd):
+    """read source i up to wEnd as a block, starting from the beam held for it"""
+    import heapq, datetime as dt
+    ptr = self.ptrs[self.keys[i]]
+    n = [k for k in range(len(self.__heap)) if self.__heap[k][1] == i][0]
+    beam = self.__heap.pop(n)[2]
+    heapq.heapify(self.__heap)
+    ptr.offsetSeek(beam.offset)
+    #the request end is inclusive, the window end is not
+    eTime = ptr.eTime
+    ptr.eTime = min(eTime,wEnd-dt.timedelta(microseconds=1))
+    try:
+      block = ptr.readBlock()
+    finally:
+      ptr.eTime = eTime
+    self.__pull(i,'rec')
+    return block
+
+  def windows(self, interval=None, kind='rec', skipEmpty=False):
+    """a generator of the windows read by :func:`readWindow`, until the sources are finished
+
+    **Args**:
+      * **[interval]** (float): the window length in seconds.  default = None
+      * **[kind]** (str): 'rec', 'scan' or 'block'.  default = 'rec'
+      * **[skipEmpty]** (bool): leave out windows with no data.  default = False
+    **Returns**:
+      * a generator of (wStart, wEnd, groups)
+    """
+    while True:
+      window = self.readWindow(interval=interval,kind=kind,skipEmpty=skipEmpty)
+      if window is None: return
+      yield window
+
+  def close(self):
+    """close the pointers this object opened.  pointers which were passed in are left open."""
+    for ptr in self.__owned: ptr.close()
+    self.__owned = []
+    self.__heap = []
@@ -28,13 +28,17 @@
   * :func:`pydarn.sdio.radDataRead.radDataOpen`
   * :func:`pydarn.sdio.radDataRead.radDataReadRec`
   * :func:`pydarn.sdio.radDataRead.radDataReadScan`
+  * :func:`pydarn.sdio.radDataRead.radDataReadScanGrid`
+  * :func:`pydarn.sdio.radDataRead.radDataReadScanCube`
+  * :func:`pydarn.sdio.radDataRead.radDataReadBlock`
   * :func:`pydarn.sdio.radDataRead.radDataReadAll`
   * :func:`pydarn.sdio.radDataRead.radDataCreateIndex`
 """
 
 def radDataOpen(sTime,radcode,eTime=None,channel=None,bmnum=None,cp=None, \
                 fileType='fitex',filtered=False, src=None,fileName=None, \
-                custType='fitex',noCache=False):
+                custType='fitex',noCache=False,useNumpy=False,nWorkers=None,fields=None, \
+                tfreq=None,prefetch=0,source=None):
 
   """A function to establish a pipeline through which we can read radar data.  first it tries the mongodb, then it tries to find local files, and lastly it sftp's over to the VT data server.
 
@@ -45,19 +49,28 @@ def radDataOpen(sTime,radcode,eTime=None,channel=None,bmnum=None,cp=None, \
     * **[channel]** (str): the 1-letter code for what channel you want data from, eg 'a','b',...  if this is set to None, data from ALL channels will be read. default = None
     * **[bmnum]** (int): the beam number which you want data for.  If this is set to None, data from all beams will be read. default = None
     * **[cp]** (int): the control program which you want data for.  If this is set to None, data from all cp's will be read.  default = None
+    * **[tfreq]** (list): a [low,high] transmit frequency band in kHz which you want data for.  If this is set to None, data from all frequencies will be read.  default = None
     * **[fileType]** (str):  The type of data you want to read.  valid inputs are: 'fitex','fitacf','lmfit','rawacf','iqdat'.   if you choose a fit file format and the specified one isn't found, we will search for one of the others.  Beware: if you ask for rawacf/iq data, these files are large and the data transfer might take a long time.  default = 'fitex'
     * **[filtered]** (boolean): a boolean specifying whether you want the fit data to be boxcar filtered.  ONLY VALID FOR FIT.  default = False
-    * **[src]** (str): the source of the data.  valid inputs are 'local' 'sftp'.  if this is set to None, it will try all possibilites sequentially.  default = None
-    * **[fileName]** (str): the name of a specific file which you want to open.  default=None
+    * **[src]** (str): the source of the data.  valid inputs are 'local' 'sftp' 'archive'.  'archive' reads the columnar archive files of fitacf, fitex and lmfit data in DAVIT_ARCHIVEDIR, see :mod:`pydarn.sdio.radDataArchive`.  if this is set to None, it will try all possibilites sequentially, starting with the archive.  default = None
+    * **[fileName]** (str): the name of a specific file which you want to open, a dmap file or a .h5 archive file.  default=None
     * **[custType]** (str): if fileName is specified, the filetype of the file.  default='fitex'
     * **[noCache]** (boolean): flag to indicate that you do not want to check first for cached files.  default = False.
+    * **[useNumpy]** (boolean): flag to indicate that array fields (slist, v, p_l, etc) should be read as numpy arrays rather than lists.  default = False.
+    * **[nWorkers]** (int): the most files to download or decompress at once.  if None, DAVIT_NWORKERS is used, or the number of cpus up to 4.  default = None.
+    * **[fields]** (set): the names of the array fields to read, eg set(['slist','v','gflg']).  other arrays are skipped when decoding and the matching beamData attributes are left as None.  scalar parameters are always read.  None reads everything.  default = None.
+    * **[prefetch]** (int): the number of records to read and decode ahead in a background thread while the ones already read are being used, eg plotted.  0 turns this off.  default = 0.
+    * **[source]** (:class:`pydarn.sdio.dataFetch.sftpSource`): the server to fetch remote files from, eg an sftpSource on a local stand-in transport.  it is left open for the caller to close.  if None, the VT sftp server is connected to for this request.  default = None.
   **Returns**:
     * **myPtr** (:class:`pydarn.sdio.radDataTypes.radDataPtr`): a radDataPtr object which contains a link to the data to be read.  this can then be passed to radDataReadRec in order to actually read the data.
 
   **ENVIRONMENT Variables**:
     * DAVIT_TMPDIR :  Directory used for davitpy temporary file cache. 
     * DAVIT_TMPEXPIRE :  Length of time that cached temporary files are valid. After which they will be regenerated.  Example: DAVIT_TMPEXPIRE='2h'  will reuse temp files in the cache for 2 hours since last access 
+    * DAVIT_NWORKERS :  Default number of files to download or decompress at once.  Example: DAVIT_NWORKERS=8
+    * DAVIT_TMPSIZE :  Size budget of the davitpy temporary file cache.  The least recently used files are removed when it is exceeded.  Example: DAVIT_TMPSIZE='10G'
     * DAVIT_LOCALDIR :  Used to set base directory tree for local file look up
+    * DAVIT_ARCHIVEDIR :  Base directory of the columnar archive files, laid out as <yyyy>/<rad>/<yyyymmdd>.<rad>.<ftype>.h5.  default = /sd-data/archive/
     * DAVIT_DIRFORMAT : Python string dictionary capable format string appended to local file base directory tree for use with directory structures which encode radar name, channel or date information.
     Currently supported dictionary keys which can be used: 
     "dirtree" : base directory tree  
@@ -79,7 +92,8 @@ def radDataOpen(sTime,radcode,eTime=None,channel=None,bmnum=None,cp=None, \
   from pydarn.sdio import radDataPtr
   myPtr = radDataPtr(sTime=sTime,radcode=radcode,eTime=eTime,channel=channel,bmnum=bmnum,cp=cp, \
                 fileType=fileType,filtered=filtered, src=src,fileName=fileName, \
-                noCache=False)
+                noCache=False,useNumpy=useNumpy,nWorkers=nWorkers,fields=fields, \
+                tfreq=tfreq,prefetch=prefetch,source=source)
   return myPtr
   
 def radDataReadRec(myPtr):
@@ -140,6 +154,91 @@ def radDataReadScan(myPtr):
     'error, input must be of type radDataPtr'
   return myPtr.readScan()
  
+def radDataReadScanGrid(myPtr,params=None,nbeam=None,ngate=None,repeats='last'):
+  """A function to read a full scan of data from a :class:`pydarn.sdio.radDataTypes.radDataPtr` object into dense (nbeam, ngate) arrays, one per fit parameter, with masks where there is no data
+  
+  .. note::
+    to use this, you must first create a :class:`pydarn.sdio.radDataTypes.radDataPtr` object with :func:`radDataOpen`
+
+  **Args**:
+    * **myPtr** (:class:`pydarn.sdio.radDataTypes.radDataPtr`): contains the pipeline to the data we are after
+    * **[params]** (list): the fit parameters to grid.  if None, those of v, p_l, w_l, elv, phi0, gflg and qflg which were read.  default = None
+    * **[nbeam]** (int): the number of beam rows.  if None, one more than the highest beam number read.  default = None
+    * **[ngate]** (int): the number of gate columns.  if None, the largest nrang read.  default = None
+    * **[repeats]** (str): which sounding of a beam sounded more than once fills its row, 'last', 'first' or 'mean'.  default = 'last'
+  **Returns**:
+    * **myGrid** (:class:`pydarn.sdio.radDataTypes.scanGrid`): the scan in arrays.  *will return None when finished reading*
+    
+  **Example**:
+    ::
+    
+      import datetime as dt
+      myPtr = radDataOpen(dt.datetime(2011,1,1),'bks',eTime=dt.datetime(2011,1,1,2),channel='a')
+      myGrid = radDataReadScanGrid(myPtr,params=['v','gflg'])
+      vel = myGrid['v']
+    
+  """
+  from pydarn.sdio.radDataTypes import radDataPtr
+  assert(isinstance(myPtr,radDataPtr)),\
+    'error, input must be of type radDataPtr'
+  return myPtr.readScanGrid(params=params,nbeam=nbeam,ngate=ngate,repeats=repeats)
+
+def radDataReadScanCube(myPtr,eTime=None,params=None,nbeam=None,ngate=None,repeats='last'):
+  """A function to read all of the scans before a time from a :class:`pydarn.sdio.radDataTypes.radDataPtr` object into (nscan, nbeam, ngate) arrays in one call
+  
+  .. note::
+    to use this, you must first create a :class:`pydarn.sdio.radDataTypes.radDataPtr` object with :func:`radDataOpen`
+
+  **Args**:
+    * **myPtr** (:class:`pydarn.sdio.radDataTypes.radDataPtr`): contains the pipeline to the data we are after
+    * **[eTime]** (`datetime <http://tinyurl.com/bl352yx>`_): read the scans which start before this.  if None, read to the end of the request.  default = None
+    * **[params]** (list): the fit parameters to grid, see :func:`radDataReadScanGrid`.  default = None
+    * **[nbeam]** (int): the number of beam rows, see :func:`radDataReadScanGrid`.  default = None
+    * **[ngate]** (int): the number of gate columns, see :func:`radDataReadScanGrid`.  default = None
+    * **[repeats]** (str): 'last', 'first' or 'mean', see :func:`radDataReadScanGrid`.  default = 'last'
+  **Returns**:
+    * **myCube** (:class:`pydarn.sdio.radDataTypes.scanGrid`): the scans in arrays.  *will return None when there are no more scans*
+    
+  **Example**:
+    ::
+    
+      import datetime as dt
+      myPtr = radDataOpen(dt.datetime(2011,1,1),'bks',eTime=dt.datetime(2011,1,1,2),channel='a')
+      myCube = radDataReadScanCube(myPtr,eTime=dt.datetime(2011,1,1,1),params=['v'])
+      vel = myCube['v']
+    
+  """
+  from pydarn.sdio.radDataTypes import radDataPtr
+  assert(isinstance(myPtr,radDataPtr)),\
+    'error, input must be of type radDataPtr'
+  return myPtr.readScanCube(eTime=eTime,params=params,nbeam=nbeam,ngate=ngate,repeats=repeats)
+
+def radDataReadBlock(myPtr,nrec=None):
+  """A function to read a run of radar data into columns from a :class:`pydarn.sdio.radDataTypes.radDataPtr` object.  This is much faster than reading records one at a time when you want arrays of parameters, since no per-beam objects are made.
+  
+  .. note::
+    to use this, you must first create a :class:`pydarn.sdio.radDataTypes.radDataPtr` object with :func:`radDataOpen`
+
+  **Args**:
+    * **myPtr** (:class:`pydarn.sdio.radDataTypes.radDataPtr`): contains the pipeline to the data we are after
+    * **[nrec]** (int): the most records to read.  if None, read to the end of the request.  default = None
+  **Returns**:
+    * **myBlock** (:class:`pydarn.sdio.radDataTypes.radDataBlock`): the records in columns.  *will return None when finished reading*
+    
+  **Example**:
+    ::
+    
+      import datetime as dt
+      myPtr = radDataOpen(dt.datetime(2011,1,1),'bks',eTime=dt.datetime(2011,1,1,2),bmnum=7,fields=['slist','v','gflg']):
+      myBlock = radDataReadBlock(myPtr)
+      vel = myBlock.dense('v')
+    
+  """
+  from pydarn.sdio.radDataTypes import radDataPtr
+  assert(isinstance(myPtr,radDataPtr)),\
+    'error, input must be of type radDataPtr'
+  return myPtr.readBlock(nrec=nrec)
+
 def radDataCreateIndex(myPtr):
   """A function to index radar data into dict from a :class:`pydarn.sdio.radDataTypes.radDataPtr` object
   
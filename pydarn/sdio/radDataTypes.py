@@ -25,17 +25,41 @@
   * :class:`pydarn.sdio.radDataTypes.radDataPtr`
   * :class:`pydarn.sdio.radDataTypes.radBaseData`
   * :class:`pydarn.sdio.radDataTypes.scanData`
+  * :class:`pydarn.sdio.radDataTypes.scanGrid`
   * :class:`pydarn.sdio.radDataTypes.beamData`
   * :class:`pydarn.sdio.radDataTypes.prmData`
   * :class:`pydarn.sdio.radDataTypes.fitData`
   * :class:`pydarn.sdio.radDataTypes.rawData`
   * :class:`pydarn.sdio.radDataTypes.iqData`
+**Functions**:
+  * :func:`pydarn.sdio.radDataTypes.samplesToList`
 """
 
 
 from utils import twoWayDict
+from utils import instrument
 alpha = ['a','b','c','d','e','f','g','h','i','j','k','l','m', \
           'n','o','p','q','r','s','t','u','v','w','x','y','z']
+#channel letter by dmap channel number, 0 and 1 are both 'a'
+channelAlpha = tuple(['a']+alpha)
+
+
+def samplesToList(samples):
+  """convert complex samples, eg :attr:`rawData.acfd` or :attr:`iqData.mainData`, to the nested list form they used to be read as.
+
+  **Args**:
+    * **samples** (numpy array): an n x m complex array
+  **Returns**:
+    * **samples** (list): an n x m x 2 list of [real,imaginary] pairs
+  **Example**:
+    ::
+
+      acfd = pydarn.sdio.samplesToList(myBeam.rawacf.acfd)
+  """
+  import numpy as np
+  samples = np.asarray(samples)
+  if samples.size == 0: return []
+  return np.dstack((samples.real,samples.imag)).tolist()
 
 
 class radDataPtr():
@@ -48,16 +72,21 @@ class radDataPtr():
     * **channel** (str): channel of the request
     * **bmnum** (int): beam number of the request
     * **cp** (int): control prog id of the request
+    * **tfreq** (list): [low,high] transmit frequency band of the request in kHz
     * **fType** (str): the file type, 'fitacf', 'rawacf', 'iqdat', 'fitex', 'lmfit'
     * **fBeam** (:class:`pydarn.sdio.radDataTypes.beamData`): the first beam of the next scan, useful for when reading into scan objects
     * **recordIndex** (dict): look up dictionary for file offsets for all records 
     * **scanStartIndex** (dict): look up dictionary for file offsets for scan start records
+    * **useNumpy** (bool): if True, array fields (slist, v, p_l, etc) are read as numpy arrays instead of lists
+    * **index** (:class:`pydarn.sdio.radDataIndex.radDataIndex`): the persistent record index of the open file, None if it could not be built
+    * **nWorkers** (int): the most files fetched or decompressed at once for this request
+    * **fields** (frozenset): the names of the array fields (slist, v, acfd, etc) to read, None reads all of them.  attributes whose fields are not read are left as None
+    * **prefetch** (int): the number of records read and decoded ahead by a background thread, 0 reads them only when asked for
   **Private Attrs**:
-    * **ptr** (file or mongodb query object): the data pointer (different depending on mongodo or dmap)
-    * **fd** (int): the file descriptor 
+    * **ptr** (:class:`pydarn.dmapio.DmapReader`, :class:`pydarn.sdio.dmapStream.dmapStream` or :class:`pydarn.sdio.radDataArchive.radDataArchive`): the data pointer, a buffered reader for a single plain file, a stream over a chain of files, or a reader of columnar archive files.  wrapped in a :class:`pydarn.sdio.dataPrefetch.dmapPrefetcher` when prefetch is set
     * **filtered** (bool): use Filtered datafile 
     * **nocache** (bool):  do not use cached files, regenerate tmp files 
-    * **src** (str):  local or sftp 
+    * **src** (str):  local, sftp or archive 
 
   **Methods**:
     * **open** 
@@ -65,15 +94,26 @@ class radDataPtr():
     * **seek** 
     * **readRec** 
     * **readScan** 
+    * **readScanGrid** 
+    * **readScanCube** 
+    * **readBlock** 
     * **readAll** 
+    * **setPrefetch** 
+    * **prefetchStats** 
     
   Written by AJ 20130108
   """
   def __init__(self,sTime=None,radcode=None,eTime=None,stid=None,channel=None,bmnum=None,cp=None, \
-                fileType=None,filtered=False, src=None,fileName=None,noCache=False):
+                fileType=None,filtered=False, src=None,fileName=None,noCache=False,useNumpy=False, \
+                nWorkers=None,fields=None,tfreq=None,prefetch=0,source=None):
     import datetime as dt
     import os,glob,string
     from pydarn.radar import network
+    from pydarn.sdio.dmapStream import dmapStream
+    from pydarn.sdio.dataCache import dataCache, cacheKey
+    from pydarn.sdio.dataFetch import sftpSource, fetchFiles, defaultWorkers
+    from pydarn.sdio.radDataArchive import archiveFiles
+    from pydarn.sdio.radDataIndex import isDataFile
 
     self.sTime = sTime
     self.eTime = eTime
@@ -81,16 +121,25 @@ class radDataPtr():
     self.channel = channel
     self.bmnum = bmnum
     self.cp = cp
+    self.tfreq = tfreq
     self.fType = fileType
     self.dType = None
     self.fBeam = None
     self.recordIndex = None
     self.scanStartIndex = None
+    self.useNumpy = useNumpy
+    self.nWorkers = nWorkers
+    self.fields = None
+    if fields is not None: self.fields = frozenset(fields)
+    self.prefetch = prefetch
+    self.index = None
+    self.__selection = None
+    self.__filterKey = None
+    self.__readCounts = None
     self.__filename = fileName 
     self.__filtered = filtered
     self.__nocache  = noCache
     self.__src = src
-    self.__fd = None
     self.__ptr =  None
 
     #check inputs
@@ -104,6 +153,8 @@ class radDataPtr():
       'error, bmnum must be an int or None'
     assert(cp == None or isinstance(cp,int)), \
       'error, cp must be an int or None'
+    assert(tfreq == None or (len(tfreq) == 2 and tfreq[0] <= tfreq[1])), \
+      'error, tfreq must be None or a [low,high] band'
     assert(fileType == 'rawacf' or fileType == 'fitacf' or \
       fileType == 'fitex' or fileType == 'lmfit' or fileType == 'iqdat'), \
       'error, fileType must be one of: rawacf,fitacf,fitex,lmfit,iqdat'
@@ -111,8 +162,14 @@ class radDataPtr():
       'error, fileName must be None or a string'
     assert(isinstance(filtered,bool)), \
       'error, filtered must be True of False'
-    assert(src == None or src == 'local' or src == 'sftp'), \
-      'error, src must be one of None,local,sftp'
+    assert(src == None or src == 'local' or src == 'sftp' or src == 'archive'), \
+      'error, src must be one of None,local,sftp,archive'
+    assert(isinstance(useNumpy,bool)), \
+      'error, useNumpy must be True or False'
+    assert(nWorkers == None or (isinstance(nWorkers,int) and nWorkers > 0)), \
+      'error, nWorkers must be None or a positive int'
+    assert(isinstance(prefetch,int) and prefetch >= 0), \
+      'error, prefetch must be an int >= 0'
 
     if radcode is not None:
       assert(isinstance(radcode,str)), \
@@ -128,6 +185,9 @@ class radDataPtr():
 
     if(self.eTime == None):
       self.eTime = self.sTime+dt.timedelta(days=1)
+    eTime = self.eTime
+    if(self.nWorkers == None):
+      self.nWorkers = defaultWorkers()
 
     filelist = []
     if(fileType == 'fitex'): arr = ['fitex','fitacf','lmfit']
@@ -145,8 +205,10 @@ class radDataPtr():
     d = os.path.dirname(tmpDir)
     if not os.path.exists(d):
       os.makedirs(d)
+    myCache = dataCache(tmpDir)
 
     cached = False
+    downloaded = False
     fileSt = None
 
     #FIRST, check if a specific filename was given
@@ -155,62 +217,41 @@ class radDataPtr():
             if(not os.path.isfile(fileName)):
                 print 'problem reading',fileName,':file does not exist'
                 return None
-            outname = tmpDir+str(int(datetimeToEpoch(dt.datetime.now())))
-            if(string.find(fileName,'.bz2') != -1):
-                outname = string.replace(fileName,'.bz2','')
-                print 'bunzip2 -c '+fileName+' > '+outname+'\n'
-                os.system('bunzip2 -c '+fileName+' > '+outname)
-            elif(string.find(fileName,'.gz') != -1):
-                outname = string.replace(fileName,'.gz','')
-                print 'gunzip -c '+fileName+' > '+outname+'\n'
-                os.system('gunzip -c '+fileName+' > '+outname)
-            else:
-                os.system('cp '+fileName+' '+outname)
-                print 'cp '+fileName+' '+outname
-            filelist.append(outname)
+            #compressed files are decompressed as they are read
+            filelist.append(fileName)
             self.dType = 'dmap'
+            if fileName.endswith('.h5'): self.dType = 'archive'
             fileSt = sTime
         except Exception, e:
             print e
             print 'problem reading file',fileName
             return None
-    #Next, check for a cached file
+    #Next, check for cached files
+    pieces = None
     if fileName == None and not noCache:
         try:
-            if True:
-                for f in glob.glob("%s????????.??????.????????.??????.%s.%sf" % (tmpDir,radcode,fileType)):
-                    try:
-                        ff = string.replace(f,tmpDir,'')
-                        #check time span of file
-                        t1 = dt.datetime(int(ff[0:4]),int(ff[4:6]),int(ff[6:8]),int(ff[9:11]),int(ff[11:13]),int(ff[13:15]))
-                        t2 = dt.datetime(int(ff[16:20]),int(ff[20:22]),int(ff[22:24]),int(ff[25:27]),int(ff[27:29]),int(ff[29:31]))
-                        #check if file covers our timespan
-                        if t1 <= sTime and t2 >= eTime:
-                            cached = True
-                            filelist.append(f)
-                            print 'Found cached file: %s' % f
-                            break
-                    except Exception,e:
-                        print e
-            if not cached:
-                for f in glob.glob("%s????????.??????.????????.??????.%s.%s" % (tmpDir,radcode,fileType)):
-                    try:
-                        ff = string.replace(f,tmpDir,'')
-                        #check time span of file
-                        t1 = dt.datetime(int(ff[0:4]),int(ff[4:6]),int(ff[6:8]),int(ff[9:11]),int(ff[11:13]),int(ff[13:15]))
-                        t2 = dt.datetime(int(ff[16:20]),int(ff[20:22]),int(ff[22:24]),int(ff[25:27]),int(ff[27:29]),int(ff[29:31]))
-                        #check if file covers our timespan
-                        if t1 <= sTime and t2 >= eTime:
-                            cached = True
-                            filelist.append(f)
-                            print 'Found cached file: %s' % f
-                            break
-                    except Exception,e:
-                        print e
+            pieces = myCache.lookup(cacheKey(radcode,fileType,filtered),sTime,self.eTime)
+            cached = pieces is not None
         except Exception,e:
             print e
+    #Next, look for columnar archive files of the days requested
+    if not cached and (src == None or src == 'archive') and fileName == None and not filtered:
+        try:
+            for ftype in arr:
+                if ftype not in ('fitex','fitacf','lmfit'): continue
+                filelist = archiveFiles(rad,ftype,sTime,eTime)
+                if len(filelist) > 0:
+                    print 'found',ftype,'data in archive files'
+                    self.fType,self.dType = ftype,'archive'
+                    fileType = ftype
+                    self.open(filelist)
+                    break
+        except Exception, e:
+            print e
+            print 'problem reading archive files'
+            filelist = []
     #Next, LOOK LOCALLY FOR FILES
-    if not cached and (src == None or src == 'local') and fileName == None:
+    if self.__ptr == None and not cached and (src == None or src == 'local') and fileName == None:
         try:
             for ftype in arr:
                 print "\nLooking locally for %s files : rad %s chan: %s" % (ftype,radcode,chan)
@@ -247,25 +288,14 @@ class radDataPtr():
                         print myDir
                         #iterate through all of the files which begin in this hour
                         for filename in glob.glob(myDir+dateStr+'.'+hrStr+form):
-                            outname = string.replace(filename,myDir,tmpDir)
-                            #unzip the compressed file
-                            if(string.find(filename,'.bz2') != -1):
-                                outname = string.replace(outname,'.bz2','')
-                                print 'bunzip2 -c '+filename+' > '+outname+'\n'
-                                os.system('bunzip2 -c '+filename+' > '+outname)
-                            elif(string.find(filename,'.gz') != -1):
-                                outname = string.replace(outname,'.gz','')
-                                print 'gunzip -c '+filename+' > '+outname+'\n'
-                                os.system('gunzip -c '+filename+' > '+outname)
-                            else:
-                                command='cp '+filename+' '+outname
-                                print command
-                                os.system(command)
-
-                            filelist.append(outname)
-                            print outname
+                            #skip the index sidecars kept next to the data
+                            if not isDataFile(filename): continue
+                            #the files are read in place, compressed files are
+                            #decompressed as they are read
+                            filelist.append(filename)
+                            print filename
                             #HANDLE CACHEING NAME
-                            ff = string.replace(outname,tmpDir,'')
+                            ff = os.path.basename(filename)
                             #check the beginning time of the file (for cacheing)
                             t1 = dt.datetime(int(ff[0:4]),int(ff[4:6]),int(ff[6:8]),int(ff[9:11]),int(ff[11:13]),int(ff[14:16]))
                             if fileSt == None or t1 < fileSt: fileSt = t1
@@ -289,65 +319,58 @@ class radDataPtr():
             src=None
     #finally, check the VT sftp server if we have not yet found files
     if (src == None or src == 'sftp') and self.__ptr == None and len(filelist) == 0 and fileName == None:
+        #one transport is shared by everything we fetch for this request,
+        #a source given to us is the caller's to close
+        ownSource = source is None
+        if ownSource:
+            try:
+                source = sftpSource()
+            except Exception,e:
+                print e
+                print 'problem connecting to sftp server'
+                source = None
         for ftype in arr:
+            if source is None: break
             print '\nLooking on the remote SFTP server for',ftype,'files'
             try:
+                import re
                 #deal with UAF naming convention
                 fnames = ['..........'+ftype]
                 if(channel == None): fnames.append('..\...\....\.a\.')
                 else: fnames.append('..........'+channel+'.'+ftype)
                 for form in fnames:
-                    #create a transport object for use in sftp-ing
-                    transport = p.Transport((os.environ['VTDB'], 22))
-                    transport.connect(username=os.environ['DBREADUSER'],password=os.environ['DBREADPASS'])
-                    sftp = p.SFTPClient.from_transport(transport)
-
                     #iterate through all of the hours in the request
                     #ie, iterate through all possible file names
+                    remoteFiles = []
                     ctime = sTime.replace(minute=0)
                     if ctime.hour % 2 == 1: ctime = ctime.replace(hour=ctime.hour-1)
-                    oldyr = ''
                     while ctime <= eTime:
                         #directory on the data server
                         myDir = '/data/'+ctime.strftime("%Y")+'/'+ftype+'/'+rad+'/'
                         hrStr = ctime.strftime("%H")
                         dateStr = ctime.strftime("%Y%m%d")
-                        if(ctime.strftime("%Y") != oldyr):
-                            #get a list of all the files in the directory
-                            allFiles = sftp.listdir(myDir)
-                            oldyr = ctime.strftime("%Y")
                         #create a regular expression to find files of this day, at this hour
                         regex = re.compile(dateStr+'.'+hrStr+form)
                         #go thorugh all the files in the directory
+                        try: allFiles = source.listdir(myDir)
+                        except (IOError,OSError): allFiles = []
                         for aFile in allFiles:
                             #if we have a file match between a file and our regex
-                            if(regex.match(aFile)):
-                                print 'copying file '+myDir+aFile+' to '+tmpDir+aFile
-                                filename = tmpDir+aFile
-                                #download the file via sftp
-                                sftp.get(myDir+aFile,filename)
-                                #unzip the compressed file
-                                if(string.find(filename,'.bz2') != -1):
-                                    outname = string.replace(filename,'.bz2','')
-                                    print 'bunzip2 -c '+filename+' > '+outname+'\n'
-                                    os.system('bunzip2 -c '+filename+' > '+outname)
-                                elif(string.find(filename,'.gz') != -1):
-                                    outname = string.replace(filename,'.gz','')
-                                    print 'gunzip -c '+filename+' > '+outname+'\n'
-                                    os.system('gunzip -c '+filename+' > '+outname)
-                                else:
-                                    print 'It seems we have downloaded an uncompressed file :/'
-                                    print 'Strange things might happen from here on out...'
-
-                                filelist.append(outname)
-
-                                #HANDLE CACHEING NAME
-                                ff = string.replace(outname,tmpDir,'')
-                                #check the beginning time of the file
-                                t1 = dt.datetime(int(ff[0:4]),int(ff[4:6]),int(ff[6:8]),int(ff[9:11]),int(ff[11:13]),int(ff[14:16]))
-                                if fileSt == None or t1 < fileSt: fileSt = t1
-
-                            ctime = ctime+dt.timedelta(hours=1)
+                            if(regex.match(aFile) and myDir+aFile not in remoteFiles):
+                                remoteFiles.append(myDir+aFile)
+                        ctime = ctime+dt.timedelta(hours=1)
+
+                    #download the files concurrently
+                    for filename in fetchFiles(source,remoteFiles,tmpDir,nWorkers=self.nWorkers):
+                        filelist.append(filename)
+                        downloaded = True
+                        instrument.count('sdio.filesFetched')
+
+                        #HANDLE CACHEING NAME
+                        ff = os.path.basename(filename)
+                        #check the beginning time of the file
+                        t1 = dt.datetime(int(ff[0:4]),int(ff[4:6]),int(ff[6:8]),int(ff[9:11]),int(ff[11:13]),int(ff[14:16]))
+                        if fileSt == None or t1 < fileSt: fileSt = t1
                     if len(filelist) > 0 :
                         print 'found',ftype,'data on sftp server'
                         self.fType,self.dType = ftype,'dmap'
@@ -359,44 +382,61 @@ class radDataPtr():
             except Exception,e:
                 print e
                 print 'problem reading from sftp server'
+        if ownSource and source is not None: source.close()
     #check if we have found files
-    if len(filelist) != 0:
-        #concatenate the files into a single file
-        if not cached:
+    if cached:
+        self.fType = fileType
+        self.dType = 'dmap'
+        if len(pieces) == 1:
+            self.open(pieces[0][0])
+        else:
+            #adjacent cached spans may overlap, so only read each one
+            #between the boundaries chosen by the cache
+            windows = [(t1,t2) for f,t1,t2 in pieces]
+            windows[0] = (None,windows[0][1])
+            windows[-1] = (windows[-1][0],None)
+            self.open([f for f,t1,t2 in pieces],windows=windows)
+    elif self.__ptr == None and len(filelist) != 0:
+        #read the files in time order
+        filelist.sort(key=os.path.basename)
+        if filtered or downloaded:
+            #fitexfilter needs a single uncompressed file, and downloaded
+            #files are kept in the cache so we do not fetch them again
             print 'Concatenating all the files in to one'
             #choose a temp file name with time span info for cacheing
-            tmpName = '%s%s.%s.%s.%s.%s.%s' % (tmpDir, \
-              fileSt.strftime("%Y%m%d"),fileSt.strftime("%H%M%S"), \
-              eTime.strftime("%Y%m%d"),eTime.strftime("%H%M%S"),radcode,fileType)
-            print 'cat '+string.join(filelist)+' > '+tmpName
-            os.system('cat '+string.join(filelist)+' > '+tmpName)
-            for filename in filelist:
-                print 'rm '+filename
-                os.system('rm '+filename)
-        else:
-            tmpName = filelist[0]
-            self.fType = fileType
-            self.dType = 'dmap'
+            tmpName = myCache.fileName(radcode,fileType,fileSt,self.eTime)
+            myStream = dmapStream(filelist,nWorkers=self.nWorkers)
+            myStream.dump(tmpName)
+            myStream.close()
+            if downloaded:
+                for filename in filelist: os.remove(filename)
+            filelist = [tmpName]
+            if fileName == None:
+                myCache.store(cacheKey(radcode,fileType),fileSt,self.eTime,tmpName)
 
         #filter(if desired) and open the file
         if(not filtered):
-            self.open(tmpName)
+            self.open(filelist)
         else:
-            if not fileType+'f' in tmpName:
-                try:
-                    fTmpName = tmpName+'f'
-                    print 'fitexfilter '+tmpName+' > '+fTmpName
-                    os.system('fitexfilter '+tmpName+' > '+fTmpName)
-                except Exception,e:
-                    print 'problem filtering file, using unfiltered'
-                    fTmpName = tmpName
-            else:
+            fTmpName = myCache.fileName(radcode,fileType,fileSt,self.eTime,filtered=True)
+            print 'fitexfilter '+tmpName+' > '+fTmpName
+            os.system('fitexfilter '+tmpName+' > '+fTmpName)
+            if not os.path.isfile(fTmpName) or os.path.getsize(fTmpName) == 0:
+                print 'problem filtering file, using unfiltered'
+                myCache.discard(fTmpName)
                 fTmpName = tmpName
+            elif fileName == None:
+                myCache.store(cacheKey(radcode,fileType,True),fileSt,self.eTime,fTmpName)
             try:
                 self.open(fTmpName)
             except Exception,e:
                 print 'problem opening file'
                 print e
+            #files made from a user's own file are not kept in the cache,
+            #they stay readable until closed
+            if fileName != None:
+                myCache.discard(tmpName)
+                myCache.discard(fTmpName)
     if(self.__ptr != None):
         if(self.dType == None): self.dType = 'dmap'
     else:
@@ -429,25 +469,98 @@ class radDataPtr():
       return beam
 
 
-  def open(self,filename):
-      """open a dmap file by filename."""
-      import os
-      self.__filename=filename
-      self.__fd = os.open(filename,os.O_RDONLY)
-      self.__ptr = os.fdopen(self.__fd)
+  def open(self,filename,windows=None):
+      """open a dmap file by filename, or a list of plain, gzip or bzip2 dmap files which will be read in order without being decompressed to disk.  windows optionally limits the record times read from each file of a list, see :class:`pydarn.sdio.dmapStream.dmapStream`.  Archive (.h5) files are read with :class:`pydarn.sdio.radDataArchive.radDataArchive`."""
+      from pydarn.sdio.radDataIndex import radDataIndex
+      from pydarn.sdio.radDataArchive import radDataArchive, archiveSuffix
+      from pydarn.sdio.dmapStream import dmapStream
+      from pydarn.dmapio import DmapReader
+      if isinstance(filename,list) and len(filename) == 1 and windows is None: filename = filename[0]
+      self.__selection = None
+      self.fBeam = None
+      #let go of anything we had open before
+      if self.__ptr is not None: self.__ptr.close()
+      names = filename
+      if isinstance(names,basestring): names = [names]
+      instrument.count('sdio.filesOpened',len(names))
+      if all([f.endswith(archiveSuffix) for f in names]):
+        #columnar archive files, see radDataArchive
+        self.__filename=names
+        self.__ptr = radDataArchive(names)
+        self.index = None
+      elif isinstance(filename,list) or filename.endswith('.bz2') or filename.endswith('.gz'):
+        if isinstance(filename,basestring): filename = [filename]
+        self.__filename=filename
+        self.__ptr = dmapStream(filename,windows=windows,nWorkers=self.nWorkers)
+        self.index = None
+      else:
+        self.__filename=filename
+        self.__ptr = DmapReader(filename)
+        try:
+          self.index = radDataIndex(filename,fd=self.__ptr.fileno())
+        except Exception,e:
+          print 'problem indexing',filename,e
+          self.index = None
+      if self.prefetch > 0:
+        prefetch,self.prefetch = self.prefetch,0
+        self.setPrefetch(prefetch)
+
+  def setPrefetch(self,depth):
+      """start or stop reading ahead in a background thread.  records come back in the same order either way, this can be changed between reads.
+
+      **Args**:
+        * **depth** (int): the number of records to read ahead, 0 stops reading ahead
+      """
+      from pydarn.sdio.dataPrefetch import dmapPrefetcher
+      assert(isinstance(depth,int) and depth >= 0), \
+        'error, depth must be an int >= 0'
+      if self.__ptr is not None:
+        if isinstance(self.__ptr,dmapPrefetcher):
+          #put the reader back at the first record not handed out yet
+          self.__ptr.cancel()
+          self.__ptr = self.__ptr.ptr
+        if depth > 0:
+          self.__ptr = dmapPrefetcher(self.__ptr,depth=depth)
+      self.prefetch = depth
+
+  def __nextOffset(self):
+      """use the record index to find the offset of the next record at or after the current position which matches the request.  returns None if there are no more matches."""
+      import numpy as np
+      #the selection only has to be redone when the request changes
+      key = (self.sTime,self.eTime,self.stid,self.channel,self.bmnum,self.cp,self.tfreq)
+      if self.__selection is None or self.__selection[0] != key:
+        first = self.index.bisect(self.sTime)
+        pos = self.index.select(eTime=self.eTime,stid=self.stid,channel=self.channel,
+                                bmnum=self.bmnum,cp=self.cp,tfreq=self.tfreq)
+        pos = pos[pos >= first]
+        self.__selection = (key,self.index.offset[pos])
+      offsets = self.__selection[1]
+      i = np.searchsorted(offsets,self.__ptr.tell(),side='left')
+      if i >= len(offsets): return None
+      return int(offsets[i])
 
   def createIndex(self):
+      """build look up dictionaries of record time -> file offset for all records and for scan start records in the requested time window.  these come straight from the persistent record index when it is available."""
       import datetime as dt
-      from pydarn.dmapio import getDmapOffset,readDmapRec,setDmapOffset
       recordDict={}
       scanStartDict={}
+      if self.index is not None:
+          pos = self.index.select(sTime=self.sTime,eTime=self.eTime)
+          for i in pos:
+              rectime = dt.datetime.utcfromtimestamp(self.index.time[i])
+              recordDict[rectime]=int(self.index.offset[i])
+              if self.index.scan[i]==1: scanStartDict[rectime]=int(self.index.offset[i])
+          self.recordIndex=recordDict
+          self.scanStartIndex=scanStartDict
+          return recordDict,scanStartDict
       starting_offset=self.offsetTell()
       #rewind back to start of file
       self.rewind()
       while(1):
           #read the next record from the dmap file
-          offset= getDmapOffset(self.__fd)
-          dfile = readDmapRec(self.__fd)
+          offset= self.offsetTell()
+          #the index only needs the scalars
+          dfile = self.__readDict(numpy=True,fields=())
           if(dfile is None):
               #if we dont have valid data, clean up, get out
               print '\nreached end of data'
@@ -464,22 +577,57 @@ class radDataPtr():
       self.scanStartIndex=scanStartDict
       return recordDict,scanStartDict
 
+  def __filters(self):
+      """the request as keywords for readDmapRec, so that records which do not match are skipped in C after reading only their scalars."""
+      from utils.timeUtils import datetimeToEpoch
+      #the keywords only have to be redone when the request changes
+      key = (self.sTime,self.eTime,self.stid,self.channel,self.bmnum,self.cp,self.tfreq)
+      if self.__filterKey is not None and self.__filterKey[0] == key: return self.__filterKey[1]
+      filters = {'sTime':datetimeToEpoch(self.sTime),'stid':self.stid,
+                 'bmnum':self.bmnum,'cp':self.cp}
+      if self.eTime is not None: filters['eTime'] = datetimeToEpoch(self.eTime)
+      if self.channel is not None: filters['channel'] = alpha.index(self.channel)+1
+      if self.tfreq is not None: filters['tfreq'] = (int(self.tfreq[0]),int(self.tfreq[1]))
+      self.__filterKey = (key,filters)
+      return filters
+
+  def __readDict(self,numpy=False,fields=None,filters=None):
+      """read the next record dictionary from the open file or stream, with only the array fields in fields.  filters are passed on to the reader."""
+      if not instrument.enabled:
+        return self.__ptr.readRec(numpy=numpy,fields=fields,filters=filters)
+      with instrument.timer('sdio.decode'):
+        dfile = self.__ptr.readRec(numpy=numpy,fields=fields,filters=filters)
+      self.__account()
+      return dfile
+
+  def __account(self):
+      """add what the reader has read since the last call to the instrumentation counters"""
+      #a prefetcher hands on the counts of the reader it wraps
+      reader = getattr(self.__ptr,'ptr',self.__ptr)
+      now = (getattr(reader,'bytesRead',0),getattr(reader,'recordsRead',0),getattr(reader,'recordsSkipped',0))
+      last = self.__readCounts
+      if last is None or last[0] is not reader: last = (reader,0,0,0)
+      instrument.count('sdio.bytesRead',now[0]-last[1])
+      instrument.count('sdio.recordsDecoded',now[1]-last[2])
+      instrument.count('sdio.recordsFiltered',now[2]-last[3])
+      self.__readCounts = (reader,)+now
+
   def offsetSeek(self,offset):
       """jump to dmap record at supplied byte offset. 
+      when reading a chain of files the offset is a (file number, byte offset) tuple as returned by offsetTell.
       """
-      from pydarn.dmapio import setDmapOffset 
-      return setDmapOffset(self.__fd,offset)
+      self.fBeam = None
+      return self.__ptr.seek(offset)
 
   def offsetTell(self):
-      """jump to dmap record at supplied byte offset. 
+      """the byte offset of the next dmap record.
       """
-      from pydarn.dmapio import getDmapOffset,setDmapOffset
-      return getDmapOffset(self.__fd)
+      return self.__ptr.tell()
 
   def rewind(self):
       """jump to beginning of dmap file."""
-      from pydarn.dmapio import setDmapOffset 
-      return setDmapOffset(self.__fd,0)
+      self.fBeam = None
+      return self.__ptr.rewind()
 
   def readScan(self):
       """A function to read a full scan of data from a :class:`pydarn.sdio.radDataTypes.radDataPtr` object
@@ -492,42 +640,111 @@ class radDataPtr():
     
       """
       from pydarn.sdio import scanData
-      #Save the radDataPtr's bmnum setting temporarily and set it to None
-      orig_beam=self.bmnum
-      self.bmnum=None
-
       if self.__ptr.closed:
           print 'error, your file pointer is closed'
           return None
 
+      #Save the radDataPtr's bmnum setting temporarily and set it to None
+      orig_beam=self.bmnum
+      self.bmnum=None
+
       myScan = scanData()
-      myBeam=self.readRec()
-      if(myBeam.prm.scan == 1):  
-        firstflg=True
-        myScan.append(myBeam)
+      #start with the beam pushed back by the last scan read, if there is one
+      if self.fBeam is not None:
+        myBeam,self.fBeam = self.fBeam,None
       else:
-        if self.fBeam != None:
-          myScan.append(self.fBeam)
-          firstflg = False
-        else:
-          firstflg = True
+        myBeam=self.readRec()
+      if myBeam is None:
+        self.bmnum=orig_beam
+        return None
+      myScan.append(myBeam)
 
       while(1):
         myBeam=self.readRec()
         if myBeam is None: 
           break
-        if(myBeam.prm.scan == 0 or firstflg):
+        if(myBeam.prm.scan == 0):
           myScan.append(myBeam)
-          firstflg = False
           continue
         else:
+          #the first beam of the next scan, keep it for next time
           self.fBeam = myBeam
           break 
       self.bmnum=orig_beam
 
       return myScan
 
+  def readScanGrid(self,params=None,nbeam=None,ngate=None,repeats='last'):
+      """read a full scan, as :func:`readScan` does, into dense beam x gate arrays
 
+      **Args**:
+        * **[params]** (list): the fit parameters to grid, eg ['v','gflg'].  if None, those of v, p_l, w_l, elv, phi0, gflg and qflg which were read.  default = None
+        * **[nbeam]** (int): the number of beam rows.  if None, one more than the highest beam number read.  default = None
+        * **[ngate]** (int): the number of gate columns.  if None, the largest nrang read.  default = None
+        * **[repeats]** (str): which sounding of a beam sounded more than once fills its row, 'last', 'first' or 'mean'.  default = 'last'
+      **Returns**:
+        * **myGrid** (:class:`pydarn.sdio.radDataTypes.scanGrid`): the scan, with (nbeam, ngate) arrays.  *will return None when finished reading*
+      """
+      myScan = self.readScan()
+      if myScan is None: return None
+      return scanGrid(myScan,params=params,nbeam=nbeam,ngate=ngate,repeats=repeats)
+
+  def readScanCube(self,eTime=None,params=None,nbeam=None,ngate=None,repeats='last'):
+      """read all of the scans which start before a time into (nscan, nbeam, ngate) arrays.  The first scan starting at or after eTime is left to be read next.
+
+      **Args**:
+        * **[eTime]** (`datetime <http://tinyurl.com/bl352yx>`_): read scans which start before this.  if None, read to the end of the request.  default = None
+        * **[params]** (list): the fit parameters to grid, see :func:`readScanGrid`.  default = None
+        * **[nbeam]** (int): the number of beam rows, see :func:`readScanGrid`.  default = None
+        * **[ngate]** (int): the number of gate columns, see :func:`readScanGrid`.  default = None
+        * **[repeats]** (str): 'last', 'first' or 'mean', see :func:`readScanGrid`.  default = 'last'
+      **Returns**:
+        * **myCube** (:class:`pydarn.sdio.radDataTypes.scanGrid`): the scans, with (nscan, nbeam, ngate) arrays.  *will return None when there are no more scans*
+      """
+      scans = []
+      while True:
+        myScan = self.readScan()
+        if myScan is None: break
+        if eTime is not None and myScan[0].time >= eTime:
+          #put the whole scan back
+          self.offsetSeek(myScan[0].offset)
+          break
+        scans.append(myScan)
+      if len(scans) == 0: return None
+      return scanGrid(scans,params=params,nbeam=nbeam,ngate=ngate,repeats=repeats)
+
+
+
+  def readBlock(self,nrec=None):
+      """read a run of records matching the request into a columnar :class:`pydarn.sdio.radDataTypes.radDataBlock`, without making a beamData object per record.
+
+      **Args**:
+        * **[nrec]** (int): the most records to read, if None read to the end of the request. default = None
+      **Returns**:
+        * **myBlock** (:class:`pydarn.sdio.radDataTypes.radDataBlock`): the records read.  *will return None when finished reading*
+      """
+      if(self.__ptr == None):
+          print 'error, your pointer does not point to any data'
+          return None
+      if self.__ptr.closed:
+          print 'error, your file pointer is closed'
+          return None
+      if self.index is not None:
+          offset = self.__nextOffset()
+          if offset is None: return None
+          self.__ptr.seek(offset)
+      if not instrument.enabled:
+          block = self.__ptr.readBlock(nrec=nrec,fields=self.fields,filters=self.__filters())
+      else:
+          with instrument.timer('sdio.decode'):
+              block = self.__ptr.readBlock(nrec=nrec,fields=self.fields,filters=self.__filters())
+          self.__account()
+          if block is not None:
+              nbytes = sum([getattr(v,'nbytes',0) for v in block['scalars'].values()])
+              for values,offsets in block['arrays'].values(): nbytes += values.nbytes
+              instrument.peak('sdio.blockBytes',nbytes)
+      if block is None: return None
+      return radDataBlock(block,fType=self.fType)
 
   def readRec(self):
      """A function to read a single record of radar data from a :class:`pydarn.sdio.radDataTypes.radDataPtr` object
@@ -549,27 +766,36 @@ class radDataPtr():
      #do this until we reach the requested start time
      #and have a parameter match
      while(1):
-         offset=pydarn.dmapio.getDmapOffset(self.__fd)
-         dfile = pydarn.dmapio.readDmapRec(self.__fd)
+         #jump straight to the next matching record if we have an index
+         if self.index is not None:
+             offset = self.__nextOffset()
+             if offset is None:
+                 print '\nreached end of data'
+                 return None
+             self.__ptr.seek(offset)
+         offset=self.offsetTell()
+         dfile = self.__readDict(numpy=self.useNumpy,fields=self.fields,filters=self.__filters())
          #check for valid data
-         if dfile == None or dt.datetime.utcfromtimestamp(dfile['time']) > self.eTime:
+         if dfile is None:
              #if we dont have valid data, clean up, get out
              print '\nreached end of data'
              #self.close()
              return None
+         recTime = dt.datetime.utcfromtimestamp(dfile['time'])
+         if recTime > self.eTime:
+             print '\nreached end of data'
+             return None
          #check that we're in the time window, and that we have a 
          #match for the desired params
-         if dfile['channel'] < 2: channel = 'a'
-         else: channel = alpha[dfile['channel']-1]
-         if(dt.datetime.utcfromtimestamp(dfile['time']) >= self.sTime and \
-               dt.datetime.utcfromtimestamp(dfile['time']) <= self.eTime and \
+         channel = _channelToAlpha(None,dfile['channel'],dfile)
+         if(recTime >= self.sTime and recTime <= self.eTime and \
                (self.stid == None or self.stid == dfile['stid']) and
                (self.channel == None or self.channel == channel) and
                (self.bmnum == None or self.bmnum == dfile['bmnum']) and
-               (self.cp == None or self.cp == dfile['cp'])):
+               (self.cp == None or self.cp == dfile['cp']) and
+               (self.tfreq == None or self.tfreq[0] <= dfile['tfreq'] <= self.tfreq[1])):
              #fill the beamdata object
              myBeam.updateValsFromDict(dfile)
-             myBeam.recordDict=dfile
              myBeam.fType = self.fType
              myBeam.fPtr = self
              myBeam.offset = offset
@@ -581,28 +807,78 @@ class radDataPtr():
                  myBeam.iqdat.updateValsFromDict(dfile)
              if(myBeam.fType == 'fitacf' or myBeam.fType == 'fitex' or myBeam.fType == 'lmfit'):
                  myBeam.fit.updateValsFromDict(dfile)
-             if myBeam.fit.slist == None:
+             if myBeam.fit.slist is None:
                  myBeam.fit.slist = []
+             #only keeps what the attributes do not already hold
+             myBeam.recordDict=dfile
              return myBeam
+         instrument.count('sdio.recordsFiltered')
+
+  def prefetchStats(self):
+    """report how reading ahead is going, see :func:`pydarn.sdio.dataPrefetch.dmapPrefetcher.stats`.  None if prefetch is not set."""
+    from pydarn.sdio.dataPrefetch import dmapPrefetcher
+    if not isinstance(self.__ptr,dmapPrefetcher): return None
+    return self.__ptr.stats()
 
   def close(self):
-    """close associated dmap file."""
-    import os
+    """close associated dmap file.  this also stops any thread reading ahead."""
     if self.__ptr is not None:
       self.__ptr.close()
-      self.__fd=None
 
-class radBaseData():
+#returned by a field converter, or used as a default, to leave an attribute as it is
+_keep = object()
+#the (source, dmap name) lists of beamData.recordDict, shared between records
+_heldFields = {}
+
+class radBaseData(object):
   """a base class for the radar data types.  This allows for single definition of common routines
   
+  The data types keep their attributes in __slots__ rather than a per object dict, and each has a field mapping table, _fieldMap, built once when the class is defined by _makeFieldMap.  An entry of the table is (dmap name, attribute, converter, default).  The converter, if not None, is called as converter(obj,value,aDict).  default is used when the record does not have the field, and is called first if it is callable, eg list.  Either may be _keep to leave the attribute as it is.  _fieldUnmap maps the dmap names of converted fields to the inverse of the converter, for those which have one.  A slot named _x holds the value of a property x, eg beamData._rawacf holds beamData.rawacf.
+
   **ATTRS**:
     * Nothing.
   **METHODS**:
     * :func:`updateValsFromDict`: converts a dict from a dmap file to radBaseData
+    * :func:`copyData`: copies the contents of another object
     
   Written by AJ 20130108
   """
-  
+  __slots__ = ()
+  _fieldMap = ()
+
+  def _attrNames(self):
+    """the names of the attributes of the object, properties in place of the slots which hold them"""
+    names = []
+    for cls in type(self).__mro__:
+      for name in cls.__dict__.get('__slots__',()):
+        if name.startswith('_') and isinstance(getattr(type(self),name[1:],None),property):
+          name = name[1:]
+        names.append(name)
+    return names
+
+  def _items(self):
+    """(name, value) pairs of the attributes which are set, without making lazy sub-objects"""
+    items = []
+    for name in self._attrNames():
+      try:
+        if isinstance(getattr(type(self),name,None),property):
+          #only look through properties which hold something
+          if getattr(self,'_'+name) is None: continue
+        items.append((name,getattr(self,name)))
+      except AttributeError:
+        pass
+    return items
+
+  def __getstate__(self):
+    state = {}
+    for cls in type(self).__mro__:
+      for name in cls.__dict__.get('__slots__',()):
+        if hasattr(self,name): state[name] = getattr(self,name)
+    return state
+
+  def __setstate__(self, state):
+    for name,val in state.iteritems(): setattr(self,name,val)
+
   def copyData(self,obj):
     """This method is used to recursively copy all of the contents from ont object to self
     
@@ -620,7 +896,9 @@ class radBaseData():
       
     written by AJ, 20130402
     """
-    for key, val in obj.__dict__.iteritems():
+    for key, val in obj._items():
+      #a sub-object keeps pointing at its own parent
+      if key == 'parent': continue
       if isinstance(val, radBaseData):
         try: getattr(self, key).copyData(val)
         except: pass
@@ -640,106 +918,71 @@ class radBaseData():
       
     Written by AJ 20121130
     """
-    
-    import datetime as dt
-    
-    #iterate through prmData's attributes
-    for attr, value in self.__dict__.iteritems():
-      #check for special params
-      if(attr == 'time'):
-        #convert from epoch to datetime
-        if(aDict.has_key(attr) and isinstance(aDict[attr], float)): 
-          setattr(self,attr,dt.datetime.utcfromtimestamp(aDict[attr]))
-        continue
-      elif(attr == 'channel'):
-        if(aDict.has_key('channel')): 
-          if(isinstance(aDict.has_key('channel'), int)):
-            if(aDict['channel'] < 2): self.channel = 'a'
-            else: self.channel = alpha[aDict['channel']-1]
-          else: self.channel = aDict['channel']
-        else: self.channel = 'a'
-        continue
-      elif(attr == 'inttus'):
-        if(aDict.has_key('intt.us')): 
-          self.inttus = aDict['intt.us']
-        continue
-      elif(attr == 'inttsc'):
-        if(aDict.has_key('intt.sc')): 
-          self.inttsc = aDict['intt.sc']
-        continue
-      elif(attr == 'noisesky'):
-        if(aDict.has_key('noise.sky')): 
-          self.noisesky = aDict['noise.sky']
-        continue
-      elif(attr == 'noisesearch'):
-        if(aDict.has_key('noise.search')): 
-          self.noisesearch = aDict['noise.search']
-        continue
-      elif(attr == 'noisemean'):
-        if(aDict.has_key('noise.mean')): 
-          self.noisemean = aDict['noise.mean']
-        continue
-      elif(attr == 'acfd' or attr == 'xcfd'):
-        if(aDict.has_key(attr)): 
-          setattr(self,attr,[])
-          for i in range(self.parent.prm.nrang):
-            rec = []
-            for j in range(self.parent.prm.mplgs):
-              samp = []
-              for k in range(2):
-                samp.append(aDict[attr][(i*self.parent.prm.mplgs+j)*2+k])
-              rec.append(samp)
-            getattr(self, attr).append(rec)
-        else: setattr(self,attr,[])
-        continue
-      elif(attr == 'mainData'):
-        if(aDict.has_key('data')): 
-          if(len(aDict['data']) == aDict['smpnum']*aDict['seqnum']*2*2): fac = 2
-          else: fac = 1
-          setattr(self,attr,[])
-          for i in range(aDict['seqnum']):
-            rec = []
-            for j in range(aDict['smpnum']):
-              samp = []
-              for k in range(2):
-                samp.append(aDict['data'][(i*fac*aDict['smpnum']+j)*2+k])
-              rec.append(samp)
-            getattr(self, attr).append(rec)
-        else: setattr(self,attr,[])
-        continue
-      elif(attr == 'intData'):
-        if(aDict.has_key('data')): 
-          if(len(aDict['data']) == aDict['smpnum']*aDict['seqnum']*2*2): fac = 2
-          else: continue
-          setattr(self,attr,[])
-          for i in range(aDict['seqnum']):
-            rec = []
-            for j in range(aDict['smpnum']):
-              samp = []
-              for k in range(2):
-                samp.append(aDict['data'][((i*fac+1)*aDict['smpnum']+j)*2+k])
-              rec.append(samp)
-            getattr(self, attr).append(rec)
-        else: setattr(self,attr,[])
-        continue
-      try:
-        setattr(self,attr,aDict[attr])
-      except:
-        #put in a default value if not another object
-        if(not isinstance(getattr(self,attr),radBaseData)):
-          setattr(self,attr,None)
-          
-  #def __repr__(self):
-    #myStr = ''
-    #for key,var in self.__dict__.iteritems():
-      #if(isinstance(var,radBaseData) and key != 'parent'):
-        #print key
-        #myStr += key+'\n'
-        #myStr += str(var)
-      #else:
-        #myStr += key+' = '+str(var)+'\n'
-    #return myStr
-    
+    for name,attr,conv,default in self._fieldMap:
+      if aDict.has_key(name):
+        val = aDict[name]
+        if conv is not None: val = conv(self,val,aDict)
+      elif callable(default): val = default()
+      else: val = default
+      if val is not _keep: setattr(self,attr,val)
+
+
+def _makeFieldMap(names, special=None):
+  """build a field mapping table.  names are attributes read from the dmap field of the same name, special maps attribute names to (dmap name, converter, default) for the others."""
+  if special is None: special = {}
+  table = []
+  for attr in names:
+    if special.has_key(attr):
+      name,conv,default = special[attr]
+      table.append((name,attr,conv,default))
+    else:
+      table.append((attr,attr,None,None))
+  return tuple(table)
+
+def _makeFieldIndex(classes):
+  """give each class the index used to put records back together, _fieldIndex, built from its field mapping table.  An entry of the index is dmap name -> (attribute, inverse converter)."""
+  for cls in classes:
+    unmap = getattr(cls,'_fieldUnmap',{})
+    cls._fieldIndex = dict([(entry[0],(entry[1],unmap.get(entry[0]))) for entry in cls._fieldMap])
+
+def _epochToDatetime(obj, val, aDict):
+  import datetime as dt
+  if not isinstance(val, float): return _keep
+  return dt.datetime.utcfromtimestamp(val)
+
+def _channelToAlpha(obj, val, aDict):
+  if isinstance(val, int):
+    if 0 <= val < len(channelAlpha): return channelAlpha[val]
+    if val < 2: return 'a'
+    return alpha[val-1]
+  return val
+
+def _complexSamples(obj, val, aDict):
+  """(re,im) float pairs viewed as complex64 samples, shape (nrang,mplgs)"""
+  import numpy as np
+  samples = np.ascontiguousarray(val,dtype=np.float32)
+  return samples.view(np.complex64).reshape(-1,obj.parent.prm.mplgs)
+
+def _samplePairs(val):
+  """the inverse of _complexSamples"""
+  import numpy as np
+  if not isinstance(val, np.ndarray): return None
+  return np.ascontiguousarray(val).view(np.float32).ravel()
+
+def _iqSamples(obj, val, aDict):
+  """iq samples are stored by sequence, main array then interferometer if there is one.  both come back as views of one complex64 buffer."""
+  import numpy as np
+  if(len(val) == aDict['smpnum']*aDict['seqnum']*2*2): fac = 2
+  else: fac = 1
+  samples = np.ascontiguousarray(val,dtype=np.float32)
+  samples = samples.view(np.complex64).reshape(aDict['seqnum'],fac,aDict['smpnum'])
+  if fac == 2: obj.intData = samples[:,1]
+  return samples[:,0]
+
+def _iqIntSamples(obj, val, aDict):
+  #filled in along with mainData
+  return _keep
+
 class scanData(list):
   """a class to contain a radar scan.  Extends list.  Just a list of :class:`pydarn.sdio.radDataTypes.beamData` objects
   
@@ -755,7 +998,248 @@ class scanData(list):
 
   def __init__(self):
     pass
-  
+
+class radDataBlock():
+  """a class to contain a run of radar records in columns, as read by :func:`pydarn.sdio.radDataTypes.radDataPtr.readBlock`.  Scalars are held as one array per field, and array fields (slist, v, p_l, etc) are held flattened, with an offsets array marking where each record starts.
+
+  **Attrs**:
+    * **nrec** (int): the number of records
+    * **fType** (str): the file type, 'fitacf', 'rawacf', 'iqdat', 'fitex', 'lmfit'
+    * **scalars** (dict): field name -> numpy array of length nrec, eg 'time' (epoch), 'bmnum', 'tfreq', 'noise.sky'.  string fields are lists
+    * **arrays** (dict): field name -> (values, offsets), the values of record i are values[offsets[i]:offsets[i+1]]
+
+  **Methods**:
+    * :func:`ragged`
+    * :func:`dense`
+    * :func:`datetimes`
+    * :func:`select`
+
+  **Example**: 
+    ::
+    
+      myBlock = myPtr.readBlock()
+      vel = myBlock.dense('v')
+    
+  """
+  def __init__(self, block, fType=None):
+    self.nrec = block['nrec']
+    self.fType = fType
+    self.scalars = block['scalars']
+    self.arrays = block['arrays']
+
+  def __repr__(self):
+    return 'radDataBlock: %d records, scalars %s, arrays %s' % \
+      (self.nrec,sorted(self.scalars.keys()),sorted(self.arrays.keys()))
+
+  def __len__(self):
+    return self.nrec
+
+  def __getitem__(self, name):
+    """a scalar column, or the flattened values of an array field"""
+    if self.scalars.has_key(name): return self.scalars[name]
+    return self.arrays[name][0]
+
+  def ragged(self, name):
+    """the flattened values of an array field and the offsets of each record
+
+    **Args**:
+      * **name** (str): the field, eg 'v'
+    **Returns**:
+      * **values** (numpy.ndarray): the values of all of the records
+      * **offsets** (numpy.ndarray): nrec+1 offsets, record i is values[offsets[i]:offsets[i+1]]
+    """
+    return self.arrays[name]
+
+  def dense(self, name, nrang=None, fill=None):
+    """a gate field as a (nrec, nrang) masked array, placed by slist.  gates with no value are masked.
+
+    **Args**:
+      * **name** (str): the gate field, eg 'v', 'p_l', 'gflg'
+      * **[nrang]** (int): the number of gates, if None use the largest nrang in the block. default = None
+      * **[fill]** (number): the fill value under the mask, if None use nan for float fields and 0 otherwise. default = None
+    **Returns**:
+      * **data** (numpy.ma.MaskedArray): the field, one row per record
+    """
+    import numpy as np
+    values,offsets = self.arrays[name]
+    gates,goff = self.arrays['slist']
+    assert(len(values) == len(gates) and np.all(offsets == goff)), \
+      'error, '+name+' is not a gate field'
+    if nrang is None:
+      nrang = 0
+      if self.scalars.has_key('nrang') and self.nrec > 0: nrang = int(self.scalars['nrang'].max())
+      if len(gates) > 0: nrang = max(nrang,int(gates.max())+1)
+    if fill is None:
+      if values.dtype.kind == 'f': fill = np.nan
+      else: fill = 0
+    data = np.empty((self.nrec,nrang),dtype=values.dtype)
+    data.fill(fill)
+    mask = np.ones((self.nrec,nrang),dtype=bool)
+    rows = np.repeat(np.arange(self.nrec),np.diff(offsets))
+    keep = (gates >= 0) & (gates < nrang)
+    data[rows[keep],gates[keep]] = values[keep]
+    mask[rows[keep],gates[keep]] = False
+    return np.ma.masked_array(data,mask=mask,fill_value=fill)
+
+  def datetimes(self):
+    """the record times as a list of datetime objects"""
+    import datetime as dt
+    return [dt.datetime.utcfromtimestamp(t) for t in self.scalars['time']]
+
+  def select(self, rows):
+    """a new block holding some of the records of this one
+
+    **Args**:
+      * **rows** (numpy.ndarray): a boolean mask of length nrec, or the record numbers to keep, in the order wanted
+    **Returns**:
+      * **myBlock** (:class:`pydarn.sdio.radDataTypes.radDataBlock`): the records selected
+    """
+    import numpy as np
+    rows = np.asarray(rows)
+    if rows.dtype == bool: rows = np.nonzero(rows)[0]
+    rows = rows.astype(np.int64)
+    scalars = {}
+    for name,col in self.scalars.iteritems():
+      if isinstance(col,np.ndarray): scalars[name] = col[rows]
+      else: scalars[name] = [col[i] for i in rows]
+    arrays = {}
+    for name,(values,offsets) in self.arrays.iteritems():
+      counts = np.diff(offsets)[rows]
+      newOffsets = np.zeros(len(rows)+1,dtype=offsets.dtype)
+      np.cumsum(counts,out=newOffsets[1:])
+      #the position in values of every element kept
+      take = np.repeat(offsets[rows]-newOffsets[:-1],counts)+np.arange(newOffsets[-1])
+      arrays[name] = (values[take],newOffsets)
+    return radDataBlock({'nrec':len(rows),'scalars':scalars,'arrays':arrays},fType=self.fType)
+
+class scanGrid():
+  """a class to contain radar scans as dense beam x gate arrays, as read by :func:`pydarn.sdio.radDataTypes.radDataPtr.readScanGrid` and :func:`pydarn.sdio.radDataTypes.radDataPtr.readScanCube`.  A single scan gives (nbeam, ngate) arrays and (nbeam) beam vectors, a list of scans gives (nscan, nbeam, ngate) arrays and (nscan, nbeam) beam vectors.  Row i holds beam number i, gates and beams with no data are masked.
+
+  A beam can be sounded more than once in a scan, eg a camping beam.  repeats chooses which sounding fills its row: 'last', 'first', or 'mean', which averages each gate over the soundings which have it.  With 'mean' the flags (gflg, qflg, nlag) and the beam vectors come from the last sounding.
+
+  **Attrs**:
+    * **nscan** (int): the number of scans, None for a single scan
+    * **nbeam** (int): the number of beam rows
+    * **ngate** (int): the number of gate columns
+    * **params** (list): the fit parameters gridded
+    * **data** (dict): parameter -> numpy.ma.MaskedArray.  float parameters are filled with nan under the mask, flags with 0
+    * **count** (numpy.ndarray): the number of soundings of each beam
+    * **time** (numpy.ndarray): epoch time of the sounding used for each beam, nan if it was not sounded
+    * **tfreq**, **nave**, **noisesky**, **noisemean**, **frang**, **rsep**, **nrang** (numpy.ndarray): the same for these operating parameters
+    * **scanTime** (`datetime <http://tinyurl.com/bl352yx>`_ or list): the time of the first beam of the scan, None for an empty scan, a list for several scans
+
+  **Methods**:
+    * :func:`datetimes`
+
+  **Example**: 
+    ::
+    
+      myGrid = myPtr.readScanGrid(params=['v','gflg'])
+      vel = myGrid['v']
+  """
+  #parameters held as integers, the rest are floats
+  flagParams = ('gflg','qflg','nlag')
+  #the fit parameters gridded by default, if they were read
+  defaultParams = ('v','p_l','w_l','elv','phi0','gflg','qflg')
+  #beam vectors, attribute -> prmData attribute
+  beamParams = (('tfreq','tfreq'),('nave','nave'),('noisesky','noisesky'),('noisemean','noisemean'), \
+                ('frang','frang'),('rsep','rsep'),('nrang','nrang'))
+
+  def __init__(self, scans, params=None, nbeam=None, ngate=None, repeats='last'):
+    import numpy as np
+    from utils.timeUtils import datetimeToEpoch
+
+    assert(repeats == 'last' or repeats == 'first' or repeats == 'mean'), \
+      "error, repeats must be one of 'last','first','mean'"
+    single = isinstance(scans,scanData)
+    if single: scans = [scans]
+    beams = [b for scan in scans for b in scan]
+    if params is None:
+      params = [p for p in self.defaultParams if any([getattr(b.fit,p) is not None for b in beams])]
+    if nbeam is None: nbeam = max([b.bmnum for b in beams]+[-1])+1
+    if ngate is None: ngate = max([b.prm.nrang for b in beams if b.prm.nrang is not None]+[0])
+
+    shape = (len(scans),nbeam,ngate)
+    data,mask,nsum = {},{},{}
+    for p in params:
+      if p in self.flagParams: data[p] = np.zeros(shape,dtype=np.int16)
+      else: data[p] = np.zeros(shape,dtype=np.float64)
+      mask[p] = np.ones(shape,dtype=bool)
+      if repeats == 'mean' and p not in self.flagParams: nsum[p] = np.zeros(shape,dtype=np.int32)
+    count = np.zeros(shape[:2],dtype=np.int32)
+    vecs = {'time':np.empty(shape[:2])}
+    for name,attr in self.beamParams: vecs[name] = np.empty(shape[:2])
+    for v in vecs.itervalues(): v.fill(np.nan)
+
+    for k,scan in enumerate(scans):
+      #with 'first' go backwards so that the first sounding is written last
+      if repeats == 'first': order = reversed(scan)
+      else: order = scan
+      for b in order:
+        i = b.bmnum
+        if i is None or i < 0 or i >= nbeam: continue
+        count[k,i] += 1
+        vecs['time'][k,i] = datetimeToEpoch(b.time)
+        for name,attr in self.beamParams:
+          val = getattr(b.prm,attr)
+          if val is not None: vecs[name][k,i] = val
+        slist = np.asarray(b.fit.slist if b.fit.slist is not None else [],dtype=np.int64)
+        keep = (slist >= 0) & (slist < ngate)
+        gates = slist[keep]
+        for p in params:
+          vals = getattr(b.fit,p)
+          if nsum.has_key(p):
+            if vals is None or len(vals) != len(slist): continue
+            vals = np.asarray(vals,dtype=np.float64)[keep]
+            if nsum[p][k,i].max() == 0: data[p][k,i] = 0.
+            data[p][k,i,gates] += vals
+            nsum[p][k,i,gates] += 1
+            continue
+          #a later sounding replaces the whole row
+          mask[p][k,i] = True
+          if vals is None or len(vals) != len(slist): continue
+          data[p][k,i,gates] = np.asarray(vals)[keep]
+          mask[p][k,i,gates] = False
+
+    for p in params:
+      if nsum.has_key(p):
+        mask[p] = nsum[p] == 0
+        data[p][~mask[p]] /= nsum[p][~mask[p]]
+      if p in self.flagParams: fill = 0
+      else: fill = np.nan
+      data[p][mask[p]] = fill
+      if single: data[p],mask[p] = data[p][0],mask[p][0]
+      data[p] = np.ma.masked_array(data[p],mask=mask[p],fill_value=fill)
+
+    if single:
+      count = count[0]
+      for name in vecs.keys(): vecs[name] = vecs[name][0]
+    self.nscan = None if single else len(scans)
+    self.nbeam = nbeam
+    self.ngate = ngate
+    self.params = params
+    self.data = data
+    self.count = count
+    for name,v in vecs.iteritems(): setattr(self,name,v)
+    self.scanTime = [min([b.time for b in scan]) if len(scan) > 0 else None for scan in scans]
+    if single: self.scanTime = self.scanTime[0]
+
+  def __repr__(self):
+    if self.nscan is None: shape = '%d beams x %d gates' % (self.nbeam,self.ngate)
+    else: shape = '%d scans x %d beams x %d gates' % (self.nscan,self.nbeam,self.ngate)
+    return 'scanGrid: %s, params %s' % (shape,self.params)
+
+  def __getitem__(self, name):
+    """the gridded values of a parameter"""
+    return self.data[name]
+
+  def datetimes(self):
+    """the beam times as datetime objects, None for beams which were not sounded.  a list, or a list of lists for several scans"""
+    import datetime as dt, numpy as np
+    conv = lambda t: None if np.isnan(t) else dt.datetime.utcfromtimestamp(t)
+    if self.nscan is None: return [conv(t) for t in self.time]
+    return [[conv(t) for t in row] for row in self.time]
+
 class beamData(radBaseData):
   """a class to contain the data from a radar beam sounding, extends class :class:`pydarn.sdio.radDataTypes.radBaseData`
   
@@ -767,8 +1251,9 @@ class beamData(radBaseData):
     * **bmnum** (int): beam number
     * **prm** (:class:`pydarn.sdio.radDataTypes.prmData`): operating params
     * **fit** (:class:`pydarn.sdio.radDataTypes.fitData`): fitted params
-    * **rawacf** (:class:`pydarn.sdio.radDataTypes.rawData`): rawacf data
-    * **iqdat** (:class:`pydarn.sdio.radDataTypes.iqData`): iqdat data
+    * **rawacf** (:class:`pydarn.sdio.radDataTypes.rawData`): rawacf data, made when first used
+    * **iqdat** (:class:`pydarn.sdio.radDataTypes.iqData`): iqdat data, made when first used
+    * **recordDict** (dict): the record as read from the file.  only the fields which are not held by an attribute are kept, the rest are put back from the attributes when this is looked at
     * **fType** (str): the file type, 'fitacf', 'rawacf', 'iqdat', 'fitex', 'lmfit'
 
   **Example**: 
@@ -778,6 +1263,13 @@ class beamData(radBaseData):
     
   Written by AJ 20121130
   """
+  __slots__ = ('cp','stid','time','bmnum','channel','exflg','lmflg','acflg','rawflg', \
+               'iqflg','fitex','fitacf','lmfit','fit','prm','_rawacf','_iqdat', \
+               '_recordDict','fType','offset','fPtr')
+  _fieldMap = _makeFieldMap(['cp','stid','time','bmnum','channel','exflg','lmflg', \
+               'acflg','rawflg','iqflg','fitex','fitacf','lmfit'], \
+               {'time':('time',_epochToDatetime,_keep), \
+                'channel':('channel',_channelToAlpha,'a')})
   def __init__(self, beamDict=None, myBeam=None, proctype=None):
     #initialize the attr values
     self.cp = None
@@ -794,21 +1286,86 @@ class beamData(radBaseData):
     self.fitacf = None
     self.lmfit= None
     self.fit = fitData()
-    self.rawacf = rawData(parent=self)
     self.prm = prmData()
-    self.iqdat = iqData()
-    self.recordDict = None 
+    self._rawacf = None
+    self._iqdat = None
+    self._recordDict = None
     self.fType = None
     self.offset = None
     self.fPtr = None 
     #if we are intializing from an object, do that
     if(beamDict != None): self.updateValsFromDict(beamDict)
     
+  def _getRawacf(self):
+    if self._rawacf is None: self._rawacf = rawData(parent=self)
+    return self._rawacf
+
+  def _setRawacf(self, val):
+    self._rawacf = val
+
+  rawacf = property(_getRawacf, _setRawacf)
+
+  def _getIqdat(self):
+    if self._iqdat is None: self._iqdat = iqData()
+    return self._iqdat
+
+  def _setIqdat(self, val):
+    self._iqdat = val
+
+  iqdat = property(_getIqdat, _setIqdat)
+
+  def _sources(self):
+    """the objects which may hold fields of the record, by name"""
+    sources = [(None,self),('prm',self.prm),('fit',self.fit)]
+    if self._rawacf is not None: sources.append(('rawacf',self._rawacf))
+    if self._iqdat is not None: sources.append(('iqdat',self._iqdat))
+    return sources
+
+  def _setRecordDict(self, aDict):
+    """keep the fields of the record which can not be put back from the attributes, and where to find the others"""
+    import numpy as np
+    if aDict is None:
+      self._recordDict = None
+      return
+    extras = dict(aDict)
+    held = []
+    for srcName,src in self._sources():
+      unmap = getattr(src,'_fieldUnmap',{})
+      for name,attr,conv,default in src._fieldMap:
+        if not extras.has_key(name): continue
+        val = getattr(src,attr,None)
+        if conv is None: same = val is extras[name]
+        elif unmap.has_key(name):
+          same = isinstance(val,np.ndarray) and isinstance(extras[name],np.ndarray) and \
+                 np.may_share_memory(val,extras[name])
+        else: same = False
+        if same:
+          del extras[name]
+          held.append((srcName,name))
+    #records of a file almost always hold the same fields, so share the list
+    held = tuple(held)
+    self._recordDict = (extras,_heldFields.setdefault(held,held))
+
+  def _getRecordDict(self):
+    if self._recordDict is None: return None
+    extras,held = self._recordDict
+    aDict = dict(extras)
+    for srcName,name in held:
+      if srcName is None: src = self
+      else: src = getattr(self,srcName)
+      attr,inverse = src._fieldIndex[name]
+      val = getattr(src,attr,None)
+      if inverse is not None: val = inverse(val)
+      if val is not None: aDict[name] = val
+    return aDict
+
+  recordDict = property(_getRecordDict, _setRecordDict)
+
   def __repr__(self):
     import datetime as dt
     myStr = 'Beam record FROM: '+str(self.time)+'\n'
-    for key,var in self.__dict__.iteritems():
-      if isinstance(var,radBaseData) or isinstance(var,radDataPtr) or isinstance(var,type({})):
+    for key,var in self._items():
+      if key == 'recordDict' or isinstance(var,radBaseData) or isinstance(var,radDataPtr):
         myStr += '%s  = %s \n' % (key,'object')
       else:
         myStr += '%s  = %s \n' % (key,var)
@@ -845,6 +1402,13 @@ class prmData(radBaseData):
 
   Written by AJ 20121130
   """
+  __slots__ = ('nave','lagfr','smsep','bmazm','scan','rxrise','inttsc','inttus','mpinc', \
+               'mppul','mplgs','mplgexs','nrang','frang','rsep','xcf','tfreq','txpl', \
+               'ifmode','ptab','ltab','noisemean','noisesky','noisesearch')
+  _fieldMap = _makeFieldMap(__slots__, \
+               {'inttus':('intt.us',None,_keep),'inttsc':('intt.sc',None,_keep), \
+                'noisesky':('noise.sky',None,_keep),'noisesearch':('noise.search',None,_keep), \
+                'noisemean':('noise.mean',None,_keep)})
 
   #initialize the struct
   def __init__(self, prmDict=None, myPrm=None):
@@ -880,7 +1444,7 @@ class prmData(radBaseData):
   def __repr__(self):
     import datetime as dt
     myStr = 'Prm data: \n'
-    for key,var in self.__dict__.iteritems():
+    for key,var in self._items():
       myStr += '%s  = %s \n' % (key,var)
     return myStr
 
@@ -915,6 +1479,9 @@ class fitData(radBaseData):
     
   Written by AJ 20121130
   """
+  __slots__ = ('pwr0','slist','npnts','nlag','qflg','gflg','p_l','p_l_e','p_s','p_s_e', \
+               'v','v_e','w_l','w_l_e','w_s','w_s_e','phi0','phi0_e','elv')
+  _fieldMap = _makeFieldMap(__slots__)
 
   #initialize the struct
   def __init__(self, fitDict=None, myFit=None):
@@ -943,7 +1510,7 @@ class fitData(radBaseData):
   def __repr__(self):
     import datetime as dt
     myStr = 'Fit data: \n'
-    for key,var in self.__dict__.iteritems():
+    for key,var in self._items():
       myStr += '%s = %s \n' % (key,var)
     return myStr
 
@@ -952,8 +1519,8 @@ class rawData(radBaseData):
   
   **Attrs**:
     * **pwr0** (nrang length list): acf lag0 pwr 
-    * **acfd** (nrang x mplgs x 2 length list): acf data
-    * **xcfd** (nrang x mplgs x 2 length list): xcf data
+    * **acfd** (nrang x mplgs complex64 numpy array): acf data.  :func:`samplesToList` gives the old nrang x mplgs x 2 list
+    * **xcfd** (nrang x mplgs complex64 numpy array): xcf data
   
   **Example**: 
     ::
@@ -962,6 +1529,10 @@ class rawData(radBaseData):
     
   Written by AJ 20130125
   """
+  __slots__ = ('pwr0','acfd','xcfd','parent')
+  _fieldMap = _makeFieldMap(['pwr0','acfd','xcfd'], \
+               {'acfd':('acfd',_complexSamples,list),'xcfd':('xcfd',_complexSamples,list)})
+  _fieldUnmap = {'acfd':_samplePairs,'xcfd':_samplePairs}
 
   #initialize the struct
   def __init__(self, rawDict=None, parent=None):
@@ -975,7 +1546,7 @@ class rawData(radBaseData):
   def __repr__(self):
     import datetime as dt
     myStr = 'Raw data: \n'
-    for key,var in self.__dict__.iteritems():
+    for key,var in self._items():
       myStr += '%s = %s \n' % (key,var)
     return myStr
 
@@ -997,8 +1568,8 @@ class iqData(radBaseData):
     * **offset** (? length list): ?
     * **size** (? length list): ?
     * **badtr** (? length list): bad tr samples?
-    * **mainData** (seqnum x smpnum x 2 length list): the actual iq samples (main array)
-    * **intData** (seqnum x smpnum x 2 length list): the actual iq samples (interferometer)
+    * **mainData** (seqnum x smpnum complex64 numpy array): the actual iq samples (main array).  :func:`samplesToList` gives the old seqnum x smpnum x 2 list
+    * **intData** (seqnum x smpnum complex64 numpy array): the actual iq samples (interferometer)
   
   **Example**: 
     ::
@@ -1007,6 +1578,10 @@ class iqData(radBaseData):
     
   Written by AJ 20130116
   """
+  __slots__ = ('seqnum','chnnum','smpnum','skpnum','btnum','tsc','tus','tatten','tnoise', \
+               'toff','tsze','tbadtr','badtr','mainData','intData')
+  _fieldMap = _makeFieldMap(__slots__, \
+               {'mainData':('data',_iqSamples,list),'intData':('data',_iqIntSamples,list)})
 
   #initialize the struct
   def __init__(self, iqDict=None, parent=None):
@@ -1031,6 +1606,8 @@ class iqData(radBaseData):
   def __repr__(self):
     import datetime as dt
     myStr = 'IQ data: \n'
-    for key,var in self.__dict__.iteritems():
+    for key,var in self._items():
       myStr += '%s = %s \n' % (key,var)
     return myStr
+
+_makeFieldIndex((beamData,prmData,fitData,rawData,iqData))
@@ -28,10 +28,11 @@
   * :func:`pydarn.sdio.sdDataRead.sdDataOpen`
   * :func:`pydarn.sdio.sdDataRead.sdDataReadRec`
   * :func:`pydarn.sdio.sdDataRead.sdDataReadAll`
+  * :func:`pydarn.sdio.sdDataRead.sdDataReadBlock`
 """
 
 def sdDataOpen(sTime,hemi='north',eTime=None,fileType='grdex',src=None,fileName=None, \
-                custType='grdex',noCache=False):
+                custType='grdex',noCache=False,nWorkers=None,prefetch=0,source=None):
 
   """A function to establish a pipeline through which we can read radar data.  first it tries the mongodb, then it tries to find local files, and lastly it sftp's over to the VT data server.
 
@@ -44,6 +45,9 @@ def sdDataOpen(sTime,hemi='north',eTime=None,fileType='grdex',src=None,fileName=
     * **[fileName]** (str): the name of a specific file which you want to open.  If this is set, we will not look for cached files.  default=None
     * **[custType]** (str): if fileName is specified, the filetype of the file.  default = 'grdex'
     * **[noCache]** (boolean): flag to indicate that you do not want to check first for cached files.  default = False.
+    * **[nWorkers]** (int): the most files to download or decompress at once.  if None, DAVIT_NWORKERS is used, or the number of cpus up to 4.  default = None.
+    * **[prefetch]** (int): the number of records to read and decode ahead in a background thread.  0 turns this off.  default = 0.
+    * **[source]** (:class:`pydarn.sdio.dataFetch.sftpSource`): the server to fetch remote files from, eg an sftpSource on a local stand-in transport.  it is left open for the caller to close.  if None, the VT sftp server is connected to for this request.  default = None.
   **Returns**:
     * **myPtr** (:class:`pydarn.sdio.sdDataTypes.sdDataPtr`): a sdDataPtr object which contains a link to the data to be read.  this can then be passed to sdDataReadRec in order to actually read the data.
     
@@ -56,16 +60,20 @@ def sdDataOpen(sTime,hemi='north',eTime=None,fileType='grdex',src=None,fileName=
   Written by AJ 20130607
   """
 
-  import paramiko as p
-  import re
   import string
   import datetime as dt
   import os
   import pydarn.sdio
   import glob
+  import calendar
   from pydarn.sdio import sdDataPtr
-  from pydarn.radar import network
-  from utils.timeUtils import datetimeToEpoch
+  from pydarn.sdio.dmapStream import dmapStream
+  from pydarn.dmapio import DmapReader
+  from pydarn.sdio.dataCache import dataCache, cacheKey
+  from pydarn.sdio.radDataIndex import isDataFile
+  from pydarn.sdio.dataFetch import sftpSource, fetchFiles, defaultWorkers
+  from pydarn.sdio.dataPrefetch import dmapPrefetcher
+  from pydarn.sdio.radDataIndex import radDataIndex
   
   #check inputs
   assert(isinstance(sTime,dt.datetime)), \
@@ -81,8 +89,11 @@ def sdDataOpen(sTime,hemi='north',eTime=None,fileType='grdex',src=None,fileName=
     'error, fileName must be None or a string'
   assert(src == None or src == 'local' or src == 'sftp'), \
     'error, src must be one of None,local,sftp'
+  assert(isinstance(prefetch,int) and prefetch >= 0), \
+    'error, prefetch must be an int >= 0'
     
   if eTime == None: eTime = sTime+dt.timedelta(days=1)
+  if nWorkers == None: nWorkers = defaultWorkers()
     
   #create a datapointer object
   myPtr = sdDataPtr(sTime=sTime,eTime=eTime,hemi=hemi)
@@ -97,12 +108,17 @@ def sdDataOpen(sTime,hemi='north',eTime=None,fileType='grdex',src=None,fileName=
   #move back a little in time because files often start at 2 mins after the hour
   sTime = sTime-dt.timedelta(minutes=4)
   #a temporary directory to store a temporary file
-  tmpDir = '/tmp/sd/'
+  try:
+    tmpDir=os.environ['DAVIT_TMPDIR']
+  except:
+    tmpDir = '/tmp/sd/'
   d = os.path.dirname(tmpDir)
   if not os.path.exists(d):
     os.makedirs(d)
+  myCache = dataCache(tmpDir)
 
   cached = False
+  downloaded = False
   fileSt = None
 
   #FIRST, check if a specific filename was given
@@ -111,19 +127,8 @@ def sdDataOpen(sTime,hemi='north',eTime=None,fileType='grdex',src=None,fileName=
       if(not os.path.isfile(fileName)):
         print 'problem reading',fileName,':file does not exist'
         return None
-      outname = tmpDir+str(int(datetimeToEpoch(dt.datetime.now())))
-      if(string.find(fileName,'.bz2') != -1):
-        outname = string.replace(fileName,'.bz2','')
-        print 'bunzip2 -c '+fileName+' > '+outname+'\n'
-        os.system('bunzip2 -c '+fileName+' > '+outname)
-      elif(string.find(fileName,'.gz') != -1):
-        outname = string.replace(fileName,'.gz','')
-        print 'gunzip -c '+fileName+' > '+outname+'\n'
-        os.system('gunzip -c '+fileName+' > '+outname)
-      else:
-        os.system('cp '+fileName+' '+outname)
-        print 'cp '+fileName+' '+outname
-      filelist.append(outname)
+      #compressed files are decompressed as they are read
+      filelist.append(fileName)
       myPtr.fType,myPtr.dType = custType,'dmap'
       fileSt = sTime
     except Exception, e:
@@ -131,24 +136,12 @@ def sdDataOpen(sTime,hemi='north',eTime=None,fileType='grdex',src=None,fileName=
       print 'problem reading file',fileName
       return None
 
-  #Next, check for a cached file
+  #Next, check for cached files
+  pieces = None
   if fileName == None and not noCache:
     try:
-      if not cached:
-        for f in glob.glob("%s????????.??????.????????.??????.%s.%s" % (tmpDir,hemi,fileType)):
-          try:
-            ff = string.replace(f,tmpDir,'')
-            #check time span of file
-            t1 = dt.datetime(int(ff[0:4]),int(ff[4:6]),int(ff[6:8]),int(ff[9:11]),int(ff[11:13]),int(ff[13:15]))
-            t2 = dt.datetime(int(ff[16:20]),int(ff[20:22]),int(ff[22:24]),int(ff[25:27]),int(ff[27:29]),int(ff[29:31]))
-            #check if file covers our timespan
-            if t1 <= sTime and t2 >= eTime:
-              cached = True
-              filelist.append(f)
-              print 'Found cached file: %s' % f
-              break
-          except Exception,e:
-            print e
+      pieces = myCache.lookup(cacheKey(hemi,fileType),sTime,eTime)
+      cached = pieces is not None
     except Exception,e:
       print e
 
@@ -164,28 +157,21 @@ def sdDataOpen(sTime,hemi='north',eTime=None,fileType='grdex',src=None,fileName=
         form = '%s.%s.*' % (hemi,ftype)
         #iterate through all of the days in the request
         #ie, iterate through all possible file names
-        ctime = sTime
+        ctime = sTime.replace(hour=0,minute=0,second=0,microsecond=0)
         while ctime <= eTime:
           #directory on the data server
           myDir = '/sd-data/'+ctime.strftime("%Y")+'/'+ftype+'/'+hemi+'/'
           dateStr = ctime.strftime("%Y%m%d")
           #iterate through all of the files which begin in this hour
           for filename in glob.glob(myDir+dateStr+'.'+form):
-            outname = string.replace(filename,myDir,tmpDir)
-            #unzip the compressed file
-            if(string.find(filename,'.bz2') != -1):
-              outname = string.replace(outname,'.bz2','')
-              print 'bunzip2 -c '+filename+' > '+outname+'\n'
-              os.system('bunzip2 -c '+filename+' > '+outname)
-            elif(string.find(filename,'.gz') != -1):
-              outname = string.replace(outname,'.gz','')
-              print 'gunzip -c '+filename+' > '+outname+'\n'
-              os.system('gunzip -c '+filename+' > '+outname)
-            
-            filelist.append(outname)
+            #skip the index sidecars kept next to the data
+            if not isDataFile(filename): continue
+            #the files are read in place, compressed files are
+            #decompressed as they are read
+            filelist.append(filename)
 
             #HANDLE CACHEING NAME
-            ff = string.replace(outname,tmpDir,'')
+            ff = os.path.basename(filename)
             #check the beginning time of the file (for cacheing)
             t1 = dt.datetime(int(ff[0:4]),int(ff[4:6]),int(ff[6:8]),0,0,0)
             if fileSt == None or t1 < fileSt: fileSt = t1
@@ -210,59 +196,51 @@ def sdDataOpen(sTime,hemi='north',eTime=None,fileType='grdex',src=None,fileName=
         
   #finally, check the VT sftp server if we have not yet found files
   if (src == None or src == 'sftp') and myPtr.ptr == None and len(filelist) == 0 and fileName == None:
+    #one transport is shared by everything we fetch for this request,
+    #a source given to us is the caller's to close
+    ownSource = source is None
+    if ownSource:
+      try:
+        source = sftpSource()
+      except Exception,e:
+        print e
+        print 'problem connecting to sftp server'
+        source = None
     for ftype in arr:
+      if source is None: break
       print '\nLooking on the remote SFTP server for',ftype,'files'
       try:
+        import re
         form = '......'+ftype
-        #create a transport object for use in sftp-ing
-        transport = p.Transport((os.environ['VTDB'], 22))
-        transport.connect(username=os.environ['DBREADUSER'],password=os.environ['DBREADPASS'])
-        sftp = p.SFTPClient.from_transport(transport)
-        
-        #iterate through all of the hours in the request
+        #iterate through all of the days in the request
         #ie, iterate through all possible file names
-        ctime = sTime
-        oldyr = ''
+        remoteFiles = []
+        ctime = sTime.replace(hour=0,minute=0,second=0,microsecond=0)
         while ctime <= eTime:
           #directory on the data server
           myDir = '/data/'+ctime.strftime("%Y")+'/'+ftype+'/'+hemi+'/'
           dateStr = ctime.strftime("%Y%m%d")
-          if ctime.strftime("%Y") != oldyr:
-            #get a list of all the files in the directory
-            allFiles = sftp.listdir(myDir)
-            oldyr = ctime.strftime("%Y")
-          #create a regular expression to find files of this day, at this hour
+          #create a regular expression to find files of this day
           regex = re.compile(dateStr+'.'+form)
           #go thorugh all the files in the directory
+          try: allFiles = source.listdir(myDir)
+          except (IOError,OSError): allFiles = []
           for aFile in allFiles:
             #if we have a file match between a file and our regex
-            if regex.match(aFile): 
-              print 'copying file '+myDir+aFile+' to '+tmpDir+aFile
-              filename = tmpDir+aFile
-              #download the file via sftp
-              sftp.get(myDir+aFile,filename)
-              #unzip the compressed file
-              if(string.find(filename,'.bz2') != -1):
-                outname = string.replace(filename,'.bz2','')
-                print 'bunzip2 -c '+filename+' > '+outname+'\n'
-                os.system('bunzip2 -c '+filename+' > '+outname)
-              elif(string.find(filename,'.gz') != -1):
-                outname = string.replace(filename,'.gz','')
-                print 'gunzip -c '+filename+' > '+outname+'\n'
-                os.system('gunzip -c '+filename+' > '+outname)
-              else:
-                print 'It seems we have downloaded an uncompressed file :/'
-                print 'Strange things might happen from here on out...'
-                
-              filelist.append(outname)
+            if regex.match(aFile) and myDir+aFile not in remoteFiles:
+              remoteFiles.append(myDir+aFile)
+          ctime = ctime+dt.timedelta(days=1)
 
-              #HANDLE CACHEING NAME
-              ff = string.replace(outname,tmpDir,'')
-              #check the beginning time of the file
-              t1 = dt.datetime(int(ff[0:4]),int(ff[4:6]),int(ff[6:8]),0,0,0)
-              if fileSt == None or t1 < fileSt: fileSt = t1
+        #download the files concurrently
+        for filename in fetchFiles(source,remoteFiles,tmpDir,nWorkers=nWorkers):
+          filelist.append(filename)
+          downloaded = True
 
-          ctime = ctime+dt.timedelta(days=1)
+          #HANDLE CACHEING NAME
+          ff = os.path.basename(filename)
+          #check the beginning time of the file
+          t1 = dt.datetime(int(ff[0:4]),int(ff[4:6]),int(ff[6:8]),0,0,0)
+          if fileSt == None or t1 < fileSt: fileSt = t1
         if len(filelist) > 0 :
           print 'found',ftype,'data on sftp server'
           myPtr.fType = ftype
@@ -273,35 +251,79 @@ def sdDataOpen(sTime,hemi='north',eTime=None,fileType='grdex',src=None,fileName=
       except Exception,e:
         print e
         print 'problem reading from sftp server'
-        
+    if ownSource and source is not None: source.close()
+
+  #grid and map records carry their time in the start.* fields
+  def recTime(aDict):
+    return calendar.timegm((aDict['start.year'],aDict['start.month'],aDict['start.day'], \
+                            aDict['start.hour'],aDict['start.minute'],int(aDict['start.second'])))
+
   #check if we have found files
-  if len(filelist) != 0:
-    #concatenate the files into a single file
-    if not cached:
+  if cached:
+    myPtr.fType = fileType
+    myPtr.dType = 'dmap'
+    #adjacent cached spans may overlap, so only read each one
+    #between the boundaries chosen by the cache
+    windows = [(t1,t2) for f,t1,t2 in pieces]
+    windows[0] = (None,windows[0][1])
+    windows[-1] = (windows[-1][0],None)
+    if len(pieces) == 1: myPtr.ptr = DmapReader(pieces[0][0])
+    else: myPtr.ptr = dmapStream([f for f,t1,t2 in pieces],windows=windows,recTime=recTime,nWorkers=nWorkers)
+  elif len(filelist) != 0:
+    #read the files in time order
+    filelist.sort(key=os.path.basename)
+    if downloaded:
+      #keep downloaded data in the cache so we do not fetch it again
       print 'Concatenating all the files in to one'
-      #choose a temp file name with time span info for cacheing
-      tmpName = '%s%s.%s.%s.%s.%s.%s' % (tmpDir, \
-                fileSt.strftime("%Y%m%d"),fileSt.strftime("%H%M%S"), \
-                eTime.strftime("%Y%m%d"),eTime.strftime("%H%M%S"),hemi,fileType)
-      print 'cat '+string.join(filelist)+' > '+tmpName
-      os.system('cat '+string.join(filelist)+' > '+tmpName)
-      for filename in filelist:
-        print 'rm '+filename
-        os.system('rm '+filename)
+      tmpName = myCache.fileName(hemi,fileType,fileSt,eTime)
+      myStream = dmapStream(filelist,nWorkers=nWorkers)
+      myStream.dump(tmpName)
+      myStream.close()
+      for filename in filelist: os.remove(filename)
+      myCache.store(cacheKey(hemi,fileType),fileSt,eTime,tmpName)
+      filelist = [tmpName]
+    #a single plain file gets a buffered reader, anything else is streamed
+    if len(filelist) == 1 and not filelist[0].endswith('.bz2') and not filelist[0].endswith('.gz'):
+      myPtr.ptr = DmapReader(filelist[0])
     else:
-      tmpName = filelist[0]
-      myPtr.fType = fileType
-      myPtr.dType = 'dmap'
-
-    #filter(if desired) and open the file
-    myPtr.fd = os.open(tmpName,os.O_RDONLY)
-    myPtr.ptr = os.fdopen(myPtr.fd)
+      myPtr.ptr = dmapStream(filelist,recTime=recTime,nWorkers=nWorkers)
   if myPtr.ptr != None: 
+    if isinstance(myPtr.ptr,DmapReader):
+      #index the record times, so we can go straight to the start of the request
+      try:
+        myPtr.index = radDataIndex(myPtr.ptr.name,fd=myPtr.ptr.fileno())
+        pos = myPtr.index.bisect(sTime)
+        if pos < len(myPtr.index): myPtr.ptr.seek(int(myPtr.index.offset[pos]))
+      except Exception,e:
+        print 'problem indexing',myPtr.ptr.name,e
+        myPtr.index = None
+    if prefetch > 0: myPtr.ptr = dmapPrefetcher(myPtr.ptr,depth=prefetch)
     return myPtr
   else:
     print '\nSorry, we could not find any data for you :('
     return None
   
+def _filters(myPtr):
+  """the time window of a request as reader filters, so that records before it are skipped after reading their scalars only"""
+  from utils.timeUtils import datetimeToEpoch
+  filters = {}
+  if myPtr.sTime is not None: filters['sTime'] = datetimeToEpoch(myPtr.sTime)
+  if myPtr.eTime is not None: filters['eTime'] = datetimeToEpoch(myPtr.eTime)
+  return filters
+  
+def _account(myPtr):
+  """add what the reader of a pointer has read since the last call to the instrumentation counters, see :mod:`utils.instrument`"""
+  from utils import instrument
+  #a prefetcher hands on the counts of the reader it wraps
+  reader = getattr(myPtr.ptr,'ptr',myPtr.ptr)
+  now = (getattr(reader,'bytesRead',0),getattr(reader,'recordsRead',0),getattr(reader,'recordsSkipped',0))
+  last = getattr(myPtr,'_readCounts',None)
+  if last is None or last[0] is not reader: last = (reader,0,0,0)
+  instrument.count('sdio.bytesRead',now[0]-last[1])
+  instrument.count('sdio.recordsDecoded',now[1]-last[2])
+  instrument.count('sdio.recordsFiltered',now[2]-last[3])
+  myPtr._readCounts = (reader,)+now
+
 def sdDataReadRec(myPtr):
   """A function to read a single record of radar data from a :class:`pydarn.sdio.sdDataTypes.sdDataPtr` object
   
@@ -324,6 +346,7 @@ def sdDataReadRec(myPtr):
   """
 
   from pydarn.sdio.sdDataTypes import sdDataPtr, gridData, mapData, alpha
+  from utils import instrument
   import pydarn
   import datetime as dt
   
@@ -349,8 +372,14 @@ def sdDataReadRec(myPtr):
   #do this until we reach the requested start time
   #and have a parameter match
   while(1):
-    dfile = pydarn.dmapio.readDmapRec(myPtr.fd)
+    with instrument.timer('sdio.decode'):
+      dfile = myPtr.ptr.readRec(numpy=True,filters=_filters(myPtr))
+    if instrument.enabled: _account(myPtr)
     #check for valid data
+    if dfile == None:
+      print '\nreached end of data'
+      myPtr.ptr.close()
+      return None
     try:
       dtime = dt.datetime(dfile['start.year'],dfile['start.month'],dfile['start.day'], \
                           dfile['start.hour'],dfile['start.minute'],int(dfile['start.second']))
@@ -376,6 +405,7 @@ def sdDataReadRec(myPtr):
         return None
       myData.fType = myPtr.fType
       return myData
+    instrument.count('sdio.recordsFiltered')
 
 def sdDataReadAll(myPtr):
   """A function to read a large amount (to the end of the request) of radar data into a list from a :class:`pydarn.sdio.sdDataTypes.sdDataPtr` object
@@ -416,9 +446,12 @@ def sdDataReadAll(myPtr):
   #and have a parameter match
   while(1):
 
-    dfile = pydarn.dmapio.readDmapRec(myPtr.fd)
-    print "python tell:",myPtr.ptr.tell()
+    dfile = myPtr.ptr.readRec(numpy=True,filters=_filters(myPtr))
     #check for valid data
+    if dfile == None:
+      print '\nreached end of data'
+      myPtr.ptr.close()
+      break
     try:
       dtime = dt.datetime(dfile['start.year'],dfile['start.month'],dfile['start.day'], \
                           dfile['start.hour'],dfile['start.minute'],int(dfile['start.second']))
@@ -446,10 +479,49 @@ def sdDataReadAll(myPtr):
       myData.fType = myPtr.fType
       myList.append(myData)
 
-  if len(myList > 0):
+  if len(myList) > 0:
     print 'returning a list with %d records of data' % len(myList)
     return myList
   else:
     print 'No data found, returning None'
     return None
 
+def sdDataReadBlock(myPtr,nrec=None,fields=None):
+  """A function to read a run of grid or map records into columns from a :class:`pydarn.sdio.sdDataTypes.sdDataPtr` object.  The vectors of all of the records come back concatenated, with the offsets of each record, which is much faster than reading a record at a time for long time series.
+  
+  .. note::
+    to use this, you must first create a :class:`pydarn.sdio.sdDataTypes.sdDataPtr` object with :func:`sdDataOpen`
+
+  **Args**:
+    * **myPtr** (:class:`pydarn.sdio.sdDataTypes.sdDataPtr`): contains the pipeline to the data we are after
+    * **[nrec]** (int): the most records to read.  if None, read to the end of the request.  default = None
+    * **[fields]** (set): the dmap names of the array fields to read, eg set(['vector.mlat','vector.mlon','vector.vel.median']).  None reads them all.  default = None
+  **Returns**:
+    * **myBlock** (:class:`pydarn.sdio.sdDataTypes.sdDataBlock`): the records in columns.  *will return None when finished reading*
+    
+  **Example**:
+    ::
+    
+      import datetime as dt
+      myPtr = sdDataOpen(dt.datetime(2011,1,1),'north',eTime=dt.datetime(2011,1,2))
+      myBlock = sdDataReadBlock(myPtr)
+      vel,offsets = myBlock.vector('velmedian')
+    
+  """
+  from pydarn.sdio.sdDataTypes import sdDataPtr, sdDataBlock
+  from utils import instrument
+  
+  #check input
+  assert(isinstance(myPtr,sdDataPtr)),\
+    'error, input must be of type sdDataPtr'
+  if myPtr.ptr == None:
+    print 'error, your pointer does not point to any data'
+    return None
+  if myPtr.ptr.closed:
+    print 'error, your file pointer is closed'
+    return None
+  with instrument.timer('sdio.decode'):
+    block = myPtr.ptr.readBlock(nrec=nrec,fields=fields,filters=_filters(myPtr))
+  if instrument.enabled: _account(myPtr)
+  if block is None: return None
+  return sdDataBlock(block,fType=myPtr.fType)
@@ -26,6 +26,7 @@
   * :class:`pydarn.sdio.sdDataTypes.sdBaseData`
   * :class:`pydarn.sdio.sdDataTypes.gridData`
   * :class:`pydarn.sdio.sdDataTypes.mapData`
+  * :class:`pydarn.sdio.sdDataTypes.sdDataBlock`
 """
 
 
@@ -37,11 +38,12 @@ class sdDataPtr():
   """A class which contains a pipeline to a data source
   
   **Attrs**:
-    * **ptr** (file or mongodb query object): the file pointer
+    * **ptr** (:class:`pydarn.dmapio.DmapReader` or :class:`pydarn.sdio.dmapStream.dmapStream`): the records being read, a buffered reader for a single plain file or a stream over a chain of files, wrapped in a :class:`pydarn.sdio.dataPrefetch.dmapPrefetcher` when sdDataOpen was asked to prefetch
     * **sTime** (`datetime <http://tinyurl.com/bl352yx>`_): start time of the request
     * **eTime** (`datetime <http://tinyurl.com/bl352yx>`_): end time of the request
     * **hemi** (str): station id of the request
     * **fType** (str): the file type, 'grid', 'map'
+    * **index** (:class:`pydarn.sdio.radDataIndex.radDataIndex`): the record time index of a single plain file, None otherwise
   **Methods**:
     * Nothing.
     
@@ -54,6 +56,7 @@ class sdDataPtr():
     self.hemi = hemi
     self.fType = None
     self.fd = None 
+    self.index = None
 
   def close(self):
     import os
@@ -71,8 +74,30 @@ class sdDataPtr():
   def __del__(self):
     self.close()
 
+#(class, dmap name) -> attribute name, or None if the class does not keep the field
+_attrNames = {}
+
+def _attrName(obj, key):
+  """the attribute of obj which holds the dmap field key, or None"""
+  if key.startswith('start.') or key.startswith('end.'): return None
+  if 'vector.' in key:
+    if not isinstance(obj,sdVector): return None
+    name = key.replace('vector.','').replace('.','')
+  elif 'model.' in key:
+    if not isinstance(obj,sdModel): return None
+    name = key.replace('model.','').replace('.','')
+  elif '+' in key:
+    name = key.replace('+','p')
+  else:
+    name = key.replace('.','')
+  if not hasattr(obj,name): return None
+  return name
+
 class sdBaseData():
   """a base class for the porocessed SD data types.  This allows for single definition of common routines
+
+
+  Array fields are held as numpy arrays, as read, except for the per radar fields of a grid record (stid, nvec, freq, ...) which stay lists.  The attribute for each dmap field name is worked out once per class and kept in _attrNames.
   
   **ATTRS**:
     * Nothing.
@@ -81,6 +106,8 @@ class sdBaseData():
     
   Written by AJ 20130607
   """
+  #keep array fields as lists rather than numpy arrays
+  _listArrays = False
   
   def updateValsFromDict(self, aDict):
     """A function to to fill an sdBaseData object with the data in a dictionary that is returned from the reading of a dmap file
@@ -97,43 +124,29 @@ class sdBaseData():
     """
     
     import datetime as dt
+    import numpy as np
     syr,smo,sdy,shr,smt,ssc = 1,1,1,1,1,1
     eyr,emo,edy,ehr,emt,esc = 1,1,1,1,1,1
+    if aDict.has_key('start.year'):
+      syr,smo,sdy = aDict['start.year'],aDict['start.month'],aDict['start.day']
+      shr,smt,ssc = aDict['start.hour'],aDict['start.minute'],int(aDict['start.second'])
+    if aDict.has_key('end.year'):
+      eyr,emo,edy = aDict['end.year'],aDict['end.month'],aDict['end.day']
+      ehr,emt,esc = aDict['end.hour'],aDict['end.minute'],int(aDict['end.second'])
 
+    cls = self.__class__
     for key,val in aDict.iteritems():
-      if key == 'start.year': syr = aDict['start.year']
-      elif key == 'start.month': smo = aDict['start.month']
-      elif key == 'start.day': sdy = aDict['start.day']
-      elif key == 'start.hour': shr = aDict['start.hour']
-      elif key == 'start.minute': smt = aDict['start.minute']
-      elif key == 'start.second': ssc = int(aDict['start.second'])
-      elif key == 'end.year': eyr = aDict['end.year']
-      elif key == 'end.month': emo = aDict['end.month']
-      elif key == 'end.day': edy = aDict['end.day']
-      elif key == 'end.hour': ehr = aDict['end.hour']
-      elif key == 'end.minute': emt = aDict['end.minute']
-      elif key == 'end.second': esc = int(aDict['end.second'])
-
-      elif 'vector.' in key:
-        if isinstance(self,sdVector):
-          name = key.replace('vector.','')
-          name = name.replace('.','')
-          if hasattr(self, name): setattr(self,name,val)
-
-      elif 'model.' in key:
-        if isinstance(self,sdModel):
-          name = key.replace('model.','')
-          name = name.replace('.','')
-          if hasattr(self, name): setattr(self,name,val)
-
-      elif '+' in key:
-        name = key.replace('+','p')
-        if hasattr(self, name): setattr(self,name,val)
-
-      else:
-        name = key.replace('.','')
-        if hasattr(self, name):
-          setattr(self,name,val)
+      try:
+        name = _attrNames[(cls,key)]
+      except KeyError:
+        name = _attrNames.setdefault((cls,key),_attrName(self,key))
+      if name is None: continue
+      if isinstance(val,np.ndarray):
+        #the per radar fields of a grid record are short, they stay lists
+        if self._listArrays: val = val.tolist()
+      elif isinstance(val,list) and not self._listArrays:
+        val = np.array(val)
+      setattr(self,name,val)
 
     if isinstance(self,gridData) or isinstance(self,mapData):
       self.sTime = dt.datetime(syr,smo,sdy,shr,smt,ssc)
@@ -176,6 +189,8 @@ class gridData(sdBaseData):
   Written by AJ 20130607
   """
 
+  _listArrays = True
+
   #initialize the struct
   def __init__(self, dataDict=None):
     self.sTime = None
@@ -297,18 +312,18 @@ class sdVector(sdBaseData):
   """ a class to contain vector records of gridded data, extends :class:`pydarn.sdio.sdDataTypes.sdBaseData`
   
   **Attrs**:
-    * **mlat** (list): the magnetic longitude of the grid cells
-    * **mlon** (list): the magnetic longitude of the grid cells
-    * **kvect** (list): the kvectors of the vectors in the grid cells
-    * **stid** (int): the station ID of the radar which made the measurement of the vector in the grid cell
-    * **channel** (int): the channel of the radar which made the measurement of the vector in the grid cell
-    * **index** (int): 
-    * **velmedian** (int): the median velocity of the vector
-    * **velsd** (float): the standard deviation of the velocity of the vector
-    * **pwrmedian** (float): the median power of the vector
-    * **pwrsd** (float): the standard devation of the power of the vector
-    * **wdtmedian** (string): the median spectral width of the vector
-    * **wdtsd** (string): the standard devation on the spectral width of the vector
+    * **mlat** (numpy.ndarray): the magnetic longitude of the grid cells
+    * **mlon** (numpy.ndarray): the magnetic longitude of the grid cells
+    * **kvect** (numpy.ndarray): the kvectors of the vectors in the grid cells
+    * **stid** (numpy.ndarray): the station ID of the radar which made the measurement of the vector in the grid cell
+    * **channel** (numpy.ndarray): the channel of the radar which made the measurement of the vector in the grid cell
+    * **index** (numpy.ndarray): 
+    * **velmedian** (numpy.ndarray): the median velocity of the vector
+    * **velsd** (numpy.ndarray): the standard deviation of the velocity of the vector
+    * **pwrmedian** (numpy.ndarray): the median power of the vector
+    * **pwrsd** (numpy.ndarray): the standard devation of the power of the vector
+    * **wdtmedian** (numpy.ndarray): the median spectral width of the vector
+    * **wdtsd** (numpy.ndarray): the standard devation on the spectral width of the vector
   
   **Example**: 
     ::
@@ -343,11 +358,11 @@ class sdModel(sdBaseData):
     I don't know what `alot <http://4.bp.blogspot.com/_D_Z-D2tzi14/S8TRIo4br3I/AAAAAAAACv4/Zh7_GcMlRKo/s400/ALOT.png>`_ of these attributes mean.  If you do, please add them in.
 
   **Attrs**:
-    * **mlat** (list): 
-    * **kvect** (list): 
-    * **velmedian** (list): 
-    * **boundarymlat** (int): 
-    * **boundarymlon** (int):
+    * **mlat** (numpy.ndarray): 
+    * **kvect** (numpy.ndarray): 
+    * **velmedian** (numpy.ndarray): 
+    * **boundarymlat** (numpy.ndarray): 
+    * **boundarymlon** (numpy.ndarray):
 
   **Example**: 
     ::
@@ -368,3 +383,85 @@ class sdModel(sdBaseData):
 
     if(dataDict != None): self.updateValsFromDict(dataDict)
 
+class sdDataBlock():
+  """a class to contain a run of grid or map records in columns, as read by :func:`pydarn.sdio.sdDataRead.sdDataReadBlock`.  The vectors of all of the records are held concatenated, one array per field, with an offsets array marking where each record starts, so a day of vectors can be worked on without making an object per record.
+
+  **Attrs**:
+    * **nrec** (int): the number of records
+    * **fType** (str): the file type, 'grd', 'grdex', 'map', 'mapex'
+    * **time** (numpy.ndarray): the start time of each record, in epoch seconds
+    * **scalars** (dict): dmap field name -> numpy array of length nrec, eg 'IMF.Bz', 'pot.drop'.  string fields are lists
+    * **arrays** (dict): dmap field name -> (values, offsets), the values of record i are values[offsets[i]:offsets[i+1]]
+
+  **Methods**:
+    * :func:`vector`
+    * :func:`model`
+    * :func:`ragged`
+    * :func:`recordNumbers`
+    * :func:`datetimes`
+
+  **Example**: 
+    ::
+    
+      myBlock = pydarn.sdio.sdDataReadBlock(myPtr)
+      mlat,offsets = myBlock.vector('mlat')
+      vel = myBlock['vector.vel.median']
+  """
+  def __init__(self, block, fType=None):
+    self.nrec = block['nrec']
+    self.fType = fType
+    self.scalars = block['scalars']
+    self.arrays = block['arrays']
+    self.time = self.scalars['time']
+
+  def __repr__(self):
+    return 'sdDataBlock: %d records, arrays %s' % (self.nrec,sorted(self.arrays.keys()))
+
+  def __len__(self):
+    return self.nrec
+
+  def __getitem__(self, name):
+    """a scalar column, or the concatenated values of an array field, by dmap name"""
+    if self.scalars.has_key(name): return self.scalars[name]
+    return self.arrays[name][0]
+
+  def __field(self, prefix, name):
+    """find the dmap name of a vector or model field from its sdVector or sdModel attribute name, eg velmedian"""
+    if self.arrays.has_key(prefix+name): return prefix+name
+    for key in self.arrays.iterkeys():
+      if key.startswith(prefix) and key[len(prefix):].replace('.','') == name: return key
+    raise KeyError(prefix+name)
+
+  def vector(self, name):
+    """the values of a vector field for all of the records, and the offsets of each record
+
+    **Args**:
+      * **name** (str): the field, as named in :class:`pydarn.sdio.sdDataTypes.sdVector`, eg 'mlat' or 'velmedian'
+    **Returns**:
+      * **values** (numpy.ndarray): the values of all of the records
+      * **offsets** (numpy.ndarray): nrec+1 offsets, record i is values[offsets[i]:offsets[i+1]]
+    """
+    return self.arrays[self.__field('vector.',name)]
+
+  def model(self, name):
+    """the values of a model field for all of the records, and the offsets of each record, as for :func:`vector`
+
+    **Args**:
+      * **name** (str): the field, as named in :class:`pydarn.sdio.sdDataTypes.sdModel`, eg 'kvect'
+    """
+    return self.arrays[self.__field('model.',name)]
+
+  def ragged(self, name):
+    """the values and offsets of an array field, by dmap name"""
+    return self.arrays[name]
+
+  def recordNumbers(self, name):
+    """the record each value of an array field came from, eg to look up the record time of each vector with time[recordNumbers('vector.mlat')]"""
+    import numpy as np
+    values,offsets = self.arrays[name]
+    return np.repeat(np.arange(self.nrec),np.diff(offsets))
+
+  def datetimes(self):
+    """the record start times as a list of datetime objects"""
+    import datetime as dt
+    return [dt.datetime.utcfromtimestamp(t) for t in self.time]
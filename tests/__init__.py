@@ -0,0 +1,11 @@
+# Copyright (C) 2012  VT SuperDARN Lab
+# Full license can be found in LICENSE.txt
+"""
+*****************
+**Module**: tests
+*****************
+Round trip and behaviour tests of the data readers and writers, on synthetic files made by :mod:`benchmarks.synthData` in a scratch directory.  They need the compiled dmapio module, and the archive tests need h5py.  Run them from the top of the tree with::
+
+  python -m unittest discover -s tests -t .
+
+"""
@@ -0,0 +1,68 @@
+# Copyright (C) 2012  VT SuperDARN Lab
+# Full license can be found in LICENSE.txt
+"""tests of reading dmap records into columns"""
+import unittest
+
+class dmapBlockTest(unittest.TestCase):
+
+  def setUp(self):
+    import os, tempfile, datetime
+    from benchmarks.synthData import writeRecords, fitRecords
+    self.dir = tempfile.mkdtemp()
+    recs = list(fitRecords(datetime.datetime(2011,1,1),datetime.datetime(2011,1,1,0,10), \
+                           nbeam=8,ngate=30,scanTime=60))
+    #the layout changes part way through: a field is dropped from some records, another added to others
+    for i,rec in enumerate(recs):
+      if i % 3 == 1: del rec['elv']
+      if i % 5 == 2: rec['extra'] = i
+    self.recs = recs
+    self.fileName = os.path.join(self.dir,'block.fitex')
+    writeRecords(self.fileName,recs)
+
+  def tearDown(self):
+    import shutil
+    shutil.rmtree(self.dir)
+
+  def testMatchesRecords(self):
+    """each column holds what readRec gives for each record, and nothing for records without the field"""
+    import numpy as np
+    from pydarn.dmapio import DmapReader
+    myReader = DmapReader(self.fileName)
+    recs = []
+    while True:
+      rec = myReader.readRec(numpy=True)
+      if rec is None: break
+      recs.append(rec)
+    block = DmapReader(self.fileName).readBlock()
+    self.assertEqual(block['nrec'],len(recs))
+    values,offsets = block['arrays']['elv']
+    slist,slistOffsets = block['arrays']['slist']
+    for i,rec in enumerate(recs):
+      got = values[offsets[i]:offsets[i+1]]
+      if rec.has_key('elv'): self.assertTrue(np.allclose(got,rec['elv']))
+      else: self.assertEqual(len(got),0)
+      self.assertTrue(np.array_equal(slist[slistOffsets[i]:slistOffsets[i+1]],rec['slist']))
+      self.assertEqual(block['scalars']['extra'][i],rec.get('extra',0))
+      self.assertEqual(block['scalars']['bmnum'][i],rec['bmnum'])
+
+  def testPieces(self):
+    """reading in pieces gives the same columns as reading at once"""
+    import numpy as np
+    from pydarn.dmapio import DmapReader
+    whole = DmapReader(self.fileName).readBlock()
+    myReader = DmapReader(self.fileName)
+    n = 0
+    while True:
+      part = myReader.readBlock(nrec=7,fields=set(['v','slist']))
+      if part is None: break
+      self.assertEqual(sorted(part['arrays'].keys()),['slist','v'])
+      values,offsets = part['arrays']['v']
+      wValues,wOffsets = whole['arrays']['v']
+      for i in range(part['nrec']):
+        self.assertTrue(np.array_equal(values[offsets[i]:offsets[i+1]],wValues[wOffsets[n+i]:wOffsets[n+i+1]]))
+      self.assertTrue(np.array_equal(part['scalars']['time'],whole['scalars']['time'][n:n+part['nrec']]))
+      n += part['nrec']
+    self.assertEqual(n,whole['nrec'])
+
+if __name__ == '__main__':
+  unittest.main()
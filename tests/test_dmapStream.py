@@ -0,0 +1,120 @@
+# Copyright (C) 2012  VT SuperDARN Lab
+# Full license can be found in LICENSE.txt
+"""tests of reading chains of compressed files, in one thread and with a pool, and of fetching them from a stand-in sftp server"""
+import unittest
+
+class _standInClient():
+  """an sftp client which serves a local directory"""
+  def __init__(self, root):
+    self.root = root
+  def listdir(self, path):
+    import os
+    return os.listdir(self.root+path)
+  def get(self, remotePath, localPath):
+    import shutil
+    shutil.copy(self.root+remotePath,localPath)
+  def close(self):
+    pass
+
+class _standInTransport():
+  def __init__(self, root):
+    self.root = root
+    self.opened = 0
+    self.closed = False
+  def open_sftp_client(self):
+    self.opened += 1
+    return _standInClient(self.root)
+  def close(self):
+    self.closed = True
+
+class dmapStreamTest(unittest.TestCase):
+
+  def setUp(self):
+    import os, tempfile, datetime, bz2, gzip
+    from benchmarks.synthData import writeRadarFiles
+    self.dir = tempfile.mkdtemp()
+    self.environ = dict(os.environ)
+    os.environ['DAVIT_TMPDIR'] = os.path.join(self.dir,'tmp')+'/'
+    self.sTime = datetime.datetime(2011,1,1)
+    self.eTime = datetime.datetime(2011,1,1,8)
+    self.serverDir = os.path.join(self.dir,'server')
+    plain = writeRadarFiles(os.path.join(self.serverDir,'data'),self.sTime,self.eTime, \
+                            fileType='fitex',nbeam=8,ngate=30,scanTime=60)
+    #alternate bzip2 and gzip, as the server has both
+    self.files = []
+    for i,f in enumerate(plain):
+      data = open(f,'rb').read()
+      if i % 2 == 0:
+        out = bz2.BZ2File(f+'.bz2','wb')
+        self.files.append(f+'.bz2')
+      else:
+        out = gzip.open(f+'.gz','wb')
+        self.files.append(f+'.gz')
+      out.write(data)
+      out.close()
+      os.remove(f)
+
+  def tearDown(self):
+    import os, shutil
+    os.environ.clear()
+    os.environ.update(self.environ)
+    shutil.rmtree(self.dir)
+
+  def readAll(self, myStream):
+    recs = []
+    while True:
+      rec = myStream.readRaw()
+      if rec is None: break
+      recs.append(rec)
+    return recs
+
+  def testPoolMatchesSerial(self):
+    """a pool gives the same records in the same order, in small chunks"""
+    import sys
+    from pydarn.sdio.dmapStream import dmapStream
+    #the package exports the class under the module's name
+    ds = sys.modules[dmapStream.__module__]
+    serial = dmapStream(self.files,nWorkers=1)
+    expected = self.readAll(serial)
+    serial.close()
+    self.assertTrue(len(expected) > 0)
+    saved = ds.chunkSize,ds.aheadChunks
+    ds.chunkSize,ds.aheadChunks = 4096,2
+    try:
+      pooled = dmapStream(self.files,nWorkers=3)
+      self.assertEqual(self.readAll(pooled),expected)
+      #going back restarts the files, and part way in one skips into it
+      self.assertTrue(pooled.rewind())
+      first = pooled.readRaw()
+      pos = pooled.tell()
+      self.assertEqual(first,expected[0])
+      self.assertEqual(self.readAll(pooled),expected[1:])
+      self.assertTrue(pooled.seek(pos))
+      self.assertEqual(pooled.readRaw(),expected[1])
+      pooled.close()
+    finally:
+      ds.chunkSize,ds.aheadChunks = saved
+
+  def testStandInSource(self):
+    """a request reads through a source it is given, which it leaves open"""
+    from pydarn.sdio.dataFetch import sftpSource
+    from pydarn.sdio.radDataTypes import radDataPtr
+    from pydarn.sdio.dmapStream import dmapStream
+    myStream = dmapStream(self.files)
+    nrec = len(self.readAll(myStream))
+    myStream.close()
+    transport = _standInTransport(self.serverDir)
+    source = sftpSource(transport=transport)
+    myPtr = radDataPtr(sTime=self.sTime,eTime=self.eTime,radcode='bks',fileType='fitex', \
+                       src='sftp',noCache=True,nWorkers=2,source=source)
+    n = 0
+    while myPtr.readRec() is not None: n += 1
+    myPtr.close()
+    self.assertEqual(n,nrec)
+    self.assertTrue(transport.opened > 0)
+    self.assertFalse(transport.closed)
+    source.close()
+    self.assertTrue(transport.closed)
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,58 @@
+# Copyright (C) 2012  VT SuperDARN Lab
+# Full license can be found in LICENSE.txt
+"""tests of printing fit records to text"""
+import unittest
+
+try:
+  from pydarn.plotting.printRec import fitPrintRec
+  import models.aacgm
+except ImportError:
+  fitPrintRec = None
+
+@unittest.skipIf(fitPrintRec is None,'pydarn.plotting or models.aacgm is not built')
+class printRecTest(unittest.TestCase):
+
+  def setUp(self):
+    import os, tempfile, datetime
+    from benchmarks.synthData import writeRadarFiles
+    self.dir = tempfile.mkdtemp()
+    self.environ = dict(os.environ)
+    os.environ['DAVIT_TMPDIR'] = os.path.join(self.dir,'tmp')+'/'
+    os.environ['DAVIT_LOCALDIR'] = os.path.join(self.dir,'data')
+    os.environ['DAVIT_DIRFORMAT'] = '%(dirtree)s/%(year)s/%(ftype)s/%(radar)s/'
+    self.sTime = datetime.datetime(2011,1,1)
+    writeRadarFiles(os.environ['DAVIT_LOCALDIR'],self.sTime,self.sTime+datetime.timedelta(hours=2), \
+                    fileType='fitacf',nbeam=8,ngate=30,scanTime=60,occupancy=.5)
+
+  def tearDown(self):
+    import os, shutil
+    os.environ.clear()
+    os.environ.update(self.environ)
+    shutil.rmtree(self.dir)
+
+  def testGates(self):
+    """every gate of every record gets a line, with its magnetic position"""
+    import os, datetime
+    outfile = os.path.join(self.dir,'out.txt')
+    fitPrintRec(self.sTime,self.sTime+datetime.timedelta(minutes=2),'bks',outfile,fileType='fitacf')
+    lines = open(outfile).read().splitlines()
+    nrec,most = 0,0
+    for k,line in enumerate(lines):
+      if not line.startswith('npnts = '): continue
+      npnts = int(line.split()[2])
+      self.assertTrue(npnts >= 0)
+      #the column names, then one line per gate
+      gates = lines[k+2:k+2+npnts]
+      self.assertEqual(len(gates),npnts)
+      for gate in gates:
+        cols = gate.split()
+        self.assertEqual(len(cols),15)
+        mlat,mlon,mazm = [float(c) for c in cols[12:15]]
+        self.assertTrue(-90. <= mlat <= 90.)
+      nrec += 1
+      most = max(most,npnts)
+    self.assertTrue(nrec > 0)
+    self.assertTrue(most >= 3)
+
+if __name__ == '__main__':
+  unittest.main()
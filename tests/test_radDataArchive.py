@@ -0,0 +1,130 @@
+# Copyright (C) 2012  VT SuperDARN Lab
+# Full license can be found in LICENSE.txt
+"""tests of the columnar archive against the dmap files it was made from"""
+import unittest
+
+try:
+  import h5py
+except ImportError:
+  h5py = None
+
+@unittest.skipIf(h5py is None,'h5py is not installed')
+class radDataArchiveTest(unittest.TestCase):
+
+  def setUp(self):
+    import os, sys, tempfile, datetime
+    from benchmarks.synthData import writeRecords, fitRecords
+    from pydarn.sdio.radDataArchive import archiveConvert
+    self.dir = tempfile.mkdtemp()
+    #the package exports the class under the module's name
+    self.module = sys.modules[archiveConvert.__module__]
+    self.chunkRows = self.module.archiveChunkRows
+    self.module.archiveChunkRows = 64
+    #two channels either side of midnight, so there are two day files of several chunks
+    self.sTime = datetime.datetime(2011,1,1,23)
+    self.eTime = datetime.datetime(2011,1,2,1)
+    self.fileName = os.path.join(self.dir,'20110101.2300.00.bks.fitex')
+    writeRecords(self.fileName,fitRecords(self.sTime,self.eTime,nbeam=8,ngate=30,scanTime=60,nchan=2))
+
+  def tearDown(self):
+    import shutil
+    self.module.archiveChunkRows = self.chunkRows
+    shutil.rmtree(self.dir)
+
+  def convert(self):
+    import os
+    from pydarn.sdio.radDataTypes import radDataPtr
+    from pydarn.sdio.radDataArchive import archiveConvert
+    myPtr = radDataPtr(sTime=self.sTime,eTime=self.eTime,fileType='fitex',fileName=self.fileName)
+    files = archiveConvert(myPtr,radcode='bks',baseDir=os.path.join(self.dir,'archive'))
+    myPtr.close()
+    return files
+
+  def assertRecsEqual(self, x, y):
+    import numpy as np
+    self.assertEqual(sorted(x.keys()),sorted(y.keys()))
+    for name in x:
+      if isinstance(x[name],np.ndarray):
+        self.assertEqual(x[name].shape,y[name].shape,name)
+        self.assertTrue(np.allclose(x[name],y[name]),name)
+      elif isinstance(x[name],float):
+        self.assertAlmostEqual(x[name],y[name],5,name)
+      else:
+        self.assertEqual(x[name],y[name],name)
+
+  def testReadRec(self):
+    """the archive hands out the records the dmap reader does, with and without filters"""
+    from pydarn.dmapio import DmapReader
+    from pydarn.sdio.radDataArchive import radDataArchive
+    files = self.convert()
+    self.assertEqual(len(files),2)
+    for filters in (None,{'bmnum':3},{'channel':2,'bmnum':5}):
+      myReader,myArchive = DmapReader(self.fileName),radDataArchive(files)
+      n = 0
+      while True:
+        x = myReader.readRec(numpy=True,filters=filters)
+        y = myArchive.readRec(numpy=True,filters=filters)
+        if x is None or y is None: break
+        self.assertRecsEqual(x,y)
+        n += 1
+      self.assertTrue(x is None and y is None)
+      self.assertTrue(n > 0)
+      myArchive.close()
+
+  def testUnionOfColumns(self):
+    """a block read across files with different columns has all of them, filled where a file lacks one"""
+    import os
+    import numpy as np
+    from pydarn.sdio.radDataTypes import radDataBlock
+    from pydarn.sdio.radDataArchive import archiveWriter, radDataArchive
+    offsets = np.array([0,2,3],dtype=np.int64)
+    first = radDataBlock({'nrec':2,'scalars':{'time':np.array([1.,2.]),'bmnum':np.array([1,2],dtype=np.int16), \
+                          'tfreq':np.array([10500,10600],dtype=np.int16)}, \
+                          'arrays':{'slist':(np.array([4,5,6],dtype=np.int16),offsets), \
+                                    'v':(np.array([1.,2.,3.],dtype=np.float32),offsets)}})
+    second = radDataBlock({'nrec':2,'scalars':{'time':np.array([3.,4.]),'bmnum':np.array([3,4],dtype=np.int16)}, \
+                           'arrays':{'slist':(np.array([7,8,9],dtype=np.int16),offsets)}})
+    files = []
+    for name,block in (('a.h5',first),('b.h5',second)):
+      files.append(os.path.join(self.dir,name))
+      myWriter = archiveWriter(files[-1])
+      myWriter.append(block)
+      myWriter.close()
+    myBlock = radDataArchive(files).readBlock()
+    self.assertEqual(myBlock['nrec'],4)
+    self.assertEqual(myBlock['scalars']['tfreq'].tolist(),[10500,10600,0,0])
+    self.assertEqual(myBlock['scalars']['bmnum'].tolist(),[1,2,3,4])
+    values,offs = myBlock['arrays']['v']
+    self.assertEqual(values.tolist(),[1.,2.,3.])
+    self.assertEqual(offs.tolist(),[0,2,3,3,3])
+    self.assertEqual(myBlock['arrays']['slist'][1].tolist(),[0,2,3,5,6])
+
+  def testFieldAddedLater(self):
+    """an array field which first turns up in a later block is empty for the records before it, and its own values are read back unchanged"""
+    import os
+    import numpy as np
+    from pydarn.sdio.radDataTypes import radDataBlock
+    from pydarn.sdio.radDataArchive import archiveWriter, radDataArchive
+    first = radDataBlock({'nrec':3,'scalars':{'time':np.array([1.,2.,3.]),'bmnum':np.array([1,2,3],dtype=np.int16)}, \
+                          'arrays':{'slist':(np.array([1,2,3],dtype=np.int16),np.array([0,1,2,3],dtype=np.int64))}})
+    second = radDataBlock({'nrec':3,'scalars':{'time':np.array([4.,5.,6.]),'bmnum':np.array([4,5,6],dtype=np.int16)}, \
+                           'arrays':{'slist':(np.array([4,5,6],dtype=np.int16),np.array([0,1,2,3],dtype=np.int64)), \
+                                     'v':(np.array([10.,20.,30.,40.,50.,60.],dtype=np.float32), \
+                                          np.array([0,2,4,6],dtype=np.int64))}})
+    fileName = os.path.join(self.dir,'later.h5')
+    myWriter = archiveWriter(fileName)
+    myWriter.append(first)
+    myWriter.append(second)
+    myWriter.close()
+    expected = [[],[],[],[10.,20.],[30.,40.],[50.,60.]]
+    myArchive = radDataArchive(fileName)
+    for vals in expected:
+      rec = myArchive.readRec()
+      self.assertEqual(rec['v'],vals)
+    self.assertTrue(myArchive.readRec() is None)
+    values,offs = radDataArchive(fileName).readBlock()['arrays']['v']
+    self.assertEqual(values.tolist(),[10.,20.,30.,40.,50.,60.])
+    self.assertEqual(offs.tolist(),[0,0,0,0,2,4,6])
+
+if __name__ == '__main__':
+  unittest.main()
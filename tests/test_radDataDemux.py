@@ -0,0 +1,89 @@
+# Copyright (C) 2012  VT SuperDARN Lab
+# Full license can be found in LICENSE.txt
+"""tests of splitting one read of a stereo file into per-channel streams"""
+import unittest
+
+class radDataDemuxTest(unittest.TestCase):
+
+  def setUp(self):
+    import os, tempfile, datetime
+    from benchmarks.synthData import writeRecords, fitRecords
+    self.dir = tempfile.mkdtemp()
+    self.environ = dict(os.environ)
+    os.environ['DAVIT_TMPDIR'] = os.path.join(self.dir,'tmp')+'/'
+    self.sTime = datetime.datetime(2011,1,1)
+    self.eTime = datetime.datetime(2011,1,1,0,30)
+    self.fileName = os.path.join(self.dir,'20110101.0000.00.han.fitacf')
+    writeRecords(self.fileName,fitRecords(self.sTime,self.eTime,nbeam=8,ngate=30, \
+                                          scanTime=60,nchan=2))
+
+  def tearDown(self):
+    import os, shutil
+    os.environ.clear()
+    os.environ.update(self.environ)
+    shutil.rmtree(self.dir)
+
+  def ptr(self, **kwargs):
+    from pydarn.sdio.radDataTypes import radDataPtr
+    return radDataPtr(sTime=self.sTime,eTime=self.eTime,fileName=self.fileName, \
+                      fileType='fitacf',useNumpy=True,**kwargs)
+
+  def offsets(self, myPtr):
+    return [myBeam.offset for myBeam in iter(myPtr.readRec,None)]
+
+  def testStreams(self):
+    """each stream gets the records of its channel, in order, and the records of keys without a stream are not kept"""
+    from pydarn.sdio.radDataDemux import radDataDemux
+    expected = dict([(ch,self.offsets(self.ptr(channel=ch))) for ch in 'ab'])
+    myDemux = radDataDemux(self.ptr())
+    chanA = myDemux['a']
+    got = self.offsets(chanA)
+    self.assertEqual(got,expected['a'])
+    self.assertEqual(myDemux.seen(),['a','b'])
+    #a stream made after the others were read through starts from where the read is
+    self.assertEqual(myDemux['b'].readRec(),None)
+    #rewinding moves every stream back
+    self.assertTrue(myDemux.rewind())
+    chanB = myDemux['b']
+    first = chanA.readRec()
+    self.assertEqual(first.offset,expected['a'][0])
+    self.assertEqual(self.offsets(chanB),expected['b'])
+    self.assertEqual([first.offset]+self.offsets(chanA),expected['a'])
+
+  def testScanCube(self):
+    """a cube leaves the scan which ends it to be read next"""
+    import datetime
+    from pydarn.sdio.radDataDemux import radDataDemux
+    myPtr = self.ptr(channel='b')
+    cut = self.sTime+datetime.timedelta(minutes=10)
+    expected = myPtr.readScanCube(eTime=cut)
+    nextScan = myPtr.readScan()
+    myDemux = radDataDemux(self.ptr())
+    chanA,chanB = myDemux['a'],myDemux['b']
+    myCube = chanB.readScanCube(eTime=cut)
+    self.assertEqual(myCube.nscan,expected.nscan)
+    self.assertEqual(myCube['v'].shape,expected['v'].shape)
+    self.assertTrue((myCube['v'].filled(0) == expected['v'].filled(0)).all())
+    self.assertEqual([b.offset for b in chanB.readScan()],[b.offset for b in nextScan])
+
+  def testBlock(self):
+    """a block read from a stream holds what a block read for the channel does"""
+    import numpy as np
+    from pydarn.sdio.radDataDemux import radDataDemux
+    expected = self.ptr(channel='b').readBlock(nrec=50)
+    myDemux = radDataDemux(self.ptr())
+    chanA,chanB = myDemux['a'],myDemux['b']
+    myBlock = chanB.readBlock(nrec=50)
+    self.assertEqual(myBlock.nrec,expected.nrec)
+    for name in ('time','bmnum','cp','nrang','tfreq'):
+      self.assertTrue(np.array_equal(myBlock.scalars[name],expected.scalars[name]),name)
+    for name in ('slist','v','p_l','gflg'):
+      values,offsets = myBlock.ragged(name)
+      eValues,eOffsets = expected.ragged(name)
+      self.assertTrue(np.array_equal(offsets,eOffsets),name)
+      self.assertTrue(np.allclose(values,eValues),name)
+    #the a stream still gets its records
+    self.assertEqual(chanA.readRec().channel,'a')
+
+if __name__ == '__main__':
+  unittest.main()
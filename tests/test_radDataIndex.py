@@ -0,0 +1,98 @@
+# Copyright (C) 2012  VT SuperDARN Lab
+# Full license can be found in LICENSE.txt
+"""tests of the sidecar record index and of opening local files which have sidecars next to them"""
+import unittest
+
+class radDataIndexTest(unittest.TestCase):
+
+  def setUp(self):
+    import os, tempfile, datetime
+    from benchmarks.synthData import writeRadarFiles
+    self.dir = tempfile.mkdtemp()
+    self.environ = dict(os.environ)
+    os.environ['DAVIT_TMPDIR'] = os.path.join(self.dir,'tmp')+'/'
+    os.environ['DAVIT_LOCALDIR'] = os.path.join(self.dir,'data')
+    os.environ['DAVIT_DIRFORMAT'] = '%(dirtree)s/%(year)s/%(ftype)s/%(radar)s/'
+    self.sTime = datetime.datetime(2011,1,1)
+    self.eTime = datetime.datetime(2011,1,1,4)
+    self.files = writeRadarFiles(os.environ['DAVIT_LOCALDIR'],self.sTime,self.eTime, \
+                                 nbeam=8,ngate=30,scanTime=60)
+
+  def tearDown(self):
+    import os, shutil
+    os.environ.clear()
+    os.environ.update(self.environ)
+    shutil.rmtree(self.dir)
+
+  def testSidecar(self):
+    """the index is saved next to the file and reloaded from there"""
+    import os
+    from pydarn.sdio.radDataIndex import radDataIndex
+    first = radDataIndex(self.files[0])
+    self.assertEqual(first.sidecar,self.files[0]+'.idx.npz')
+    self.assertTrue(os.path.isfile(first.sidecar))
+    second = radDataIndex(self.files[0])
+    self.assertEqual(second.sidecar,first.sidecar)
+    self.assertTrue((second.offset == first.offset).all())
+    self.assertTrue((second.time == first.time).all())
+
+  def testRebuildAfterTouch(self):
+    """a sidecar is rebuilt when the mtime of its data file moves, even if the size does not"""
+    import os
+    import numpy as np
+    from pydarn.sdio.radDataIndex import radDataIndex
+    first = radDataIndex(self.files[0])
+    stat = os.stat(self.files[0])
+    os.utime(self.files[0],(stat.st_atime,stat.st_mtime+10))
+    second = radDataIndex(self.files[0])
+    self.assertEqual(second.sidecar,first.sidecar)
+    sidecar = np.load(second.sidecar)
+    try: self.assertEqual(float(sidecar['mtime']),os.stat(self.files[0]).st_mtime)
+    finally: sidecar.close()
+    self.assertTrue((second.offset == first.offset).all())
+
+  def testRebuildAfterRewrite(self):
+    """a sidecar of a file which has been written again describes the new records"""
+    import os
+    from pydarn.sdio.radDataIndex import radDataIndex
+    from benchmarks.synthData import writeRecords, fitRecords
+    first = radDataIndex(self.files[0])
+    n = writeRecords(self.files[0],fitRecords(self.sTime,self.sTime+(self.eTime-self.sTime)/4, \
+                                             nbeam=8,ngate=30,scanTime=60))
+    stat = os.stat(self.files[0])
+    os.utime(self.files[0],(stat.st_atime,stat.st_mtime+10))
+    second = radDataIndex(self.files[0])
+    self.assertEqual(len(second),n)
+    self.assertNotEqual(len(second),len(first))
+    #the rebuilt index was saved over the stale one
+    self.assertEqual(len(radDataIndex(self.files[0])),n)
+
+  def testIsDataFile(self):
+    from pydarn.sdio.radDataIndex import isDataFile
+    self.assertTrue(isDataFile('20110101.0000.00.bks.fitacf'))
+    self.assertTrue(isDataFile('20110101.0000.00.bks.fitacf.bz2'))
+    self.assertFalse(isDataFile('20110101.0000.00.bks.fitacf.idx.npz'))
+    self.assertFalse(isDataFile('20110101.0000.00.bks.fitacf.idx.npz.123.tmp'))
+
+  def testOpenSkipsSidecars(self):
+    """a directory holding sidecars, and one being written, is read as its data files only"""
+    from pydarn.sdio.radDataIndex import radDataIndex
+    from pydarn.sdio.radDataTypes import radDataPtr
+    nrec = sum([len(radDataIndex(f)) for f in self.files])
+    open(self.files[0]+'.idx.npz.123.tmp','w').close()
+    from utils import instrument
+    with instrument.instrumented() as run:
+      myPtr = radDataPtr(sTime=self.sTime,eTime=self.eTime,radcode='bks',fileType='fitacf', \
+                         src='local',noCache=True)
+    self.assertEqual(run.report['counters']['sdio.filesOpened'],len(self.files))
+    times = []
+    while True:
+      myBeam = myPtr.readRec()
+      if myBeam is None: break
+      times.append(myBeam.time)
+    myPtr.close()
+    self.assertEqual(len(times),nrec)
+    self.assertEqual(times,sorted(times))
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,61 @@
+# Copyright (C) 2012  VT SuperDARN Lab
+# Full license can be found in LICENSE.txt
+"""tests of gridding scans into dense beam x gate arrays"""
+import unittest
+
+class scanGridTest(unittest.TestCase):
+
+  def setUp(self):
+    import os, tempfile, datetime
+    from benchmarks.synthData import writeRecords, fitRecords
+    self.dir = tempfile.mkdtemp()
+    self.sTime = datetime.datetime(2011,1,1)
+    self.eTime = datetime.datetime(2011,1,1,0,10)
+    self.fileName = os.path.join(self.dir,'20110101.0000.00.bks.fitex')
+    writeRecords(self.fileName,fitRecords(self.sTime,self.eTime,nbeam=8,ngate=30,scanTime=60))
+
+  def tearDown(self):
+    import shutil
+    shutil.rmtree(self.dir)
+
+  def open(self):
+    from pydarn.sdio.radDataTypes import radDataPtr
+    return radDataPtr(sTime=self.sTime,eTime=self.eTime,fileType='fitex',fileName=self.fileName)
+
+  def testReadScanGrid(self):
+    """a scan's beams land in the rows of their beam numbers"""
+    import numpy as np
+    myPtr = self.open()
+    myScan = myPtr.readScan()
+    myPtr.rewind()
+    myGrid = myPtr.readScanGrid(params=['v'])
+    myPtr.close()
+    self.assertEqual(myGrid.nbeam,8)
+    self.assertEqual(myGrid.ngate,max([b.prm.nrang for b in myScan]))
+    self.assertEqual(myGrid.scanTime,myScan[0].time)
+    for b in myScan:
+      row = myGrid['v'][b.bmnum]
+      self.assertTrue(np.allclose(row[b.fit.slist].data,b.fit.v))
+      self.assertEqual(int((~row.mask).sum()),len(b.fit.slist))
+
+  def testEmptyScan(self):
+    """an empty scan gives an empty grid, and leaves its place empty in a cube"""
+    from pydarn.sdio.radDataTypes import scanData, scanGrid
+    myPtr = self.open()
+    myScan = myPtr.readScan()
+    myPtr.readScan = lambda: scanData()
+    myGrid = myPtr.readScanGrid()
+    myPtr.close()
+    self.assertEqual((myGrid.nbeam,myGrid.ngate),(0,0))
+    self.assertEqual(myGrid.params,[])
+    self.assertEqual(myGrid.scanTime,None)
+    myGrid = scanGrid(scanData(),params=['v'],nbeam=8,ngate=30)
+    self.assertEqual(myGrid['v'].shape,(8,30))
+    self.assertTrue(myGrid['v'].mask.all())
+    myCube = scanGrid([myScan,scanData()],params=['v'])
+    self.assertEqual(myCube['v'].shape,(2,8,myCube.ngate))
+    self.assertTrue(myCube['v'][1].mask.all())
+    self.assertEqual(myCube.scanTime,[myScan[0].time,None])
+
+if __name__ == '__main__':
+  unittest.main()
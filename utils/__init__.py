@@ -11,6 +11,7 @@ This subpackage contains various utilities for DaViT-py
     * :mod:`utils.geoPack`: geographic transformations
     * :mod:`utils.timeUtils`: date/time manipulations 
     * :mod:`utils.calcSun`: solar position calculator
+    * :mod:`utils.instrument`: counters and timers for the hot paths
 
 """
 try:
@@ -33,6 +34,11 @@ try:
 except Exception, e:
     print __file__+' -> utils.calcSun: ', e
 
+try:
+    import instrument
+except Exception, e:
+    print __file__+' -> utils.instrument: ', e
+
 
 # *************************************************************
 # Define a few general-use constants
@@ -28,13 +28,45 @@ This module contains the following functions:
     * :func: `utils.geoPack.greatCircleDist`:
         Calculates the distance in radians along a great circle path between two points.
 
+All of the transforms take scalars or numpy arrays (or lists) of any shapes which broadcast 
+against each other and return scalars or arrays of the broadcast shape, so a whole field of 
+view or track can be converted in one call.  The transforms also take an optional **out**, 
+preallocated arrays the last step of each result is computed into, so no new arrays are made 
+for the results when the same conversion is done over and over.  The out arrays must not be 
+the inputs.
+
 Based on J.M. Ruohoniemi's geopack
 Based on R.J. Barnes radar.pro
 
 """
 
+
 # *************************************************************
-def geodToGeoc(lat,lon,inverse=False):
+def _asArray(x):
+    """Lists and tuples become arrays, anything else (scalars, arrays, None) is returned as is."""
+    if isinstance(x, (list, tuple)):
+        import numpy as np
+        return np.asarray(x, dtype=float)
+    return x
+
+
+# *************************************************************
+def _outputs(out, n):
+    """Returns the n preallocated arrays of out (any of which may be None), or n Nones, to be passed as the out of the last ufunc of each result."""
+    if out is None: return (None,)*n
+    assert len(out) == n, 'geoPack: out must hold %d arrays' % n
+    return tuple(out)
+
+
+# *************************************************************
+def _copyTo(o, val):
+    """Returns val, copied into o if o is given, for the results which are an input passed through."""
+    if o is None: return val
+    o[...] = val
+    return o
+
+# *************************************************************
+def geodToGeoc(lat,lon,inverse=False,out=None):
     """Converts position from geodetic to geocentric and vice-versa.
     Based on the IAU 1964 oblate spheroid model of the Earth.
 
@@ -42,34 +74,37 @@ def geodToGeoc(lat,lon,inverse=False):
         * **lat**: latitude [degree]
         * **lon**: longitude [degree]
         * **[inverse]**: inverse conversion
+        * **[out]**: 3 preallocated arrays for lat, lon and Re
     **Returns**:
         * **lat**: latitude [degree]
         * **lon**: longitude [degree]
         * **Re**: Earth radius [km]
     """
     import numpy as np
+    lat, lon = _asArray(lat), _asArray(lon)
     
     a = 6378.16
     f = 1./298.25
     b = a*(1.-f)
     e2 = (a**2/b**2) - 1.
+    oLat, oLon, oRe = _outputs(out, 3)
     
     if not inverse:
         # geodetic into geocentric
-        latOut = np.degrees( np.arctan( b**2/a**2 * np.tan( np.radians(lat) ) ) )
-        lonOut = lon
-        Re = a / np.sqrt( 1. + e2 * np.sin( np.radians(latOut) )**2 )
+        latOut = np.degrees( np.arctan( b**2/a**2 * np.tan( np.radians(lat) ) ), out=oLat )
+        lonOut = _copyTo(oLon, lon)
+        Re = np.divide( a, np.sqrt( 1. + e2 * np.sin( np.radians(latOut) )**2 ), out=oRe )
     else:
         # geocentric into geodetic
-        latOut = np.degrees( np.arctan( a**2/b**2 * np.tan( np.radians(lat) ) ) )
-        lonOut = lon
-        Re = a / np.sqrt( 1. + e2 * np.sin( np.radians(lat) )**2 )
+        latOut = np.degrees( np.arctan( a**2/b**2 * np.tan( np.radians(lat) ) ), out=oLat )
+        lonOut = _copyTo(oLon, lon)
+        Re = np.divide( a, np.sqrt( 1. + e2 * np.sin( np.radians(lat) )**2 ), out=oRe )
         
     return latOut, lonOut, Re
 
 
 # *************************************************************
-def geodToGeocAzEl(lat,lon,az,el,inverse=False):
+def geodToGeocAzEl(lat,lon,az,el,inverse=False,out=None):
     """Converts pointing azimuth and elevation measured with respect to the local horizon 
     to azimuth and elevation with respect to the horizon defined by the plane perpendicular 
     to the Earth-centered radial vector drawn through a user defined point.
@@ -80,6 +115,7 @@ def geodToGeocAzEl(lat,lon,az,el,inverse=False):
         * **az**: azimuth [degree, N]
         * **el**: elevation [degree]
         * **[inverse]**: inverse conversion
+        * **[out]**: 5 preallocated arrays for lat, lon, Re, az and el
     **Returns**:
         * **lat**: latitude [degree]
         * **lon**: longitude [degree]
@@ -88,6 +124,8 @@ def geodToGeocAzEl(lat,lon,az,el,inverse=False):
         * **el**: elevation [degree]
     """
     from numpy import degrees, radians, cos, sin, tan, arctan, arctan2, sqrt
+    lat, lon, az, el = _asArray(lat), _asArray(lon), _asArray(az), _asArray(el)
+    oLat, oLon, oRe, oAz, oEl = _outputs(out, 5)
     
     taz = radians(az)
     tel = radians(el)
@@ -95,7 +133,7 @@ def geodToGeocAzEl(lat,lon,az,el,inverse=False):
     # In this transformation x is east, y is north and z is up
     if not inverse:
         # Calculate deviation from vertical (in radians)
-        (geocLat, geocLon, Re) = geodToGeoc(lat, lon)
+        (geocLat, geocLon, Re) = geodToGeoc(lat, lon, out=(oLat, oLon, oRe))
         devH = radians(lat - geocLat)
         # Calculate cartesian coordinated in local system
         kxGD = cos( tel ) * sin( taz )
@@ -106,13 +144,13 @@ def geodToGeocAzEl(lat,lon,az,el,inverse=False):
         kyGC = kyGD * cos( devH ) + kzGD * sin( devH )
         kzGC = -kyGD * sin( devH ) + kzGD * cos( devH )
         # Finally calculate the new azimuth and elevation in the geocentric frame
-        azOut = degrees( arctan2( kxGC, kyGC ) )
-        elOut = degrees( arctan( kzGC / sqrt( kxGC**2 + kyGC**2 ) ) )
+        azOut = degrees( arctan2( kxGC, kyGC ), out=oAz )
+        elOut = degrees( arctan( kzGC / sqrt( kxGC**2 + kyGC**2 ) ), out=oEl )
         latOut = geocLat
         lonOut = geocLon
     else:
         # Calculate deviation from vertical (in radians)
-        (geodLat, geodLon, Re) = geodToGeoc(lat, lon, inverse=True)
+        (geodLat, geodLon, Re) = geodToGeoc(lat, lon, inverse=True, out=(oLat, oLon, oRe))
         devH = radians(geodLat - lat)
         # Calculate cartesian coordinated in geocentric system
         kxGC = cos( tel ) * sin( taz )
@@ -123,8 +161,8 @@ def geodToGeocAzEl(lat,lon,az,el,inverse=False):
         kyGD = kyGC * cos( -devH ) + kzGC * sin( -devH )
         kzGD = -kyGC * sin( -devH ) + kzGC * cos( -devH )
         # Finally calculate the new azimuth and elevation in the geocentric frame
-        azOut = degrees( arctan2( kxGD, kyGD ) )
-        elOut = degrees( arctan( kzGD / sqrt( kxGD**2 + kyGD**2 ) ) )
+        azOut = degrees( arctan2( kxGD, kyGD ), out=oAz )
+        elOut = degrees( arctan( kzGD / sqrt( kxGD**2 + kyGD**2 ) ), out=oEl )
         latOut = geodLat
         lonOut = geodLon
     
@@ -132,7 +170,7 @@ def geodToGeocAzEl(lat,lon,az,el,inverse=False):
 
 
 # *************************************************************
-def gspToGcar(X, Y, Z, inverse=False):
+def gspToGcar(X, Y, Z, inverse=False, out=None):
     """
     Converts a position from global spherical (geocentric) to global cartesian (and vice-versa).
     The global cartesian coordinate system is defined as:
@@ -147,29 +185,32 @@ def gspToGcar(X, Y, Z, inverse=False):
         * **Y**: longitude [degree] or global cartesian Y [km]
         * **Z**: distance from center of the Earth [km] or global cartesian Z [km]
         * **[inverse]**: inverse conversion
+        * **[out]**: 3 preallocated arrays for X, Y and Z
     **Returns**:
         * **X**: global cartesian X [km] or latitude [degree]
         * **Y**: global cartesian Y [km] or longitude [degree]
         * **Z**: global cartesian Z [km] or distance from center of the Earth [km]
     """
-    from numpy import radians, degrees, cos, sin, arcsin, arctan2, sqrt
+    from numpy import radians, degrees, cos, sin, arcsin, arctan2, sqrt, multiply
+    X, Y, Z = _asArray(X), _asArray(Y), _asArray(Z)
+    oX, oY, oZ = _outputs(out, 3)
     
     if not inverse:
         # Global spherical to global cartesian
-        xOut = Z * cos( radians(X) ) * cos( radians(Y) )
-        yOut = Z * cos( radians(X) ) * sin( radians(Y) )
-        zOut = Z * sin( radians(X) )
+        xOut = multiply( Z * cos( radians(X) ), cos( radians(Y) ), out=oX )
+        yOut = multiply( Z * cos( radians(X) ), sin( radians(Y) ), out=oY )
+        zOut = multiply( Z, sin( radians(X) ), out=oZ )
     else:
         # Calculate latitude (xOut), longitude (yOut) and distance from center of the Earth (zOut)
-        zOut = sqrt( X**2 + Y**2 + Z**2 )
-        xOut = degrees( arcsin( Z/zOut ) )
-        yOut = degrees( arctan2( Y, X ) )
+        zOut = sqrt( X**2 + Y**2 + Z**2, out=oZ )
+        xOut = degrees( arcsin( Z/zOut ), out=oX )
+        yOut = degrees( arctan2( Y, X ), out=oY )
         
     return xOut, yOut, zOut
 
 
 # *************************************************************
-def gcarToLcar(X, Y, Z, lat, lon, rho , inverse=False):
+def gcarToLcar(X, Y, Z, lat, lon, rho , inverse=False, out=None):
     """Converts a position from global cartesian to local cartesian (and vice-versa).
     The global cartesian coordinate system is defined as:
         - origin: center of the Earth
@@ -191,12 +232,16 @@ def gcarToLcar(X, Y, Z, lat, lon, rho , inverse=False):
         * **lon**: geocentric longitude [degree] of local cartesian system origin
         * **rho**: distance from center of the Earth [km] of local cartesian system origin
         * **[inverse]**: inverse conversion
+        * **[out]**: 3 preallocated arrays for X, Y and Z
     **Returns**:
         * **X**: local cartesian X [km] or global cartesian X [km]
         * **Y**: local cartesian Y [km] or global cartesian Y [km]
         * **Z**: local cartesian Z [km] or global cartesian Z [km]
     """
-    from numpy import radians, degrees, cos, sin
+    from numpy import radians, degrees, cos, sin, add, subtract
+    X, Y, Z = _asArray(X), _asArray(Y), _asArray(Z)
+    lat, lon, rho = _asArray(lat), _asArray(lon), _asArray(rho)
+    oX, oY, oZ = _outputs(out, 3)
     
     # First get global cartesian coordinates of local origin
     (goX, goY, goZ) = gspToGcar(lat, lon, rho)
@@ -208,14 +253,14 @@ def gcarToLcar(X, Y, Z, lat, lon, rho , inverse=False):
         tz = Z - goZ
         # Then, rotate about global-Z to get local-X pointing eastward
         rot = -radians(lon + 90.)
-        sx = tx * cos( rot ) - ty * sin( rot )
+        sx = subtract( tx * cos( rot ), ty * sin( rot ), out=oX )
         sy = tx * sin( rot ) + ty * cos( rot )
         sz = tz
         # Finally, rotate about X axis to align Z with upward direction
         rot = -radians(90. - lat)
         xOut = sx
-        yOut = sy * cos( rot ) - sz * sin( rot )
-        zOut = sy * sin( rot ) + sz * cos( rot )
+        yOut = subtract( sy * cos( rot ), sz * sin( rot ), out=oY )
+        zOut = add( sy * sin( rot ), sz * cos( rot ), out=oZ )
     else:
         # First rotate about X axis to align Z with Earth rotational axis direction
         rot = radians(90. - lat)
@@ -224,19 +269,16 @@ def gcarToLcar(X, Y, Z, lat, lon, rho , inverse=False):
         sz = Y * sin( rot ) + Z * cos( rot )
         # Then, rotate about global-Z to get global-X pointing to the prime meridian
         rot = radians(lon + 90.)
-        xOut = sx * cos( rot ) - sy * sin( rot )
-        yOut = sx * sin( rot ) + sy * cos( rot )
-        zOut = sz
         # Finally, translate local position to global origin
-        xOut = xOut + goX
-        yOut = yOut + goY
-        zOut = zOut + goZ
+        xOut = add( sx * cos( rot ) - sy * sin( rot ), goX, out=oX )
+        yOut = add( sx * sin( rot ) + sy * cos( rot ), goY, out=oY )
+        zOut = add( sz, goZ, out=oZ )
     
     return xOut, yOut, zOut
 
 
 # *************************************************************
-def lspToLcar(X, Y, Z, inverse=False):
+def lspToLcar(X, Y, Z, inverse=False, out=None):
     """Converts a position from local spherical to local cartesian (and vice-versa).
     The local spherical coordinate system is defined as:
         - origin: local position
@@ -256,26 +298,29 @@ def lspToLcar(X, Y, Z, inverse=False):
         * **Y**: elevation [degree] or local cartesian Y [km]
         * **Z**: distance origin [km] or local cartesian Z [km]
         * **[inverse]**: inverse conversion
+        * **[out]**: 3 preallocated arrays for X, Y and Z
     **Returns**:
         * **X**: local cartesian X [km] or azimuth [degree, N]
         * **Y**: local cartesian Y [km] or elevation [degree]
         * **Z**: local cartesian Z [km] or distance from origin [km]
     """
-    from numpy import radians, degrees, cos, sin, arcsin, arctan2, sqrt
+    from numpy import radians, degrees, cos, sin, arcsin, arctan2, sqrt, multiply
+    X, Y, Z = _asArray(X), _asArray(Y), _asArray(Z)
+    oX, oY, oZ = _outputs(out, 3)
     
     if not inverse:
         # local spherical into local cartesian
         r = Z
         el = Y
         az = X
-        xOut = r * cos( radians(el) ) * sin( radians(az) )
-        yOut = r * cos( radians(el) ) * cos( radians(az) )
-        zOut = r * sin( radians(el) )
+        xOut = multiply( r * cos( radians(el) ), sin( radians(az) ), out=oX )
+        yOut = multiply( r * cos( radians(el) ), cos( radians(az) ), out=oY )
+        zOut = multiply( r, sin( radians(el) ), out=oZ )
     else:
         # local cartesian into local spherical
-        r = sqrt( X**2 + Y**2 + Z**2 )
-        el = degrees( arcsin(Z/r) )
-        az = degrees( arctan2(X, Y) )
+        r = sqrt( X**2 + Y**2 + Z**2, out=oZ )
+        el = degrees( arcsin(Z/r), out=oY )
+        az = degrees( arctan2(X, Y), out=oX )
         xOut = az
         yOut = el
         zOut = r
@@ -294,6 +339,8 @@ def calcDistPnt(origLat, origLon, origAlt, \
         - the distance, azimuth between a point of origin and a distant point and the altitude of said distant point given 
         a point of origin, distant point and elevation angle.
     Input/output is in geodetic coordinates, distances are in km and angles in degrees.
+    Which of these is calculated is decided once from the keywords given, and every input may be an array, 
+    so all the gates of a beam or all the points of a track are done in a single call.
 
     **Args**:
         * **origLat**: geographic latitude of point of origin [degree]
@@ -307,13 +354,23 @@ def calcDistPnt(origLat, origLon, origAlt, \
         * **[distAlt]**: altitide [km] of distant point
     **Returns**:
         * **dict**: a dictionary containing all the information about origin and distant points and their relative positions
+
+    **Example**:
+        ::
+
+            # the distance and azimuth from the start of each gate to the next, for a whole beam
+            d = utils.geoPack.calcDistPnt(lat[:-1], lon[:-1], 300., distLat=lat[1:], distLon=lon[1:], distAlt=300.)
+            print d['dist'], d['az']
     """
-    from math import sqrt, pi
+    from numpy import sqrt, pi
     import numpy
+    origLat, origLon, origAlt = _asArray(origLat), _asArray(origLon), _asArray(origAlt)
+    dist, el, az = _asArray(dist), _asArray(el), _asArray(az)
+    distLat, distLon, distAlt = _asArray(distLat), _asArray(distLon), _asArray(distAlt)
     
     # If all the input parameters (keywords) are set to 0, show a warning, and default to fint distance/azimuth/elevation
     if dist is None and el is None and az is None:
-        assert None not in [distLat, distLon, distAlt], 'calcDistPnt: Warning: Not enough keywords.'
+        assert distLat is not None and distLon is not None and distAlt is not None, 'calcDistPnt: Warning: Not enough keywords.'
 
         # Convert point of origin from geodetic to geocentric
         (gcLat, gcLon, origRe) = geodToGeoc(origLat, origLon)
@@ -330,7 +387,7 @@ def calcDistPnt(origLat, origLon, origAlt, \
         dist = sqrt( dX**2 + dY**2 + dZ**2 )
 
     elif distLat is None and distLon is None and distAlt is None:
-        assert None not in [dist, el, az], 'calcDistPnt: Warning: Not enough keywords.'
+        assert dist is not None and el is not None and az is not None, 'calcDistPnt: Warning: Not enough keywords.'
 
         # convert pointing azimuth and elevation to geocentric
         (gcLat, gcLon, origRe, gaz, gel) = geodToGeocAzEl(origLat, origLon, az, el)
@@ -346,7 +403,7 @@ def calcDistPnt(origLat, origLon, origAlt, \
         distRe = Re
 
     elif dist is None and distAlt is None and az is None:
-        assert None not in [distLat, distLon, el], 'calcDistPnt: Warning: Not enough keywords.'
+        assert distLat is not None and distLon is not None and el is not None, 'calcDistPnt: Warning: Not enough keywords.'
 
         # Convert point of origin from geodetic to geocentric
         (gcLat, gcLon, origRe) = geodToGeoc(origLat, origLon)
@@ -372,7 +429,7 @@ def calcDistPnt(origLat, origLon, origAlt, \
         dist = Dref*numpy.sin(theta)/numpy.cos(theta+numpy.radians(gel))
 
     elif distLat is None and distLon is None and dist is None:
-        assert None not in [distAlt, el, az], 'calcDistPnt: Warning: Not enough keywords.'
+        assert distAlt is not None and el is not None and az is not None, 'calcDistPnt: Warning: Not enough keywords.'
 
         # convert pointing azimuth and elevation to geocentric
         (gcLat, gcLon, origRe, gaz, gel) = geodToGeocAzEl(origLat, origLon, az, el)
@@ -416,8 +473,11 @@ def greatCircleMove(origLat, origLon, dist, az, alt=0):
         * **alt**:      altitude [km] (added to default Re = 6378.1 km)
     **Returns**:
         * **list**:     [latitude, longitude] [deg]
+
+    All the inputs may be arrays, then the latitude and longitude are arrays too.
     """
     import numpy
+    origLat, origLon, dist, az = _asArray(origLat), _asArray(origLon), _asArray(dist), _asArray(az)
     
     Re = 6378.1e3 + (alt * 1e3)
     dist = dist * 1e3
@@ -433,7 +493,7 @@ def greatCircleMove(origLat, origLon, dist, az, alt=0):
     ret_lat = numpy.degrees(lat2)
     ret_lon = numpy.degrees(lon2)
     
-    if ret_lon < -180.: ret_lon = ret_lon + 360.
+    ret_lon = ret_lon + 360.*(ret_lon < -180.)
     return [ret_lat,ret_lon]
 
 # *************************************************************
@@ -451,6 +511,7 @@ def greatCircleAzm(lat1,lon1,lat2,lon2):
     """
 
     from numpy import sin, cos, arctan2, degrees, radians
+    lat1,lon1,lat2,lon2 = _asArray(lat1),_asArray(lon1),_asArray(lat2),_asArray(lon2)
     lat1,lon1,lat2,lon2 = radians(lat1),radians(lon1),radians(lat2),radians(lon2)
     dlon  = lon2-lon1
     y     = sin(dlon)*cos(lat2)
@@ -474,6 +535,7 @@ def greatCircleDist(lat1,lon1,lat2,lon2):
     """
     from numpy import cos, sin, arctan2, radians, sqrt
 
+    lat1,lon1,lat2,lon2 = _asArray(lat1),_asArray(lon1),_asArray(lat2),_asArray(lon2)
     lat1,lon1,lat2,lon2 = radians(lat1),radians(lon1),radians(lat2),radians(lon2)
 
     dlat = lat2-lat1
@@ -0,0 +1,311 @@
+# Copyright (C) 2012  VT SuperDARN Lab
+# Full license can be found in LICENSE.txt
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+.. module:: instrument
+   :synopsis: named counters and timers for the hot paths of sdio, plotting and proc
+
+.. moduleauthor:: VTSD Lab
+
+*****************************
+**Module**: utils.instrument
+*****************************
+Named counters, timers and peaks for the hot paths of sdio, plotting and proc: bytes read, records decoded and filtered out, cache hits and misses, decode/render/compute seconds and the largest arrays made.  Nothing is recorded unless instrumentation is on, and then every call checks a single module flag first, so leaving the calls in costs next to nothing.
+
+Instrumentation is turned on by setting DAVIT_INSTRUMENT before python starts, or for a block of code with :class:`instrumented`.  With DAVIT_INSTRUMENT=1 the report is printed when python exits, and if DAVIT_INSTRUMENT names a .json file the report is written there instead.
+
+The names are dotted by where they are recorded, eg sdio.bytesRead, sdio.decode, plot.rti.render, proc.music.calculateKarr.
+
+**Functions**:
+  * :func:`utils.instrument.enable`
+  * :func:`utils.instrument.count`
+  * :func:`utils.instrument.peak`
+  * :func:`utils.instrument.addTime`
+  * :func:`utils.instrument.timer`
+  * :func:`utils.instrument.timed`
+  * :func:`utils.instrument.report`
+  * :func:`utils.instrument.formatReport`
+  * :func:`utils.instrument.writeReport`
+  * :func:`utils.instrument.reset`
+**Classes**:
+  * :class:`utils.instrument.instrumented`
+
+**Example**:
+  ::
+
+    from utils import instrument
+    with instrument.instrumented() as run:
+      myPtr = pydarn.sdio.radDataOpen(sTime,'bks',eTime=eTime)
+      myBeam = myPtr.readRec()
+    print instrument.formatReport(run.report)
+"""
+import os
+import threading
+import time
+
+#whether anything is being recorded.  callers on hot paths check this
+#before doing any work of their own for instrumentation
+enabled = False
+
+_lock = threading.Lock()
+_counters = {}
+_timers = {}
+_peaks = {}
+_start = time.time()
+
+def enable(on=True):
+  """turn recording on or off for the rest of the run.  what has been recorded is kept, see :func:`reset`.
+
+  **Args**:
+    * **[on]** (bool): True to record. default = True
+  **Returns**:
+    * **was** (bool): whether recording was on before
+  """
+  global enabled
+  was,enabled = enabled,bool(on)
+  return was
+
+def count(name, n=1):
+  """add n to a named counter, eg records decoded
+
+  **Args**:
+    * **name** (str): the counter
+    * **[n]** (int): the amount to add. default = 1
+  """
+  if not enabled or not n: return
+  with _lock:
+    _counters[name] = _counters.get(name,0)+n
+
+def peak(name, value):
+  """keep the largest value seen under a name, eg the bytes of the biggest array made
+
+  **Args**:
+    * **name** (str): the peak
+    * **value** (number): the value seen now
+  """
+  if not enabled: return
+  with _lock:
+    if value > _peaks.get(name,value-1): _peaks[name] = value
+
+def addTime(name, seconds, calls=1):
+  """add seconds to a named timer
+
+  **Args**:
+    * **name** (str): the timer
+    * **seconds** (float): the time spent
+    * **[calls]** (int): the number of calls the time is for. default = 1
+  """
+  if not enabled: return
+  with _lock:
+    t = _timers.get(name)
+    if t is None: t = _timers[name] = [0.,0]
+    t[0] += seconds
+    t[1] += calls
+
+class _timer():
+  """times a with block, see :func:`timer`"""
+  def __init__(self, name):
+    self.name = name
+
+  def __enter__(self):
+    self.t0 = time.time()
+    return self
+
+  def __exit__(self, *args):
+    addTime(self.name,time.time()-self.t0)
+    return False
+
+class _noTimer():
+  """what :func:`timer` gives when nothing is being recorded"""
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *args):
+    return False
+
+_off = _noTimer()
+
+def timer(name):
+  """a context manager which adds the time spent in a with block to a named timer
+
+  **Args**:
+    * **name** (str): the timer
+  **Returns**:
+    * **timer** (object): the context manager.  when nothing is being recorded a shared one which does nothing is returned
+
+  **Example**:
+    ::
+
+      with instrument.timer('plot.rti.render'):
+        myFig.savefig('rti.png')
+  """
+  if not enabled: return _off
+  return _timer(name)
+
+def timed(name):
+  """a decorator which adds the time spent in each call of a function to a named timer
+
+  **Args**:
+    * **name** (str): the timer
+
+  **Example**:
+    ::
+
+      @instrument.timed('proc.music.calculateKarr')
+      def calculateKarr(dataObj, ...):
+  """
+  def decorate(func):
+    def wrapper(*args, **kwargs):
+      if not enabled: return func(*args, **kwargs)
+      t0 = time.time()
+      try:
+        return func(*args, **kwargs)
+      finally:
+        addTime(name,time.time()-t0)
+    wrapper.__name__ = func.__name__
+    wrapper.__doc__ = func.__doc__
+    wrapper.__module__ = func.__module__
+    return wrapper
+  return decorate
+
+def report():
+  """what has been recorded since the last :func:`reset`
+
+  **Returns**:
+    * **report** (dict): counters {name: n}, timers {name: {'seconds','calls'}}, peaks {name: value}, wall (seconds since the last reset) and maxRss (the peak resident memory of the process in kB, where it is known)
+  """
+  with _lock:
+    rep = {'counters':dict(_counters),
+           'timers':dict([(k,{'seconds':v[0],'calls':v[1]}) for k,v in _timers.iteritems()]),
+           'peaks':dict(_peaks),
+           'wall':time.time()-_start}
+  try:
+    import resource
+    rep['maxRss'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+  except Exception:
+    rep['maxRss'] = None
+  return rep
+
+def formatReport(rep=None):
+  """a report as a table of text
+
+  **Args**:
+    * **[rep]** (dict): a report from :func:`report`.  None formats the current one. default = None
+  **Returns**:
+    * **text** (str): the report
+  """
+  if rep is None: rep = report()
+  lines = ['davitpy instrumentation, %.3f s wall' % rep['wall']]
+  if rep.get('maxRss') is not None: lines.append('  peak rss: %d kB' % rep['maxRss'])
+  if len(rep['timers']) > 0:
+    lines.append('  timers:')
+    for name in sorted(rep['timers']):
+      t = rep['timers'][name]
+      lines.append('    %-40s %10.4f s %8d calls' % (name,t['seconds'],t['calls']))
+  if len(rep['counters']) > 0:
+    lines.append('  counters:')
+    for name in sorted(rep['counters']):
+      lines.append('    %-40s %12d' % (name,rep['counters'][name]))
+  if len(rep['peaks']) > 0:
+    lines.append('  peaks:')
+    for name in sorted(rep['peaks']):
+      lines.append('    %-40s %12s' % (name,rep['peaks'][name]))
+  return '\n'.join(lines)
+
+def writeReport(fileName, rep=None):
+  """write a report as json
+
+  **Args**:
+    * **fileName** (str): the file to write
+    * **[rep]** (dict): a report from :func:`report`.  None writes the current one. default = None
+  """
+  import json
+  if rep is None: rep = report()
+  f = open(fileName,'w')
+  try:
+    json.dump(rep,f,indent=1,sort_keys=True)
+  finally:
+    f.close()
+
+def reset():
+  """forget everything recorded so far"""
+  global _start
+  with _lock:
+    _counters.clear()
+    _timers.clear()
+    _peaks.clear()
+    _start = time.time()
+
+class instrumented():
+  """A context manager which records a block of code on its own.  Anything recorded before the block is put aside and restored after it, with the block's own numbers added to it if recording was on.
+
+  **Attrs**:
+    * **report** (dict): the report of the block, see :func:`report`.  set when the block ends
+
+  **Example**:
+    ::
+
+      with instrument.instrumented() as run:
+        pydarn.plotting.rti.plotRti(sTime,'bks',eTime=eTime,show=False)
+      print run.report['timers']['plot.rti.render']
+  """
+  def __init__(self):
+    self.report = None
+
+  def __enter__(self):
+    global _start
+    with _lock:
+      self.__saved = (dict(_counters),dict([(k,list(v)) for k,v in _timers.iteritems()]),dict(_peaks),_start)
+    reset()
+    self.__was = enable(True)
+    return self
+
+  def __exit__(self, *args):
+    global _start
+    self.report = report()
+    enable(self.__was)
+    counters,timers,peaks,start = self.__saved
+    with _lock:
+      if self.__was:
+        for k,v in _counters.iteritems(): counters[k] = counters.get(k,0)+v
+        for k,v in _timers.iteritems():
+          t = timers.setdefault(k,[0.,0])
+          t[0] += v[0]
+          t[1] += v[1]
+        for k,v in _peaks.iteritems(): peaks[k] = max(peaks.get(k,v),v)
+      _counters.clear()
+      _counters.update(counters)
+      _timers.clear()
+      _timers.update(timers)
+      _peaks.clear()
+      _peaks.update(peaks)
+      _start = start
+    return False
+
+def _atExit(dest):
+  """the report of the run, printed or written to a json file"""
+  try:
+    if dest.endswith('.json'): writeReport(dest)
+    else: print formatReport()
+  except Exception,e:
+    print 'problem writing the instrumentation report',e
+
+#turn on from the environment, with the report made at exit
+_dest = os.environ.get('DAVIT_INSTRUMENT','')
+if _dest not in ('','0'):
+  import atexit
+  enabled = True
+  atexit.register(_atExit,_dest)
@@ -26,6 +26,7 @@ class mapObj(basemap.Basemap):
   
   **Members**: 
     * **coords** (str): map coordinate system ('geo', 'mag', 'mlt').
+    * **approx** (bool): whether arrays are converted to and from 'mag' with the approximate aacgm lookup grid
     * all members of :class:`mpl_toolkits.basemap.Basemap` (<http://tinyurl.com/d4rzmfo>) 
   **Methods**:
     * all methods of :class:`mpl_toolkits.basemap.Basemap` (<http://tinyurl.com/d4rzmfo>)
@@ -52,7 +53,7 @@ class mapObj(basemap.Basemap):
     projection='stere', resolution='c', dateTime=None, 
     lat_0=None, lon_0=None, boundinglat=None, width=None, height=None, 
     fillContinents='.8', fillOceans='None', fillLakes=None, coastLineWidth=0., 
-    grid=True, gridLabels=True, showCoords=True, **kwargs):
+    grid=True, gridLabels=True, showCoords=True, approx=False, **kwargs):
     """Create empty map 
     
     **Args**:    
@@ -66,6 +67,8 @@ class mapObj(basemap.Basemap):
       * **[coords]**: 'geo'
       * **[showCoords]**: display coordinate system name in upper right corner
       * **[dateTime]** (datetime.datetime): necessary for MLT plots if you want the continents to be plotted
+      * **[approx]**: convert coastlines and other arrays to and from 'mag' with a precomputed aacgm lookup grid, 
+        which is much faster but approximate, see :mod:`models.aacgm.aacgmGrid`.  default = False
       * **[kwargs]**: See <http://tinyurl.com/d4rzmfo> for more keywords
     **Returns**:
       * **map**: a Basemap object (<http://tinyurl.com/d4rzmfo>)
@@ -95,6 +98,7 @@ class mapObj(basemap.Basemap):
       print 'Invalid coordinate system given in coords ({}): setting "geo"'.format(coords)
       coords = 'geo'
     self.coords = coords
+    self.approx = approx
 
     # Set map projection limits and center point depending on hemisphere selection
     if lat_0 is None: 
@@ -161,15 +165,9 @@ class mapObj(basemap.Basemap):
       trans = coords+'-'+self.coords
       if trans in ['geo-mag','mag-geo']:
         flag = 0 if trans == 'geo-mag' else 1
-        try:
-          nx, ny = len(x), len(y)
-          xt = np.array(x)
-          yt = np.array(y)
-          shape = xt.shape    
-          y, x, _ = aacgm.aacgmConvArr(list(yt.flatten()), list(xt.flatten()), [0.]*nx, flag)
-          x = np.array(x).reshape(shape)
-          y = np.array(y).reshape(shape)
-        except TypeError as e:
+        if np.ndim(x) > 0 or np.ndim(y) > 0:
+          y, x, _ = aacgm.aacgmConvArray(y, x, 0., flag, approx=self.approx)
+        else:
           y, x, _ = aacgm.aacgmConv(y, x, 0., flag)
 
 
@@ -185,15 +183,9 @@ class mapObj(basemap.Basemap):
         return basemap.Basemap.__call__(self, x, y, inverse=inverse)
       if 'mpl_toolkits' in callerFile and callerName is '_readboundarydata':
         if not inverse:
-          try:
-            nx, ny = len(x), len(y)
-            x = np.array(x)
-            y = np.array(y)
-            shape = x.shape
-            yout, xout, _ = aacgm.aacgmConvArr(list(y.flatten()), list(x.flatten()), [0.]*nx, 0)
-            xout = np.array(xout).reshape(shape)
-            yout = np.array(yout).reshape(shape)
-          except TypeError:
+          if np.ndim(x) > 0 or np.ndim(y) > 0:
+            yout, xout, _ = aacgm.aacgmConvArray(y, x, 0., 0, approx=self.approx)
+          else:
             yout, xout, _ = aacgm.aacgmConv(y, x, 0., 0)
           return basemap.Basemap.__call__(self, xout, yout, inverse=inverse)
         else:
@@ -213,10 +205,8 @@ class mapObj(basemap.Basemap):
     import numpy as np
 
     if self.coords is 'mag':
-      nPts = len(self._boundarypolyll.boundary[:, 0])
-      lats, lons, _ = aacgm.aacgmConvArr(list(self._boundarypolyll.boundary[:, 1]), 
-              list(self._boundarypolyll.boundary[:, 0]), 
-              [0.]*nPts, 1)
+      lats, lons, _ = aacgm.aacgmConvArray(self._boundarypolyll.boundary[:, 1], 
+              self._boundarypolyll.boundary[:, 0], 0., 1, approx=self.approx)
       b = np.asarray([lons,lats]).T
       oldgeom = deepcopy(self._boundarypolyll)
       newgeom = _geoslib.Polygon(b).fix()